@@ -160,7 +160,10 @@ def cluster_entities():
                 {
                     "cluster_id": 0,
                     "entity_ids": [...],
-                    "size": 10
+                    "size": 10,
+                    "representative_type": "layer",
+                    "representative_entity_id": "...",
+                    "cohesion": 0.87
                 }
             ],
             "method": "kmeans",
@@ -270,9 +273,13 @@ def compute_similarity_matrix():
 
     Request Body:
         {
-            "entity_ids": ["uuid-1", "uuid-2", "uuid-3", ...]
+            "entity_ids": ["uuid-1", "uuid-2", "uuid-3", ...],
+            "top_k": 20,            // Optional: keep each entity's k nearest
+            "min_similarity": 0.5   // Optional: drop pairs below this score
         }
 
+    Selections over 2,000 entities default to each entity's top 50.
+
     Returns:
         {
             "similarity_matrix": {
@@ -280,7 +287,9 @@ def compute_similarity_matrix():
                 "uuid-2": {"uuid-1": 0.85, "uuid-2": 1.0, ...}
             },
             "entities": [...],
-            "size": 3
+            "size": 3,
+            "sparse": false,
+            "model_id": "..."
         }
     """
     try:
@@ -290,7 +299,9 @@ def compute_similarity_matrix():
             return jsonify({'error': 'entity_ids is required'}), 400
 
         result = search_service.compute_entity_similarity_matrix(
-            entity_ids=data['entity_ids']
+            entity_ids=data['entity_ids'],
+            top_k=data.get('top_k'),
+            min_similarity=data.get('min_similarity')
         )
 
         return jsonify(result), 200
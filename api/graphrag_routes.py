@@ -462,7 +462,8 @@ def invalidate_cache():
 
     Returns:
         {
-            "message": "Cache invalidated successfully"
+            "message": "Cache invalidated successfully",
+            "invalidated_queries": 3
         }
     """
     try:
@@ -471,13 +472,14 @@ def invalidate_cache():
         entity_ids = data.get('entity_ids')
         reason = data.get('reason', 'manual_invalidation')
 
-        # Invalidate query cache
-        graphrag_service.invalidate_cache(entity_ids=entity_ids, reason=reason)
+        # Invalidate query cache (only results containing entity_ids, if given)
+        invalidated = graphrag_service.invalidate_cache(entity_ids=entity_ids, reason=reason)
 
         # Invalidate analytics cache
         analytics_service.invalidate_analytics_cache()
 
-        return jsonify({'message': 'Cache invalidated successfully'}), 200
+        return jsonify({'message': 'Cache invalidated successfully',
+                        'invalidated_queries': invalidated}), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -103,13 +103,16 @@ def create_edges_batch():
         service = RelationshipGraphService()
         results = service.create_edges_batch(
             project_id=data['project_id'],
-            edges=data['edges']
+            edges=data['edges'],
+            page_size=int(data.get('page_size', 1000))
         )
 
         return jsonify({
             'success': True,
             'edges': results,
-            'count': len(results)
+            'edge_ids': [edge['edge_id'] for edge in results],
+            'count': len(results),
+            'metrics': service.batch_metrics
         }), 201
 
     except ValueError as e:
@@ -124,6 +127,42 @@ def create_edges_batch():
         }), 500
 
 
+@relationship_bp.route('/edges/batch', methods=['DELETE'])
+def delete_edges_batch():
+    """Delete multiple relationship edges in a batch."""
+    try:
+        data = request.get_json()
+
+        if not data or 'edge_ids' not in data:
+            return jsonify({
+                'success': False,
+                'error': 'Missing edge_ids array'
+            }), 400
+
+        service = RelationshipGraphService()
+        count = service.delete_edges_batch(
+            edge_ids=data['edge_ids'],
+            soft_delete=data.get('soft_delete', True)
+        )
+
+        return jsonify({
+            'success': True,
+            'count': count,
+            'metrics': service.batch_metrics
+        })
+
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 @relationship_bp.route('/edges/<edge_id>', methods=['GET'])
 def get_edge(edge_id):
     """Get a single relationship edge by ID."""
@@ -277,7 +316,8 @@ def get_related_entities():
         return jsonify({
             'success': True,
             'related_entities': results,
-            'count': len(results)
+            'count': len(results),
+            'query_stats': service.query_stats
         })
 
     except Exception as e:
@@ -314,7 +354,8 @@ def get_subgraph():
 
         return jsonify({
             'success': True,
-            'subgraph': result
+            'subgraph': result,
+            'query_stats': service.query_stats
         })
 
     except Exception as e:
@@ -356,13 +397,15 @@ def find_path():
             return jsonify({
                 'success': True,
                 'path': None,
-                'message': 'No path found'
+                'message': 'No path found',
+                'query_stats': service.query_stats
             })
 
         return jsonify({
             'success': True,
             'path': path,
-            'length': len(path)
+            'length': len(path),
+            'query_stats': service.query_stats
         })
 
     except Exception as e:
@@ -374,9 +417,18 @@ def find_path():
 
 @relationship_bp.route('/query/cycles', methods=['GET'])
 def detect_cycles():
-    """Detect cycles in the relationship graph."""
+    """
+    Detect cycles in the relationship graph.
+
+    Query params:
+        project_id: Project UUID
+        mode: 'cycles' (default) for representative cycles, or 'components'
+              for the full strongly-connected-component analysis
+        max_cycles: Maximum number of cycles to return
+    """
     try:
         project_id = request.args.get('project_id')
+        mode = request.args.get('mode', 'cycles')
 
         if not project_id:
             return jsonify({
@@ -385,12 +437,25 @@ def detect_cycles():
             }), 400
 
         service = RelationshipQueryService()
-        cycles = service.detect_cycles(project_id)
+
+        if mode == 'components':
+            analysis = service.analyze_cycles(
+                project_id,
+                max_cycles=int(request.args.get('max_cycles', 20))
+            )
+            return jsonify({
+                'success': True,
+                'analysis': analysis,
+                'query_stats': service.query_stats
+            })
+
+        cycles = service.detect_cycles(project_id, max_cycles=int(request.args.get('max_cycles', 100)))
 
         return jsonify({
             'success': True,
             'cycles': cycles,
-            'count': len(cycles)
+            'count': len(cycles),
+            'query_stats': service.query_stats
         })
 
     except Exception as e:
@@ -57,6 +57,9 @@ import zipfile
 import tempfile
 from weasyprint import HTML, CSS
 from services.project_mapping_service import ProjectMappingService
+from services.advanced_search_engine import advanced_search_engine, search_history_log
+from services.batch_operation_executor import batch_operation_executor
+from services.tile_cache import bump_project_data_version
 from project_mapping_registry import get_supported_entity_types
 from database import get_db, execute_query
 from pyproj import Transformer
@@ -716,6 +719,8 @@ def delete_survey_points(project_id):
                     (project_id, point_ids)
                 )
                 deleted_count = cur.rowcount
+                if deleted_count:
+                    bump_project_data_version(project_id, cur)
                 conn.commit()
         
         return jsonify({
@@ -2523,6 +2528,8 @@ def universal_reclassify():
             
             execute_query(delete_query, (source_id,))
         
+        bump_project_data_version(obj.get('project_id'))
+        
         return jsonify({
             'success': True,
             'message': f'Entity reclassified from {source_table} to {target_type}',
@@ -12266,12 +12273,15 @@ def soft_delete_survey_points():
                     UPDATE survey_points 
                     SET is_active = false, updated_at = CURRENT_TIMESTAMP
                     WHERE point_id = ANY(%s::uuid[])
-                    RETURNING point_id
+                    RETURNING point_id, project_id
                     """,
                     (point_ids,)
                 )
                 
-                deleted_ids = [row[0] for row in cur.fetchall()]
+                rows = cur.fetchall()
+                deleted_ids = [row[0] for row in rows]
+                for changed_project_id in {row[1] for row in rows if row[1]}:
+                    bump_project_data_version(changed_project_id, cur)
                 conn.commit()
                 
                 return jsonify({
@@ -12307,12 +12317,15 @@ def restore_survey_points():
                     UPDATE survey_points 
                     SET is_active = true, updated_at = CURRENT_TIMESTAMP
                     WHERE point_id = ANY(%s::uuid[])
-                    RETURNING point_id
+                    RETURNING point_id, project_id
                     """,
                     (point_ids,)
                 )
                 
-                restored_ids = [row[0] for row in cur.fetchall()]
+                rows = cur.fetchall()
+                restored_ids = [row[0] for row in rows]
+                for changed_project_id in {row[1] for row in rows if row[1]}:
+                    bump_project_data_version(changed_project_id, cur)
                 conn.commit()
                 
                 return jsonify({
@@ -13391,205 +13404,44 @@ def use_nl_query_template(template_id):
 
 @app.route('/api/search/execute', methods=['POST'])
 def execute_advanced_search():
-    """Execute an advanced search with filters"""
+    """Execute an advanced search with filters, one keyset page at a time"""
     try:
         data = request.get_json()
         entity_type = data.get('entity_type')
         filter_config = data.get('filter_config', {})
         sort_field = data.get('sort_field', 'created_at')
         sort_direction = data.get('sort_direction', 'DESC')
-        page = data.get('page', 1)
         per_page = data.get('per_page', 50)
+        cursor = data.get('cursor')
 
         if not entity_type:
             return jsonify({'error': 'entity_type is required'}), 400
 
-        # Build query based on entity type and filters
-        query, params = build_search_query(entity_type, filter_config, sort_field, sort_direction, page, per_page)
-
-        # Execute search
-        start_time = datetime.now()
-        results = execute_query(query, params)
-        execution_time = int((datetime.now() - start_time).total_seconds() * 1000)
+        try:
+            page = advanced_search_engine.search(
+                entity_type, filter_config, sort_field, sort_direction, per_page, cursor
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-        # Save to search history
-        history_query = """
-            INSERT INTO search_history
-            (entity_type, filter_config, result_count, execution_time_ms, executed_by)
-            VALUES (%s, %s, %s, %s, %s)
-            RETURNING search_id
-        """
-        history_result = execute_query(
-            history_query,
-            (entity_type, json.dumps(filter_config), len(results) if results else 0, execution_time, 'system')
+        # Written in the background; the id is usable right away
+        search_id = search_history_log.record(
+            entity_type, filter_config, page['count'], page['execution_time_ms'], 'system'
         )
 
-        search_id = history_result[0]['search_id'] if history_result else None
-
         return jsonify({
-            'results': results if results else [],
-            'count': len(results) if results else 0,
-            'execution_time_ms': execution_time,
-            'search_id': str(search_id) if search_id else None,
-            'page': page,
+            'results': page['results'],
+            'count': page['count'],
+            'has_more': page['has_more'],
+            'next_cursor': page['next_cursor'],
+            'execution_time_ms': page['execution_time_ms'],
+            'search_id': search_id,
             'per_page': per_page
         })
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def build_search_query(entity_type, filter_config, sort_field, sort_direction, page, per_page):
-    """Build SQL query based on entity type and filters"""
-    params = []
-
-    # Base queries for different entity types
-    if entity_type == 'utility_structures':
-        base_query = """
-            SELECT us.structure_id, us.structure_number, us.structure_type,
-                   sts.type_name, us.rim_elevation, us.invert_elevation,
-                   p.project_name, p.municipality,
-                   ST_X(us.rim_geometry) as lon, ST_Y(us.rim_geometry) as lat
-            FROM utility_structures us
-            LEFT JOIN structure_type_standards sts ON us.structure_type_id = sts.type_id
-            LEFT JOIN projects p ON us.project_id = p.project_id
-            WHERE us.is_active = TRUE
-        """
-    elif entity_type == 'survey_points':
-        base_query = """
-            SELECT sp.point_id, sp.point_number, sp.point_description,
-                   spd.description_text, sp.northing, sp.easting, sp.elevation,
-                   sp.survey_date, smt.method_name, sp.surveyed_by,
-                   p.project_name
-            FROM survey_points sp
-            LEFT JOIN survey_point_description_standards spd ON sp.point_description_id = spd.description_id
-            LEFT JOIN survey_method_types smt ON sp.survey_method_id = smt.method_id
-            LEFT JOIN projects p ON sp.project_id = p.project_id
-            WHERE sp.is_active = TRUE
-        """
-    elif entity_type == 'utility_lines':
-        base_query = """
-            SELECT ul.line_id, ul.line_number, ul.line_type, ul.material,
-                   ul.diameter, ul.slope, ul.length_ft,
-                   us1.structure_number as upstream_structure,
-                   us2.structure_number as downstream_structure,
-                   p.project_name
-            FROM utility_lines ul
-            LEFT JOIN utility_structures us1 ON ul.upstream_structure_id = us1.structure_id
-            LEFT JOIN utility_structures us2 ON ul.downstream_structure_id = us2.structure_id
-            LEFT JOIN projects p ON ul.project_id = p.project_id
-            WHERE ul.is_active = TRUE
-        """
-    elif entity_type == 'projects':
-        base_query = """
-            SELECT p.project_id, p.project_number, p.project_name,
-                   p.client, p.municipality, p.status, p.start_date,
-                   COUNT(DISTINCT us.structure_id) as structure_count,
-                   COUNT(DISTINCT sp.point_id) as point_count,
-                   COUNT(DISTINCT ul.line_id) as line_count
-            FROM projects p
-            LEFT JOIN utility_structures us ON us.project_id = p.project_id
-            LEFT JOIN survey_points sp ON sp.project_id = p.project_id
-            LEFT JOIN utility_lines ul ON ul.project_id = p.project_id
-            WHERE p.is_active = TRUE
-        """
-    else:
-        raise ValueError(f"Unsupported entity type: {entity_type}")
-
-    # Apply filters
-    where_clauses = []
-
-    # Text search filters
-    if 'search_text' in filter_config and filter_config['search_text']:
-        search_text = f"%{filter_config['search_text']}%"
-        params.append(search_text)
-        if entity_type == 'utility_structures':
-            where_clauses.append("(us.structure_number ILIKE %s OR us.structure_type ILIKE %s)")
-            params.append(search_text)
-        elif entity_type == 'survey_points':
-            where_clauses.append("(sp.point_number ILIKE %s OR sp.point_description ILIKE %s)")
-            params.append(search_text)
-
-    # Specific field filters
-    if 'structure_type_id' in filter_config and filter_config['structure_type_id']:
-        where_clauses.append("us.structure_type_id = %s")
-        params.append(filter_config['structure_type_id'])
-
-    if 'project_id' in filter_config and filter_config['project_id']:
-        where_clauses.append(f"{entity_type[0:2]}.project_id = %s")
-        params.append(filter_config['project_id'])
-
-    if 'material' in filter_config and filter_config['material']:
-        where_clauses.append("ul.material ILIKE %s")
-        params.append(f"%{filter_config['material']}%")
-
-    # Elevation range
-    if 'elevation_range' in filter_config:
-        elev_range = filter_config['elevation_range']
-        if elev_range.get('min') is not None:
-            where_clauses.append("sp.elevation >= %s")
-            params.append(elev_range['min'])
-        if elev_range.get('max') is not None:
-            where_clauses.append("sp.elevation <= %s")
-            params.append(elev_range['max'])
-
-    # Date range
-    if 'date_range' in filter_config:
-        date_range = filter_config['date_range']
-        field = date_range.get('field', 'created_at')
-        if date_range.get('start'):
-            where_clauses.append(f"{field} >= %s")
-            params.append(date_range['start'])
-        if date_range.get('end'):
-            where_clauses.append(f"{field} <= %s")
-            params.append(date_range['end'])
-
-    # Spatial search
-    if 'spatial_search' in filter_config:
-        spatial = filter_config['spatial_search']
-        if spatial['type'] == 'radius':
-            where_clauses.append(
-                "ST_DWithin(us.rim_geometry, ST_SetSRID(ST_MakePoint(%s, %s), 2226), %s)"
-            )
-            params.extend([spatial['center_lon'], spatial['center_lat'], spatial['radius_feet']])
-        elif spatial['type'] == 'bbox':
-            where_clauses.append(
-                "sp.northing BETWEEN %s AND %s AND sp.easting BETWEEN %s AND %s"
-            )
-            params.extend([
-                spatial['min_northing'], spatial['max_northing'],
-                spatial['min_easting'], spatial['max_easting']
-            ])
-
-    # Special filters
-    if filter_config.get('has_no_connections'):
-        where_clauses.append("""
-            NOT EXISTS (
-                SELECT 1 FROM utility_lines ul1
-                WHERE ul1.upstream_structure_id = us.structure_id
-                   OR ul1.downstream_structure_id = us.structure_id
-            )
-        """)
-
-    if filter_config.get('elevation_null'):
-        where_clauses.append("sp.elevation IS NULL")
-
-    # Combine where clauses
-    if where_clauses:
-        base_query += " AND " + " AND ".join(where_clauses)
-
-    # Add GROUP BY for projects
-    if entity_type == 'projects':
-        base_query += " GROUP BY p.project_id, p.project_number, p.project_name, p.client, p.municipality, p.status, p.start_date"
-
-    # Add sorting
-    base_query += f" ORDER BY {sort_field} {sort_direction}"
-
-    # Add pagination
-    offset = (page - 1) * per_page
-    base_query += f" LIMIT {per_page} OFFSET {offset}"
-
-    return base_query, params
-
 @app.route('/api/search/facets/<entity_type>')
 def get_search_facets(entity_type):
     """Get available facet values for filtering"""
@@ -13759,6 +13611,7 @@ def delete_search_template(template_id):
 def get_search_history():
     """Get search history with optional filtering"""
     try:
+        search_history_log.flush()
         bookmarked_only = request.args.get('bookmarked_only', 'false') == 'true'
         entity_type = request.args.get('entity_type')
         limit = int(request.args.get('limit', 50))
@@ -13796,6 +13649,7 @@ def get_search_history():
 def update_search_history(search_id):
     """Update search history (bookmark, feedback, etc.)"""
     try:
+        search_history_log.flush()
         data = request.get_json()
 
         query = """
@@ -13834,6 +13688,9 @@ def export_search_results():
         if not results:
             return jsonify({'error': 'No results to export'}), 400
 
+        if search_id:
+            search_history_log.flush()
+
         if export_format == 'csv':
             # Create CSV
             output = io.StringIO()
@@ -14050,9 +13907,14 @@ def get_batch_job_details(job_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def send_batch_task(task_name, job_id):
+    """Queue a batch job task on the Celery worker and return its task id"""
+    from app.celery_config import send_task
+    return send_task(task_name, job_id)
+
 @app.route('/api/batch/jobs/<uuid:job_id>/start', methods=['POST'])
 def start_batch_job(job_id):
-    """Start executing a batch job"""
+    """Start executing a batch job in the background"""
     try:
         # Update job status to running
         update_query = """
@@ -14060,21 +13922,29 @@ def start_batch_job(job_id):
             SET status = 'running',
                 started_at = CURRENT_TIMESTAMP
             WHERE job_id = %s AND status = 'pending'
+              AND (requires_approval = FALSE OR approved_at IS NOT NULL)
             RETURNING job_id
         """
 
         result = execute_query(update_query, (str(job_id),))
 
         if not result:
-            return jsonify({'error': 'Job not found or already started'}), 404
+            return jsonify({'error': 'Job not found, already started or awaiting approval'}), 404
 
-        # In a production system, this would trigger background processing
-        # For now, we'll return success and process would happen asynchronously
+        try:
+            task_id = send_batch_task('app.tasks.execute_batch_job', str(job_id))
+        except Exception as e:
+            execute_query(
+                "UPDATE batch_operation_jobs SET status = 'pending', started_at = NULL WHERE job_id = %s RETURNING job_id",
+                (str(job_id),)
+            )
+            return jsonify({'error': f'Could not queue batch job: {e}'}), 503
 
         return jsonify({
             'message': 'Batch job started',
-            'job_id': str(job_id)
-        })
+            'job_id': str(job_id),
+            'task_id': task_id
+        }), 202
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -14104,19 +13974,38 @@ def cancel_batch_job(job_id):
 
 @app.route('/api/batch/jobs/<uuid:job_id>/rollback', methods=['POST'])
 def rollback_batch_job(job_id):
-    """Rollback a completed batch job"""
+    """Rollback a completed batch job in the background"""
     try:
-        # Call rollback function
-        query = """
-            SELECT rollback_batch_operation(%s)
-        """
+        job = execute_query("""
+            SELECT job_id
+            FROM batch_operation_jobs
+            WHERE job_id = %s
+              AND status IN ('completed', 'cancelled')
+              AND is_reversible = TRUE
+              AND rolled_back_at IS NULL
+        """, (str(job_id),))
+
+        if not job:
+            return jsonify({'error': 'Job not found or not reversible'}), 404
 
-        result = execute_query(query, (str(job_id),))
+        try:
+            task_id = send_batch_task('app.tasks.rollback_batch_job', str(job_id))
+        except Exception as e:
+            execute_query("""
+                UPDATE batch_operation_jobs
+                SET status = 'failed',
+                    error_summary = jsonb_build_object('error', %s::text)
+                WHERE job_id = %s
+                RETURNING job_id
+            """, (f'Could not queue rollback: {e}', str(job_id)))
+            return jsonify({'error': f'Could not queue batch job rollback: {e}'}), 503
 
         return jsonify({
-            'message': 'Batch job rolled back successfully',
-            'success': result[0]['rollback_batch_operation'] if result else False
-        })
+            'message': 'Batch job rollback started',
+            'job_id': str(job_id),
+            'task_id': task_id,
+            'success': True
+        }), 202
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -14161,60 +14050,13 @@ def execute_batch_operation():
         if not all([operation_type, entity_type, entity_ids]):
             return jsonify({'error': 'Missing required fields'}), 400
 
-        results = {
-            'successful': [],
-            'failed': [],
-            'total': len(entity_ids)
-        }
-
-        # Process based on operation type
-        if operation_type == 'bulk_update':
-            field = operation_config.get('field')
-            value = operation_config.get('value')
-
-            if not field:
-                return jsonify({'error': 'Missing field for bulk update'}), 400
-
-            # Build update query based on entity type
-            table_name = entity_type
-            id_column = f"{entity_type[:-1]}_id"  # Remove 's' and add '_id'
-
-            for entity_id in entity_ids:
-                try:
-                    update_query = f"""
-                        UPDATE {table_name}
-                        SET {field} = %s
-                        WHERE {id_column} = %s
-                        RETURNING {id_column}
-                    """
-                    result = execute_query(update_query, (value, entity_id))
-                    if result:
-                        results['successful'].append(entity_id)
-                    else:
-                        results['failed'].append({'entity_id': entity_id, 'error': 'Not found'})
-                except Exception as e:
-                    results['failed'].append({'entity_id': entity_id, 'error': str(e)})
-
-        elif operation_type == 'bulk_delete':
-            # Soft delete
-            table_name = entity_type
-            id_column = f"{entity_type[:-1]}_id"
-
-            for entity_id in entity_ids:
-                try:
-                    delete_query = f"""
-                        UPDATE {table_name}
-                        SET is_active = FALSE
-                        WHERE {id_column} = %s
-                        RETURNING {id_column}
-                    """
-                    result = execute_query(delete_query, (entity_id,))
-                    if result:
-                        results['successful'].append(entity_id)
-                    else:
-                        results['failed'].append({'entity_id': entity_id, 'error': 'Not found'})
-                except Exception as e:
-                    results['failed'].append({'entity_id': entity_id, 'error': str(e)})
+        # One UPDATE ... WHERE id = ANY(...) per chunk of ids, in one transaction
+        try:
+            results = batch_operation_executor.apply(
+                operation_type, entity_type, entity_ids, operation_config
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
         return jsonify({
             'message': 'Batch operation completed',
@@ -2,17 +2,21 @@
 GIS Engine Blueprint
 Handles all DXF/CAD operations, Map Export, Coordinate Systems, and Spatial Utilities
 """
-from flask import Blueprint, render_template, jsonify, request, send_file, make_response, redirect
+from flask import Blueprint, Response, render_template, jsonify, request, send_file, make_response, redirect
 from werkzeug.utils import secure_filename
 import os
 import uuid
-import json
 from psycopg2.extras import RealDictCursor
 
 from database import get_db, execute_query
 from dxf_importer import DXFImporter
 from dxf_exporter import DXFExporter
 from map_export_service import MapExportService
+from services.map_export_engine import EXPORT_FORMATS
+from services.tile_cache import tile_cache, bump_project_data_version
+from services.map_viewer_service import pixel_size_ft
+from services.geometry_generalization_service import geometry_generalization_service as generalization
+from services.geojson_stream import stream_features, mimetype
 
 
 # Create Blueprint
@@ -20,6 +24,33 @@ gis_bp = Blueprint('gis', __name__)
 
 # Initialize MapExportService at module level
 map_export = MapExportService()
+map_viewer = tile_cache.map_viewer
+
+# (table, geometry column) -> other column names, looked up once per process
+_layer_columns = {}
+
+
+def get_layer_columns(table_name: str, geom_column: str) -> list:
+    """Columns of a layer table except its geometry column (cached)"""
+    key = (table_name, geom_column)
+    if key not in _layer_columns:
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT column_name
+                    FROM information_schema.columns
+                    WHERE table_name = %s
+                    AND column_name != %s
+                    ORDER BY ordinal_position
+                """, (table_name, geom_column))
+                _layer_columns[key] = [row[0] for row in cur.fetchall()]
+    return _layer_columns[key]
+
+
+def send_map_export_task(job_id: str) -> str:
+    """Queue a map export job on the Celery worker and return its task id"""
+    from app.celery_config import send_task
+    return send_task('app.tasks.run_map_export', job_id)
 
 
 # ============================================
@@ -315,37 +346,20 @@ def reimport_dxf_with_changes():
         file.save(temp_path)
 
         try:
-            # Step 1: Import DXF entities (without creating new intelligent objects yet)
-            importer = DXFImporter(DB_CONFIG, create_intelligent_objects=False)
-            import_stats = importer.import_dxf(
-                temp_path,
-                project_id,
-                import_modelspace=True
-            )
-
-            # Step 2: Get the reimported entities from database (recent imports only)
-            # Use a 10-minute window to capture just the entities from this import
-            with get_db() as conn:
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute("""
-                        SELECT entity_id, layer_name, entity_type,
-                               ST_AsText(geometry) as wkt_geom,
-                               attributes
-                        FROM drawing_entities
-                        WHERE project_id = %s
-                        AND created_at >= NOW() - INTERVAL '10 minutes'
-                    """, (project_id,))
-                    new_entities = cur.fetchall()
-
-            # Step 3: Run change detection
+            # Step 1: Read and hash the DXF entities client-side (nothing is
+            # written for entities that did not change)
             detector = DXFChangeDetector(DB_CONFIG)
-            change_report = detector.detect_changes(project_id, new_entities)
+            reimported_entities = detector.read_dxf_entities(temp_path)
 
+            # Step 2: Diff against stored entity links and apply only the changes
+            change_report = detector.detect_changes(project_id, reimported_entities)
+
+            modified = change_report.get('geometry_changes', 0) + change_report.get('layer_changes', 0)
             return jsonify({
                 'success': True,
-                'import_stats': import_stats,
+                'import_stats': {'entities_read': len(reimported_entities)},
                 'changes': change_report,
-                'message': f"Detected {len(change_report.get('added', []))} new, {len(change_report.get('modified', []))} modified, {len(change_report.get('deleted', []))} deleted"
+                'message': f"Detected {change_report.get('new_entities', 0)} new, {modified} modified, {change_report.get('deleted_entities', 0)} deleted"
             })
 
         finally:
@@ -454,7 +468,7 @@ def get_database_layers():
                 'id': 'horizontal_alignments',
                 'name': 'Alignments',
                 'table': 'horizontal_alignments',
-                'geom_column': 'geometry',
+                'geom_column': 'alignment_geometry',
                 'geom_type': 'LineString',
                 'enabled': True,
                 'description': 'Horizontal centerline alignments',
@@ -589,15 +603,22 @@ def get_layer_data(layer_id: str):
 
 @gis_bp.route('/api/map-viewer/database-layer-data/<layer_id>')
 def get_database_layer_data(layer_id: str):
-    """Fetch database layer data from PostGIS tables"""
+    """
+    Fetch database layer data from PostGIS tables
+
+    Geometry is generalized for the map resolution, given by ?zoom= or else
+    by the bbox and ?width= (viewport width in pixels, default 1024).
+    The FeatureCollection is streamed; ?format=ndjson streams one Feature
+    per line instead.
+    """
     try:
         # Map layer IDs to table and geometry column
         layer_map = {
             'survey_points': ('survey_points', 'geometry', 'Point'),
             'utility_lines': ('utility_lines', 'geometry', 'LineString'),
-            'utility_structures': ('utility_structures', 'geometry', 'Point'),
-            'parcels': ('parcels', 'geometry', 'Polygon'),
-            'horizontal_alignments': ('horizontal_alignments', 'geometry', 'LineString'),
+            'utility_structures': ('utility_structures', 'rim_geometry', 'Point'),
+            'parcels': ('parcels', 'boundary_geometry', 'Polygon'),
+            'horizontal_alignments': ('horizontal_alignments', 'alignment_geometry', 'LineString'),
             'surface_features': ('surface_features', 'geometry', 'Mixed'),
             'drawing_entities': ('drawing_entities', 'geometry', 'Mixed')
         }
@@ -622,60 +643,43 @@ def get_database_layer_data(layer_id: str):
         min_x_2226, min_y_2226 = transformer.transform(minx, miny)
         max_x_2226, max_y_2226 = transformer.transform(maxx, maxy)
 
+        # Ground size of a screen pixel selects the generalization level
+        zoom = request.args.get('zoom', type=int)
+        if zoom is not None:
+            feet_per_pixel = pixel_size_ft(zoom)
+        else:
+            width_px = request.args.get('width', 1024, type=int) or 1024
+            feet_per_pixel = (max_x_2226 - min_x_2226) / width_px
+        level = generalization.level_for_resolution(feet_per_pixel)
+        join, geometry = generalization.geometry_sql(table_name, 't', level, geom_column)
+
         # Build query to fetch features within bbox (data in EPSG:2226, transformed to WGS84 for output)
         # Get all columns except the geometry column to avoid conflicts
-        with get_db() as conn:
-            with conn.cursor() as cur:
-                cur.execute(f"""
-                    SELECT column_name
-                    FROM information_schema.columns
-                    WHERE table_name = '{table_name}'
-                    AND column_name != '{geom_column}'
-                """)
-                columns = [row[0] for row in cur.fetchall()]
+        columns = get_layer_columns(table_name, geom_column)
 
-        columns_str = ', '.join(columns)
+        columns_str = ', '.join(f't.{column}' for column in columns)
+        params = {'minx': min_x_2226, 'miny': min_y_2226, 'maxx': max_x_2226, 'maxy': max_y_2226,
+                  'min_size': feet_per_pixel}
+        # Below full resolution, skip lines and polygons smaller than a pixel
+        size_filter = f"AND {generalization.min_size_sql(f't.{geom_column}')}" if level else ""
         query = f"""
             SELECT
-                ST_AsGeoJSON(ST_Transform({geom_column}, 4326)) as geometry_json,
+                ST_AsGeoJSON(ST_Transform({geometry}, 4326),
+                             {generalization.coordinate_digits(feet_per_pixel)}) as geometry_json,
                 {columns_str}
-            FROM {table_name}
-            WHERE {geom_column} && ST_MakeEnvelope(%s, %s, %s, %s, 2226)
+            FROM {table_name} t
+            {join}
+            WHERE t.{geom_column} && ST_MakeEnvelope(%(minx)s, %(miny)s, %(maxx)s, %(maxy)s, 2226)
+              {size_filter}
             LIMIT 1000
         """
 
-        with get_db() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(query, (min_x_2226, min_y_2226, max_x_2226, max_y_2226))
-                rows = cur.fetchall()
-
-        # Convert to GeoJSON features
-        features = []
-        for row in rows:
-            geom_json = json.loads(row['geometry_json'])
-
-            # Build properties (exclude geometry_json column)
-            properties = {}
-            for key, value in row.items():
-                if key != 'geometry_json':
-                    # Convert datetime/UUID/etc to string
-                    if hasattr(value, 'isoformat'):
-                        properties[key] = value.isoformat()
-                    elif value is None:
-                        continue
-                    else:
-                        properties[key] = str(value)
-
-            features.append({
-                'type': 'Feature',
-                'geometry': geom_json,
-                'properties': properties
-            })
+        output_format = request.args.get('format', 'geojson')
+        if output_format not in ('geojson', 'ndjson'):
+            return jsonify({'error': f'Unknown format: {output_format}'}), 400
 
-        return jsonify({
-            'type': 'FeatureCollection',
-            'features': features
-        })
+        body = stream_features([(query, params, None)], output_format)
+        return Response(body, mimetype=mimetype(output_format))
 
     except Exception as e:
         print(f"Error fetching database layer data: {e}")
@@ -684,6 +688,41 @@ def get_database_layer_data(layer_id: str):
         return jsonify({'error': str(e)}), 500
 
 
+@gis_bp.route('/tiles/layers.json')
+def get_tile_layers():
+    """List the vector tile layers with their URL template and zoom range"""
+    layers = map_viewer.list_tile_layers()
+    for layer in layers:
+        layer['tiles'] = [f"/tiles/{layer['id']}/{{z}}/{{x}}/{{y}}.mvt"]
+    return jsonify({'layers': layers})
+
+
+@gis_bp.route('/tiles/cache/stats')
+def get_tile_cache_stats():
+    """Tile cache hit rate (this worker) and size"""
+    return jsonify(tile_cache.stats())
+
+
+@gis_bp.route('/tiles/<layer>/<int:z>/<int:x>/<int:y>.mvt')
+def get_vector_tile(layer: str, z: int, x: int, y: int):
+    """Serve a Mapbox Vector Tile for a database layer (optionally ?project_id=)"""
+    if layer not in map_viewer.layers:
+        return jsonify({'error': f'Unknown tile layer: {layer}'}), 404
+
+    try:
+        tile = tile_cache.get_tile(layer, z, x, y, request.args.get('project_id'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if tile is None:
+        return jsonify({'error': 'Tile generation failed'}), 500
+
+    response = make_response(tile)
+    response.headers['Content-Type'] = 'application/vnd.mapbox-vector-tile'
+    response.headers['Cache-Control'] = 'public, max-age=300'
+    return response
+
+
 @gis_bp.route('/api/map-viewer/projects')
 def get_map_projects():
     """Get all projects with spatial data for map display (computed from entity bounding boxes)"""
@@ -841,58 +880,48 @@ def get_project_structure():
 
 @gis_bp.route('/api/map-viewer/project-entities/<project_id>')
 def get_project_entities_map(project_id: str):
-    """Get project entities as GeoJSON for map display"""
+    """
+    Get project entities as GeoJSON for map display
+
+    With ?zoom=, geometry is generalized for that zoom and entities smaller
+    than a pixel are skipped. Streamed like database-layer-data
+    (?format=ndjson for one Feature per line).
+    """
     try:
-        from pyproj import Transformer
+        zoom = request.args.get('zoom', type=int)
+        level = generalization.level_for_zoom(zoom) if zoom is not None else None
+        join, geometry = generalization.geometry_sql('drawing_entities', 'de', level)
+        feet_per_pixel = pixel_size_ft(zoom) if zoom is not None else None
+        digits = generalization.coordinate_digits(feet_per_pixel) if feet_per_pixel else 9
+        size_filter = f"AND {generalization.min_size_sql('de.geometry')}" if level else ""
 
         # Get all drawing entities for this project
-        query = """
+        query = f"""
             SELECT
-                entity_id,
-                entity_type,
-                layer_name,
-                color_aci,
-                linetype,
-                lineweight,
-                ST_AsText(geometry) as wkt_geometry,
-                attributes
-            FROM drawing_entities
-            WHERE project_id = %s
-            AND geometry IS NOT NULL
+                de.entity_id,
+                de.entity_type,
+                l.layer_name,
+                de.color_aci,
+                COALESCE(de.linetype, 'Continuous') AS linetype,
+                COALESCE(de.lineweight, 0) AS lineweight,
+                ST_AsGeoJSON(ST_Transform({geometry}, 4326), {digits}) as geometry_json
+            FROM drawing_entities de
+            LEFT JOIN layers l ON l.layer_id = de.layer_id
+            {join}
+            WHERE de.project_id = %(project_id)s
+            AND de.geometry IS NOT NULL
+            {size_filter}
             LIMIT 5000
         """
 
-        with get_db() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(query, (project_id,))
-                entities = cur.fetchall()
-
-        # Transform to WGS84 for map display
-        transformer = Transformer.from_crs("EPSG:2226", "EPSG:4326", always_xy=True)
-
-        # Convert to GeoJSON (simplified - just return WKT for now)
-        features = []
-        for entity in entities:
-            # Basic feature structure
-            feature = {
-                'type': 'Feature',
-                'properties': {
-                    'entity_id': str(entity['entity_id']),
-                    'entity_type': entity['entity_type'],
-                    'layer_name': entity['layer_name'],
-                    'color_aci': entity['color_aci'],
-                    'linetype': entity['linetype'] or 'Continuous',
-                    'lineweight': entity['lineweight'] or 0
-                }
-            }
-            # Note: WKT to GeoJSON conversion would happen here in production
-            features.append(feature)
+        output_format = request.args.get('format', 'geojson')
+        if output_format not in ('geojson', 'ndjson'):
+            return jsonify({'error': f'Unknown format: {output_format}'}), 400
 
-        return jsonify({
-            'type': 'FeatureCollection',
-            'features': features,
-            'count': len(features)
-        })
+        body = stream_features(
+            [(query, {'project_id': project_id, 'min_size': feet_per_pixel}, None)], output_format,
+            trailer=lambda count: {'count': count, 'generalization_level': level})
+        return Response(body, mimetype=mimetype(output_format))
 
     except Exception as e:
         print(f"Error fetching project entities: {str(e)}")
@@ -901,6 +930,17 @@ def get_project_entities_map(project_id: str):
         return jsonify({'error': str(e)}), 500
 
 
+@gis_bp.route('/api/map-viewer/generalize/<project_id>', methods=['POST'])
+def refresh_project_generalization(project_id: str):
+    """Rebuild a project's generalized map geometry (e.g. for data imported before it existed)"""
+    try:
+        summary = generalization.refresh(project_id)
+        bump_project_data_version(project_id)
+        return jsonify({'success': True, 'tables': summary})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @gis_bp.route('/api/map-viewer/project-layers/<project_id>')
 def get_project_layers(project_id: str):
     """Get unique layer names for a project"""
@@ -1164,161 +1204,33 @@ def create_simple_export():
 
 @gis_bp.route('/api/map-export/create', methods=['POST'])
 def create_multi_format_export():
-    """Create export with multiple formats (PNG, DXF, SHP, KML)"""
+    """Queue an export job with multiple formats (PNG, SHP, GeoPackage, FlatGeobuf, DXF, KML)"""
     try:
-        import requests
-        from shapely.geometry import shape
-        from shapely import geometry as geom_lib
-        from pyproj import Transformer
+        params = request.get_json() or {}
+        bbox = params.get('bbox')
+        if not bbox or any(key not in bbox for key in ('minx', 'miny', 'maxx', 'maxy')):
+            return jsonify({'error': 'bbox with minx, miny, maxx, maxy is required'}), 400
 
-        params = request.json
-        bbox = params.get('bbox', {})
-        requested_layers = params.get('layers', [])
-        formats = params.get('formats', ['shp'])  # Default to shapefile only
-        png_options = params.get('png_options', {'north_arrow': True, 'scale_bar': True})
+        params['formats'] = params.get('formats') or ['shp']  # Default to shapefile only
+        unknown = [fmt for fmt in params['formats'] if fmt not in EXPORT_FORMATS]
+        if unknown:
+            return jsonify({'error': f"Unknown formats: {', '.join(unknown)}",
+                            'supported_formats': list(EXPORT_FORMATS)}), 400
 
-        print(f"Creating multi-format export:")
-        print(f"  Formats: {formats}")
-        print(f"  Layers: {requested_layers}")
-        print(f"  PNG options: {png_options}")
+        job_id = map_export.create_export_job(params, project_id=params.get('project_id'))
 
-        # Create unique ID for this export
-        export_id = str(uuid.uuid4())
-        export_dir = os.path.join('/tmp/exports', export_id)
-        os.makedirs(export_dir, exist_ok=True)
-
-        # Get bounding box in WGS84
-        minx, miny, maxx, maxy = bbox['minx'], bbox['miny'], bbox['maxx'], bbox['maxy']
-
-        # Coordinate transformer
-        transformer = Transformer.from_crs("EPSG:4326", "EPSG:2226", always_xy=True)
-
-        # Get GIS layer configurations from database
-        with get_db() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("SELECT * FROM gis_layers WHERE enabled = true AND id = ANY(%s)", (requested_layers,))
-                layers = cur.fetchall()
-
-        print(f"Found {len(layers)} layers in database")
-
-        # PRIORITY 1: Fetch drawing entities from database (automatic, ALL layers)
-        print("Fetching drawing entities from database...")
-        all_layers_data = {}
-        feature_counts = {}
-
-        # Transform bbox to EPSG:2226 for PostGIS query
-        min_x_2226, min_y_2226 = transformer.transform(minx, miny)
-        max_x_2226, max_y_2226 = transformer.transform(maxx, maxy)
-        bbox_2226 = (min_x_2226, min_y_2226, max_x_2226, max_y_2226)
-
-        # Use MapExportService with database connection
-        with get_db() as conn:
-            export_service = MapExportService(db_conn=conn)
-            project_id = params.get('project_id')
-            drawing_layers = export_service.fetch_drawing_entities_by_layer(bbox_2226, project_id=project_id, srid=2226)
-
-            if drawing_layers:
-                print(f"Found {len(drawing_layers)} DXF-imported layers")
-                for layer_name, features in drawing_layers.items():
-                    # Features are already in EPSG:2226, need to transform to WGS84 for consistency
-                    features_wgs84 = []
-                    back_transformer = Transformer.from_crs("EPSG:2226", "EPSG:4326", always_xy=True)
-
-                    for feature in features:
-                        try:
-                            geom_2226 = shape(feature['geometry'])
-
-                            # Transform to WGS84 (handle both 2D and 3D geometries)
-                            if geom_2226.geom_type == 'LineString':
-                                # Handle 3D coordinates (x, y, z) by ignoring Z
-                                coords_wgs84 = []
-                                for coord in geom_2226.coords:
-                                    x, y = coord[0], coord[1]  # Ignore Z if present
-                                    lon, lat = back_transformer.transform(x, y)
-                                    coords_wgs84.append((lon, lat))
-                                geom_wgs84 = geom_lib.LineString(coords_wgs84)
-                            elif geom_2226.geom_type == 'Polygon':
-                                exterior_wgs84 = []
-                                for coord in geom_2226.exterior.coords:
-                                    x, y = coord[0], coord[1]  # Ignore Z if present
-                                    lon, lat = back_transformer.transform(x, y)
-                                    exterior_wgs84.append((lon, lat))
-                                geom_wgs84 = geom_lib.Polygon(exterior_wgs84)
-                            elif geom_2226.geom_type == 'Point':
-                                x, y = geom_2226.x, geom_2226.y
-                                lon, lat = back_transformer.transform(x, y)
-                                geom_wgs84 = geom_lib.Point(lon, lat)
-                            else:
-                                geom_wgs84 = geom_2226  # Keep as-is for unsupported types
-
-                            features_wgs84.append({
-                                'type': 'Feature',
-                                'geometry': geom_wgs84.__geo_interface__,
-                                'properties': feature['properties']
-                            })
-                        except Exception as e:
-                            print(f"Error transforming drawing entity: {e}")
-                            import traceback
-                            traceback.print_exc()
-                            continue
-
-                    all_layers_data[layer_name] = features_wgs84
-                    feature_counts[layer_name] = len(features_wgs84)
-                    print(f"  {layer_name}: {len(features_wgs84)} features")
-
-        # PRIORITY 2: Fetch external WFS layers
-        for layer_config in layers:
-            layer_id = layer_config['id']
-            layer_url = layer_config['url']
-            layer_name = layer_config['name']
-
-            print(f"Fetching external WFS layer {layer_name}...")
-
-            try:
-                # Query FeatureServer with bounding box
-                query_url = f"{layer_url}/query"
-                query_params = {
-                    'where': '1=1',
-                    'geometry': f'{minx},{miny},{maxx},{maxy}',
-                    'geometryType': 'esriGeometryEnvelope',
-                    'inSR': '4326',
-                    'spatialRel': 'esriSpatialRelIntersects',
-                    'outFields': '*',
-                    'returnGeometry': 'true',
-                    'outSR': '4326',
-                    'f': 'json'
-                }
-
-                response = requests.get(query_url, params=query_params, timeout=30)
-                response.raise_for_status()
-                esri_data = response.json()
-
-                # Convert ESRI JSON to GeoJSON
-                from arcgis2geojson import arcgis2geojson
-
-                features = []
-                for esri_feature in esri_data.get('features', []):
-                    try:
-                        geojson_feature = arcgis2geojson(esri_feature)
-                        if geojson_feature.get('geometry') is not None:
-                            features.append(geojson_feature)
-                    except Exception as e:
-                        continue
-
-                feature_counts[layer_id] = len(features)
-                all_layers_data[layer_id] = features
-                print(f"  Found {len(features)} features")
-
-            except Exception as e:
-                print(f"  ERROR fetching {layer_name}: {e}")
-                feature_counts[layer_id] = 0
+        try:
+            task_id = send_map_export_task(job_id)
+        except Exception as e:
+            map_export.fail_export_job(job_id, f'Could not queue export job: {e}')
+            return jsonify({'error': f'Could not queue export job: {e}'}), 503
 
         return jsonify({
-            'status': 'complete',
-            'export_id': export_id,
-            'feature_counts': feature_counts,
-            'message': f'Exported {sum(feature_counts.values())} total features'
-        })
+            'status': 'pending',
+            'job_id': job_id,
+            'task_id': task_id,
+            'status_url': f'/api/map-export/status/{job_id}'
+        }), 202
 
     except Exception as e:
         print(f"ERROR in create_multi_format_export: {e}")
@@ -1360,19 +1272,9 @@ def download_simple_export(export_id: str):
 
 @gis_bp.route('/api/map-export/status/<job_id>')
 def get_export_status(job_id: str):
-    """Get status of export job"""
+    """Get status of export job, with per-format timings once it has run"""
     try:
-        query = """
-            SELECT id, status, params, download_url, file_size_mb,
-                   error_message, created_at, expires_at
-            FROM map_export_jobs
-            WHERE id = %s
-        """
-
-        with get_db() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(query, (job_id,))
-                job = cur.fetchone()
+        job = map_export.get_export_job(job_id)
 
         if not job:
             return jsonify({'error': 'Job not found'}), 404
@@ -1382,8 +1284,12 @@ def get_export_status(job_id: str):
             'status': job['status'],
             'download_url': job['download_url'],
             'file_size_mb': float(job['file_size_mb']) if job['file_size_mb'] else None,
+            'feature_count': job['feature_count'],
+            'timings': job['format_timings'],
             'error': job['error_message'],
             'created_at': job['created_at'].isoformat() if job['created_at'] else None,
+            'started_at': job['started_at'].isoformat() if job['started_at'] else None,
+            'completed_at': job['completed_at'].isoformat() if job['completed_at'] else None,
             'expires_at': job['expires_at'].isoformat() if job['expires_at'] else None
         })
 
@@ -1396,12 +1302,7 @@ def download_export(job_id: str, filename: str):
     """Download completed export file"""
     try:
         # Verify job exists and is complete
-        query = "SELECT status, download_url FROM map_export_jobs WHERE id = %s"
-
-        with get_db() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(query, (job_id,))
-                job = cur.fetchone()
+        job = map_export.get_export_job(job_id)
 
         if not job:
             return jsonify({'error': 'Job not found'}), 404
@@ -1410,7 +1311,7 @@ def download_export(job_id: str, filename: str):
             return jsonify({'error': 'Export not complete'}), 400
 
         # Construct file path
-        file_path = os.path.join('/tmp/exports', job_id, filename)
+        file_path = os.path.join(map_export.export_dir, str(job['id']), secure_filename(filename))
 
         if not os.path.exists(file_path):
             return jsonify({'error': 'File not found'}), 404
@@ -1530,15 +1431,22 @@ def delete_coordinate_system_crud(system_id: str):
 
 @gis_bp.route('/api/map/data', methods=['POST'])
 def get_map_data():
-    """Get spatial data for map with filters and styling"""
+    """
+    Get spatial data for map with filters and styling
+
+    bbox is [minx, miny, maxx, maxy] in WGS84; filters are column = value
+    matches on the requested tables. The FeatureCollection is streamed
+    ("format": "ndjson" for one Feature per line).
+    """
     try:
         data = request.get_json()
         entity_types = data.get('entity_types', [])
         filters = data.get('filters', {})
         bbox = data.get('bbox')  # [minx, miny, maxx, maxy]
         color_by = data.get('color_by', 'type')
-
-        features = []
+        output_format = data.get('format', 'geojson')
+        if output_format not in ('geojson', 'ndjson'):
+            return jsonify({'error': f'Unknown format: {output_format}'}), 400
 
         # Color schemes
         type_colors = {
@@ -1554,72 +1462,64 @@ def get_map_data():
             'CONC': '#ffff00'
         }
 
-        for entity_type in entity_types:
-            # Build query based on entity type
-            if entity_type == 'survey_points':
-                query = """
-                    SELECT id, point_number, northing, easting, elevation, description,
-                           ST_AsGeoJSON(ST_Transform(geometry, 4326)) as geojson
-                    FROM survey_points
-                    WHERE is_active = TRUE
-                """
-            elif entity_type == 'utility_structures':
-                query = """
-                    SELECT id, structure_number, structure_type, rim_elevation, invert_elevation,
-                           ST_AsGeoJSON(ST_Transform(geometry, 4326)) as geojson
-                    FROM utility_structures
-                    WHERE is_active = TRUE
-                """
-            elif entity_type == 'utility_lines':
-                query = """
-                    SELECT id, material, diameter, ST_Length(geometry) as length,
-                           ST_AsGeoJSON(ST_Transform(geometry, 4326)) as geojson
-                    FROM utility_lines
-                    WHERE is_active = TRUE
-                """
-            else:
-                continue
-
-            # Add bbox filter if provided
-            if bbox:
-                query += f" AND ST_Intersects(geometry, ST_MakeEnvelope({bbox[0]}, {bbox[1]}, {bbox[2]}, {bbox[3]}, 4326))"
-
-            # Add other filters
-            for key, value in filters.items():
-                if value:
-                    query += f" AND {key} = '{value}'"
-
-            query += " LIMIT 1000"
-
-            results = execute_query(query)
-
-            # Convert to GeoJSON features
-            for row in results:
-                geom = json.loads(row['geojson']) if row.get('geojson') else None
+        # entity type -> (table, geometry column, selected columns, base conditions)
+        # (only survey_points has an is_active column)
+        entity_queries = {
+            'survey_points': ('survey_points', 'geometry',
+                              'point_id AS id, point_number, northing, easting, elevation, '
+                              'point_description AS description', ['is_active = TRUE']),
+            'utility_structures': ('utility_structures', 'rim_geometry',
+                                   'structure_id AS id, structure_number, structure_type, '
+                                   'rim_elevation, invert_elevation', []),
+            'utility_lines': ('utility_lines', 'geometry',
+                              'line_id AS id, material, diameter_mm AS diameter, '
+                              'ST_Length(geometry) AS length', []),
+        }
 
-                # Determine color
+        def styler(entity_type):
+            def style(properties):
                 if color_by == 'type':
                     color = type_colors.get(entity_type, '#ffffff')
-                elif color_by == 'material' and 'material' in row:
-                    color = material_colors.get(row['material'], '#ffffff')
+                elif color_by == 'material' and 'material' in properties:
+                    color = material_colors.get(properties['material'], '#ffffff')
                 else:
                     color = '#00ffff'
+                properties['entity_type'] = entity_type
+                properties['color'] = color
+                return properties
+            return style
 
-                feature = {
-                    'type': 'Feature',
-                    'geometry': geom,
-                    'properties': {
-                        **{k: v for k, v in row.items() if k != 'geojson'},
-                        'entity_type': entity_type,
-                        'color': color
-                    }
-                }
-                features.append(feature)
+        sources = []
+        for entity_type in entity_types:
+            if entity_type not in entity_queries:
+                continue
+            table_name, geom_column, columns_str, base_conditions = entity_queries[entity_type]
+            conditions = list(base_conditions)
+            params = {}
 
-        return jsonify({
-            'type': 'FeatureCollection',
-            'features': features
-        })
+            # Add bbox filter if provided
+            if bbox:
+                conditions.append(f"{geom_column} && ST_Transform(ST_MakeEnvelope("
+                                  "%(minx)s, %(miny)s, %(maxx)s, %(maxy)s, 4326), 2226)")
+                params.update(zip(('minx', 'miny', 'maxx', 'maxy'), (float(v) for v in bbox)))
+
+            # Add other filters (columns of this table only)
+            columns = get_layer_columns(table_name, geom_column)
+            for index, (key, value) in enumerate(filters.items()):
+                if value and key in columns:
+                    conditions.append(f"{key} = %(filter_{index})s")
+                    params[f'filter_{index}'] = value
+
+            query = f"""
+                SELECT {columns_str},
+                       ST_AsGeoJSON(ST_Transform({geom_column}, 4326)) AS geometry_json
+                FROM {table_name}
+                {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+                LIMIT 1000
+            """
+            sources.append((query, params, styler(entity_type)))
+
+        return Response(stream_features(sources, output_format), mimetype=mimetype(output_format))
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
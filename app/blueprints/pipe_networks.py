@@ -7,6 +7,7 @@ from flask import Blueprint, render_template, jsonify, request, session
 from typing import Dict, List, Any, Optional
 from database import get_db, execute_query
 from app.extensions import cache
+from services.tile_cache import bump_project_data_version
 import json
 
 # Create the pipes blueprint
@@ -220,10 +221,12 @@ def update_network_pipe(network_id, pipe_id):
                     UPDATE utility_lines
                     SET {', '.join(updates)}, updated_at = CURRENT_TIMESTAMP
                     WHERE line_id = %s
-                    RETURNING line_id
+                    RETURNING line_id, project_id
                 """
                 cur.execute(query, tuple(params))
                 result = cur.fetchone()
+                if result:
+                    bump_project_data_version(result[1], cur)
                 conn.commit()
 
                 if not result:
@@ -266,10 +269,12 @@ def update_network_structure(network_id, structure_id):
                     UPDATE utility_structures
                     SET {', '.join(updates)}, updated_at = CURRENT_TIMESTAMP
                     WHERE structure_id = %s
-                    RETURNING structure_id
+                    RETURNING structure_id, project_id
                 """
                 cur.execute(query, tuple(params))
                 result = cur.fetchone()
+                if result:
+                    bump_project_data_version(result[1], cur)
                 conn.commit()
 
                 if not result:
@@ -282,17 +287,26 @@ def update_network_structure(network_id, structure_id):
 
 @pipes_bp.route('/api/pipe-networks/<network_id>/auto-connect', methods=['POST'])
 def auto_connect_pipes(network_id):
-    """Automatically connect pipes to nearby structures using spatial snapping"""
+    """
+    Automatically connect pipes to nearby structures using spatial snapping.
+
+    The response includes per-phase 'timings' and 'match_stats'
+    (endpoints matched, distance checks, pipes updated).
+    """
     try:
         from pipe_structure_connector import PipeStructureConnector
 
         data = request.get_json() or {}
-        tolerance_feet = data.get('tolerance_feet', 5.0)
+        tolerance_feet = float(data.get('tolerance_feet', 5.0))
 
         connector = PipeStructureConnector(tolerance_feet=tolerance_feet)
         results = connector.connect_network_pipes(network_id)
 
         if results.get('success'):
+            network = execute_query("SELECT project_id FROM pipe_networks WHERE network_id = %s",
+                                    (network_id,))
+            if network:
+                bump_project_data_version(network[0]['project_id'])
             return jsonify(results), 200
         else:
             return jsonify(results), 500
@@ -566,6 +580,7 @@ def create_pipe():
         ))
 
         if result and len(result) > 0:
+            bump_project_data_version(project_id)
             return jsonify({'line_id': str(result[0]['line_id'])}), 201
         else:
             return jsonify({'error': 'Failed to create pipe'}), 500
@@ -604,10 +619,12 @@ def update_pipe(pipe_id):
                     UPDATE utility_lines
                     SET {', '.join(updates)}, updated_at = CURRENT_TIMESTAMP
                     WHERE line_id = %s
-                    RETURNING line_id
+                    RETURNING line_id, project_id
                 """
                 cur.execute(query, tuple(params))
                 result = cur.fetchone()
+                if result:
+                    bump_project_data_version(result[1], cur)
                 conn.commit()
 
                 if not result:
@@ -634,9 +651,10 @@ def delete_pipe(pipe_id):
                 # If deleted_at column doesn't exist, we'll do hard delete
                 cur.execute("""
                     DELETE FROM utility_lines WHERE line_id = %s
-                    RETURNING line_id
+                    RETURNING line_id, project_id
                 """, (pipe_id,))
                 result = cur.fetchone()
+                bump_project_data_version(result[1], cur)
                 conn.commit()
 
                 return jsonify({'success': True, 'line_id': str(result[0])})
@@ -823,6 +841,7 @@ def create_structure():
         ))
 
         if result and len(result) > 0:
+            bump_project_data_version(project_id)
             return jsonify({'structure_id': str(result[0]['structure_id'])}), 201
         else:
             return jsonify({'error': 'Failed to create structure'}), 500
@@ -861,10 +880,12 @@ def update_structure(structure_id):
                     UPDATE utility_structures
                     SET {', '.join(updates)}, updated_at = CURRENT_TIMESTAMP
                     WHERE structure_id = %s
-                    RETURNING structure_id
+                    RETURNING structure_id, project_id
                 """
                 cur.execute(query, tuple(params))
                 result = cur.fetchone()
+                if result:
+                    bump_project_data_version(result[1], cur)
                 conn.commit()
 
                 if not result:
@@ -890,9 +911,10 @@ def delete_structure(structure_id):
                 # Delete
                 cur.execute("""
                     DELETE FROM utility_structures WHERE structure_id = %s
-                    RETURNING structure_id
+                    RETURNING structure_id, project_id
                 """, (structure_id,))
                 result = cur.fetchone()
+                bump_project_data_version(result[1], cur)
                 conn.commit()
 
                 return jsonify({'success': True, 'structure_id': str(result[0])})
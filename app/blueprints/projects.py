@@ -589,6 +589,9 @@ def delete_survey_points(project_id):
                     (project_id, point_ids)
                 )
                 deleted_count = cur.rowcount
+                if deleted_count:
+                    from services.tile_cache import bump_project_data_version
+                    bump_project_data_version(project_id, cur)
                 conn.commit()
 
         return jsonify({
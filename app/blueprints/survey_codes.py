@@ -33,6 +33,11 @@ def _get_db_config() -> Dict[str, str]:
         'password': os.getenv('PGPASSWORD') or os.getenv('DB_PASSWORD')
     }
 
+def _invalidate_code_library() -> None:
+    """Drop cached code library snapshots after an edit to survey_code_library."""
+    from survey_code_parser import survey_code_cache
+    survey_code_cache.invalidate()
+
 # ============================================================================
 # PAGE ROUTES
 # ============================================================================
@@ -184,6 +189,7 @@ def create_survey_code():
             data.get('tags', []),
             data.get('attributes', {})
         ))
+        _invalidate_code_library()
 
         return jsonify({
             'survey_code': result[0],
@@ -246,6 +252,7 @@ def update_survey_code(code_id):
             data.get('attributes', {}),
             str(code_id)
         ))
+        _invalidate_code_library()
 
         if not result:
             return jsonify({'error': 'Survey code not found'}), 404
@@ -263,6 +270,7 @@ def delete_survey_code(code_id):
     try:
         query = "UPDATE survey_code_library SET is_active = FALSE, updated_at = CURRENT_TIMESTAMP WHERE code_id = %s RETURNING code_id, code"
         result = execute_query(query, (str(code_id),))
+        _invalidate_code_library()
 
         if not result:
             return jsonify({'error': 'Survey code not found'}), 404
@@ -288,6 +296,7 @@ def toggle_survey_code_favorite(code_id):
         """
 
         result = execute_query(query, (is_favorite, str(code_id)))
+        _invalidate_code_library()
 
         if not result:
             return jsonify({'error': 'Survey code not found'}), 404
@@ -150,6 +150,32 @@ def create_celery_app(flask_app: 'Flask') -> Celery:
     return celery
 
 
+# ==================== Task Dispatch ====================
+
+_sender = None
+
+
+def send_task(name: str, *args) -> str:
+    """
+    Queue a task by name on the Celery worker and return its task id.
+
+    Used by web requests, which only need to publish tasks: one Celery app
+    is created per process on first use, from the current Flask app.
+
+    Args:
+        name: Registered task name, e.g. 'app.tasks.run_map_export'
+        *args: Positional task arguments (JSON-serialisable)
+
+    Returns:
+        Celery task id
+    """
+    global _sender
+    if _sender is None:
+        from flask import current_app
+        _sender = create_celery_app(current_app._get_current_object())
+    return _sender.send_task(name, args=list(args)).id
+
+
 # ==================== Celery CLI Integration ====================
 
 def get_celery_app() -> Celery:
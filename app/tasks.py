@@ -7,6 +7,9 @@ blocking the Flask application.
 
 Current Tasks:
     - process_dxf_import: Imports DXF files and creates intelligent objects
+    - execute_batch_job: Runs a batch operation job as chunked set-based UPDATEs
+    - rollback_batch_job: Restores the original values recorded by a batch job
+    - run_map_export: Writes a map export job's formats in parallel and zips them
 
 Task Design Principles:
     - All tasks accept serializable arguments (strings, ints, dicts)
@@ -38,11 +41,13 @@ from flask import current_app
 
 from database import DB_CONFIG
 from dxf_importer import DXFImporter
+from services.batch_operation_executor import BatchOperationExecutor
+from map_export_service import MapExportService
 
 
 # ==================== Status Tracking ====================
 
-def update_task_status(task_id: str, status: str, progress: int = 0,
+def update_task_status(task_id: str, status: str, progress: Optional[int] = 0,
                       message: str = '', result: Optional[Dict] = None) -> None:
     """
     Update the status of a task in the cache.
@@ -50,7 +55,8 @@ def update_task_status(task_id: str, status: str, progress: int = 0,
     Args:
         task_id: Unique identifier for the task
         status: Current status (PENDING, STARTED, PROGRESS, SUCCESS, FAILURE)
-        progress: Percentage complete (0-100)
+        progress: Percentage complete (0-100), or None to keep the recorded
+            value (for work whose total is unknown)
         message: Human-readable status message
         result: Optional result data (for SUCCESS status)
 
@@ -80,10 +86,11 @@ def update_task_status(task_id: str, status: str, progress: int = 0,
         status_record.update({
             'task_id': task_id,
             'status': status,
-            'progress': progress,
             'message': message,
             'updated_at': datetime.utcnow().isoformat()
         })
+        if progress is not None:
+            status_record['progress'] = progress
 
         if result:
             status_record['result'] = result
@@ -122,7 +129,12 @@ def process_dxf_import(self, file_path: str, project_id: str,
                       coordinate_system: str = 'LOCAL',
                       import_modelspace: bool = True,
                       create_intelligent_objects: bool = True,
-                      use_name_translator: bool = True) -> Dict:
+                      use_name_translator: bool = True,
+                      bulk_mode: bool = False,
+                      batch_size: int = 5000,
+                      streaming: bool = False,
+                      chunk_size: int = 5000,
+                      workers: int = 0) -> Dict:
     """
     Asynchronous task to import a DXF file and create intelligent objects.
 
@@ -137,6 +149,14 @@ def process_dxf_import(self, file_path: str, project_id: str,
         import_modelspace: Whether to import model space entities
         create_intelligent_objects: Whether to create intelligent civil objects
         use_name_translator: Whether to use ImportMappingManager for layer translation
+        bulk_mode: Write entities with buffered COPY batches instead of per-row INSERTs
+        batch_size: Rows per table buffered before a bulk flush
+        streaming: Stream modelspace entities in chunks instead of loading the
+            whole document (bounded memory for very large files)
+        chunk_size: Modelspace entities per chunk (streaming mode or workers > 1)
+        workers: Worker processes for entity geometry conversion (0 = inline).
+            Prefork Celery children are daemonic and cannot start a pool, so
+            this only takes effect with the solo or threads worker pool.
 
     Returns:
         Dictionary containing import statistics:
@@ -157,7 +177,10 @@ def process_dxf_import(self, file_path: str, project_id: str,
                 'linetypes': int,
                 'errors': list,
                 'layer_translations': dict,
-                'translation_stats': dict
+                'translation_stats': dict,
+                'batch_timings': list (bulk_mode/streaming only),
+                'chunks': int (streaming or workers > 1),
+                'conversion_workers': int (streaming or workers > 1)
             }
 
     Raises:
@@ -222,6 +245,16 @@ def process_dxf_import(self, file_path: str, project_id: str,
             message=f'Reading DXF file: {os.path.basename(file_path)}'
         )
 
+        def report_chunk_progress(info: Dict) -> None:
+            # Streamed chunks cover the 20-85% range of the task progress
+            update_task_status(
+                task_id=task_id,
+                status='PROGRESS',
+                progress=20 + int(info['fraction'] * 65),
+                message=(f"Imported chunk {info['chunk']} "
+                         f"({info['entities_read']} entities read)")
+            )
+
         # Execute the import
         # This is the long-running operation that justifies async execution
         # The importer handles:
@@ -234,7 +267,13 @@ def process_dxf_import(self, file_path: str, project_id: str,
             file_path=file_path,
             project_id=project_id,
             coordinate_system=coordinate_system,
-            import_modelspace=import_modelspace
+            import_modelspace=import_modelspace,
+            bulk_mode=bulk_mode,
+            batch_size=batch_size,
+            streaming=streaming,
+            chunk_size=chunk_size,
+            progress_callback=report_chunk_progress if streaming else None,
+            workers=workers
         )
 
         # Update status: PROGRESS (90%)
@@ -297,6 +336,144 @@ def process_dxf_import(self, file_path: str, project_id: str,
         raise
 
 
+# ==================== Batch Operation Tasks ====================
+
+@celery_app.task(bind=True, name='app.tasks.execute_batch_job')
+def execute_batch_job(self, job_id: str, chunk_size: int = 5000) -> Dict:
+    """
+    Execute a started batch_operation_jobs row as chunked set-based UPDATEs.
+
+    Args:
+        job_id: UUID of a job moved to 'running' by /api/batch/jobs/<id>/start
+        chunk_size: Entities changed per UPDATE statement
+
+    Returns:
+        Job summary: status, total/processed/successful/failed items,
+        execution_time_ms and chunks
+    """
+    task_id = self.request.id
+
+    try:
+        update_task_status(task_id, 'STARTED', 0, f'Starting batch job {job_id}')
+
+        def report_progress(info: Dict) -> None:
+            total = info['total'] or 1
+            update_task_status(
+                task_id=task_id,
+                status='PROGRESS',
+                progress=min(99, int(info['processed'] * 100 / total)),
+                message=f"Processed {info['processed']} of {info['total']} items"
+            )
+
+        summary = BatchOperationExecutor(chunk_size=chunk_size).run_job(
+            job_id, progress_callback=report_progress
+        )
+
+        update_task_status(
+            task_id=task_id,
+            status='SUCCESS',
+            progress=100,
+            message=(f"Batch job {summary['status']}: {summary['successful_items']} succeeded, "
+                     f"{summary['failed_items']} failed"),
+            result=summary
+        )
+        return summary
+
+    except Exception as e:
+        print(f"ERROR in task {task_id}:")
+        print(traceback.format_exc())
+        update_task_status(task_id, 'FAILURE', 0, f"Batch job failed: {str(e)}")
+        raise
+
+
+@celery_app.task(bind=True, name='app.tasks.rollback_batch_job')
+def rollback_batch_job(self, job_id: str, chunk_size: int = 5000) -> Dict:
+    """
+    Restore the original values recorded by a completed or cancelled batch job.
+
+    Args:
+        job_id: UUID of the batch job to roll back
+        chunk_size: Entities restored per UPDATE statement
+
+    Returns:
+        {'job_id': str, 'restored_items': int}
+    """
+    task_id = self.request.id
+
+    try:
+        update_task_status(task_id, 'STARTED', 0, f'Rolling back batch job {job_id}')
+
+        def report_progress(info: Dict) -> None:
+            total = info['total'] or 1
+            update_task_status(
+                task_id=task_id,
+                status='PROGRESS',
+                progress=min(99, int(info['restored'] * 100 / total)),
+                message=f"Restored {info['restored']} of {info['total']} items"
+            )
+
+        result = BatchOperationExecutor(chunk_size=chunk_size).rollback_job(
+            job_id, progress_callback=report_progress
+        )
+
+        update_task_status(task_id, 'SUCCESS', 100,
+                           f"Restored {result['restored_items']} items", result=result)
+        return result
+
+    except Exception as e:
+        print(f"ERROR in task {task_id}:")
+        print(traceback.format_exc())
+        update_task_status(task_id, 'FAILURE', 0, f"Batch rollback failed: {str(e)}")
+        raise
+
+
+# ==================== Map Export Tasks ====================
+
+@celery_app.task(bind=True, name='app.tasks.run_map_export')
+def run_map_export(self, job_id: str) -> Dict:
+    """
+    Run a pending map_export_jobs row created by /api/map-export/create.
+
+    Args:
+        job_id: UUID of the export job
+
+    Returns:
+        Export result: status, download_url, file_size_mb, feature_count
+        and format_timings
+    """
+    task_id = self.request.id
+
+    try:
+        update_task_status(task_id, 'STARTED', 0, f'Starting map export {job_id}')
+
+        def report_progress(info: Dict) -> None:
+            update_task_status(
+                task_id=task_id,
+                status='PROGRESS',
+                progress=None,  # The total is not known until the stream ends
+                message=f"Exported {info['features']} features"
+            )
+
+        result = MapExportService(db_config=DB_CONFIG).run_export_job(
+            job_id, progress_callback=report_progress
+        )
+
+        update_task_status(
+            task_id=task_id,
+            status='SUCCESS' if result['status'] == 'complete' else 'FAILURE',
+            progress=100,
+            message=f"Map export {result['status']}: {result.get('feature_count') or 0} features",
+            result=result
+        )
+        return result
+
+    except Exception as e:
+        print(f"ERROR in task {task_id}:")
+        print(traceback.format_exc())
+        update_task_status(task_id, 'FAILURE', 0, f"Map export failed: {str(e)}")
+        raise
+
+
 # ==================== Future Tasks ====================
 
 # Additional tasks can be added here following the same pattern:
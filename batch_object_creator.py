@@ -0,0 +1,661 @@
+"""
+Batch Intelligent Object Creator
+Creates intelligent database objects from many DXF entities with set-based SQL.
+
+The per-entity IntelligentObjectCreator classifies a layer and then issues
+several INSERT/UPDATE statements for every entity. This module classifies
+all entities up front (once per distinct layer name), groups them by target
+object type and writes each group with multi-row statements, followed by
+bulk drawing_entities, standards_entities and dxf_entity_links writes.
+"""
+
+import json
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from psycopg2.extras import execute_values
+
+from dxf_geometry import geometry_hash
+from intelligent_object_creator import IntelligentObjectCreator
+from layer_classifier import LayerClassification
+
+
+# Accepted (upper-cased) geometry types per object type, matching the
+# checks done by the per-entity _create_* methods
+LINE_TYPES = ('LINESTRING', 'LINESTRING Z')
+POINT_TYPES = ('POINT', 'POINT Z')
+POLYGON_TYPES = ('POLYGON', 'POLYGON Z')
+
+# Object types that resolve to a shared surface_models row per surface name
+SURFACE_NAME_FORMATS = {
+    'surface_model': None,  # named from the classified surface type
+    'contour': ('Contours - {layer_name}', 'Contour'),
+    'spot_elevation': ('Spot Elevations - {layer_name}', 'Spot Elevation'),
+}
+
+
+def resolve_network_mode(props: Dict, utility_type: str) -> Optional[str]:
+    """Determine network_mode from classification properties with utility-type fallback."""
+    network_mode = props.get('network_mode')
+    if network_mode:
+        # Normalize to lowercase for database enum compatibility
+        return network_mode.lower()
+    if utility_type.lower() in ['storm', 'sanitary', 'sewer']:
+        return 'gravity'
+    if utility_type.lower() in ['water', 'potable', 'reuse', 'reclaim']:
+        return 'pressure'
+    return None
+
+
+def _source_attributes(item: Dict, **extra) -> str:
+    """Standard attributes JSON stamped on objects created from DXF imports."""
+    attributes = {'source': 'dxf_import', 'layer_name': item['entity'].get('layer_name')}
+    attributes.update(extra)
+    return json.dumps(attributes)
+
+
+class BatchIntelligentObjectCreator(IntelligentObjectCreator):
+    """
+    Set-based variant of IntelligentObjectCreator for whole-import batches.
+
+    Objects are written with one multi-row statement per target table and
+    primary keys are generated client-side so created ids can be correlated
+    with their source entities without relying on RETURNING order. Object
+    types without a bulk handler (BMPs, street lights, pavement zones) fall
+    back to the per-entity _create_* methods but still share the bulk link
+    and metadata writes.
+
+    Spatial context enrichment for low-confidence classifications is skipped
+    here (it costs three spatial queries per entity); such objects are still
+    created and flagged 'needs_review' with geometry-based suggestions.
+    """
+
+    def __init__(self, db_config: Dict, conn, page_size: int = 1000):
+        """
+        Initialize the batch creator.
+
+        Args:
+            db_config: Database configuration dictionary
+            conn: Open database connection; the caller owns the transaction
+            page_size: Rows per execute_values page
+        """
+        super().__init__(db_config, conn=conn)
+        self.should_close_conn = False
+        self.page_size = page_size
+
+    def create_from_entities(self, entities: List[Dict], project_id: str,
+                             stats: Optional[Dict] = None) -> int:
+        """
+        Create intelligent objects for a batch of DXF entities.
+
+        Args:
+            entities: Entity data dicts (same shape as create_from_entity input)
+            project_id: UUID of project
+            stats: Optional import statistics dict; group failures are
+                appended to stats['errors']
+
+        Returns:
+            Count of intelligent objects created
+        """
+        errors = stats['errors'] if stats is not None else []
+        groups = self._classify_entities(entities)
+
+        created = []
+        for object_type, items in groups.items():
+            handler = self._bulk_handlers().get(object_type)
+            cur = self.conn.cursor()
+            cur.execute("SAVEPOINT batch_object_group")
+            try:
+                if handler:
+                    handler(items, project_id, cur)
+                else:
+                    self._create_rows_individually(items, project_id)
+                cur.execute("RELEASE SAVEPOINT batch_object_group")
+                created.extend(item for item in items if item.get('object_id'))
+            except Exception as e:
+                cur.execute("ROLLBACK TO SAVEPOINT batch_object_group")
+                errors.append(f"Failed to create {object_type} objects "
+                              f"({len(items)} entities): {str(e)}")
+            finally:
+                cur.close()
+
+        if created:
+            self._bulk_ensure_drawing_entities(created, project_id)
+            self._bulk_update_classification_metadata(created, project_id)
+            self._bulk_create_entity_links(created, project_id)
+
+        return len(created)
+
+    # ------------------------------------------------------------------
+    # Classification and grouping
+    # ------------------------------------------------------------------
+
+    def _classify_entities(self, entities: List[Dict]) -> Dict[str, List[Dict]]:
+        """Classify every entity (once per layer name) and group by object type."""
+        layer_classifications = {}
+        groups: Dict[str, List[Dict]] = {}
+
+        for entity_data in entities:
+            layer_name = entity_data.get('layer_name') or ''
+            if layer_name not in layer_classifications:
+                layer_classifications[layer_name] = self.classifier.classify(layer_name)
+            classification = layer_classifications[layer_name]
+
+            if not classification or classification.confidence < 0.7:
+                classification_state = 'needs_review'
+                suggestions = self._get_classification_suggestions(entity_data, classification, {})
+                if not classification:
+                    classification = LayerClassification(
+                        object_type=self._guess_type_from_geometry(entity_data),
+                        confidence=0.5,
+                        properties={},
+                        network_mode=None
+                    )
+            else:
+                classification_state = 'auto_classified'
+                suggestions = []
+
+            object_type = classification.object_type
+            if object_type == 'ada_feature':
+                object_type = 'surface_feature'
+
+            groups.setdefault(object_type, []).append({
+                'entity': entity_data,
+                'classification': classification,
+                'classification_state': classification_state,
+                'suggestions': suggestions,
+                'object_type': None,
+                'object_id': None,
+                'table_name': None
+            })
+
+        return groups
+
+    def _bulk_handlers(self) -> Dict[str, Callable]:
+        """Map object types to their set-based creation handlers."""
+        return {
+            'utility_line': self._bulk_utility_lines,
+            'utility_structure': self._bulk_utility_structures,
+            'survey_point': self._bulk_survey_points,
+            'site_tree': self._bulk_site_trees,
+            'alignment': self._bulk_alignments,
+            'parcel': self._bulk_parcels,
+            'grading_feature': self._bulk_grading_features,
+            'surface_feature': self._bulk_surface_features,
+            'service_connection': self._bulk_service_connections,
+            'surface_model': self._bulk_surface_models,
+            'contour': self._bulk_surface_models,
+            'spot_elevation': self._bulk_surface_models,
+        }
+
+    @staticmethod
+    def _accepts(item: Dict, geometry_types: Tuple[str, ...]) -> bool:
+        """Check an item's geometry type against the accepted types."""
+        return (item['entity'].get('geometry_type') or '').upper() in geometry_types
+
+    @staticmethod
+    def _assign(item: Dict, object_type: str, table_name: str,
+                object_id: Optional[str] = None) -> str:
+        """Record the object an item will create (generating its id)."""
+        item['object_type'] = object_type
+        item['table_name'] = table_name
+        item['object_id'] = object_id or str(uuid.uuid4())
+        return item['object_id']
+
+    def _create_rows_individually(self, items: List[Dict], project_id: str):
+        """Fallback for object types without a bulk handler."""
+        creators = {
+            'bmp': self._create_bmp,
+            'street_light': self._create_street_light,
+            'pavement_zone': self._create_pavement_zone,
+        }
+        for item in items:
+            creator = creators.get(item['classification'].object_type)
+            if not creator:
+                continue
+            result = creator(item['entity'], item['classification'], project_id)
+            if result:
+                object_type, object_id, table_name = result
+                self._assign(item, object_type, table_name, object_id)
+
+    # ------------------------------------------------------------------
+    # Set-based object handlers
+    # ------------------------------------------------------------------
+
+    def _bulk_network_memberships(self, members: List[Tuple[str, str, str]],
+                                  project_id: str, id_column: str, cur):
+        """Resolve networks once per (utility, mode) and insert memberships in bulk."""
+        if not members:
+            return
+
+        networks = {}
+        rows = []
+        for utility_type, network_mode, object_id in members:
+            key = (utility_type, network_mode)
+            if key not in networks:
+                networks[key] = self._get_or_create_network(project_id, utility_type, network_mode, cur)
+            if networks[key]:
+                line_id = object_id if id_column == 'line_id' else None
+                structure_id = object_id if id_column == 'structure_id' else None
+                rows.append((networks[key], line_id, structure_id))
+
+        execute_values(cur, """
+            INSERT INTO utility_network_memberships (network_id, line_id, structure_id)
+            VALUES %s
+            ON CONFLICT DO NOTHING
+        """, rows, template="(%s::uuid, %s::uuid, %s::uuid)", page_size=self.page_size)
+
+    def _bulk_utility_lines(self, items: List[Dict], project_id: str, cur):
+        """Create utility_lines records."""
+        rows, members = [], []
+        for item in items:
+            if not self._accepts(item, LINE_TYPES):
+                continue
+            props = item['classification'].properties
+            utility_type = props.get('utility_type', 'Unknown')
+            diameter = props.get('diameter_inches')
+            network_mode = resolve_network_mode(props, utility_type)
+            line_id = self._assign(item, 'utility_line', 'utility_lines')
+
+            rows.append((
+                line_id, project_id, utility_type, network_mode, 'Unknown',
+                int(diameter * 25.4) if diameter else None,
+                item['entity'].get('geometry_wkt'),
+                _source_attributes(item)
+            ))
+            if network_mode:
+                members.append((utility_type, network_mode, line_id))
+
+        if rows:
+            execute_values(cur, """
+                INSERT INTO utility_lines (
+                    line_id, project_id, utility_system, utility_mode, material,
+                    diameter_mm, geometry, attributes
+                )
+                VALUES %s
+            """, rows, template="(%s::uuid, %s, %s, %s::utility_mode_enum, %s, %s, %s, %s)",
+                page_size=self.page_size)
+            self._bulk_network_memberships(members, project_id, 'line_id', cur)
+
+    def _bulk_utility_structures(self, items: List[Dict], project_id: str, cur):
+        """Create utility_structures records."""
+        rows, members = [], []
+        for item in items:
+            if not self._accepts(item, POINT_TYPES):
+                continue
+            props = item['classification'].properties
+            utility_type = props.get('utility_type', 'Unknown')
+            network_mode = resolve_network_mode(props, utility_type)
+            structure_id = self._assign(item, 'utility_structure', 'utility_structures')
+
+            rows.append((
+                structure_id, project_id, props.get('structure_type', 'Unknown'),
+                utility_type, network_mode,
+                item['entity'].get('geometry_wkt'),
+                _source_attributes(item)
+            ))
+            if network_mode:
+                members.append((utility_type, network_mode, structure_id))
+
+        if rows:
+            execute_values(cur, """
+                INSERT INTO utility_structures (
+                    structure_id, project_id, structure_type, utility_system, utility_mode,
+                    rim_geometry, attributes
+                )
+                VALUES %s
+            """, rows, template="(%s::uuid, %s, %s, %s, %s::utility_mode_enum, %s, %s)",
+                page_size=self.page_size)
+            self._bulk_network_memberships(members, project_id, 'structure_id', cur)
+
+    def _bulk_survey_points(self, items: List[Dict], project_id: str, cur):
+        """Create survey_points records."""
+        rows = []
+        for item in items:
+            if not self._accepts(item, POINT_TYPES):
+                continue
+            point_id = self._assign(item, 'survey_point', 'survey_points')
+            rows.append((
+                point_id, project_id,
+                f"PT-{item['entity'].get('dxf_handle', 'AUTO')}",
+                item['classification'].properties.get('point_type', 'Topo'),
+                item['entity'].get('geometry_wkt'),
+                _source_attributes(item)
+            ))
+
+        if rows:
+            execute_values(cur, """
+                INSERT INTO survey_points (
+                    point_id, project_id, point_number, point_type, geometry, attributes
+                )
+                VALUES %s
+            """, rows, template="(%s::uuid, %s, %s, %s, %s, %s)", page_size=self.page_size)
+
+    def _bulk_site_trees(self, items: List[Dict], project_id: str, cur):
+        """Create site_trees records."""
+        rows = []
+        for item in items:
+            if not self._accepts(item, POINT_TYPES):
+                continue
+            tree_id = self._assign(item, 'site_tree', 'site_trees')
+            rows.append((
+                tree_id, project_id,
+                item['classification'].properties.get('tree_status', 'Existing'),
+                item['entity'].get('geometry_wkt'),
+                _source_attributes(item)
+            ))
+
+        if rows:
+            execute_values(cur, """
+                INSERT INTO site_trees (tree_id, project_id, tree_status, geometry, attributes)
+                VALUES %s
+            """, rows, template="(%s::uuid, %s, %s, %s, %s)", page_size=self.page_size)
+
+    def _bulk_alignments(self, items: List[Dict], project_id: str, cur):
+        """Create horizontal_alignments records."""
+        rows = []
+        for item in items:
+            if not self._accepts(item, LINE_TYPES):
+                continue
+            alignment_id = self._assign(item, 'alignment', 'horizontal_alignments')
+            rows.append((
+                alignment_id, project_id,
+                item['classification'].properties.get('description', item['entity'].get('layer_name')),
+                'Centerline',
+                item['entity'].get('geometry_wkt'),
+                _source_attributes(item)
+            ))
+
+        if rows:
+            execute_values(cur, """
+                INSERT INTO horizontal_alignments (
+                    alignment_id, project_id, alignment_name, alignment_type,
+                    alignment_geometry, attributes
+                )
+                VALUES %s
+            """, rows, template="(%s::uuid, %s, %s, %s, ST_GeomFromText(%s, 2226), %s)",
+                page_size=self.page_size)
+
+    def _bulk_parcels(self, items: List[Dict], project_id: str, cur):
+        """Create parcels records with areas computed in the same statement."""
+        rows = []
+        for item in items:
+            if not self._accepts(item, POLYGON_TYPES):
+                continue
+            parcel_id = self._assign(item, 'parcel', 'parcels')
+            wkt = item['entity'].get('geometry_wkt')
+            props = item['classification'].properties
+            rows.append((
+                parcel_id, project_id,
+                f"Parcel - {item['entity'].get('layer_name', '')}",
+                wkt, wkt, wkt, wkt,
+                _source_attributes(item, phase=props.get('phase', 'EXIST'))
+            ))
+
+        if rows:
+            execute_values(cur, """
+                INSERT INTO parcels (
+                    parcel_id, project_id, parcel_name, boundary_geometry,
+                    area_sqft, area_acres, perimeter, attributes
+                )
+                VALUES %s
+            """, rows, template="""(
+                %s::uuid, %s, %s, ST_GeomFromText(%s, 2226),
+                ST_Area(ST_GeomFromText(%s, 2226)),
+                ST_Area(ST_GeomFromText(%s, 2226)) / 43560.0,
+                ST_Perimeter(ST_GeomFromText(%s, 2226)), %s
+            )""", page_size=self.page_size)
+
+    def _bulk_grading_features(self, items: List[Dict], project_id: str, cur):
+        """Create grading_limits records (polygon grading features only)."""
+        rows = []
+        for item in items:
+            if not self._accepts(item, POLYGON_TYPES):
+                continue
+            limit_id = self._assign(item, 'grading_feature', 'grading_limits')
+            wkt = item['entity'].get('geometry_wkt')
+            props = item['classification'].properties
+            limit_type = props.get('type', 'Grading')
+            rows.append((
+                limit_id, project_id,
+                f"{limit_type} - {item['entity'].get('layer_name', '')}",
+                limit_type, wkt, wkt, wkt,
+                _source_attributes(item, phase=props.get('phase', 'EXIST'))
+            ))
+
+        if rows:
+            execute_values(cur, """
+                INSERT INTO grading_limits (
+                    limit_id, project_id, limit_name, limit_type, boundary_geometry,
+                    area_sqft, area_acres, attributes
+                )
+                VALUES %s
+            """, rows, template="""(
+                %s::uuid, %s, %s, %s, ST_GeomFromText(%s, 2226),
+                ST_Area(ST_GeomFromText(%s, 2226)),
+                ST_Area(ST_GeomFromText(%s, 2226)) / 43560.0, %s
+            )""", page_size=self.page_size)
+
+    def _bulk_surface_features(self, items: List[Dict], project_id: str, cur):
+        """Create surface_features records for road and ADA features."""
+        rows = []
+        for item in items:
+            feature_id = self._assign(item, 'surface_feature', 'surface_features')
+            classification = item['classification']
+            props = classification.properties
+            rows.append((
+                feature_id, project_id,
+                props.get('type', classification.object_type),
+                item['entity'].get('geometry_wkt'),
+                _source_attributes(item, phase=props.get('phase', 'EXIST'),
+                                   object_type=classification.object_type)
+            ))
+
+        if rows:
+            execute_values(cur, """
+                INSERT INTO surface_features (feature_id, project_id, feature_type, geometry, attributes)
+                VALUES %s
+            """, rows, template="(%s::uuid, %s, %s, ST_GeomFromText(%s, 2226), %s)",
+                page_size=self.page_size)
+
+    def _bulk_service_connections(self, items: List[Dict], project_id: str, cur):
+        """Create utility_service_connections records (laterals)."""
+        service_type_map = {
+            'SEW': 'SEWER_LATERAL',
+            'WAT': 'WATER_LATERAL',
+            'WATER': 'WATER_LATERAL'
+        }
+        rows = []
+        for item in items:
+            if not self._accepts(item, LINE_TYPES + ('POLYLINE', 'LWPOLYLINE')):
+                continue
+            connection_id = self._assign(item, 'service_connection', 'utility_service_connections')
+            props = item['classification'].properties
+            diameter_in = props.get('diameter', 4)
+            wkt = item['entity'].get('geometry_wkt')
+            rows.append((
+                connection_id, project_id,
+                service_type_map.get(props.get('service_type', 'SEW'), 'SEWER_LATERAL'),
+                int(diameter_in * 25.4) if diameter_in else 100,
+                wkt, wkt,
+                _source_attributes(item, diameter_in=diameter_in)
+            ))
+
+        if rows:
+            execute_values(cur, """
+                INSERT INTO utility_service_connections (
+                    connection_id, project_id, service_type, size_mm, length_ft,
+                    geometry, attributes
+                )
+                VALUES %s
+            """, rows, template="(%s::uuid, %s, %s, %s, ST_Length(ST_GeomFromText(%s, 2226)), %s, %s)",
+                page_size=self.page_size)
+
+    def _bulk_surface_models(self, items: List[Dict], project_id: str, cur):
+        """Resolve surface_models rows shared by name (surfaces, contours, spot elevations)."""
+        wanted = {}
+        for item in items:
+            object_type = item['classification'].object_type
+            layer_name = item['entity'].get('layer_name', '')
+            props = item['classification'].properties
+            if object_type == 'contour' and not self._accepts(item, LINE_TYPES):
+                continue
+            if object_type == 'spot_elevation' and not self._accepts(item, POINT_TYPES):
+                continue
+
+            name_format = SURFACE_NAME_FORMATS.get(object_type)
+            if name_format:
+                surface_name = name_format[0].format(layer_name=layer_name)
+                surface_type = name_format[1]
+                attributes = _source_attributes(item, phase=props.get('phase', 'EXIST'))
+            else:
+                surface_type = props.get('surface_type', 'Unknown')
+                surface_name = f"{surface_type} - {item['entity'].get('layer_name')}"
+                attributes = _source_attributes(item)
+
+            item['surface_name'] = surface_name
+            wanted.setdefault(surface_name, (surface_type, attributes))
+
+        if not wanted:
+            return
+
+        cur.execute("""
+            SELECT surface_id, surface_name FROM surface_models
+            WHERE project_id = %s AND surface_name = ANY(%s)
+        """, (project_id, list(wanted.keys())))
+        surface_ids = {row[1]: str(row[0]) for row in cur.fetchall()}
+
+        missing = [(project_id, name, surface_type, attributes)
+                   for name, (surface_type, attributes) in wanted.items()
+                   if name not in surface_ids]
+        if missing:
+            inserted = execute_values(cur, """
+                INSERT INTO surface_models (project_id, surface_name, surface_type, attributes)
+                VALUES %s
+                RETURNING surface_id, surface_name
+            """, missing, page_size=self.page_size, fetch=True)
+            surface_ids.update({row[1]: str(row[0]) for row in inserted})
+
+        for item in items:
+            surface_name = item.pop('surface_name', None)
+            if surface_name and surface_name in surface_ids:
+                self._assign(item, item['classification'].object_type, 'surface_models',
+                             surface_ids[surface_name])
+
+    # ------------------------------------------------------------------
+    # Bulk bookkeeping writes
+    # ------------------------------------------------------------------
+
+    def _bulk_ensure_drawing_entities(self, created: List[Dict], project_id: str):
+        """Upsert drawing_entities rows (with standard layer assignment) for created objects."""
+        rows = {}
+        for item in created:
+            classification = item['classification']
+            layer_name = getattr(classification, 'standard_layer_name', None) or \
+                         getattr(classification, 'original_layer_name', None) or \
+                         item['entity'].get('layer_name', 'UNKNOWN')
+            layer_id, _ = self.lookup_service.get_or_create_layer(
+                layer_name=layer_name,
+                project_id=project_id
+            )
+            # Shared objects (e.g. surfaces) keep the last entity, as sequential upserts would
+            rows[item['object_id']] = (
+                item['object_id'], project_id, layer_id,
+                item['entity'].get('entity_type', 'UNKNOWN'),
+                item['entity'].get('geometry_wkt', '')
+            )
+
+        cur = self.conn.cursor()
+        try:
+            execute_values(cur, """
+                INSERT INTO drawing_entities (
+                    entity_id, project_id, layer_id, entity_type, geometry
+                )
+                VALUES %s
+                ON CONFLICT (entity_id) DO UPDATE SET
+                    layer_id = EXCLUDED.layer_id,
+                    updated_at = CURRENT_TIMESTAMP
+            """, list(rows.values()),
+                template="(%s::uuid, %s::uuid, %s::uuid, %s, ST_GeomFromText(%s, 2226))",
+                page_size=self.page_size)
+        finally:
+            cur.close()
+
+    def _bulk_update_classification_metadata(self, created: List[Dict], project_id: str):
+        """Update standards_entities classification metadata for created objects."""
+        classified_at = datetime.utcnow().isoformat()
+        rows = {}
+        for item in created:
+            rows[item['object_id']] = (
+                item['object_id'],
+                item['classification_state'],
+                item['classification'].confidence,
+                json.dumps({
+                    'suggestions': item['suggestions'],
+                    'spatial_context': {},
+                    'classified_at': classified_at
+                }),
+                item['table_name'],
+                project_id
+            )
+
+        cur = self.conn.cursor()
+        try:
+            execute_values(cur, """
+                UPDATE standards_entities se
+                SET classification_state = v.classification_state,
+                    classification_confidence = v.confidence::numeric,
+                    classification_metadata = v.metadata::jsonb,
+                    target_table = v.target_table,
+                    target_id = v.entity_id::uuid,
+                    project_id = v.project_id::uuid
+                FROM (VALUES %s) AS v(entity_id, classification_state, confidence,
+                                      metadata, target_table, project_id)
+                WHERE se.entity_id = v.entity_id::uuid
+            """, list(rows.values()), page_size=self.page_size)
+        finally:
+            cur.close()
+
+    def _bulk_create_entity_links(self, created: List[Dict], project_id: str):
+        """Upsert dxf_entity_links for created objects in one statement per page."""
+        rows = {}
+        for item in created:
+            entity = item['entity']
+            dxf_handle = entity.get('dxf_handle')
+            geometry_wkt = entity.get('geometry_wkt')
+            if not dxf_handle or not geometry_wkt:
+                continue
+            # One link per handle; ON CONFLICT cannot touch the same row twice
+            rows[dxf_handle] = (
+                project_id, dxf_handle, entity.get('entity_type', 'UNKNOWN'),
+                entity.get('layer_name'),
+                geometry_hash(geometry_wkt),
+                item['table_name'], item['object_id']
+            )
+
+        if not rows:
+            return
+
+        cur = self.conn.cursor()
+        try:
+            execute_values(cur, """
+                INSERT INTO dxf_entity_links (
+                    drawing_id, project_id, dxf_handle, entity_type, layer_name,
+                    entity_geom_hash, object_table_name, object_id, sync_state
+                )
+                VALUES %s
+                ON CONFLICT (project_id, dxf_handle)
+                WHERE drawing_id IS NULL
+                DO UPDATE SET
+                    object_table_name = EXCLUDED.object_table_name,
+                    object_id = EXCLUDED.object_id,
+                    entity_geom_hash = EXCLUDED.entity_geom_hash,
+                    sync_state = 'active',
+                    last_seen_at = CURRENT_TIMESTAMP,
+                    updated_at = CURRENT_TIMESTAMP
+            """, list(rows.values()),
+                template="(NULL, %s, %s, %s, %s, %s, %s, %s, 'active')",
+                page_size=self.page_size)
+        finally:
+            cur.close()
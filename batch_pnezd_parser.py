@@ -24,10 +24,17 @@ class PNEZDParser:
         self.db_config = db_config
         self.crs_service = CoordinateSystemService(db_config)
     
-    def parse_file(self, file_content: str, source_filename: str) -> Dict:
+    def parse_file(self, file_content: str, source_filename: str, code_parser=None) -> Dict:
         """
         Parse PNEZD text file content
         
+        Args:
+            file_content: Raw file content
+            source_filename: Name recorded on each point
+            code_parser: Optional SurveyCodeParser; when given, each point's
+                description is resolved as a survey code (in one batch) and
+                stored under 'code_data'
+        
         Returns:
             Dict with 'points' list and 'errors' list
         """
@@ -117,6 +124,11 @@ class PNEZDParser:
                     'error': f'Parse error: {str(e)}'
                 })
         
+        if code_parser is not None:
+            parsed_codes = code_parser.parse_codes([point['description'].strip() for point in points])
+            for point, code_data in zip(points, parsed_codes):
+                point['code_data'] = code_data
+        
         return {
             'points': points,
             'errors': errors,
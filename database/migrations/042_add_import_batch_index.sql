@@ -0,0 +1,11 @@
+-- Migration 042: Index drawing_entities by DXF import batch
+-- Purpose: DXFImporter stamps attributes->>'import_batch_id' on every row it
+--          writes; intelligent object creation selects an import's rows by
+--          (project_id, import_batch_id) instead of a created_at time window.
+--          The index is partial: queries must also test
+--          attributes ? 'import_batch_id' for the planner to use it.
+-- Date: 2026-10-16
+
+CREATE INDEX IF NOT EXISTS idx_drawing_entities_import_batch
+    ON drawing_entities (project_id, (attributes->>'import_batch_id'))
+    WHERE attributes ? 'import_batch_id';
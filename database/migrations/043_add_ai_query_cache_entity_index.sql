@@ -0,0 +1,22 @@
+-- Migration 043: Entity-driven invalidation for ai_query_cache
+-- Purpose: GraphRAG results record the entity ids they touch, so
+--          invalidating entities marks only the results that contain them
+--          (entity_ids && ARRAY[...]) instead of the whole cache.
+--          invalidated_at lets each worker's in-process cache tier poll for
+--          invalidations made by other workers.
+-- Date: 2026-10-16
+
+ALTER TABLE ai_query_cache
+    ADD COLUMN IF NOT EXISTS entity_ids UUID[],
+    ADD COLUMN IF NOT EXISTS invalidated_at TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_ai_query_cache_entity_ids
+    ON ai_query_cache USING GIN (entity_ids)
+    WHERE is_valid = TRUE;
+
+CREATE INDEX IF NOT EXISTS idx_ai_query_cache_invalidated_at
+    ON ai_query_cache (invalidated_at)
+    WHERE invalidated_at IS NOT NULL;
+
+COMMENT ON COLUMN ai_query_cache.entity_ids IS 'Entities (and relationship endpoints) contained in the cached result; NULL for rows cached before migration 043';
+COMMENT ON COLUMN ai_query_cache.invalidated_at IS 'When the row was last invalidated; polled by in-process cache tiers';
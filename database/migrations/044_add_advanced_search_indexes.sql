@@ -0,0 +1,148 @@
+-- Migration 044: Indexes and pre-aggregated counts for advanced search
+-- Purpose: /api/search/execute pages with keyset cursors ordered by
+--          (sort column, primary key), matches search text with
+--          ILIKE '%text%' served by trigram indexes, and reads per-project
+--          entity counts from project_entity_counts instead of joining and
+--          counting three child tables on every request.
+-- Date: 2026-10-16
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- ============================================================================
+-- TRIGRAM INDEXES FOR SEARCH TEXT
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_surveypts_number_trgm
+    ON survey_points USING gin (point_number gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_surveypts_description_trgm
+    ON survey_points USING gin (point_description gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_utilstruct_number_trgm
+    ON utility_structures USING gin (structure_number gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_utilstruct_type_trgm
+    ON utility_structures USING gin (structure_type gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_utilline_number_trgm
+    ON utility_lines USING gin (line_number gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_projects_name_trgm
+    ON projects USING gin (project_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_projects_number_trgm
+    ON projects USING gin (project_number gin_trgm_ops);
+
+-- ============================================================================
+-- KEYSET PAGINATION INDEXES
+-- ============================================================================
+-- Scanned forwards for ASC and backwards for DESC (the default NULLS
+-- ordering, which the keyset predicates assume)
+
+CREATE INDEX IF NOT EXISTS idx_surveypts_created_keyset
+    ON survey_points (created_at, point_id);
+CREATE INDEX IF NOT EXISTS idx_surveypts_project_created_keyset
+    ON survey_points (project_id, created_at, point_id);
+
+CREATE INDEX IF NOT EXISTS idx_utilstruct_created_keyset
+    ON utility_structures (created_at, structure_id);
+CREATE INDEX IF NOT EXISTS idx_utilstruct_project_created_keyset
+    ON utility_structures (project_id, created_at, structure_id);
+
+CREATE INDEX IF NOT EXISTS idx_utilline_created_keyset
+    ON utility_lines (created_at, line_id);
+CREATE INDEX IF NOT EXISTS idx_utilline_project_created_keyset
+    ON utility_lines (project_id, created_at, line_id);
+
+CREATE INDEX IF NOT EXISTS idx_projects_created_keyset
+    ON projects (created_at, project_id);
+
+-- ============================================================================
+-- PRE-AGGREGATED PROJECT COUNTS
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS project_entity_counts (
+    project_id UUID PRIMARY KEY,
+    structure_count INTEGER NOT NULL DEFAULT 0,
+    point_count INTEGER NOT NULL DEFAULT 0,
+    line_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE project_entity_counts IS 'Structure, survey point and line counts per project, maintained by statement-level triggers';
+
+-- Statement-level triggers aggregate the transition tables, so a bulk
+-- import of N points is one upsert per project rather than N row updates
+CREATE OR REPLACE FUNCTION update_project_entity_counts()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_column TEXT := CASE TG_TABLE_NAME
+        WHEN 'utility_structures' THEN 'structure_count'
+        WHEN 'survey_points' THEN 'point_count'
+        ELSE 'line_count'
+    END;
+    v_delta TEXT;
+BEGIN
+    v_delta := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT project_id, COUNT(*) AS delta FROM new_rows GROUP BY project_id'
+        WHEN 'DELETE' THEN 'SELECT project_id, -COUNT(*) AS delta FROM old_rows GROUP BY project_id'
+        ELSE 'SELECT project_id, SUM(delta) AS delta FROM (
+                  SELECT project_id, 1 AS delta FROM new_rows
+                  UNION ALL
+                  SELECT project_id, -1 AS delta FROM old_rows
+              ) d GROUP BY project_id'
+    END;
+
+    EXECUTE format(
+        'INSERT INTO project_entity_counts AS c (project_id, %1$I, updated_at)
+         SELECT project_id, delta, CURRENT_TIMESTAMP
+         FROM (%2$s) d
+         WHERE project_id IS NOT NULL AND delta <> 0
+         ON CONFLICT (project_id) DO UPDATE
+         SET %1$I = c.%1$I + EXCLUDED.%1$I,
+             updated_at = EXCLUDED.updated_at',
+        v_column, v_delta);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    v_table TEXT;
+BEGIN
+    FOREACH v_table IN ARRAY ARRAY['utility_structures', 'survey_points', 'utility_lines'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trigger_%s_counts_insert ON %I', v_table, v_table);
+        EXECUTE format('DROP TRIGGER IF EXISTS trigger_%s_counts_update ON %I', v_table, v_table);
+        EXECUTE format('DROP TRIGGER IF EXISTS trigger_%s_counts_delete ON %I', v_table, v_table);
+
+        EXECUTE format('CREATE TRIGGER trigger_%s_counts_insert AFTER INSERT ON %I
+                        REFERENCING NEW TABLE AS new_rows
+                        FOR EACH STATEMENT EXECUTE FUNCTION update_project_entity_counts()',
+                       v_table, v_table);
+        EXECUTE format('CREATE TRIGGER trigger_%s_counts_update AFTER UPDATE ON %I
+                        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+                        FOR EACH STATEMENT EXECUTE FUNCTION update_project_entity_counts()',
+                       v_table, v_table);
+        EXECUTE format('CREATE TRIGGER trigger_%s_counts_delete AFTER DELETE ON %I
+                        REFERENCING OLD TABLE AS old_rows
+                        FOR EACH STATEMENT EXECUTE FUNCTION update_project_entity_counts()',
+                       v_table, v_table);
+    END LOOP;
+END $$;
+
+-- Backfill
+INSERT INTO project_entity_counts (project_id, structure_count, point_count, line_count)
+SELECT project_id, SUM(structures), SUM(points), SUM(lines)
+FROM (
+    SELECT project_id, COUNT(*) AS structures, 0 AS points, 0 AS lines
+    FROM utility_structures WHERE project_id IS NOT NULL GROUP BY project_id
+    UNION ALL
+    SELECT project_id, 0, COUNT(*), 0
+    FROM survey_points WHERE project_id IS NOT NULL GROUP BY project_id
+    UNION ALL
+    SELECT project_id, 0, 0, COUNT(*)
+    FROM utility_lines WHERE project_id IS NOT NULL GROUP BY project_id
+) counts
+GROUP BY project_id
+ON CONFLICT (project_id) DO UPDATE
+SET structure_count = EXCLUDED.structure_count,
+    point_count = EXCLUDED.point_count,
+    line_count = EXCLUDED.line_count,
+    updated_at = CURRENT_TIMESTAMP;
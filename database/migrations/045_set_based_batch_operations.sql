@@ -0,0 +1,107 @@
+-- Migration 045: Set-based batch operation jobs
+-- Purpose: Batch jobs are executed in chunks by a Celery task
+--          (services/batch_operation_executor.py), updating thousands of
+--          batch_operation_items rows per statement. The row-level progress
+--          trigger recounted every item of the job for each changed row
+--          (quadratic in job size); it is replaced by a statement-level
+--          trigger that applies status deltas from the transition tables.
+--          create_batch_operation_job inserts its items in one statement.
+-- Date: 2026-10-16
+
+DROP TRIGGER IF EXISTS trigger_update_batch_job_progress ON batch_operation_items;
+DROP TRIGGER IF EXISTS trigger_update_batch_job_progress_insert ON batch_operation_items;
+DROP TRIGGER IF EXISTS trigger_update_batch_job_progress_update ON batch_operation_items;
+
+CREATE OR REPLACE FUNCTION update_batch_job_progress()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE batch_operation_jobs j
+        SET processed_items = j.processed_items + d.processed,
+            successful_items = j.successful_items + d.successful,
+            failed_items = j.failed_items + d.failed
+        FROM (
+            SELECT job_id,
+                   COUNT(*) FILTER (WHERE status IN ('success', 'failed', 'skipped')) AS processed,
+                   COUNT(*) FILTER (WHERE status = 'success') AS successful,
+                   COUNT(*) FILTER (WHERE status = 'failed') AS failed
+            FROM new_items
+            GROUP BY job_id
+        ) d
+        WHERE j.job_id = d.job_id
+          AND d.processed > 0;
+    ELSE
+        UPDATE batch_operation_jobs j
+        SET processed_items = j.processed_items + d.processed,
+            successful_items = j.successful_items + d.successful,
+            failed_items = j.failed_items + d.failed
+        FROM (
+            SELECT n.job_id,
+                   SUM((n.status IN ('success', 'failed', 'skipped'))::int
+                       - (o.status IN ('success', 'failed', 'skipped'))::int) AS processed,
+                   SUM((n.status = 'success')::int - (o.status = 'success')::int) AS successful,
+                   SUM((n.status = 'failed')::int - (o.status = 'failed')::int) AS failed
+            FROM new_items n
+            JOIN old_items o ON o.item_id = n.item_id
+            WHERE n.status IS DISTINCT FROM o.status
+            GROUP BY n.job_id
+        ) d
+        WHERE j.job_id = d.job_id;
+    END IF;
+
+    -- Auto-complete jobs whose items have all been processed
+    UPDATE batch_operation_jobs
+    SET status = 'completed',
+        completed_at = CURRENT_TIMESTAMP,
+        execution_time_ms = EXTRACT(EPOCH FROM (CURRENT_TIMESTAMP - started_at)) * 1000
+    WHERE job_id IN (SELECT DISTINCT job_id FROM new_items)
+      AND status = 'running'
+      AND processed_items >= total_items;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_update_batch_job_progress_insert
+    AFTER INSERT ON batch_operation_items
+    REFERENCING NEW TABLE AS new_items
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION update_batch_job_progress();
+
+CREATE TRIGGER trigger_update_batch_job_progress_update
+    AFTER UPDATE ON batch_operation_items
+    REFERENCING OLD TABLE AS old_items NEW TABLE AS new_items
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION update_batch_job_progress();
+
+-- Keyset scans over a job's pending / successful items
+CREATE INDEX IF NOT EXISTS idx_batch_items_job_status_entity
+    ON batch_operation_items(job_id, status, entity_id);
+
+CREATE OR REPLACE FUNCTION create_batch_operation_job(
+    p_job_name VARCHAR,
+    p_operation_type VARCHAR,
+    p_entity_type VARCHAR,
+    p_entity_ids JSONB,
+    p_operation_config JSONB,
+    p_created_by VARCHAR DEFAULT 'system'
+)
+RETURNS UUID AS $$
+DECLARE
+    v_job_id UUID;
+BEGIN
+    INSERT INTO batch_operation_jobs
+        (job_name, operation_type, entity_type, target_entity_ids,
+         operation_config, created_by, total_items)
+    VALUES
+        (p_job_name, p_operation_type, p_entity_type, p_entity_ids,
+         p_operation_config, p_created_by, jsonb_array_length(p_entity_ids))
+    RETURNING job_id INTO v_job_id;
+
+    INSERT INTO batch_operation_items (job_id, entity_type, entity_id, status)
+    SELECT v_job_id, p_entity_type, value::UUID, 'pending'
+    FROM jsonb_array_elements_text(p_entity_ids);
+
+    RETURN v_job_id;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,32 @@
+-- Migration 046: Project data versions for the map tile cache
+-- Purpose: services/tile_cache.py stores rendered vector tiles with the data
+--          version of their project and serves them only while it is
+--          current. DXF imports, DXF re-imports, GIS snapshot imports and
+--          pipe network edits call bump_project_data_version in the same
+--          transaction as their writes. Versions come from one sequence,
+--          so MAX(version) is the version of tiles covering all projects.
+-- Date: 2026-10-16
+
+CREATE SEQUENCE IF NOT EXISTS project_data_version_seq;
+
+CREATE TABLE IF NOT EXISTS project_data_versions (
+    project_id UUID PRIMARY KEY,
+    version BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_project_data_versions_version
+    ON project_data_versions(version);
+
+COMMENT ON TABLE project_data_versions IS 'Version of each project''s map data, bumped on import and edit to retire cached tiles';
+
+CREATE OR REPLACE FUNCTION bump_project_data_version(p_project_id UUID)
+RETURNS BIGINT AS $$
+    INSERT INTO project_data_versions (project_id, version)
+    SELECT p_project_id, nextval('project_data_version_seq')
+    WHERE p_project_id IS NOT NULL
+    ON CONFLICT (project_id) DO UPDATE
+    SET version = EXCLUDED.version,
+        updated_at = CURRENT_TIMESTAMP
+    RETURNING version;
+$$ LANGUAGE sql;
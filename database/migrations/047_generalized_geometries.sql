@@ -0,0 +1,27 @@
+-- Migration 047: Precomputed generalized geometry for map layers
+-- Purpose: The map viewer's GeoJSON layer endpoints sent full-resolution
+--          geometry at every zoom (32-segment circles, dense contours,
+--          parcel boundaries). generalized_geometries holds 2D simplified
+--          variants of drawing_entities, parcels, utility_lines and
+--          surface_features at several tolerances; it is maintained
+--          incrementally by services/geometry_generalization_service.py
+--          (keyed by an md5 of the source geometry) and read with a LEFT
+--          JOIN on (source_table, source_id, level).
+-- Date: 2026-10-16
+
+CREATE TABLE IF NOT EXISTS generalized_geometries (
+    source_table VARCHAR(63) NOT NULL,
+    source_id UUID NOT NULL,
+    level SMALLINT NOT NULL,
+    project_id UUID,
+    source_hash TEXT NOT NULL,
+    geometry GEOMETRY(Geometry, 2226) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (source_table, source_id, level)
+);
+
+-- Incremental refresh scans one project's rows of one table
+CREATE INDEX IF NOT EXISTS idx_generalized_geometries_project
+    ON generalized_geometries(source_table, project_id);
+
+COMMENT ON TABLE generalized_geometries IS 'Simplified geometry per source feature and generalization level (tolerances 2, 8, 32, 128 ft)';
@@ -0,0 +1,33 @@
+-- Migration 048: Map export jobs
+-- Purpose: /api/map-export/status/<job_id> and /api/map-export/download read
+--          map_export_jobs, which no migration created. Exports now run as
+--          background jobs (app.tasks.run_map_export) that stream features
+--          once to parallel format writers; the row records the outcome,
+--          the feature count and per-format timings (format_timings:
+--          {format: {seconds, features, files, bytes, zip_seconds, error},
+--          read: {...}, total: {...}}).
+-- Date: 2026-10-16
+
+CREATE TABLE IF NOT EXISTS map_export_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    params JSONB NOT NULL,
+    project_id UUID,
+    download_url TEXT,
+    file_size_mb DECIMAL(10,2),
+    error_message TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP
+);
+
+-- Columns added for the streaming export engine (tables created by hand before this migration)
+ALTER TABLE map_export_jobs ADD COLUMN IF NOT EXISTS project_id UUID;
+ALTER TABLE map_export_jobs ADD COLUMN IF NOT EXISTS feature_count INTEGER;
+ALTER TABLE map_export_jobs ADD COLUMN IF NOT EXISTS format_timings JSONB;
+ALTER TABLE map_export_jobs ADD COLUMN IF NOT EXISTS started_at TIMESTAMP;
+ALTER TABLE map_export_jobs ADD COLUMN IF NOT EXISTS completed_at TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_map_export_jobs_status
+    ON map_export_jobs(status, created_at);
+
+COMMENT ON TABLE map_export_jobs IS 'Background map export jobs (SHP, GeoPackage, FlatGeobuf, DXF, KML, PNG) with per-format timings';
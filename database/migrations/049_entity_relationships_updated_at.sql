@@ -0,0 +1,24 @@
+-- Migration 049: Keep entity_relationships.updated_at current
+-- Purpose: GraphStore refreshes its cached graphs incrementally from rows
+--          whose updated_at is at or after the graph's watermark. Upserts
+--          such as ON CONFLICT ... DO UPDATE SET confidence_score = ...
+--          left updated_at untouched, so the change was invisible until the
+--          next full rebuild. Stamp every UPDATE instead of relying on each
+--          writer to set the column.
+-- Date: 2026-10-16
+
+-- Same body as the function created in 031_create_auth_tables.sql; repeated
+-- so this migration does not depend on the auth tables being installed
+CREATE OR REPLACE FUNCTION update_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS entity_relationships_updated_at_trigger ON entity_relationships;
+CREATE TRIGGER entity_relationships_updated_at_trigger
+    BEFORE UPDATE ON entity_relationships
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
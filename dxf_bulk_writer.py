@@ -0,0 +1,240 @@
+"""
+DXF Bulk Writer Module
+Buffers converted DXF rows and flushes them to PostgreSQL with COPY.
+
+Rows are streamed into a temporary text-typed staging table with
+``COPY ... FROM STDIN`` and then moved into the target table with a single
+set-based ``INSERT ... SELECT`` that performs the type casts and PostGIS
+geometry construction. This replaces one round trip per DXF entity with a
+handful of statements per batch.
+"""
+
+import io
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+# Geometry columns are staged as WKT text and built with ST_GeomFromText
+GEOMETRY = 'geometry'
+
+# Column -> SQL type for every table the DXF importer writes to
+TABLE_COLUMN_TYPES = {
+    'drawing_entities': {
+        'project_id': 'uuid',
+        'entity_type': 'text',
+        'layer_id': 'uuid',
+        'geometry': GEOMETRY,
+        'dxf_handle': 'text',
+        'color_aci': 'integer',
+        'lineweight': 'integer',
+        'linetype': 'text',
+        'transparency': 'integer',
+        'quality_score': 'numeric',
+        'tags': 'text[]',
+        'attributes': 'jsonb',
+    },
+    'drawing_text': {
+        'project_id': 'uuid',
+        'layer_id': 'uuid',
+        'text_content': 'text',
+        'insertion_point': GEOMETRY,
+        'text_height': 'numeric',
+        'rotation_angle': 'numeric',
+        'text_style': 'text',
+        'horizontal_justification': 'text',
+        'vertical_justification': 'text',
+        'dxf_handle': 'text',
+        'quality_score': 'numeric',
+        'tags': 'text[]',
+        'attributes': 'jsonb',
+    },
+    'drawing_dimensions': {
+        'project_id': 'uuid',
+        'layer_id': 'uuid',
+        'dimension_type': 'text',
+        'measured_value': 'numeric',
+        'dimension_text': 'text',
+        'dimension_style': 'text',
+        'dxf_handle': 'text',
+        'quality_score': 'numeric',
+        'tags': 'text[]',
+        'attributes': 'jsonb',
+    },
+    'drawing_hatches': {
+        'project_id': 'uuid',
+        'layer_id': 'uuid',
+        'hatch_pattern': 'text',
+        'boundary_geometry': GEOMETRY,
+        'hatch_scale': 'numeric',
+        'hatch_angle': 'numeric',
+        'dxf_handle': 'text',
+        'quality_score': 'numeric',
+        'tags': 'text[]',
+        'attributes': 'jsonb',
+    },
+    'block_inserts': {
+        'project_id': 'uuid',
+        'layer_id': 'uuid',
+        'block_name': 'text',
+        'insertion_point': GEOMETRY,
+        'scale_x': 'numeric',
+        'scale_y': 'numeric',
+        'scale_z': 'numeric',
+        'rotation': 'numeric',
+        'dxf_handle': 'text',
+        'quality_score': 'numeric',
+        'tags': 'text[]',
+        'attributes': 'jsonb',
+    },
+}
+
+
+def _column_expression(table: str, column: str, value_sql: str, srid: int) -> str:
+    """Wrap a value expression with the cast (or geometry constructor) for a column."""
+    col_type = TABLE_COLUMN_TYPES[table][column]
+    if col_type == GEOMETRY:
+        return f"ST_GeomFromText({value_sql}, {int(srid)})"
+    return f"{value_sql}::{col_type}"
+
+
+def build_insert_sql(table: str, columns: List[str], srid: int) -> str:
+    """
+    Build a single-row parameterized INSERT for a DXF target table.
+
+    Used by the row-at-a-time import path so both paths share one column spec.
+    """
+    values = [_column_expression(table, col, '%s', srid) for col in columns]
+    return f"""
+        INSERT INTO {table} ({', '.join(columns)})
+        VALUES ({', '.join(values)})
+    """
+
+
+def _copy_field(value) -> str:
+    """Encode a Python value as a CSV field for COPY (NULL is written as \\N)."""
+    if value is None:
+        return '\\N'
+    text = str(value)
+    return '"' + text.replace('"', '""') + '"'
+
+
+class DXFBulkWriter:
+    """
+    Buffer rows per target table and flush them with COPY + INSERT ... SELECT.
+
+    Rows with a different column set (e.g. POINT rows that rely on column
+    defaults) are buffered separately so omitted columns keep their defaults.
+    A failed flush raises, leaving transaction handling to the caller.
+    """
+
+    def __init__(self, conn, srid: int, batch_size: int = 5000,
+                 stats: Optional[Dict] = None):
+        """
+        Initialize the writer.
+
+        Args:
+            conn: Open database connection (transaction is owned by the caller)
+            srid: SRID used when constructing geometries
+            batch_size: Rows buffered per table/column set before a flush
+            stats: Optional import statistics dict; per-batch timings are
+                appended to stats['batch_timings']
+        """
+        self.conn = conn
+        self.srid = srid
+        self.batch_size = max(1, int(batch_size))
+        self.stats = stats if stats is not None else {}
+        self.stats.setdefault('batch_timings', [])
+        self._buffers: Dict[Tuple[str, Tuple[str, ...]], List[Tuple]] = {}
+        self._staging_tables: Dict[Tuple[str, Tuple[str, ...]], str] = {}
+
+    def add(self, table: str, row: Dict):
+        """Buffer one row for a target table, flushing when the batch is full."""
+        if table not in TABLE_COLUMN_TYPES:
+            raise ValueError(f"Unsupported bulk target table: {table}")
+
+        columns = tuple(row.keys())
+        key = (table, columns)
+        buffer = self._buffers.setdefault(key, [])
+        buffer.append(tuple(row[col] for col in columns))
+
+        if len(buffer) >= self.batch_size:
+            self._flush_buffer(key)
+
+    def pending(self) -> int:
+        """Number of rows buffered but not yet written."""
+        return sum(len(rows) for rows in self._buffers.values())
+
+    def flush(self):
+        """Write every buffered row to the database."""
+        for key in list(self._buffers.keys()):
+            self._flush_buffer(key)
+
+    def close(self):
+        """Flush remaining rows and drop the staging tables."""
+        self.flush()
+        if self._staging_tables:
+            cur = self.conn.cursor()
+            try:
+                for staging_table in self._staging_tables.values():
+                    cur.execute(f"DROP TABLE IF EXISTS {staging_table}")
+            finally:
+                cur.close()
+            self._staging_tables.clear()
+
+    def _staging_table(self, cur, key: Tuple[str, Tuple[str, ...]]) -> str:
+        """Create (once) the text-typed temporary staging table for a buffer key."""
+        if key in self._staging_tables:
+            return self._staging_tables[key]
+
+        table, columns = key
+        staging_table = f"_bulk_{table}_{len(self._staging_tables)}"
+        column_defs = ', '.join(f"{col} text" for col in columns)
+        cur.execute(f"CREATE TEMP TABLE IF NOT EXISTS {staging_table} ({column_defs})")
+        cur.execute(f"TRUNCATE {staging_table}")
+        self._staging_tables[key] = staging_table
+        return staging_table
+
+    def _flush_buffer(self, key: Tuple[str, Tuple[str, ...]]):
+        """COPY one buffer into its staging table and move it into the target."""
+        rows = self._buffers.get(key)
+        if not rows:
+            return
+
+        table, columns = key
+        cur = self.conn.cursor()
+        try:
+            staging_table = self._staging_table(cur, key)
+
+            copy_start = time.perf_counter()
+            payload = io.StringIO()
+            for row in rows:
+                payload.write(','.join(_copy_field(value) for value in row))
+                payload.write('\n')
+            payload.seek(0)
+            cur.copy_expert(
+                f"COPY {staging_table} ({', '.join(columns)}) "
+                f"FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                payload
+            )
+            copy_seconds = time.perf_counter() - copy_start
+
+            insert_start = time.perf_counter()
+            select_list = [_column_expression(table, col, f"s.{col}", self.srid)
+                           for col in columns]
+            cur.execute(f"""
+                INSERT INTO {table} ({', '.join(columns)})
+                SELECT {', '.join(select_list)}
+                FROM {staging_table} s
+            """)
+            cur.execute(f"TRUNCATE {staging_table}")
+            insert_seconds = time.perf_counter() - insert_start
+        finally:
+            cur.close()
+
+        self.stats['batch_timings'].append({
+            'table': table,
+            'rows': len(rows),
+            'copy_seconds': round(copy_seconds, 4),
+            'insert_seconds': round(insert_seconds, 4)
+        })
+        self._buffers[key] = []
@@ -1,24 +1,122 @@
 """
 DXF Change Detector Module
 Detects changes between DXF files and database for intelligent re-import.
+
+Re-imports are incremental: reimported entities are hashed client-side and
+diffed in memory against the stored dxf_entity_links, and only the changed
+rows are written - new objects, geometry/property updates and soft-deletes are
+each applied with set-based statements.
 """
 
+import time
+import ezdxf
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from typing import Dict, List, Optional, Tuple
-import hashlib
+from psycopg2.extras import RealDictCursor, execute_values
+from typing import Dict, List, Optional, Set, Tuple
 from layer_classifier import LayerClassifier
-from intelligent_object_creator import IntelligentObjectCreator
+from batch_object_creator import BatchIntelligentObjectCreator
+from services.tile_cache import bump_project_data_version
+from services.geometry_generalization_service import geometry_generalization_service
+from dxf_geometry import (GEOMETRY_ENTITY_TYPES, extract_entity_geometry,
+                          geometry_hash, geometry_to_wkt, wkt_geometry_type)
+
+
+# object_table_name -> (id column, geometry column) for geometry updates of
+# every table the object creators link entities to. Tables without a
+# geometry column (surface_models) are left unsynced.
+GEOMETRY_COLUMNS = {
+    'utility_lines': ('line_id', 'geometry'),
+    'utility_structures': ('structure_id', 'rim_geometry'),
+    'horizontal_alignments': ('alignment_id', 'alignment_geometry'),
+    'survey_points': ('point_id', 'geometry'),
+    'site_trees': ('tree_id', 'geometry'),
+    'parcels': ('parcel_id', 'boundary_geometry'),
+    'grading_limits': ('limit_id', 'boundary_geometry'),
+    'surface_features': ('feature_id', 'geometry'),
+    'utility_service_connections': ('connection_id', 'geometry'),
+    'storm_bmps': ('bmp_id', 'geometry'),
+    'street_lights': ('light_id', 'geometry'),
+    'pavement_zones': ('zone_id', 'geometry'),
+}
+
+# Geometry expressions of tables not stored as reimported (default: as is)
+GEOMETRY_EXPRESSIONS = {
+    'storm_bmps': 'ST_Multi(ST_Force2D(ST_Transform({geometry}, 3857)))',
+}
+
+# table_name -> (id column, [(column, property key, SQL type)]) for
+# properties derived from the layer name
+PROPERTY_COLUMNS = {
+    'utility_lines': ('line_id', [('utility_system', 'utility_type', 'text'),
+                                  ('diameter_mm', 'diameter_mm', 'numeric')]),
+    'utility_structures': ('structure_id', [('structure_type', 'structure_type', 'text'),
+                                            ('utility_system', 'utility_type', 'text')]),
+    'storm_bmps': ('bmp_id', [('bmp_type', 'bmp_type', 'text'),
+                              ('treatment_volume_cf', 'design_volume_cf', 'numeric')]),
+    'surface_models': ('surface_id', [('surface_type', 'surface_type', 'text')]),
+    'survey_points': ('point_id', [('point_type', 'point_type', 'text')]),
+    'site_trees': ('tree_id', [('tree_status', 'tree_status', 'text')]),
+}
 
 
 class DXFChangeDetector:
     """Detect and process changes between CAD and database."""
-    
-    def __init__(self, db_config: Dict):
-        """Initialize change detector with database configuration."""
+
+    def __init__(self, db_config: Dict, srid: int = 2226):
+        """
+        Initialize change detector with database configuration.
+
+        Args:
+            db_config: Database configuration dictionary
+            srid: SRID of reimported geometry
+        """
         self.db_config = db_config
+        self.srid = srid
         self.classifier = LayerClassifier()
-    
+
+    def read_dxf_entities(self, file_path: str) -> List[Dict]:
+        """
+        Read modelspace entities of a DXF file as entity dicts, without
+        writing anything to the database.
+
+        Args:
+            file_path: Path to DXF file
+
+        Returns:
+            Entity dicts (dxf_handle, entity_type, layer_name, geometry_wkt,
+            geometry_type, color_aci, linetype) for convertible entities
+        """
+        doc = ezdxf.readfile(file_path)
+        entities = []
+
+        for entity in doc.modelspace():
+            entity_type = entity.dxftype()
+            try:
+                if entity_type in GEOMETRY_ENTITY_TYPES:
+                    geometry_wkt = geometry_to_wkt(extract_entity_geometry(entity))
+                elif entity_type == 'POINT':
+                    loc = entity.dxf.location
+                    geometry_wkt = f'POINT Z ({loc.x} {loc.y} {loc.z})'
+                else:
+                    continue
+            except Exception:
+                continue
+
+            if not geometry_wkt:
+                continue
+
+            entities.append({
+                'dxf_handle': entity.dxf.handle,
+                'entity_type': entity_type,
+                'layer_name': entity.dxf.layer,
+                'geometry_wkt': geometry_wkt,
+                'geometry_type': wkt_geometry_type(geometry_wkt),
+                'color_aci': entity.dxf.color if entity.dxf.hasattr('color') else 256,
+                'linetype': entity.dxf.linetype if entity.dxf.hasattr('linetype') else 'ByLayer'
+            })
+
+        return entities
+
     def detect_changes(self, project_id: str, reimported_entities: List[Dict]) -> Dict:
         """
         Detect changes between reimported DXF entities and database.
@@ -38,70 +136,63 @@ class DXFChangeDetector:
             'new_entities': 0,
             'new_objects_created': 0,
             'deleted_entities': 0,
+            'restored_entities': 0,
             'conflicts': 0,
-            'errors': []
+            'errors': [],
+            'timings': {}
         }
-        
+
         conn = psycopg2.connect(**self.db_config)
-        
+
         try:
+            started = time.perf_counter()
+
             # Get all existing entity links for this project
             existing_links = self._get_existing_links(project_id, conn)
-            
-            # Initialize intelligent object creator for new entities
-            creator = IntelligentObjectCreator(self.db_config, conn=conn)
-            
-            # Track which handles we've seen in the reimport
-            reimport_handles = set()
-            
-            # Check each reimported entity
-            for entity in reimported_entities:
-                stats['entities_checked'] += 1
-                dxf_handle = entity.get('dxf_handle')
-                
-                if not dxf_handle:
-                    continue
-                
-                reimport_handles.add(dxf_handle)
-                
-                if dxf_handle in existing_links:
-                    # Entity exists - check for changes
-                    link = existing_links[dxf_handle]
-                    changes = self._detect_entity_changes(entity, link, conn)
-                    
-                    if changes['geometry_changed']:
-                        stats['geometry_changes'] += 1
-                        self._update_geometry(entity, link, conn, stats)
-                    
-                    if changes['layer_changed']:
-                        stats['layer_changes'] += 1
-                        self._update_properties_from_layer(entity, link, conn, stats)
-                    
-                    if not changes['geometry_changed'] and not changes['layer_changed']:
-                        stats['entities_unchanged'] += 1
-                else:
-                    # New entity - create intelligent object
-                    stats['new_entities'] += 1
-                    result = creator.create_from_entity(entity, project_id)
-                    if result:
-                        stats['new_objects_created'] += 1
-            
-            # Find deleted entities (in database but not in reimport)
-            deleted_handles = set(existing_links.keys()) - reimport_handles
-            for handle in deleted_handles:
-                stats['deleted_entities'] += 1
-                self._mark_as_deleted(existing_links[handle], conn, stats)
-            
+
+            # Diff in memory; nothing is written for unchanged entities
+            changes = self._diff_entities(reimported_entities, existing_links, stats)
+            diffed = time.perf_counter()
+
+            cur = conn.cursor()
+            try:
+                failed = self._apply_geometry_updates(cur, changes['geometry'], stats)
+                failed |= self._apply_property_updates(cur, changes['properties'], stats)
+                self._apply_link_updates(cur, changes['links'], failed)
+                self._mark_as_deleted(cur, project_id, changes['deleted'])
+            finally:
+                cur.close()
+
+            # New entities - create intelligent objects set-based
+            if changes['new']:
+                creator = BatchIntelligentObjectCreator(self.db_config, conn=conn)
+                stats['new_objects_created'] = creator.create_from_entities(
+                    changes['new'], project_id, stats
+                )
+
+            # Refresh simplified map geometry and retire cached map tiles of
+            # the project with this transaction
+            if any(changes.values()):
+                with conn.cursor() as cur:
+                    geometry_generalization_service.refresh(project_id, cursor=cur)
+                    bump_project_data_version(project_id, cur)
+
             conn.commit()
-            
+
+            finished = time.perf_counter()
+            stats['timings'] = {
+                'diff_seconds': round(diffed - started, 4),
+                'write_seconds': round(finished - diffed, 4)
+            }
+
         except Exception as e:
             conn.rollback()
             stats['errors'].append(f"Change detection failed: {str(e)}")
         finally:
             conn.close()
-        
+
         return stats
-    
+
     def _get_existing_links(self, project_id: str, conn) -> Dict[str, Dict]:
         """
         Get all existing entity links for a project, indexed by DXF handle.
@@ -118,245 +209,221 @@ class DXFChangeDetector:
                 dxf_handle,
                 entity_type,
                 layer_name,
-                geometry_hash,
-                object_type,
+                entity_geom_hash,
                 object_id,
-                table_name,
-                sync_status,
-                last_modified_in_db
+                object_table_name,
+                sync_state
             FROM dxf_entity_links
             WHERE project_id = %s AND drawing_id IS NULL
         """, (project_id,))
-        
+
         links = cur.fetchall()
         cur.close()
-        
+
         # Index by handle for quick lookup
         return {link['dxf_handle']: dict(link) for link in links}
-    
-    def _detect_entity_changes(self, entity: Dict, link: Dict, conn) -> Dict:
+
+    def _diff_entities(self, reimported_entities: List[Dict],
+                       existing_links: Dict[str, Dict], stats: Dict) -> Dict:
         """
-        Detect what changed about an entity.
-        
+        Compare reimported entities with stored links by hash and layer name.
+
         Returns:
-            Dict with boolean flags: geometry_changed, layer_changed
+            Dict of change lists: 'new' entities, 'geometry' and 'properties'
+            updates per target table, 'links' rows to update and 'deleted'
+            DXF handles
         """
-        # Calculate geometry hash from reimported entity
-        geometry_wkt = entity.get('geometry_wkt', '')
-        new_hash = hashlib.sha256(geometry_wkt.encode()).hexdigest() if geometry_wkt else None
-        old_hash = link['geometry_hash']
-        
-        geometry_changed = (new_hash != old_hash)
-        layer_changed = (entity.get('layer_name') != link['layer_name'])
-        
-        return {
-            'geometry_changed': geometry_changed,
-            'layer_changed': layer_changed
-        }
-    
-    def _update_geometry(self, entity: Dict, link: Dict, conn, stats: Dict):
-        """Update intelligent object geometry when CAD geometry changes."""
-        try:
-            cur = conn.cursor()
-            
-            table_name = link['table_name']
+        changes = {'new': [], 'geometry': {}, 'properties': {}, 'links': [], 'deleted': []}
+        classifications = {}  # layer name -> classification (classified once)
+        reimport_handles = set()
+
+        for entity in reimported_entities:
+            stats['entities_checked'] += 1
+            dxf_handle = entity.get('dxf_handle')
+
+            if not dxf_handle or dxf_handle in reimport_handles:
+                continue
+            reimport_handles.add(dxf_handle)
+
+            link = existing_links.get(dxf_handle)
+            if link is None:
+                stats['new_entities'] += 1
+                changes['new'].append(entity)
+                continue
+
+            new_hash = geometry_hash(entity.get('geometry_wkt'))
+            geometry_changed = new_hash is not None and new_hash != link['entity_geom_hash']
+            new_layer = entity.get('layer_name')
+            layer_changed = new_layer != link['layer_name']
+            restored = link.get('sync_state') == 'deleted'
+
+            if restored:
+                # Handle is back after a re-import removed it
+                stats['restored_entities'] += 1
+            elif not geometry_changed and not layer_changed:
+                stats['entities_unchanged'] += 1
+                continue
+
+            table_name = link['object_table_name']
             object_id = link['object_id']
-            geometry_wkt = entity.get('geometry_wkt')
-            
-            # Update geometry in the appropriate table
-            if table_name == 'utility_lines':
-                cur.execute("""
-                    UPDATE utility_lines
-                    SET line_geometry = ST_GeomFromText(%s, 4326),
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE utility_line_id = %s
-                """, (geometry_wkt, object_id))
-            
-            elif table_name == 'utility_structures':
-                cur.execute("""
-                    UPDATE utility_structures
-                    SET point_geometry = ST_GeomFromText(%s, 4326),
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE structure_id = %s
-                """, (geometry_wkt, object_id))
-            
-            elif table_name == 'bmps':
-                # Update location or boundary depending on geometry type
-                geom_type = entity.get('geometry_type', '')
-                if 'POINT' in geom_type:
-                    cur.execute("""
-                        UPDATE bmps
-                        SET location = ST_GeomFromText(%s, 4326),
-                            updated_at = CURRENT_TIMESTAMP
-                        WHERE bmp_id = %s
-                    """, (geometry_wkt, object_id))
+            sync_state = 'active'
+            stored_hash = new_hash
+
+            if geometry_changed:
+                stats['geometry_changes'] += 1
+                if table_name in GEOMETRY_COLUMNS:
+                    changes['geometry'].setdefault(table_name, []).append(
+                        (object_id, entity['geometry_wkt'])
+                    )
                 else:
-                    cur.execute("""
-                        UPDATE bmps
-                        SET boundary = ST_GeomFromText(%s, 4326),
-                            updated_at = CURRENT_TIMESTAMP
-                        WHERE bmp_id = %s
-                    """, (geometry_wkt, object_id))
-            
-            elif table_name == 'surface_models':
-                cur.execute("""
-                    UPDATE surface_models
-                    SET surface_geometry = ST_GeomFromText(%s, 4326),
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE surface_id = %s
-                """, (geometry_wkt, object_id))
-            
-            elif table_name == 'horizontal_alignments':
-                cur.execute("""
-                    UPDATE horizontal_alignments
-                    SET centerline_geometry = ST_GeomFromText(%s, 4326),
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE alignment_id = %s
-                """, (geometry_wkt, object_id))
-            
-            elif table_name == 'survey_points':
-                cur.execute("""
-                    UPDATE survey_points
-                    SET point_geometry = ST_GeomFromText(%s, 4326),
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE point_id = %s
-                """, (geometry_wkt, object_id))
-            
-            elif table_name == 'site_trees':
-                cur.execute("""
-                    UPDATE site_trees
-                    SET location = ST_GeomFromText(%s, 4326),
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE tree_id = %s
-                """, (geometry_wkt, object_id))
-            
-            # Update geometry hash in entity links
-            new_hash = hashlib.sha256(geometry_wkt.encode()).hexdigest()
-            cur.execute("""
-                UPDATE dxf_entity_links
-                SET geometry_hash = %s,
-                    sync_status = 'synced',
-                    last_sync_at = CURRENT_TIMESTAMP
-                WHERE dxf_handle = %s AND object_id = %s
-            """, (new_hash, entity['dxf_handle'], object_id))
-            
-            cur.close()
-            
-        except Exception as e:
-            stats['errors'].append(f"Failed to update geometry for {link['object_type']}: {str(e)}")
-    
-    def _update_properties_from_layer(self, entity: Dict, link: Dict, conn, stats: Dict):
-        """Update intelligent object properties when layer name changes."""
-        try:
-            cur = conn.cursor()
-            
-            # Classify the new layer name
-            new_layer = entity.get('layer_name', '')
-            classification = self.classifier.classify(new_layer)
-            
-            if not classification or classification.confidence < 0.7:
-                # Can't reliably classify new layer - mark as conflict
-                cur.execute("""
-                    UPDATE dxf_entity_links
-                    SET sync_status = 'conflict',
-                        layer_name = %s,
-                        last_sync_at = CURRENT_TIMESTAMP
-                    WHERE dxf_handle = %s AND object_id = %s
-                """, (new_layer, entity['dxf_handle'], link['object_id']))
-                stats['conflicts'] += 1
-                cur.close()
-                return
-            
-            table_name = link['table_name']
-            object_id = link['object_id']
-            props = classification.properties
-            
-            # Update properties based on table
-            if table_name == 'utility_lines':
-                diameter_mm = props.get('diameter_inches', 0) * 25.4 if props.get('diameter_inches') else None
-                cur.execute("""
-                    UPDATE utility_lines
-                    SET utility_type = COALESCE(%s, utility_type),
-                        diameter_mm = COALESCE(%s, diameter_mm),
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE utility_line_id = %s
-                """, (props.get('utility_type'), diameter_mm, object_id))
-            
-            elif table_name == 'utility_structures':
-                cur.execute("""
-                    UPDATE utility_structures
-                    SET structure_type = COALESCE(%s, structure_type),
-                        utility_type = COALESCE(%s, utility_type),
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE structure_id = %s
-                """, (props.get('structure_type'), props.get('utility_type'), object_id))
-            
-            elif table_name == 'bmps':
-                cur.execute("""
-                    UPDATE bmps
-                    SET bmp_type = COALESCE(%s, bmp_type),
-                        design_volume_cf = COALESCE(%s, design_volume_cf),
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE bmp_id = %s
-                """, (props.get('bmp_type'), props.get('design_volume_cf'), object_id))
-            
-            elif table_name == 'surface_models':
-                cur.execute("""
-                    UPDATE surface_models
-                    SET surface_type = COALESCE(%s, surface_type),
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE surface_id = %s
-                """, (props.get('surface_type'), object_id))
-            
-            elif table_name == 'survey_points':
-                cur.execute("""
-                    UPDATE survey_points
-                    SET point_type = COALESCE(%s, point_type),
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE point_id = %s
-                """, (props.get('point_type'), object_id))
-            
-            elif table_name == 'site_trees':
-                cur.execute("""
-                    UPDATE site_trees
-                    SET tree_status = COALESCE(%s, tree_status),
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE tree_id = %s
-                """, (props.get('tree_status'), object_id))
-            
-            # Update layer name in entity links
-            cur.execute("""
-                UPDATE dxf_entity_links
-                SET layer_name = %s,
-                    sync_status = 'synced',
-                    last_sync_at = CURRENT_TIMESTAMP
-                WHERE dxf_handle = %s AND object_id = %s
-            """, (new_layer, entity['dxf_handle'], object_id))
-            
-            cur.close()
-            
-        except Exception as e:
-            stats['errors'].append(f"Failed to update properties for {link['object_type']}: {str(e)}")
-    
-    def _mark_as_deleted(self, link: Dict, conn, stats: Dict):
-        """Mark an intelligent object as deleted when its DXF entity is removed."""
+                    # No geometry to update: keep the old hash so the change
+                    # is seen again on the next re-import
+                    stored_hash = None
+                    sync_state = 'pending'
+
+            if layer_changed:
+                stats['layer_changes'] += 1
+                if new_layer not in classifications:
+                    classifications[new_layer] = self.classifier.classify(new_layer or '')
+                classification = classifications[new_layer]
+
+                if not classification or classification.confidence < 0.7:
+                    # Can't reliably classify new layer - mark as conflict
+                    stats['conflicts'] += 1
+                    sync_state = 'conflict'
+                elif table_name in PROPERTY_COLUMNS:
+                    changes['properties'].setdefault(table_name, []).append(
+                        (object_id, self._layer_properties(classification.properties))
+                    )
+
+            changes['links'].append((
+                dxf_handle, object_id,
+                stored_hash if geometry_changed else None,
+                new_layer if layer_changed else None,
+                sync_state
+            ))
+
+        # Deleted entities (in database but not in reimport); links already
+        # marked deleted are not deleted again
+        changes['deleted'] = sorted(
+            handle for handle, link in existing_links.items()
+            if handle not in reimport_handles and link.get('sync_state') != 'deleted'
+        )
+        stats['deleted_entities'] = len(changes['deleted'])
+
+        return changes
+
+    def _layer_properties(self, props: Dict) -> Dict:
+        """Map classifier properties to the values written to object tables."""
+        values = dict(props)
+        diameter_inches = props.get('diameter_inches')
+        values['diameter_mm'] = diameter_inches * 25.4 if diameter_inches else None
+        return values
+
+    def _apply_geometry_updates(self, cur, updates: Dict[str, List[Tuple]],
+                                stats: Dict) -> Set[str]:
+        """
+        Update object geometry with one statement per target table.
+
+        Returns:
+            object_ids whose update failed (their links stay unsynced)
+        """
+        failed = set()
+
+        for table_name, rows in updates.items():
+            id_column, geom_column = GEOMETRY_COLUMNS[table_name]
+            geometry = f"ST_GeomFromText(v.geometry_wkt, {int(self.srid)})"
+            geometry = GEOMETRY_EXPRESSIONS.get(table_name, '{geometry}').format(geometry=geometry)
+
+            sql = f"""
+                UPDATE {table_name} AS t
+                SET {geom_column} = {geometry},
+                    updated_at = CURRENT_TIMESTAMP
+                FROM (VALUES %s) AS v(object_id, geometry_wkt)
+                WHERE t.{id_column} = v.object_id::uuid
+            """
+            if not self._execute_group(cur, sql, rows, stats,
+                                       f"Failed to update geometry for {table_name}"):
+                failed.update(object_id for object_id, _ in rows)
+
+        return failed
+
+    def _apply_property_updates(self, cur, updates: Dict[str, List[Tuple]],
+                                stats: Dict) -> Set[str]:
+        """
+        Update layer-derived object properties with one statement per table.
+
+        Returns:
+            object_ids whose update failed (their links stay unsynced)
+        """
+        failed = set()
+
+        for table_name, items in updates.items():
+            id_column, columns = PROPERTY_COLUMNS[table_name]
+            assignments = ',\n                    '.join(
+                f"{column} = COALESCE(v.{column}::{sql_type}, t.{column})"
+                for column, _, sql_type in columns
+            )
+            value_names = ', '.join(column for column, _, _ in columns)
+            rows = [
+                (object_id,) + tuple(props.get(key) for _, key, _ in columns)
+                for object_id, props in items
+            ]
+
+            sql = f"""
+                UPDATE {table_name} AS t
+                SET {assignments},
+                    updated_at = CURRENT_TIMESTAMP
+                FROM (VALUES %s) AS v(object_id, {value_names})
+                WHERE t.{id_column} = v.object_id::uuid
+            """
+            if not self._execute_group(cur, sql, rows, stats,
+                                       f"Failed to update properties for {table_name}"):
+                failed.update(object_id for object_id, _ in items)
+
+        return failed
+
+    def _execute_group(self, cur, sql: str, rows: List[Tuple], stats: Dict,
+                       error_prefix: str) -> bool:
+        """Run one batched statement under a savepoint; report failures in stats."""
+        cur.execute("SAVEPOINT change_detector_group")
         try:
-            cur = conn.cursor()
-            
-            # Update entity link status
-            cur.execute("""
-                UPDATE dxf_entity_links
-                SET sync_status = 'deleted',
-                    last_sync_at = CURRENT_TIMESTAMP
-                WHERE dxf_handle = %s AND object_id = %s
-            """, (link['dxf_handle'], link['object_id']))
-            
-            # Optionally soft-delete the object or mark it inactive
-            # For now, just update the sync status
-            # In production, you might want to add a 'deleted_at' timestamp
-            # or 'is_active' flag to the object tables
-            
-            cur.close()
-            
+            execute_values(cur, sql, rows, page_size=len(rows))
+            cur.execute("RELEASE SAVEPOINT change_detector_group")
+            return True
         except Exception as e:
-            stats['errors'].append(f"Failed to mark {link['object_type']} as deleted: {str(e)}")
+            cur.execute("ROLLBACK TO SAVEPOINT change_detector_group")
+            stats['errors'].append(f"{error_prefix}: {str(e)}")
+            return False
+
+    def _apply_link_updates(self, cur, link_rows: List[Tuple], failed: Set[str]):
+        """Record new hashes, layer names and sync state in one statement."""
+        rows = [row for row in link_rows if row[1] not in failed]
+        if not rows:
+            return
+
+        execute_values(cur, """
+            UPDATE dxf_entity_links AS l
+            SET entity_geom_hash = COALESCE(v.entity_geom_hash, l.entity_geom_hash),
+                layer_name = COALESCE(v.layer_name, l.layer_name),
+                sync_state = v.sync_state,
+                last_seen_at = CURRENT_TIMESTAMP,
+                updated_at = CURRENT_TIMESTAMP
+            FROM (VALUES %s) AS v(dxf_handle, object_id, entity_geom_hash, layer_name, sync_state)
+            WHERE l.dxf_handle = v.dxf_handle AND l.object_id = v.object_id::uuid
+        """, rows, page_size=len(rows))
+
+    def _mark_as_deleted(self, cur, project_id: str, handles: List[str]):
+        """Soft-delete links whose DXF entities were removed, in one statement."""
+        if not handles:
+            return
+
+        # Only the link status is updated; object tables have no common
+        # soft-delete column
+        cur.execute("""
+            UPDATE dxf_entity_links
+            SET sync_state = 'deleted',
+                updated_at = CURRENT_TIMESTAMP
+            WHERE project_id = %s AND drawing_id IS NULL
+              AND dxf_handle = ANY(%s)
+        """, (project_id, handles))
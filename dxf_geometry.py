@@ -0,0 +1,221 @@
+"""
+DXF Geometry Conversion Module
+Converts DXF entity geometry to WKT strings.
+
+Conversion is split in two steps so the CPU-heavy part can run in worker
+processes: extract_entity_geometry() copies the coordinates out of an ezdxf
+entity into plain (picklable) Python data, and geometry_to_wkt() does the
+tessellation and WKT formatting on that data.
+"""
+
+import hashlib
+import math
+import re
+from typing import Dict, List, Optional
+
+
+# Entity types converted to WKT by geometry_to_wkt()
+GEOMETRY_ENTITY_TYPES = ('LINE', 'POLYLINE', 'LWPOLYLINE', 'ARC',
+                         'CIRCLE', 'ELLIPSE', 'SPLINE')
+
+# Words, structural punctuation and numbers of a WKT string
+_WKT_TOKEN = re.compile(r'[A-Za-z]+|[(),]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+
+
+def extract_entity_geometry(entity) -> Dict:
+    """
+    Copy the geometry of an ezdxf entity into plain Python data.
+
+    Args:
+        entity: ezdxf entity
+
+    Returns:
+        Dict with a 'type' key plus type-specific coordinates
+    """
+    entity_type = entity.dxftype()
+    data = {'type': entity_type}
+
+    if entity_type == 'LINE':
+        data['start'] = tuple(entity.dxf.start)
+        data['end'] = tuple(entity.dxf.end)
+
+    elif entity_type in ('CIRCLE', 'ARC'):
+        data['center'] = tuple(entity.dxf.center)
+        data['radius'] = entity.dxf.radius
+        if entity_type == 'ARC':
+            data['start_angle'] = entity.dxf.start_angle
+            data['end_angle'] = entity.dxf.end_angle
+
+    elif entity_type == 'POLYLINE':
+        # Use vertices directly to ensure Z-values are preserved
+        data['vertices'] = [tuple(vertex.dxf.location) for vertex in entity.vertices]
+        data['closed'] = bool(entity.is_closed)
+
+    elif entity_type == 'LWPOLYLINE':
+        data['vertices'] = [tuple(v) for v in entity.vertices()]
+        data['elevation'] = entity.dxf.elevation if hasattr(entity.dxf, 'elevation') else 0
+        data['closed'] = bool(entity.closed)
+
+    elif entity_type == 'ELLIPSE':
+        data['center'] = tuple(entity.dxf.center)
+        data['major_axis'] = tuple(entity.dxf.major_axis)
+        data['ratio'] = entity.dxf.ratio
+
+    return data
+
+
+def geometry_to_wkt(data: Dict) -> Optional[str]:
+    """
+    Convert extracted entity geometry to a WKT geometry string.
+
+    Args:
+        data: Output of extract_entity_geometry()
+
+    Returns:
+        WKT string, or None for unsupported/empty geometry
+    """
+    entity_type = data['type']
+
+    if entity_type == 'LINE':
+        sx, sy, sz = data['start']
+        ex, ey, ez = data['end']
+        return f'LINESTRING Z ({sx} {sy} {sz}, {ex} {ey} {ez})'
+
+    elif entity_type == 'CIRCLE':
+        cx, cy, cz = data['center']
+        radius = data['radius']
+        # Approximate circle with 32 points
+        points = []
+        for i in range(33):
+            angle = 2 * math.pi * i / 32
+            x = cx + radius * math.cos(angle)
+            y = cy + radius * math.sin(angle)
+            points.append(f'{x} {y} {cz}')
+        return f'LINESTRING Z ({", ".join(points)})'
+
+    elif entity_type == 'ARC':
+        cx, cy, cz = data['center']
+        radius = data['radius']
+        start_angle = math.radians(data['start_angle'])
+        end_angle = math.radians(data['end_angle'])
+
+        # Approximate arc with points
+        points = []
+        segments = 32
+        if end_angle < start_angle:
+            end_angle += 2 * math.pi
+        angle_range = end_angle - start_angle
+
+        for i in range(segments + 1):
+            angle = start_angle + (angle_range * i / segments)
+            x = cx + radius * math.cos(angle)
+            y = cy + radius * math.sin(angle)
+            points.append(f'{x} {y} {cz}')
+        return f'LINESTRING Z ({", ".join(points)})'
+
+    elif entity_type == 'POLYLINE':
+        points = [f'{x} {y} {z}' for x, y, z in data['vertices']]
+
+        if len(points) > 0:
+            # Check if polyline is closed (closed flag or first==last vertex)
+            is_closed = data['closed'] or (len(points) >= 3 and points[0] == points[-1])
+
+            if is_closed:
+                # Ensure first and last points match for valid polygon
+                if points[0] != points[-1]:
+                    points.append(points[0])
+                return f'POLYGON Z (({", ".join(points)}))'
+            else:
+                return f'LINESTRING Z ({", ".join(points)})'
+
+    elif entity_type == 'LWPOLYLINE':
+        vertices = data['vertices']
+        z = data['elevation']
+        points = [f'{x} {y} {z}' for x, y in vertices]
+
+        if len(points) > 0:
+            # Check if LWPOLYLINE is closed (closed flag or first==last vertex)
+            is_closed = data['closed'] or (len(vertices) >= 3 and vertices[0] == vertices[-1])
+
+            if is_closed:
+                # Ensure first and last points match for valid polygon
+                if vertices[0] != vertices[-1]:
+                    x, y = vertices[0]
+                    points.append(f'{x} {y} {z}')
+                return f'POLYGON Z (({", ".join(points)}))'
+            else:
+                return f'LINESTRING Z ({", ".join(points)})'
+
+    elif entity_type == 'ELLIPSE':
+        # Approximate ellipse with points
+        cx, cy, cz = data['center']
+        mx, my, _ = data['major_axis']
+        ratio = data['ratio']
+
+        points = []
+        for i in range(33):
+            angle = 2 * math.pi * i / 32
+            x = cx + mx * math.cos(angle)
+            y = cy + my * ratio * math.sin(angle)
+            points.append(f'{x} {y} {cz}')
+        return f'LINESTRING Z ({", ".join(points)})'
+
+    return None
+
+
+def convert_geometry_batch(batch: List[Optional[Dict]]) -> List[Optional[str]]:
+    """
+    Convert a batch of extracted geometries to WKT (process pool entry point).
+
+    Entries that are None or fail to convert yield None at the same position,
+    so results stay aligned with the input order.
+    """
+    results = []
+    for data in batch:
+        if data is None:
+            results.append(None)
+            continue
+        try:
+            results.append(geometry_to_wkt(data))
+        except Exception:
+            results.append(None)
+    return results
+
+
+def geometry_hash(geometry_wkt: Optional[str], precision: int = 6) -> Optional[str]:
+    """
+    Stable SHA256 hash of a WKT geometry.
+
+    Coordinates are rounded to ``precision`` decimals and the text is
+    re-tokenized, so the same geometry hashes identically whether the WKT was
+    produced here or by PostGIS ST_AsText (which formats numbers and
+    separators differently).
+
+    Args:
+        geometry_wkt: WKT geometry string
+        precision: Decimal places kept per coordinate
+
+    Returns:
+        Hex digest, or None for empty geometry
+    """
+    if not geometry_wkt:
+        return None
+
+    tokens = []
+    for token in _WKT_TOKEN.findall(geometry_wkt):
+        if token[0].isalpha():
+            tokens.append(token.upper())
+        elif token in '(),':
+            tokens.append(token)
+        else:
+            # + 0.0 folds -0.0 into 0.0
+            tokens.append(f'{round(float(token), precision) + 0.0:.{precision}f}')
+
+    return hashlib.sha256(' '.join(tokens).encode()).hexdigest()
+
+
+def wkt_geometry_type(geometry_wkt: str) -> str:
+    """Geometry type name of a WKT string as reported by ST_GeometryType without 'ST_'."""
+    names = {'POINT': 'Point', 'LINESTRING': 'LineString', 'POLYGON': 'Polygon'}
+    word = geometry_wkt.split('(', 1)[0].split()[0].upper() if geometry_wkt else ''
+    return names.get(word, word.title())
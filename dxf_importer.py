@@ -9,13 +9,23 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 from datetime import datetime
 import json
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 import os
-import math
 import hashlib
+import uuid
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from dxf_lookup_service import DXFLookupService
+from dxf_bulk_writer import DXFBulkWriter, build_insert_sql
+from dxf_geometry import (GEOMETRY_ENTITY_TYPES, convert_geometry_batch,
+                          extract_entity_geometry, geometry_to_wkt)
+from dxf_stream_reader import DXFStreamReader
 from intelligent_object_creator import IntelligentObjectCreator
+from batch_object_creator import BatchIntelligentObjectCreator
 from standards.import_mapping_manager import ImportMappingManager
+from services.tile_cache import bump_project_data_version
+from services.geometry_generalization_service import geometry_generalization_service
 
 
 class DXFImporter:
@@ -35,11 +45,19 @@ class DXFImporter:
         self.create_intelligent_objects = create_intelligent_objects
         self.use_name_translator = use_name_translator
         self.mapping_manager = ImportMappingManager() if use_name_translator else None
+        self._bulk_writer = None
+        self.import_batch_id = None
     
     def import_dxf(self, file_path: str, project_id: str,
                    coordinate_system: str = 'LOCAL',
                    import_modelspace: bool = True,
-                   external_conn=None) -> Dict:
+                   external_conn=None,
+                   bulk_mode: bool = False,
+                   batch_size: int = 5000,
+                   streaming: bool = False,
+                   chunk_size: int = 5000,
+                   progress_callback: Optional[Callable[[Dict], None]] = None,
+                   workers: int = 0) -> Dict:
         """
         Import a DXF file into the database at project level.
 
@@ -49,6 +67,24 @@ class DXFImporter:
             coordinate_system: Coordinate system ('LOCAL', 'WGS84', etc.')
             import_modelspace: Whether to import model space entities
             external_conn: Optional external database connection (will not be closed)
+            bulk_mode: Buffer converted rows and write them with COPY instead
+                of one INSERT per entity, and create intelligent objects with
+                set-based statements. Per-batch timings are reported in
+                stats['batch_timings'].
+            batch_size: Rows per table buffered before a bulk flush
+            streaming: Read the file with DXFStreamReader instead of loading the
+                whole document; modelspace entities are converted and flushed
+                chunk by chunk (implies bulk writes)
+            chunk_size: Modelspace entities per chunk in streaming mode or
+                with conversion workers
+            progress_callback: Optional callable invoked after each streamed
+                chunk with {'chunk', 'entities_read', 'fraction'}
+            workers: Number of worker processes converting entity geometry to
+                WKT. With more than one worker, modelspace entities are
+                processed in chunks of chunk_size: upcoming chunks are
+                converted in the pool while the current chunk is written over
+                the single import connection, in original entity order.
+                0 or 1 converts inline.
 
         Returns:
             Dictionary with import statistics
@@ -60,8 +96,13 @@ class DXFImporter:
             'WGS84': 4326  # WGS84 geographic coordinates
         }
         self.srid = srid_map.get(coordinate_system.upper(), 0)
+
+        # Every drawing_entities row of this import is stamped with the batch id
+        # so follow-up steps only see this import's rows
+        self.import_batch_id = str(uuid.uuid4())
         
         stats = {
+            'import_batch_id': self.import_batch_id,
             'entities': 0,
             'text': 0,
             'dimensions': 0,
@@ -92,8 +133,13 @@ class DXFImporter:
         conn = external_conn if external_conn else psycopg2.connect(**self.db_config)
         
         try:
-            # Read DXF file
-            doc = ezdxf.readfile(file_path)
+            # Read DXF file (streaming mode only reads the table records up front)
+            reader = None
+            if streaming:
+                reader = DXFStreamReader(file_path, chunk_size=chunk_size)
+                doc = reader.read_tables()
+            else:
+                doc = ezdxf.readfile(file_path)
             
             # Set autocommit only if we own the connection
             if owns_connection:
@@ -111,14 +157,39 @@ class DXFImporter:
                 
                 # Import model space
                 if import_modelspace:
-                    modelspace = doc.modelspace()
-                    self._import_entities(modelspace, project_id, conn, stats, resolver)
+                    if bulk_mode or streaming:
+                        self._bulk_writer = DXFBulkWriter(conn, self.srid,
+                                                          batch_size=batch_size,
+                                                          stats=stats)
+                    if streaming:
+                        self._import_entity_stream(reader, project_id, conn, stats,
+                                                   resolver, progress_callback,
+                                                   workers=workers)
+                    elif workers > 1:
+                        self._import_entity_chunks(
+                            self._chunked(doc.modelspace(), chunk_size),
+                            project_id, conn, stats, resolver, workers=workers
+                        )
+                    else:
+                        modelspace = doc.modelspace()
+                        self._import_entities(modelspace, project_id, conn, stats, resolver)
+
+                    # Flush buffered rows before intelligent objects read them back
+                    if self._bulk_writer:
+                        self._bulk_writer.close()
 
                 # Create intelligent objects from imported entities
                 if self.create_intelligent_objects:
                     stats['intelligent_objects_created'] = self._create_intelligent_objects(
-                        project_id, conn, stats
+                        project_id, conn, stats, batched=bulk_mode or streaming,
+                        chunk_size=chunk_size
                     )
+
+                # Refresh simplified map geometry and retire cached map tiles
+                # of the project with this transaction
+                with conn.cursor() as cur:
+                    geometry_generalization_service.refresh(project_id, cursor=cur)
+                    bump_project_data_version(project_id, cur)
                 
                 # Only commit if we own the connection
                 if owns_connection:
@@ -130,6 +201,7 @@ class DXFImporter:
                     conn.rollback()
                 raise e
             finally:
+                self._bulk_writer = None
                 # Only close if we own the connection
                 if owns_connection:
                     conn.close()
@@ -143,73 +215,95 @@ class DXFImporter:
         
         return stats
     
-    def _create_intelligent_objects(self, project_id: str, conn, stats: Dict) -> int:
+    def _create_intelligent_objects(self, project_id: str, conn, stats: Dict,
+                                    batched: bool = False, chunk_size: int = 5000) -> int:
         """
         Create intelligent civil engineering objects from imported DXF entities.
+
+        Entities are read through a server-side cursor and handed to the
+        creator chunk_size at a time, so a large import is never held in
+        memory at once.
         
         Args:
             project_id: UUID of the project
             conn: Database connection
             stats: Import statistics dictionary
+            batched: Use BatchIntelligentObjectCreator (set-based writes per
+                object type) instead of one create_from_entity call per entity
+            chunk_size: Entities fetched and created per chunk
             
         Returns:
             Count of intelligent objects created
         """
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Query recently imported entities from this project (last 10 minutes)
-        # Since entities are no longer tied to drawings, we query by project and recent timestamp
-        cur.execute(f"""
-            SELECT
-                de.entity_id,
-                de.entity_type,
-                l.layer_name,
-                ST_AsText(de.geometry) as geometry_wkt,
-                ST_GeometryType(de.geometry) as geometry_type,
-                de.dxf_handle,
-                de.color_aci,
-                de.linetype
-            FROM drawing_entities de
-            LEFT JOIN layers l ON de.layer_id = l.layer_id
-            WHERE de.created_at >= NOW() - INTERVAL '10 minutes'
-            ORDER BY de.created_at DESC
-        """)
-        
-        entities = cur.fetchall()
-        cur.close()
-        
-        # Initialize intelligent object creator
-        creator = IntelligentObjectCreator(self.db_config, conn=conn)
-        
+        if batched:
+            creator = BatchIntelligentObjectCreator(self.db_config, conn=conn)
+        else:
+            creator = IntelligentObjectCreator(self.db_config, conn=conn)
+
         created_count = 0
-        
-        for entity in entities:
-            try:
-                # Prepare entity data dictionary
-                entity_data = {
-                    'entity_id': str(entity['entity_id']),
-                    'entity_type': entity['entity_type'],
-                    'layer_name': entity['layer_name'],
-                    'geometry_wkt': entity['geometry_wkt'],
-                    'geometry_type': entity['geometry_type'].replace('ST_', ''),  # ST_LineString -> LineString
-                    'dxf_handle': entity['dxf_handle'],
-                    'color_aci': entity['color_aci'],
-                    'linetype': entity['linetype']
-                }
-                
-                # Attempt to create intelligent object
-                result = creator.create_from_entity(entity_data, project_id)
-                
-                if result:
-                    created_count += 1
-                    object_type, object_id, table_name = result
-                    # Optional: Log successful creation
-                    # print(f"Created {object_type} {object_id} from {entity['entity_type']} on {entity['layer_name']}")
-                    
-            except Exception as e:
-                stats['errors'].append(f"Failed to create intelligent object from entity {entity.get('dxf_handle', 'unknown')}: {str(e)}")
-                continue
-        
+
+        # WITH HOLD keeps the cursor open across the commits the per-entity
+        # creator makes while the chunks are processed
+        with conn.cursor(name=f'intelligent_objects_{uuid.uuid4().hex}',
+                         cursor_factory=RealDictCursor, withhold=True) as cur:
+            cur.itersize = chunk_size
+
+            # Query the entities written by this import (scoped by import batch id,
+            # so concurrent imports into other projects are never picked up). The
+            # ? test repeats the predicate of idx_drawing_entities_import_batch so
+            # the planner can use that partial index.
+            cur.execute("""
+                SELECT
+                    de.entity_id,
+                    de.entity_type,
+                    l.layer_name,
+                    ST_AsText(de.geometry) as geometry_wkt,
+                    ST_GeometryType(de.geometry) as geometry_type,
+                    de.dxf_handle,
+                    de.color_aci,
+                    de.linetype
+                FROM drawing_entities de
+                LEFT JOIN layers l ON de.layer_id = l.layer_id
+                WHERE de.project_id = %s::uuid
+                  AND de.attributes ? 'import_batch_id'
+                  AND de.attributes->>'import_batch_id' = %s
+                ORDER BY de.created_at DESC
+            """, (project_id, self.import_batch_id))
+
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                entities = [
+                    {
+                        'entity_id': str(entity['entity_id']),
+                        'entity_type': entity['entity_type'],
+                        'layer_name': entity['layer_name'],
+                        'geometry_wkt': entity['geometry_wkt'],
+                        'geometry_type': entity['geometry_type'].replace('ST_', ''),  # ST_LineString -> LineString
+                        'dxf_handle': entity['dxf_handle'],
+                        'color_aci': entity['color_aci'],
+                        'linetype': entity['linetype']
+                    }
+                    for entity in rows
+                ]
+
+                if batched:
+                    created_count += creator.create_from_entities(entities, project_id, stats)
+                    continue
+
+                for entity_data in entities:
+                    try:
+                        # Attempt to create intelligent object
+                        result = creator.create_from_entity(entity_data, project_id)
+
+                        if result:
+                            created_count += 1
+
+                    except Exception as e:
+                        stats['errors'].append(f"Failed to create intelligent object from entity {entity_data.get('dxf_handle', 'unknown')}: {str(e)}")
+                        continue
+
         return created_count
     
     def _import_layers(self, doc, project_id: str,
@@ -218,8 +312,11 @@ class DXFImporter:
         Import layers at project level.
 
         If use_name_translator is enabled, attempts to translate layer names
-        using ImportMappingManager before creating/retrieving layers.
+        using ImportMappingManager before creating/retrieving layers. All
+        layers are resolved (and missing ones created) in one warm-up pass.
         """
+        resolved_layers = {}  # translated_name -> (color_aci, linetype)
+
         for layer in doc.layers:
             layer_name = layer.dxf.name
             stats['layers'].add(layer_name)
@@ -280,8 +377,15 @@ class DXFImporter:
                           f"entity_valid: {match.entity_valid}, "
                           f"conflicts: {len(match.conflict_patterns)})")
 
+            # Use translated name if available
+            resolved_layers.setdefault(translated_name, (color_aci, linetype))
+
+        # Resolve/create every layer with one query per table
+        resolver.warm_up(project_id, layers=resolved_layers)
+
+        for translated_name, (color_aci, linetype) in resolved_layers.items():
             layer_id, layer_standard_id = resolver.get_or_create_layer(
-                translated_name,  # Use translated name if available
+                translated_name,
                 project_id=project_id,
                 color_aci=color_aci,
                 linetype=linetype
@@ -290,23 +394,33 @@ class DXFImporter:
     def _import_linetypes(self, doc,
                           conn, stats: Dict, resolver: DXFLookupService):
         """Import linetypes (no drawing-level tracking needed)."""
-        for linetype in doc.linetypes:
-            linetype_name = linetype.dxf.name
+        linetype_names = [linetype.dxf.name for linetype in doc.linetypes]
+        resolver.warm_up(linetypes=linetype_names)
+
+        for linetype_name in linetype_names:
             stats['linetypes'].add(linetype_name)
             
             # Get linetype standard ID (no drawing-level usage tracking)
             linetype_standard_id = resolver.get_or_create_linetype(linetype_name)
     
     def _import_entities(self, layout, project_id: str,
-                         conn, stats: Dict, resolver: DXFLookupService):
-        """Import entities from a layout at project level."""
-        for entity in layout:
+                         conn, stats: Dict, resolver: DXFLookupService,
+                         converted: Optional[List[Optional[str]]] = None):
+        """
+        Import entities from a layout at project level.
+
+        Args:
+            converted: Optional WKT geometries precomputed by the conversion
+                pool, aligned index-for-index with the entities of layout
+        """
+        for index, entity in enumerate(layout):
             entity_type = entity.dxftype()
 
             try:
-                if entity_type in ['LINE', 'POLYLINE', 'LWPOLYLINE', 'ARC',
-                                   'CIRCLE', 'ELLIPSE', 'SPLINE']:
-                    self._import_entity(entity, project_id, conn, stats, resolver)
+                if entity_type in GEOMETRY_ENTITY_TYPES:
+                    geometry_wkt = converted[index] if converted is not None else None
+                    self._import_entity(entity, project_id, conn, stats, resolver,
+                                        geometry_wkt=geometry_wkt)
 
                 elif entity_type == 'POINT':
                     self._import_point(entity, project_id, conn, stats, resolver)
@@ -340,9 +454,120 @@ class DXFImporter:
                     f"Failed to import {entity_type}: {str(e)}"
                 )
     
+    def _import_entity_stream(self, reader: DXFStreamReader, project_id: str,
+                              conn, stats: Dict, resolver: DXFLookupService,
+                              progress_callback: Optional[Callable[[Dict], None]] = None,
+                              workers: int = 0):
+        """Import streamed modelspace entities chunk by chunk, flushing each chunk."""
+        entities_read = 0
+
+        def report(chunk):
+            nonlocal entities_read
+            entities_read += len(chunk)
+            if progress_callback:
+                progress_callback({
+                    'chunk': stats['chunks'],
+                    'entities_read': entities_read,
+                    'fraction': reader.progress()
+                })
+
+        self._import_entity_chunks(reader.iter_chunks(), project_id, conn, stats,
+                                   resolver, workers=workers, on_chunk=report)
+    
+    def _import_entity_chunks(self, chunks: Iterable[List], project_id: str,
+                              conn, stats: Dict, resolver: DXFLookupService,
+                              workers: int = 0,
+                              on_chunk: Optional[Callable[[List], None]] = None):
+        """
+        Import modelspace entities chunk by chunk.
+
+        With more than one worker, geometry conversion runs in a process pool
+        ahead of the writer; all database writes stay on this connection.
+
+        Args:
+            chunks: Iterable of entity lists
+            workers: Number of conversion worker processes
+            on_chunk: Optional callable invoked with each chunk after it is written
+        """
+        stats['chunks'] = 0
+
+        if workers > 1 and multiprocessing.current_process().daemon:
+            # Daemonic processes (e.g. Celery prefork children) cannot fork a pool
+            print("WARNING: Running in a daemonic process, converting geometry inline")
+            workers = 0
+        stats['conversion_workers'] = workers if workers > 1 else 0
+
+        if workers > 1:
+            pipeline = self._convert_chunks(chunks, workers)
+        else:
+            pipeline = ((chunk, None) for chunk in chunks)
+
+        for chunk, converted in pipeline:
+            self._import_entities(chunk, project_id, conn, stats, resolver,
+                                  converted=converted)
+            if self._bulk_writer:
+                self._bulk_writer.flush()
+
+            stats['chunks'] += 1
+            if on_chunk:
+                on_chunk(chunk)
+    
+    def _convert_chunks(self, chunks: Iterable[List],
+                        workers: int) -> Iterator[Tuple[List, List[Optional[str]]]]:
+        """
+        Convert entity geometry in a process pool, yielding chunks in input order.
+
+        Entities are reduced to plain coordinate data here (ezdxf entities are
+        not picklable) and tessellated/formatted in the workers. At most
+        2 * workers chunks are in flight, so streamed input stays bounded.
+        """
+        pending = deque()
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk in chunks:
+                batch = []
+                for entity in chunk:
+                    data = None
+                    if entity.dxftype() in GEOMETRY_ENTITY_TYPES:
+                        try:
+                            data = extract_entity_geometry(entity)
+                        except Exception:
+                            # Converted inline by _import_entity, which reports the error
+                            data = None
+                    batch.append(data)
+
+                pending.append((chunk, pool.submit(convert_geometry_batch, batch)))
+                if len(pending) >= workers * 2:
+                    done_chunk, future = pending.popleft()
+                    yield done_chunk, future.result()
+
+            while pending:
+                done_chunk, future = pending.popleft()
+                yield done_chunk, future.result()
+    
+    @staticmethod
+    def _chunked(entities: Iterable, chunk_size: int) -> Iterator[List]:
+        """Split an entity iterable into lists of at most chunk_size entities."""
+        chunk_size = max(1, int(chunk_size))
+        chunk = []
+        for entity in entities:
+            chunk.append(entity)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    
     def _import_entity(self, entity, project_id: str,
-                       conn, stats: Dict, resolver: DXFLookupService):
-        """Import generic drawing entity at project level (line, arc, circle, etc.)."""
+                       conn, stats: Dict, resolver: DXFLookupService,
+                       geometry_wkt: Optional[str] = None):
+        """
+        Import generic drawing entity at project level (line, arc, circle, etc.).
+
+        Args:
+            geometry_wkt: WKT already converted by the conversion pool; the
+                entity is converted inline when not given
+        """
         cur = conn.cursor()
 
         entity_type = entity.dxftype()
@@ -362,7 +587,8 @@ class DXFImporter:
         )
 
         # Convert entity to WKT geometry
-        geometry_wkt = self._entity_to_wkt(entity)
+        if geometry_wkt is None:
+            geometry_wkt = self._entity_to_wkt(entity)
 
         if geometry_wkt:
             try:
@@ -370,26 +596,26 @@ class DXFImporter:
                 attributes = {
                     'layer_name': layer_name,
                     'linetype': linetype,
-                    'entity_type': entity_type
+                    'entity_type': entity_type,
+                    'import_batch_id': self.import_batch_id
                 }
 
-                # Insert geometry using ST_GeomFromText
-                # The POLYGON Z WKT format should preserve the polygon type
-                geom_cast = f"ST_GeomFromText(%s, {self.srid})"
-
                 # Insert entity at project level (project-only architecture)
-                cur.execute(f"""
-                    INSERT INTO drawing_entities (
-                        project_id, entity_type, layer_id,
-                        geometry, dxf_handle, color_aci, lineweight, linetype,
-                        transparency, quality_score, tags, attributes
-                    )
-                    VALUES (%s::uuid, %s, %s, {geom_cast}, %s, %s, %s, %s, %s, 0.5, '{{}}', %s)
-                """, (
-                    project_id, entity_type, layer_id,
-                    geometry_wkt, dxf_handle, color_aci, lineweight, linetype,
-                    transparency, json.dumps(attributes)
-                ))
+                # The POLYGON Z WKT format should preserve the polygon type
+                self._write_row(cur, 'drawing_entities', {
+                    'project_id': project_id,
+                    'entity_type': entity_type,
+                    'layer_id': layer_id,
+                    'geometry': geometry_wkt,
+                    'dxf_handle': dxf_handle,
+                    'color_aci': color_aci,
+                    'lineweight': lineweight,
+                    'linetype': linetype,
+                    'transparency': transparency,
+                    'quality_score': 0.5,
+                    'tags': '{}',
+                    'attributes': json.dumps(attributes)
+                })
                 
                 stats['entities'] += 1
             except Exception as e:
@@ -403,107 +629,27 @@ class DXFImporter:
         
         cur.close()
     
+    def _write_row(self, cur, table: str, row: Dict):
+        """
+        Write one converted row to a target table.
+
+        In bulk mode the row is buffered and flushed with COPY; otherwise it is
+        inserted immediately with a single-row INSERT.
+        """
+        if self._bulk_writer:
+            self._bulk_writer.add(table, row)
+            return
+
+        cur.execute(build_insert_sql(table, list(row.keys()), self.srid),
+                    tuple(row.values()))
+    
     def _entity_to_wkt(self, entity) -> Optional[str]:
         """Convert DXF entity to WKT geometry string."""
-        entity_type = entity.dxftype()
-        
         try:
-            if entity_type == 'LINE':
-                start = entity.dxf.start
-                end = entity.dxf.end
-                return f'LINESTRING Z ({start.x} {start.y} {start.z}, {end.x} {end.y} {end.z})'
-            
-            elif entity_type == 'CIRCLE':
-                center = entity.dxf.center
-                radius = entity.dxf.radius
-                # Approximate circle with 32 points
-                points = []
-                for i in range(33):
-                    angle = 2 * math.pi * i / 32
-                    x = center.x + radius * math.cos(angle)
-                    y = center.y + radius * math.sin(angle)
-                    points.append(f'{x} {y} {center.z}')
-                return f'LINESTRING Z ({", ".join(points)})'
-            
-            elif entity_type == 'ARC':
-                center = entity.dxf.center
-                radius = entity.dxf.radius
-                start_angle = math.radians(entity.dxf.start_angle)
-                end_angle = math.radians(entity.dxf.end_angle)
-                
-                # Approximate arc with points
-                points = []
-                segments = 32
-                if end_angle < start_angle:
-                    end_angle += 2 * math.pi
-                angle_range = end_angle - start_angle
-                
-                for i in range(segments + 1):
-                    angle = start_angle + (angle_range * i / segments)
-                    x = center.x + radius * math.cos(angle)
-                    y = center.y + radius * math.sin(angle)
-                    points.append(f'{x} {y} {center.z}')
-                return f'LINESTRING Z ({", ".join(points)})'
-            
-            elif entity_type == 'POLYLINE':
-                points = []
-                # Use vertices directly to ensure Z-values are preserved
-                for vertex in entity.vertices:
-                    loc = vertex.dxf.location
-                    points.append(f'{loc.x} {loc.y} {loc.z}')
-                
-                if len(points) > 0:
-                    # Check if polyline is closed (closed flag or first==last vertex)
-                    is_closed = entity.is_closed or (len(points) >= 3 and points[0] == points[-1])
-                    
-                    if is_closed:
-                        # Ensure first and last points match for valid polygon
-                        if points[0] != points[-1]:
-                            points.append(points[0])
-                        return f'POLYGON Z (({", ".join(points)}))'
-                    else:
-                        return f'LINESTRING Z ({", ".join(points)})'
-            
-            elif entity_type == 'LWPOLYLINE':
-                points = []
-                vertices = list(entity.vertices())
-                z = entity.dxf.elevation if hasattr(entity.dxf, 'elevation') else 0
-                
-                for x, y in vertices:
-                    points.append(f'{x} {y} {z}')
-                
-                if len(points) > 0:
-                    # Check if LWPOLYLINE is closed (closed flag or first==last vertex)
-                    is_closed = entity.closed or (len(vertices) >= 3 and vertices[0] == vertices[-1])
-                    
-                    if is_closed:
-                        # Ensure first and last points match for valid polygon
-                        if vertices[0] != vertices[-1]:
-                            x, y = vertices[0]
-                            points.append(f'{x} {y} {z}')
-                        return f'POLYGON Z (({", ".join(points)}))'
-                    else:
-                        return f'LINESTRING Z ({", ".join(points)})'
-            
-            elif entity_type == 'ELLIPSE':
-                # Approximate ellipse with points
-                center = entity.dxf.center
-                major_axis = entity.dxf.major_axis
-                ratio = entity.dxf.ratio
-                
-                points = []
-                for i in range(33):
-                    angle = 2 * math.pi * i / 32
-                    x = center.x + major_axis.x * math.cos(angle)
-                    y = center.y + major_axis.y * ratio * math.sin(angle)
-                    points.append(f'{x} {y} {center.z}')
-                return f'LINESTRING Z ({", ".join(points)})'
-            
+            return geometry_to_wkt(extract_entity_geometry(entity))
         except Exception as e:
-            print(f"Error converting {entity_type} to WKT: {e}")
+            print(f"Error converting {entity.dxftype()} to WKT: {e}")
             return None
-        
-        return None
     
     def _import_text(self, entity, project_id: str,
                      conn, stats: Dict, resolver: DXFLookupService):
@@ -550,19 +696,21 @@ class DXFImporter:
             'entity_type': entity_type
         }
 
-        cur.execute(f"""
-            INSERT INTO drawing_text (
-                project_id, layer_id, text_content,
-                insertion_point, text_height, rotation_angle,
-                text_style, horizontal_justification, vertical_justification,
-                dxf_handle, quality_score, tags, attributes
-            )
-            VALUES (%s::uuid, %s::uuid, %s, ST_GeomFromText(%s, {self.srid}), %s, %s, %s, %s, %s, %s, 0.5, '{{}}', %s)
-        """, (
-            project_id, layer_id, text_content,
-            geometry_wkt, height, rotation, style_name, h_just, v_just,
-            dxf_handle, json.dumps(attributes)
-        ))
+        self._write_row(cur, 'drawing_text', {
+            'project_id': project_id,
+            'layer_id': layer_id,
+            'text_content': text_content,
+            'insertion_point': geometry_wkt,
+            'text_height': height,
+            'rotation_angle': rotation,
+            'text_style': style_name,
+            'horizontal_justification': h_just,
+            'vertical_justification': v_just,
+            'dxf_handle': dxf_handle,
+            'quality_score': 0.5,
+            'tags': '{}',
+            'attributes': json.dumps(attributes)
+        })
 
         stats['text'] += 1
         cur.close()
@@ -596,18 +744,18 @@ class DXFImporter:
             'entity_type': dim_type
         }
 
-        cur.execute(f"""
-            INSERT INTO drawing_dimensions (
-                project_id, layer_id, dimension_type,
-                measured_value, dimension_text, dimension_style,
-                dxf_handle, quality_score, tags, attributes
-            )
-            VALUES (%s::uuid, %s::uuid, %s, %s, %s, %s, %s, 0.5, '{{}}', %s)
-        """, (
-            project_id, layer_id, dim_type,
-            measured_value, dimension_text, dimstyle_name,
-            dxf_handle, json.dumps(attributes)
-        ))
+        self._write_row(cur, 'drawing_dimensions', {
+            'project_id': project_id,
+            'layer_id': layer_id,
+            'dimension_type': dim_type,
+            'measured_value': measured_value,
+            'dimension_text': dimension_text,
+            'dimension_style': dimstyle_name,
+            'dxf_handle': dxf_handle,
+            'quality_score': 0.5,
+            'tags': '{}',
+            'attributes': json.dumps(attributes)
+        })
 
         stats['dimensions'] += 1
         cur.close()
@@ -655,18 +803,18 @@ class DXFImporter:
                     'is_solid': pattern_name.upper() == 'SOLID'
                 }
 
-                cur.execute(f"""
-                    INSERT INTO drawing_hatches (
-                        project_id, layer_id, hatch_pattern,
-                        boundary_geometry, hatch_scale, hatch_angle,
-                        dxf_handle, quality_score, tags, attributes
-                    )
-                    VALUES (%s::uuid, %s::uuid, %s, ST_GeomFromText(%s, {self.srid}), %s, %s, %s, 0.5, '{{}}', %s)
-                """, (
-                    project_id, layer_id, pattern_name,
-                    geometry_wkt, scale, angle,
-                    dxf_handle, json.dumps(attributes)
-                ))
+                self._write_row(cur, 'drawing_hatches', {
+                    'project_id': project_id,
+                    'layer_id': layer_id,
+                    'hatch_pattern': pattern_name,
+                    'boundary_geometry': geometry_wkt,
+                    'hatch_scale': scale,
+                    'hatch_angle': angle,
+                    'dxf_handle': dxf_handle,
+                    'quality_score': 0.5,
+                    'tags': '{}',
+                    'attributes': json.dumps(attributes)
+                })
 
                 stats['hatches'] += 1
 
@@ -708,18 +856,20 @@ class DXFImporter:
         }
         
         try:
-            cur.execute(f"""
-                INSERT INTO block_inserts (
-                    project_id, layer_id, block_name, insertion_point,
-                    scale_x, scale_y, scale_z, rotation,
-                    dxf_handle, quality_score, tags, attributes
-                )
-                VALUES (%s::uuid, %s::uuid, %s, ST_GeomFromText(%s, {self.srid}), %s, %s, %s, %s, %s, 0.5, '{{}}', %s)
-            """, (
-                project_id, layer_id, block_name, geometry_wkt,
-                scale_x, scale_y, scale_z, rotation,
-                dxf_handle, json.dumps(attributes)
-            ))
+            self._write_row(cur, 'block_inserts', {
+                'project_id': project_id,
+                'layer_id': layer_id,
+                'block_name': block_name,
+                'insertion_point': geometry_wkt,
+                'scale_x': scale_x,
+                'scale_y': scale_y,
+                'scale_z': scale_z,
+                'rotation': rotation,
+                'dxf_handle': dxf_handle,
+                'quality_score': 0.5,
+                'tags': '{}',
+                'attributes': json.dumps(attributes)
+            })
             
             stats['blocks'] += 1
         except Exception as e:
@@ -746,19 +896,17 @@ class DXFImporter:
         
         geometry_wkt = f'POINT Z ({location.x} {location.y} {location.z})'
         
-        cur.execute(f"""
-            INSERT INTO drawing_entities (
-                project_id, entity_type, layer_id,
-                geometry, color_aci, lineweight, linetype, attributes
-            )
-            VALUES (%s::uuid, %s, %s, ST_GeomFromText(%s, {self.srid}), %s, %s, %s, %s)
-        """, (
-            project_id, 'POINT', layer_id,
-            geometry_wkt,
-            entity.dxf.color if hasattr(entity.dxf, 'color') else 256,
-            -1, 'ByLayer',
-            json.dumps({'layer_name': layer_name, 'dxf_handle': entity.dxf.handle})
-        ))
+        self._write_row(cur, 'drawing_entities', {
+            'project_id': project_id,
+            'entity_type': 'POINT',
+            'layer_id': layer_id,
+            'geometry': geometry_wkt,
+            'color_aci': entity.dxf.color if hasattr(entity.dxf, 'color') else 256,
+            'lineweight': -1,
+            'linetype': 'ByLayer',
+            'attributes': json.dumps({'layer_name': layer_name, 'dxf_handle': entity.dxf.handle,
+                                          'import_batch_id': self.import_batch_id})
+        })
         
         stats['points'] += 1
         cur.close()
@@ -820,19 +968,17 @@ class DXFImporter:
         geometry_wkt = f'POLYGON Z (({", ".join(points)}))'
         print(f"[IMPORT] WKT to DB: {geometry_wkt}")
         
-        cur.execute(f"""
-            INSERT INTO drawing_entities (
-                project_id, entity_type, layer_id,
-                geometry, color_aci, lineweight, linetype, attributes
-            )
-            VALUES (%s::uuid, %s, %s, ST_GeomFromText(%s, {self.srid}), %s, %s, %s, %s)
-        """, (
-            project_id, '3DFACE', layer_id,
-            geometry_wkt,
-            entity.dxf.color if hasattr(entity.dxf, 'color') else 256,
-            -1, 'ByLayer',
-            json.dumps({'layer_name': layer_name, 'dxf_handle': entity.dxf.handle})
-        ))
+        self._write_row(cur, 'drawing_entities', {
+            'project_id': project_id,
+            'entity_type': '3DFACE',
+            'layer_id': layer_id,
+            'geometry': geometry_wkt,
+            'color_aci': entity.dxf.color if hasattr(entity.dxf, 'color') else 256,
+            'lineweight': -1,
+            'linetype': 'ByLayer',
+            'attributes': json.dumps({'layer_name': layer_name, 'dxf_handle': entity.dxf.handle,
+                                          'import_batch_id': self.import_batch_id})
+        })
         
         stats['3dfaces'] += 1
         cur.close()
@@ -859,22 +1005,20 @@ class DXFImporter:
                 metadata = {'layer_name': layer_name, 'dxf_handle': entity.dxf.handle, 'attribs': dict(attribs)}
             else:
                 metadata = {'layer_name': layer_name, 'dxf_handle': entity.dxf.handle}
+            metadata['import_batch_id'] = self.import_batch_id
             
             geometry_wkt = 'POINT Z (0 0 0)'
             
-            cur.execute(f"""
-                INSERT INTO drawing_entities (
-                    project_id, entity_type, layer_id,
-                    geometry, color_aci, lineweight, linetype, attributes
-                )
-                VALUES (%s::uuid, %s, %s, ST_GeomFromText(%s, {self.srid}), %s, %s, %s, %s)
-            """, (
-                project_id, '3DSOLID', layer_id,
-                geometry_wkt,
-                entity.dxf.color if hasattr(entity.dxf, 'color') else 256,
-                -1, 'ByLayer',
-                json.dumps(metadata)
-            ))
+            self._write_row(cur, 'drawing_entities', {
+                'project_id': project_id,
+                'entity_type': '3DSOLID',
+                'layer_id': layer_id,
+                'geometry': geometry_wkt,
+                'color_aci': entity.dxf.color if hasattr(entity.dxf, 'color') else 256,
+                'lineweight': -1,
+                'linetype': 'ByLayer',
+                'attributes': json.dumps(metadata)
+            })
             
             stats['solids'] += 1
         except Exception as e:
@@ -911,19 +1055,17 @@ class DXFImporter:
             else:
                 geometry_wkt = 'POINT Z (0 0 0)'
             
-            cur.execute(f"""
-                INSERT INTO drawing_entities (
-                    project_id, entity_type, layer_id,
-                    geometry, color_aci, lineweight, linetype, attributes
-                )
-                VALUES (%s::uuid, %s, %s, ST_GeomFromText(%s, {self.srid}), %s, %s, %s, %s)
-            """, (
-                project_id, 'MESH', layer_id,
-                geometry_wkt,
-                entity.dxf.color if hasattr(entity.dxf, 'color') else 256,
-                -1, 'ByLayer',
-                json.dumps({'layer_name': layer_name, 'dxf_handle': entity.dxf.handle})
-            ))
+            self._write_row(cur, 'drawing_entities', {
+                'project_id': project_id,
+                'entity_type': 'MESH',
+                'layer_id': layer_id,
+                'geometry': geometry_wkt,
+                'color_aci': entity.dxf.color if hasattr(entity.dxf, 'color') else 256,
+                'lineweight': -1,
+                'linetype': 'ByLayer',
+                'attributes': json.dumps({'layer_name': layer_name, 'dxf_handle': entity.dxf.handle,
+                                          'import_batch_id': self.import_batch_id})
+            })
             
             stats['meshes'] += 1
         except Exception as e:
@@ -962,19 +1104,17 @@ class DXFImporter:
             else:
                 geometry_wkt = 'LINESTRING Z (0 0 0, 1 1 0)'
             
-            cur.execute(f"""
-                INSERT INTO drawing_entities (
-                    project_id, entity_type, layer_id,
-                    geometry, color_aci, lineweight, linetype, attributes
-                )
-                VALUES (%s::uuid, %s, %s, ST_GeomFromText(%s, {self.srid}), %s, %s, %s, %s)
-            """, (
-                project_id, 'LEADER', layer_id,
-                geometry_wkt,
-                entity.dxf.color if hasattr(entity.dxf, 'color') else 256,
-                -1, 'ByLayer',
-                json.dumps({'layer_name': layer_name, 'dxf_handle': entity.dxf.handle})
-            ))
+            self._write_row(cur, 'drawing_entities', {
+                'project_id': project_id,
+                'entity_type': 'LEADER',
+                'layer_id': layer_id,
+                'geometry': geometry_wkt,
+                'color_aci': entity.dxf.color if hasattr(entity.dxf, 'color') else 256,
+                'lineweight': -1,
+                'linetype': 'ByLayer',
+                'attributes': json.dumps({'layer_name': layer_name, 'dxf_handle': entity.dxf.handle,
+                                          'import_batch_id': self.import_batch_id})
+            })
             
             stats['leaders'] += 1
         except Exception as e:
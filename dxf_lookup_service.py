@@ -4,11 +4,65 @@ Resolves DXF string names (layers, linetypes, styles) to database UUIDs.
 """
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from typing import Dict, Optional
+from psycopg2.extras import RealDictCursor, execute_values
+from typing import Dict, Iterable, Optional, Tuple
+import threading
+import time
 import uuid
 
 
+# Names that never need a lookup (resolve to None)
+STANDARD_LINETYPES = ('ByLayer', 'ByBlock', 'Continuous')
+
+
+class LayerStandardsCache:
+    """
+    Process-wide, TTL-bounded snapshot of layer_standards (name -> layer_id).
+
+    layer_standards changes rarely but is consulted for every layer of every
+    import; sharing one snapshot per database lets consecutive imports in the
+    same worker process skip the lookup entirely. Snapshots are reloaded once
+    they are older than ttl_seconds.
+    """
+
+    def __init__(self, ttl_seconds: float = 300):
+        self.ttl_seconds = ttl_seconds
+        self._snapshots = {}  # database key -> (loaded_at, {layer_name: layer_id})
+        self._lock = threading.Lock()
+
+    def get_all(self, key: Tuple, cur) -> Dict[str, str]:
+        """
+        Return the layer_standards mapping for a database, loading it if stale.
+
+        Args:
+            key: Hashable identifier of the database
+            cur: Cursor used to (re)load the snapshot
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot and time.monotonic() - snapshot[0] < self.ttl_seconds:
+                return snapshot[1]
+
+        cur.execute("SELECT layer_id, layer_name FROM layer_standards")
+        mapping = {row['layer_name']: row['layer_id'] for row in cur.fetchall()}
+
+        with self._lock:
+            self._snapshots[key] = (time.monotonic(), mapping)
+        return mapping
+
+    def invalidate(self, key: Optional[Tuple] = None):
+        """Drop the snapshot for one database, or all snapshots."""
+        with self._lock:
+            if key is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(key, None)
+
+
+# Shared by every DXFLookupService in this process
+layer_standards_cache = LayerStandardsCache()
+
+
 class DXFLookupService:
     """
     Resolves DXF entity names to database foreign key IDs.
@@ -38,6 +92,159 @@ class DXFLookupService:
         else:
             return psycopg2.connect(**self.db_config), True  # Close when done
     
+    def _database_key(self) -> Tuple:
+        """Identify the target database for the shared layer_standards cache."""
+        return tuple(str(self.db_config.get(k)) for k in ('host', 'port', 'database', 'dbname'))
+    
+    def _get_layer_standard_id(self, cur, layer_name: str) -> Optional[str]:
+        """Resolve a layer standard ID through the shared layer_standards cache."""
+        standards = layer_standards_cache.get_all(self._database_key(), cur)
+        return standards.get(layer_name)
+    
+    def warm_up(self, project_id: str = None,
+                layers: Optional[Dict[str, Tuple[int, str]]] = None,
+                linetypes: Iterable[str] = (),
+                text_styles: Iterable[str] = (),
+                hatch_patterns: Iterable[str] = (),
+                dimension_styles: Iterable[str] = ()) -> Dict[str, int]:
+        """
+        Resolve a DXF's table names up front with one query per table.
+
+        Missing project layers are created with a single multi-row INSERT.
+        Afterwards the get_or_create_* methods answer these names from the
+        cache without touching the database.
+
+        Args:
+            project_id: UUID of the project (required to create layers)
+            layers: layer_name -> (color_aci, linetype) for creation defaults
+            linetypes: Linetype names
+            text_styles: Text style names
+            hatch_patterns: Hatch pattern names
+            dimension_styles: Dimension style names
+
+        Returns:
+            Dictionary with the number of names resolved per table and the
+            number of layers created
+        """
+        counts = {'layers': 0, 'layers_created': 0, 'linetypes': 0,
+                  'text_styles': 0, 'hatch_patterns': 0, 'dimension_styles': 0}
+
+        conn, should_close = self._get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+
+        try:
+            if layers:
+                counts['layers_created'] = self._warm_up_layers(cur, project_id, layers)
+                counts['layers'] = len(layers)
+
+            counts['linetypes'] = self._warm_up_names(
+                cur, self._linetype_cache, linetypes,
+                "SELECT linetype_id AS id, linetype_name AS name FROM linetypes "
+                "WHERE linetype_name = ANY(%s) AND is_active = true",
+                skip=lambda name: name in STANDARD_LINETYPES)
+            counts['text_styles'] = self._warm_up_names(
+                cur, self._textstyle_cache, text_styles,
+                "SELECT text_style_id AS id, style_name AS name FROM text_styles "
+                "WHERE style_name = ANY(%s)",
+                skip=lambda name: not name or name == 'Standard')
+            counts['hatch_patterns'] = self._warm_up_names(
+                cur, self._hatch_cache, hatch_patterns,
+                "SELECT hatch_id AS id, pattern_name AS name FROM hatch_patterns "
+                "WHERE pattern_name = ANY(%s)",
+                skip=lambda name: not name or name.upper() == 'SOLID')
+            counts['dimension_styles'] = self._warm_up_names(
+                cur, self._dimstyle_cache, dimension_styles,
+                "SELECT dimstyle_id AS id, dimstyle_name AS name FROM dimension_styles "
+                "WHERE dimstyle_name = ANY(%s)",
+                skip=lambda name: not name or name == 'Standard')
+
+            if counts['layers_created'] and not self.external_conn:
+                conn.commit()
+
+            return counts
+
+        finally:
+            cur.close()
+            if should_close:
+                conn.close()
+    
+    def _warm_up_layers(self, cur, project_id: Optional[str],
+                        layers: Dict[str, Tuple[int, str]]) -> int:
+        """Resolve and bulk-create project layers; returns the number created."""
+        names = [name for name in layers if f"{project_id}:{name}" not in self._layer_cache]
+        if not names:
+            return 0
+
+        standards = layer_standards_cache.get_all(self._database_key(), cur)
+
+        if project_id:
+            cur.execute("""
+                SELECT layer_id, layer_name
+                FROM layers
+                WHERE project_id = %s AND layer_name = ANY(%s)
+            """, (project_id, names))
+        else:
+            cur.execute("""
+                SELECT DISTINCT ON (layer_name) layer_id, layer_name
+                FROM layers
+                WHERE layer_name = ANY(%s)
+            """, (names,))
+        existing = {row['layer_name']: row['layer_id'] for row in cur.fetchall()}
+
+        missing = [name for name in names if name not in existing]
+        created = 0
+        if missing and project_id:
+            rows = [(str(uuid.uuid4()), project_id, name, standards.get(name),
+                     layers[name][0], layers[name][1]) for name in missing]
+            inserted = execute_values(cur, """
+                INSERT INTO layers (
+                    layer_id, project_id, layer_name, layer_standard_id,
+                    color, linetype, is_frozen, is_locked,
+                    quality_score, tags, attributes
+                )
+                VALUES %s
+                ON CONFLICT (project_id, layer_name) DO NOTHING
+                RETURNING layer_id, layer_name
+            """, rows, template="(%s::uuid, %s::uuid, %s, %s::uuid, %s, %s, "
+                                "false, false, 0.5, '{}', '{}')", fetch=True)
+            existing.update({row['layer_name']: row['layer_id'] for row in inserted})
+            created = len(inserted)
+
+            # Layers created concurrently by another import were skipped above
+            raced = [name for name in missing if name not in existing]
+            if raced:
+                cur.execute("""
+                    SELECT layer_id, layer_name
+                    FROM layers
+                    WHERE project_id = %s AND layer_name = ANY(%s)
+                """, (project_id, raced))
+                existing.update({row['layer_name']: row['layer_id'] for row in cur.fetchall()})
+
+        for name, layer_id in existing.items():
+            self._layer_cache[f"{project_id}:{name}"] = (layer_id, standards.get(name))
+
+        return created
+    
+    def _warm_up_names(self, cur, cache: Dict, names: Iterable[str],
+                       query: str, skip) -> int:
+        """Resolve names against one lookup table and cache hits and misses."""
+        pending = []
+        for name in dict.fromkeys(names):
+            if name in cache:
+                continue
+            if skip(name):
+                cache[name] = None
+            else:
+                pending.append(name)
+
+        if pending:
+            cur.execute(query, (pending,))
+            found = {row['name']: row['id'] for row in cur.fetchall()}
+            for name in pending:
+                cache[name] = found.get(name)
+
+        return len(pending)
+    
     def get_or_create_layer(self, layer_name: str, project_id: str = None,
                            color_aci: int = 7, linetype: str = 'Continuous') -> tuple:
         """
@@ -62,15 +269,7 @@ class DXFLookupService:
         
         try:
             # First, check if layer exists in layer_standards
-            cur.execute("""
-                SELECT layer_id, layer_name
-                FROM layer_standards
-                WHERE layer_name = %s
-                LIMIT 1
-            """, (layer_name,))
-            
-            layer_standard = cur.fetchone()
-            layer_standard_id = layer_standard['layer_id'] if layer_standard else None
+            layer_standard_id = self._get_layer_standard_id(cur, layer_name)
 
             # Check if layer exists in layers table (project-level only)
             if project_id:
@@ -137,7 +336,7 @@ class DXFLookupService:
             return self._linetype_cache[linetype_name]
         
         # Standard linetypes don't need lookup
-        if linetype_name in ['ByLayer', 'ByBlock', 'Continuous']:
+        if linetype_name in STANDARD_LINETYPES:
             self._linetype_cache[linetype_name] = None
             return None
         
@@ -333,7 +532,7 @@ class DXFLookupService:
         pass
     
     def clear_cache(self):
-        """Clear all cached lookups."""
+        """Clear all cached lookups (the shared layer_standards cache is kept)."""
         self._layer_cache.clear()
         self._linetype_cache.clear()
         self._textstyle_cache.clear()
@@ -0,0 +1,134 @@
+"""
+DXF Stream Reader Module
+Reads very large DXF files without loading the whole document into memory.
+
+Layer and linetype table records are read from the TABLES section with the
+low-level tag loader, and modelspace entities are streamed with ezdxf's
+iterdxf add-on in fixed-size chunks. Peak memory is bounded by the chunk
+size rather than the file size.
+"""
+
+import os
+from types import SimpleNamespace
+from typing import Iterator, List, Optional
+
+from ezdxf.addons import iterdxf
+from ezdxf.filemanagement import dxf_file_info
+from ezdxf.lldxf.tagger import ascii_tags_loader
+from ezdxf.lldxf.validator import is_binary_dxf_file
+
+
+class DXFStreamReader:
+    """
+    Streaming access to a DXF file's table records and modelspace entities.
+
+    Streamed entities are regular ezdxf entities without a document, so the
+    DXFImporter conversion code works on them unchanged. Entity types not
+    supported by iterdxf (e.g. 3DSOLID, BODY) are not yielded.
+    """
+
+    def __init__(self, file_path: str, chunk_size: int = 5000):
+        """
+        Initialize the reader.
+
+        Args:
+            file_path: Path to an ASCII DXF file
+            chunk_size: Number of modelspace entities per yielded chunk
+        """
+        self.file_path = file_path
+        self.chunk_size = max(1, int(chunk_size))
+        self.file_size = os.path.getsize(file_path)
+        self._iter_doc = None
+        self._started = False
+
+    def read_tables(self) -> SimpleNamespace:
+        """
+        Read LAYER and LTYPE table records from the TABLES section.
+
+        Returns:
+            Namespace with ``layers`` and ``linetypes`` lists whose items expose
+            ``.dxf.name`` (and ``.dxf.color`` / ``.dxf.linetype`` for layers),
+            so they can be passed where an ezdxf document's tables are expected.
+        """
+        if is_binary_dxf_file(self.file_path):
+            raise ValueError("Streaming import supports ASCII DXF files only")
+
+        encoding = dxf_file_info(self.file_path).encoding
+        layers, linetypes = [], []
+        section = None
+        record = None
+
+        with open(self.file_path, 'rt', encoding=encoding, errors='surrogateescape') as stream:
+            previous = None
+            for tag in ascii_tags_loader(stream):
+                code, value = tag.code, tag.value
+
+                if previous == (0, 'SECTION') and code == 2:
+                    section = value
+                previous = (code, value)
+
+                if section != 'TABLES':
+                    if section in ('BLOCKS', 'ENTITIES', 'OBJECTS'):
+                        break
+                    continue
+
+                if code == 0:
+                    record = None
+                    if value == 'LAYER':
+                        record = {'name': None, 'color': 7, 'linetype': 'Continuous'}
+                        layers.append(record)
+                    elif value == 'LTYPE':
+                        record = {'name': None}
+                        linetypes.append(record)
+                    elif value == 'ENDSEC':
+                        break
+                elif record is not None:
+                    if code == 2:
+                        record['name'] = value
+                    elif code == 62 and 'color' in record:
+                        record['color'] = int(value)
+                    elif code == 6 and 'linetype' in record:
+                        record['linetype'] = value
+
+        def as_table_entry(values):
+            return SimpleNamespace(dxf=SimpleNamespace(**values))
+
+        return SimpleNamespace(
+            layers=[as_table_entry(r) for r in layers if r['name']],
+            linetypes=[as_table_entry(r) for r in linetypes if r['name']]
+        )
+
+    def iter_chunks(self, types: Optional[List[str]] = None) -> Iterator[List]:
+        """
+        Yield modelspace entities in lists of at most ``chunk_size`` entities.
+
+        Args:
+            types: Optional DXF types to restrict the stream to
+        """
+        self._iter_doc = iterdxf.opendxf(self.file_path)
+        self._started = True
+        try:
+            chunk = []
+            for entity in self._iter_doc.modelspace(types=types):
+                chunk.append(entity)
+                if len(chunk) >= self.chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+        finally:
+            self.close()
+
+    def progress(self) -> float:
+        """Fraction (0.0-1.0) of the file consumed by the entity stream so far."""
+        if self._iter_doc is None:
+            return 1.0 if self._started else 0.0
+        if not self.file_size:
+            return 0.0
+        return min(1.0, self._iter_doc.file.tell() / self.file_size)
+
+    def close(self):
+        """Close the underlying file handle."""
+        if self._iter_doc is not None:
+            self._iter_doc.close()
+            self._iter_doc = None
@@ -6,7 +6,6 @@ Creates database objects from DXF entities based on layer classification.
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from typing import Dict, Optional, Tuple
-import hashlib
 import json
 import sys
 import os
@@ -21,6 +20,8 @@ except ImportError:
 
 # Import DXFLookupService for layer management
 from dxf_lookup_service import DXFLookupService
+from dxf_geometry import geometry_hash
+from services.spatial_proximity_service import spatial_proximity_service
 
 
 class IntelligentObjectCreator:
@@ -853,7 +854,7 @@ class IntelligentObjectCreator:
         
         cur = self.conn.cursor()
 
-        geometry_hash = hashlib.sha256(geometry_wkt.encode()).hexdigest() if geometry_wkt else None
+        geom_hash = geometry_hash(geometry_wkt)
 
         # Project-level import (no drawing_id)
         # Use project_id + dxf_handle combination to track entity links
@@ -874,7 +875,7 @@ class IntelligentObjectCreator:
                 updated_at = CURRENT_TIMESTAMP
         """, (
             project_id, dxf_handle, entity_type, layer_name,
-            geometry_hash, table_name, object_id
+            geom_hash, table_name, object_id
         ))
         
         cur.close()
@@ -1084,50 +1085,19 @@ class IntelligentObjectCreator:
             return {}
 
         try:
-            cur = self.conn.cursor(cursor_factory=RealDictCursor)
-
-            # Count nearby utility lines
-            cur.execute("""
-                SELECT COUNT(*) as count
-                FROM utility_lines
-                WHERE project_id = %s
-                AND ST_DWithin(
-                    geometry::geography,
-                    ST_GeomFromText(%s, 2226)::geography,
-                    %s
-                )
-            """, (project_id, geometry_wkt, radius_ft * 0.3048))  # Convert ft to meters
-            nearby_lines = cur.fetchone()['count']
-
-            # Count nearby structures
-            cur.execute("""
-                SELECT COUNT(*) as count
-                FROM utility_structures
-                WHERE project_id = %s
-                AND ST_DWithin(
-                    rim_geometry::geography,
-                    ST_GeomFromText(%s, 2226)::geography,
-                    %s
-                )
-            """, (project_id, geometry_wkt, radius_ft * 0.3048))
-            nearby_structures = cur.fetchone()['count']
-
-            # Find distance to nearest pipe
-            cur.execute("""
-                SELECT ST_Distance(
-                    geometry::geography,
-                    ST_GeomFromText(%s, 2226)::geography
-                ) as distance
-                FROM utility_lines
-                WHERE project_id = %s
-                ORDER BY geometry::geography <-> ST_GeomFromText(%s, 2226)::geography
-                LIMIT 1
-            """, (geometry_wkt, project_id, geometry_wkt))
-
-            nearest = cur.fetchone()
-            distance_to_nearest = nearest['distance'] if nearest else None
+            # Counts and nearest pipe via GiST-indexed ST_DWithin / KNN on each
+            # table's own geometry column, read through this import's connection
+            counts = spatial_proximity_service.count_nearby(
+                geometry_wkt, 2226, radius_ft, project_id,
+                entity_types=['utility_line', 'utility_structure'], conn=self.conn
+            )
+            nearby_lines = counts.get('utility_line', 0)
+            nearby_structures = counts.get('utility_structure', 0)
 
-            cur.close()
+            nearest = spatial_proximity_service.nearest(
+                geometry_wkt, 2226, ['utility_line'], project_id, conn=self.conn
+            )
+            distance_to_nearest = nearest['distance_ft'] / 3.28084 if nearest else None
 
             return {
                 'nearby_utility_lines': nearby_lines,
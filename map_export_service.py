@@ -1,12 +1,14 @@
 """
 Map Export Service
-Handles geospatial data export in multiple formats (DXF, SHP, PNG)
+Handles geospatial data export in multiple formats (DXF, SHP, KML, PNG,
+GeoPackage, FlatGeobuf)
 """
 
 import os
+import time
 import uuid
-import zipfile
 import json
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from io import BytesIO
@@ -27,6 +29,11 @@ from psycopg2.extras import RealDictCursor
 import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from services.coordinate_system_service import CoordinateSystemService
+from services.map_export_engine import (
+    EXPORT_FORMATS, FORMAT_WRITERS, ExportFeature, MapExportEngine, PngWriter,
+    add_kml_geometry, iter_drawing_entities
+)
+from tools.db_utils import get_connection, get_cursor
 
 
 class MapExportService:
@@ -474,202 +481,38 @@ class MapExportService:
     
     def _add_kml_geometry(self, placemark, geom):
         """Add geometry to KML placemark"""
-        import xml.etree.ElementTree as ET
-        
-        if geom.geom_type == 'Point':
-            point = ET.SubElement(placemark, 'Point')
-            ET.SubElement(point, 'coordinates').text = f'{geom.x},{geom.y},0'
-        
-        elif geom.geom_type == 'MultiPoint':
-            for pt in geom.geoms:
-                point = ET.SubElement(placemark, 'Point')
-                ET.SubElement(point, 'coordinates').text = f'{pt.x},{pt.y},0'
-        
-        elif geom.geom_type == 'LineString':
-            linestring = ET.SubElement(placemark, 'LineString')
-            coords = ' '.join([f'{x},{y},0' for x, y in geom.coords])
-            ET.SubElement(linestring, 'coordinates').text = coords
-        
-        elif geom.geom_type == 'MultiLineString':
-            multigeom = ET.SubElement(placemark, 'MultiGeometry')
-            for line in geom.geoms:
-                linestring = ET.SubElement(multigeom, 'LineString')
-                coords = ' '.join([f'{x},{y},0' for x, y in line.coords])
-                ET.SubElement(linestring, 'coordinates').text = coords
-        
-        elif geom.geom_type == 'Polygon':
-            polygon = ET.SubElement(placemark, 'Polygon')
-            outer = ET.SubElement(polygon, 'outerBoundaryIs')
-            linear_ring = ET.SubElement(outer, 'LinearRing')
-            coords = ' '.join([f'{x},{y},0' for x, y in geom.exterior.coords])
-            ET.SubElement(linear_ring, 'coordinates').text = coords
-        
-        elif geom.geom_type == 'MultiPolygon':
-            multigeom = ET.SubElement(placemark, 'MultiGeometry')
-            for poly in geom.geoms:
-                polygon = ET.SubElement(multigeom, 'Polygon')
-                outer = ET.SubElement(polygon, 'outerBoundaryIs')
-                linear_ring = ET.SubElement(outer, 'LinearRing')
-                coords = ' '.join([f'{x},{y},0' for x, y in poly.exterior.coords])
-                ET.SubElement(linear_ring, 'coordinates').text = coords
-    
+        add_kml_geometry(placemark, geom)
+
+    # Layer colors of map images, assigned in order of first appearance
+    MAP_LAYER_COLORS = [
+        '#FF0000',  # Red
+        '#0000FF',  # Blue
+        '#00AA00',  # Green
+        '#FF8800',  # Orange
+        '#AA00AA',  # Purple
+        '#00AAAA',  # Cyan
+        '#AA5500',  # Brown
+        '#FF00FF',  # Magenta
+        '#808000',  # Olive
+        '#008080',  # Teal
+    ]
+
     def create_map_image(self, bbox: Dict, layers_data: Dict[str, List[Dict]] = None,
                         width: int = 1200, height: int = 900,
                         north_arrow: bool = True, scale_bar: bool = True) -> Optional[str]:
         """Create a map image with rendered features, legend, scale bar, and north arrow"""
         try:
-            # Create blank image with white background
-            img = Image.new('RGB', (width, height), color='#FFFFFF')
-            draw = ImageDraw.Draw(img)
-
-            # Load fonts
-            try:
-                title_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 20)
-                legend_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 12)
-                small_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 10)
-            except:
-                title_font = ImageFont.load_default()
-                legend_font = ImageFont.load_default()
-                small_font = ImageFont.load_default()
-
-            # Define map area (leave space for legend on right)
-            legend_width = 250
-            map_left = 20
-            map_top = 60
-            map_right = width - legend_width - 30
-            map_bottom = height - 100
-            map_width = map_right - map_left
-            map_height = map_bottom - map_top
-
-            # Draw map area border
-            draw.rectangle([(map_left, map_top), (map_right, map_bottom)],
-                          outline='#333333', width=2, fill='#F8F8F8')
-
-            # Add title
-            draw.text((width//2, 25), "Map Export", fill='#000000', font=title_font, anchor='mm')
+            canvas = self.begin_map_image(bbox, width, height)
 
             # Render features if provided
-            if layers_data and len(layers_data) > 0:
-                # Assign colors to layers (using a palette)
-                color_palette = [
-                    '#FF0000',  # Red
-                    '#0000FF',  # Blue
-                    '#00AA00',  # Green
-                    '#FF8800',  # Orange
-                    '#AA00AA',  # Purple
-                    '#00AAAA',  # Cyan
-                    '#AA5500',  # Brown
-                    '#FF00FF',  # Magenta
-                    '#808000',  # Olive
-                    '#008080',  # Teal
-                ]
-
-                layer_colors = {}
-                for idx, layer_name in enumerate(layers_data.keys()):
-                    layer_colors[layer_name] = color_palette[idx % len(color_palette)]
-
-                # Calculate coordinate transformation
-                bbox_width = bbox['maxx'] - bbox['minx']
-                bbox_height = bbox['maxy'] - bbox['miny']
-
-                if bbox_width == 0 or bbox_height == 0:
-                    print("Warning: Invalid bbox dimensions")
-                else:
-                    # Scale to fit map area (with padding)
-                    scale_x = map_width / bbox_width
-                    scale_y = map_height / bbox_height
-                    scale = min(scale_x, scale_y) * 0.95  # 95% to add padding
-
-                    # Center the content
-                    offset_x = map_left + (map_width - bbox_width * scale) / 2
-                    offset_y = map_top + (map_height - bbox_height * scale) / 2
-
-                    def transform_point(x, y):
-                        """Transform real-world coordinates to image pixels"""
-                        px = offset_x + (x - bbox['minx']) * scale
-                        # Flip Y axis (image Y increases downward, map Y increases upward)
-                        py = map_bottom - offset_y - (y - bbox['miny']) * scale
-                        return (int(px), int(py))
-
-                    # Draw features layer by layer
-                    for layer_name, features in layers_data.items():
-                        color = layer_colors.get(layer_name, '#000000')
-
-                        for feature in features:
-                            try:
-                                geom = shape(feature['geometry'])
-
-                                if geom.geom_type == 'Polygon':
-                                    coords = [transform_point(x, y) for x, y in geom.exterior.coords]
-                                    if len(coords) > 2:
-                                        draw.polygon(coords, outline=color, fill=None, width=2)
-
-                                elif geom.geom_type == 'MultiPolygon':
-                                    for poly in geom.geoms:
-                                        coords = [transform_point(x, y) for x, y in poly.exterior.coords]
-                                        if len(coords) > 2:
-                                            draw.polygon(coords, outline=color, fill=None, width=2)
-
-                                elif geom.geom_type == 'LineString':
-                                    coords = [transform_point(x, y) for x, y in geom.coords]
-                                    if len(coords) > 1:
-                                        draw.line(coords, fill=color, width=2)
-
-                                elif geom.geom_type == 'MultiLineString':
-                                    for line in geom.geoms:
-                                        coords = [transform_point(x, y) for x, y in line.coords]
-                                        if len(coords) > 1:
-                                            draw.line(coords, fill=color, width=2)
-
-                                elif geom.geom_type == 'Point':
-                                    px, py = transform_point(geom.x, geom.y)
-                                    # Draw point as small circle
-                                    r = 4
-                                    draw.ellipse([(px-r, py-r), (px+r, py+r)], fill=color, outline=color)
-
-                                elif geom.geom_type == 'MultiPoint':
-                                    for point in geom.geoms:
-                                        px, py = transform_point(point.x, point.y)
-                                        r = 4
-                                        draw.ellipse([(px-r, py-r), (px+r, py+r)], fill=color, outline=color)
-
-                            except Exception as e:
-                                print(f"Error rendering feature: {e}")
-                                continue
-
-                # Draw legend
-                legend_x = map_right + 20
-                legend_y = map_top
-                draw.rectangle([(legend_x, legend_y), (legend_x + legend_width - 10, legend_y + 40 + len(layer_colors) * 25)],
-                              outline='#333333', fill='#FFFFFF', width=2)
-
-                draw.text((legend_x + 10, legend_y + 10), "LEGEND", fill='#000000', font=title_font)
-
-                y_offset = legend_y + 40
-                for layer_name, color in layer_colors.items():
-                    # Draw color box
-                    draw.rectangle([(legend_x + 10, y_offset), (legend_x + 25, y_offset + 12)],
-                                  fill=color, outline='#000000', width=1)
-                    # Draw layer name (truncate if too long)
-                    display_name = layer_name[:25] + '...' if len(layer_name) > 25 else layer_name
-                    draw.text((legend_x + 30, y_offset), display_name, fill='#000000', font=legend_font)
-                    y_offset += 25
-
-            # Add north arrow if requested
-            if north_arrow:
-                self._draw_north_arrow(draw, width - 140, height - 150)
-
-            # Add scale bar if requested
-            if scale_bar:
-                self._draw_scale_bar(draw, map_left + 20, map_bottom + 30, bbox, map_width)
-
-            # Add watermark
-            draw.text((width - 20, height - 20), "ACAD-GIS Map Viewer",
-                     fill='#999999', font=small_font, anchor='rb')
+            for layer_name, features in (layers_data or {}).items():
+                self._map_layer_color(canvas, layer_name)
+                for feature in features:
+                    self.draw_map_feature(canvas, layer_name, feature['geometry'])
 
             # Save to temp file
             temp_path = os.path.join(self.export_dir, f"map_{uuid.uuid4().hex}.png")
-            img.save(temp_path, 'PNG')
+            self.finish_map_image(canvas, temp_path, north_arrow=north_arrow, scale_bar=scale_bar)
             print(f"PNG map image created: {temp_path}")
             return temp_path
 
@@ -678,6 +521,184 @@ class MapExportService:
             import traceback
             traceback.print_exc()
             return None
+
+    def begin_map_image(self, bbox: Dict, width: int = 1200, height: int = 900) -> Dict:
+        """
+        Start a map image: blank frame and title, ready for draw_map_feature().
+
+        Args:
+            bbox: Dict with minx, miny, maxx, maxy in the CRS of the features
+
+        Returns:
+            Canvas state passed to draw_map_feature() and finish_map_image()
+        """
+        # Create blank image with white background
+        img = Image.new('RGB', (width, height), color='#FFFFFF')
+        draw = ImageDraw.Draw(img)
+
+        # Load fonts
+        try:
+            title_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 20)
+            legend_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 12)
+            small_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 10)
+        except:
+            title_font = ImageFont.load_default()
+            legend_font = ImageFont.load_default()
+            small_font = ImageFont.load_default()
+
+        # Define map area (leave space for legend on right)
+        legend_width = 250
+        map_left = 20
+        map_top = 60
+        map_right = width - legend_width - 30
+        map_bottom = height - 100
+        map_width = map_right - map_left
+        map_height = map_bottom - map_top
+
+        # Draw map area border
+        draw.rectangle([(map_left, map_top), (map_right, map_bottom)],
+                      outline='#333333', width=2, fill='#F8F8F8')
+
+        # Add title
+        draw.text((width//2, 25), "Map Export", fill='#000000', font=title_font, anchor='mm')
+
+        canvas = {
+            'img': img, 'draw': draw, 'bbox': bbox, 'width': width, 'height': height,
+            'fonts': (title_font, legend_font, small_font),
+            'legend_width': legend_width,
+            'map_box': (map_left, map_top, map_right, map_bottom),
+            'layer_colors': {},
+            'scale': None,
+        }
+
+        # Calculate coordinate transformation
+        bbox_width = bbox['maxx'] - bbox['minx']
+        bbox_height = bbox['maxy'] - bbox['miny']
+
+        if bbox_width == 0 or bbox_height == 0:
+            print("Warning: Invalid bbox dimensions")
+        else:
+            # Scale to fit map area (with padding)
+            scale_x = map_width / bbox_width
+            scale_y = map_height / bbox_height
+            scale = min(scale_x, scale_y) * 0.95  # 95% to add padding
+
+            # Center the content
+            canvas['scale'] = scale
+            canvas['offset_x'] = map_left + (map_width - bbox_width * scale) / 2
+            canvas['offset_y'] = map_top + (map_height - bbox_height * scale) / 2
+
+        return canvas
+
+    def _map_layer_color(self, canvas: Dict, layer_name: str) -> str:
+        layer_colors = canvas['layer_colors']
+        if layer_name not in layer_colors:
+            layer_colors[layer_name] = self.MAP_LAYER_COLORS[len(layer_colors) % len(self.MAP_LAYER_COLORS)]
+        return layer_colors[layer_name]
+
+    def draw_map_feature(self, canvas: Dict, layer_name: str, geometry: Dict) -> None:
+        """Draw one GeoJSON geometry on a map image in its layer's color"""
+        color = self._map_layer_color(canvas, layer_name)
+        if canvas['scale'] is None:
+            return
+
+        draw = canvas['draw']
+        bbox = canvas['bbox']
+        scale = canvas['scale']
+        offset_x = canvas['offset_x']
+        offset_y = canvas['offset_y']
+        map_bottom = canvas['map_box'][3]
+
+        def transform_point(x, y):
+            """Transform real-world coordinates to image pixels"""
+            px = offset_x + (x - bbox['minx']) * scale
+            # Flip Y axis (image Y increases downward, map Y increases upward)
+            py = map_bottom - offset_y - (y - bbox['miny']) * scale
+            return (int(px), int(py))
+
+        try:
+            geom = shape(geometry)
+
+            if geom.geom_type == 'Polygon':
+                coords = [transform_point(c[0], c[1]) for c in geom.exterior.coords]
+                if len(coords) > 2:
+                    draw.polygon(coords, outline=color, fill=None, width=2)
+
+            elif geom.geom_type == 'MultiPolygon':
+                for poly in geom.geoms:
+                    coords = [transform_point(c[0], c[1]) for c in poly.exterior.coords]
+                    if len(coords) > 2:
+                        draw.polygon(coords, outline=color, fill=None, width=2)
+
+            elif geom.geom_type == 'LineString':
+                coords = [transform_point(c[0], c[1]) for c in geom.coords]
+                if len(coords) > 1:
+                    draw.line(coords, fill=color, width=2)
+
+            elif geom.geom_type == 'MultiLineString':
+                for line in geom.geoms:
+                    coords = [transform_point(c[0], c[1]) for c in line.coords]
+                    if len(coords) > 1:
+                        draw.line(coords, fill=color, width=2)
+
+            elif geom.geom_type == 'Point':
+                px, py = transform_point(geom.x, geom.y)
+                # Draw point as small circle
+                r = 4
+                draw.ellipse([(px-r, py-r), (px+r, py+r)], fill=color, outline=color)
+
+            elif geom.geom_type == 'MultiPoint':
+                for point in geom.geoms:
+                    px, py = transform_point(point.x, point.y)
+                    r = 4
+                    draw.ellipse([(px-r, py-r), (px+r, py+r)], fill=color, outline=color)
+
+        except Exception as e:
+            print(f"Error rendering feature: {e}")
+
+    def finish_map_image(self, canvas: Dict, output_path: str,
+                         north_arrow: bool = True, scale_bar: bool = True) -> str:
+        """Draw legend, north arrow, scale bar and watermark and save the image as PNG"""
+        draw = canvas['draw']
+        bbox = canvas['bbox']
+        width, height = canvas['width'], canvas['height']
+        title_font, legend_font, small_font = canvas['fonts']
+        map_left, map_top, map_right, map_bottom = canvas['map_box']
+        layer_colors = canvas['layer_colors']
+
+        if layer_colors:
+            # Draw legend
+            legend_x = map_right + 20
+            legend_y = map_top
+            draw.rectangle([(legend_x, legend_y), (legend_x + canvas['legend_width'] - 10, legend_y + 40 + len(layer_colors) * 25)],
+                          outline='#333333', fill='#FFFFFF', width=2)
+
+            draw.text((legend_x + 10, legend_y + 10), "LEGEND", fill='#000000', font=title_font)
+
+            y_offset = legend_y + 40
+            for layer_name, color in layer_colors.items():
+                # Draw color box
+                draw.rectangle([(legend_x + 10, y_offset), (legend_x + 25, y_offset + 12)],
+                              fill=color, outline='#000000', width=1)
+                # Draw layer name (truncate if too long)
+                display_name = layer_name[:25] + '...' if len(layer_name) > 25 else layer_name
+                draw.text((legend_x + 30, y_offset), display_name, fill='#000000', font=legend_font)
+                y_offset += 25
+
+        # Add north arrow if requested
+        if north_arrow:
+            self._draw_north_arrow(draw, width - 140, height - 150)
+
+        # Add scale bar if requested
+        if scale_bar:
+            self._draw_scale_bar(draw, map_left + 20, map_bottom + 30, bbox, map_right - map_left)
+
+        # Add watermark
+        draw.text((width - 20, height - 20), "ACAD-GIS Map Viewer",
+                 fill='#999999', font=small_font, anchor='rb')
+
+        canvas['img'].save(output_path, 'PNG')
+        return output_path
     
     def _draw_north_arrow(self, draw, x: int, y: int):
         """Draw a professional compass rose north arrow"""
@@ -810,18 +831,26 @@ class MapExportService:
         draw.text((x + bar_length_px//2, y+bar_height//2+12), label, 
                  fill='#000000', font=scale_font, anchor='mm')
     
-    def create_export_package(self, job_id: str, params: Dict, project_id: Optional[str] = None) -> Dict:
+    def create_export_package(self, job_id: str, params: Dict, project_id: Optional[str] = None,
+                              progress_callback=None) -> Dict:
         """
         Main export function - creates export package with selected formats.
 
+        Features are streamed once from the database (and requested
+        FeatureServer layers) to all format writers running in parallel,
+        see services/map_export_engine.py.
+
         Args:
             job_id: Unique job identifier
             params: Export parameters including bbox, layers, formats, etc.
             project_id: Optional project ID to determine target CRS (if None, defaults to EPSG:2226)
+            progress_callback: Optional callable receiving {'features': n} as features are written
 
         Returns:
-            dict with status, download_url, file_size_mb, or error
+            dict with status, download_url, file_size_mb, feature_count and
+            format_timings, or error_message
         """
+        started = time.perf_counter()
         try:
             # Create job directory
             job_dir = os.path.join(self.export_dir, str(job_id))
@@ -844,133 +873,236 @@ class MapExportService:
                 target_srid = 2226
                 print("No project_id provided or CRS service unavailable, defaulting to EPSG:2226")
 
-            # Transform bounding box to target CRS
+            # Transform bounding box to target CRS (and WGS84 for FeatureServer queries)
             source_crs = params['bbox'].get('crs', 'EPSG:3857')
             bbox_transformed = self.transform_bbox(params['bbox'], source_crs, target_epsg)
+            bbox_wgs84 = self.transform_bbox(params['bbox'], source_crs, 'EPSG:4326')
 
-            # Storage for all layer data
-            all_layers_data = {}
+            formats = [fmt for fmt in params.get('formats', ['shp']) if fmt in EXPORT_FORMATS]
+            if not formats:
+                raise ValueError(f"No supported export format requested (supported: {', '.join(EXPORT_FORMATS)})")
+            wgs84 = 'kml' in formats
 
-            # PRIORITY 1: Fetch drawing entities from database (DXF-imported layers)
-            print("Fetching drawing entities from database...")
-            drawing_layers = self.fetch_drawing_entities_by_layer(
-                bbox_transformed,
-                project_id=project_id,
-                srid=target_srid
-            )
-            if drawing_layers:
-                print(f"Found {len(drawing_layers)} drawing layers: {list(drawing_layers.keys())}")
-                all_layers_data.update(drawing_layers)
-
-            # PRIORITY 2: Fetch external WFS layers if requested
-            for layer_id in params.get('layers', []):
-                if layer_id not in all_layers_data:  # Don't override drawing layers
-                    # External WFS layer - use placeholder for now
-                    layer_config = {
-                        'name': layer_id.title(),
-                        'url': 'https://gis.sonomacounty.ca.gov/geoserver/wfs',
-                        'layer_name': layer_id
-                    }
+            writers = {}
+            try:
+                for fmt in formats:
+                    if fmt == 'png':
+                        png_opts = params.get('png_options', {})
+                        writers[fmt] = PngWriter(
+                            job_dir, target_srid, self,
+                            bbox=dict(zip(('minx', 'miny', 'maxx', 'maxy'), bbox_transformed)),
+                            north_arrow=png_opts.get('north_arrow', True),
+                            scale_bar=png_opts.get('scale_bar', True)
+                        )
+                    else:
+                        writers[fmt] = FORMAT_WRITERS[fmt](job_dir, target_srid)
+            except Exception:
+                for writer in writers.values():
+                    writer.abort()
+                raise
+
+            def features(conn):
+                # PRIORITY 1: Drawing entities from database (DXF-imported layers)
+                drawing_layers = set()
+                for feature in iter_drawing_entities(conn, bbox_transformed, target_srid, target_srid,
+                                                     project_id=project_id, wgs84=wgs84):
+                    drawing_layers.add(feature.layer)
+                    yield feature
+                # PRIORITY 2: Requested external FeatureServer layers
+                for layer_config in self.fetch_gis_layer_configs(conn, params.get('layers', [])):
+                    if layer_config['id'] not in drawing_layers:  # Don't override drawing layers
+                        yield from self.iter_feature_server_layer(layer_config, bbox_wgs84,
+                                                                  target_epsg, wgs84=wgs84)
 
-                    # For MVP, create sample data for external layers
-                    all_layers_data[layer_id] = self._create_sample_features(bbox_transformed, layer_id)
-
-            # Export to requested formats
-            exported_files = []
-
-            if 'shp' in params.get('formats', []):
-                for layer_id, features in all_layers_data.items():
-                    shp_path = os.path.join(job_dir, f"{layer_id}.shp")
-                    if self.export_to_shapefile(features, layer_id, shp_path, epsg_code=target_srid):
-                        exported_files.extend([
-                            f"{layer_id}.shp",
-                            f"{layer_id}.shx",
-                            f"{layer_id}.dbf",
-                            f"{layer_id}.prj"
-                        ])
-            
-            if 'dxf' in params.get('formats', []):
-                dxf_path = os.path.join(job_dir, "export.dxf")
-                if self.export_to_dxf(all_layers_data, dxf_path):
-                    exported_files.append("export.dxf")
-
-            if 'kml' in params.get('formats', []):
-                kml_path = os.path.join(job_dir, "export.kml")
-                if self.export_to_kml(all_layers_data, kml_path, source_epsg=target_epsg):
-                    exported_files.append("export.kml")
-
-            if 'png' in params.get('formats', []):
-                png_opts = params.get('png_options', {})
-                png_path = self.create_map_image(
-                    params['bbox'],
-                    north_arrow=png_opts.get('north_arrow', True),
-                    scale_bar=png_opts.get('scale_bar', True)
-                )
-                if png_path:
-                    # Move to job dir
-                    import shutil
-                    dest = os.path.join(job_dir, "map.png")
-                    shutil.move(png_path, dest)
-                    exported_files.append("map.png")
-            
-            # Create zip archive
             zip_path = os.path.join(job_dir, "export.zip")
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for filename in exported_files:
-                    file_path = os.path.join(job_dir, filename)
-                    if os.path.exists(file_path):
-                        zipf.write(file_path, filename)
-            
+            connection = nullcontext(self.db_conn) if self.db_conn is not None else get_connection()
+            with connection as conn:
+                summary = MapExportEngine().run(features(conn), writers, zip_path,
+                                                progress_callback=progress_callback)
+
+            timings = summary['timings']
+            timings['total'] = {'seconds': round(time.perf_counter() - started, 3)}
+            errors = [f"{fmt}: {timings[fmt]['error']}" for fmt in formats if timings[fmt]['error']]
+            if len(errors) == len(formats):
+                return {
+                    'status': 'failed',
+                    'error_message': '; '.join(errors),
+                    'feature_count': summary['feature_count'],
+                    'format_timings': timings
+                }
+
             # Calculate file size
             file_size_mb = os.path.getsize(zip_path) / (1024 * 1024)
-            
+
             return {
                 'status': 'complete',
                 'download_url': f'/api/map-export/download/{job_id}/export.zip',
                 'file_size_mb': round(file_size_mb, 2),
-                'expires_at': (datetime.now() + timedelta(hours=1)).isoformat()
+                'expires_at': (datetime.now() + timedelta(hours=1)).isoformat(),
+                'feature_count': summary['feature_count'],
+                'format_timings': timings,
+                'error_message': '; '.join(errors) or None
             }
-            
+
         except Exception as e:
             return {
                 'status': 'failed',
                 'error_message': str(e)
             }
-    
-    def _create_sample_features(self, bbox: Tuple, layer_type: str) -> List[Dict]:
+
+    def fetch_gis_layer_configs(self, conn, layer_ids: List[str]) -> List[Dict]:
+        """Enabled gis_layers rows for the requested layer ids"""
+        if not layer_ids:
+            return []
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT * FROM gis_layers WHERE enabled = true AND id = ANY(%s)", (list(layer_ids),))
+            return cur.fetchall()
+
+    def iter_feature_server_layer(self, layer_config: Dict, bbox_wgs84: Tuple, target_epsg: str = 'EPSG:2226',
+                                  wgs84: bool = False):
         """
-        Create sample features for MVP demonstration.
+        Features of an ArcGIS FeatureServer layer intersecting a WGS84 bbox.
 
         Args:
-            bbox: Bounding box tuple (minx, miny, maxx, maxy)
-            layer_type: Type of layer to create sample features for
+            layer_config: gis_layers row (id, name, url)
+            bbox_wgs84: Bounding box (minx, miny, maxx, maxy) in EPSG:4326
+            target_epsg: CRS of the exported geometry
+            wgs84: Also keep the WGS84 geometry (for KML)
+
+        Yields:
+            ExportFeature per feature (none if the layer cannot be fetched)
+        """
+        import requests
+        from arcgis2geojson import arcgis2geojson
+
+        minx, miny, maxx, maxy = bbox_wgs84
+        print(f"Fetching external layer {layer_config['name']}...")
+        try:
+            response = requests.get(f"{layer_config['url']}/query", params={
+                'where': '1=1',
+                'geometry': f'{minx},{miny},{maxx},{maxy}',
+                'geometryType': 'esriGeometryEnvelope',
+                'inSR': '4326',
+                'spatialRel': 'esriSpatialRelIntersects',
+                'outFields': '*',
+                'returnGeometry': 'true',
+                'outSR': '4326',
+                'f': 'json'
+            }, timeout=30)
+            response.raise_for_status()
+            esri_features = response.json().get('features', [])
+        except Exception as e:
+            print(f"  ERROR fetching {layer_config['name']}: {e}")
+            return
+
+        if self.crs_service:
+            transformer = self.crs_service.get_transformer('EPSG:4326', target_epsg)
+        else:
+            transformer = Transformer.from_crs('EPSG:4326', target_epsg, always_xy=True)
+
+        for esri_feature in esri_features:
+            try:
+                geojson_feature = arcgis2geojson(esri_feature)
+                if geojson_feature.get('geometry') is None:
+                    continue
+                geom = shape(geojson_feature['geometry'])
+                yield ExportFeature(
+                    layer=layer_config['id'],
+                    geometry=mapping(transform(transformer.transform, geom)),
+                    properties=geojson_feature.get('properties') or {},
+                    geometry_wgs84=geojson_feature['geometry'] if wgs84 else None
+                )
+            except Exception:
+                continue
+
+    # ------------------------------------------------------------------
+    # Export jobs (map_export_jobs)
+    # ------------------------------------------------------------------
+
+    def create_export_job(self, params: Dict, project_id: Optional[str] = None) -> str:
+        """Record a pending export job and return its id"""
+        with get_cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO map_export_jobs (status, params, project_id)
+                VALUES ('pending', %s, %s)
+                RETURNING id
+            """, (json.dumps(params), project_id))
+            return str(cursor.fetchone()['id'])
+
+    def get_export_job(self, job_id: str) -> Optional[Dict]:
+        """map_export_jobs row of a job, or None"""
+        with get_cursor() as cursor:
+            cursor.execute("""
+                SELECT id, status, params, download_url, file_size_mb, feature_count,
+                       format_timings, error_message, created_at, started_at,
+                       completed_at, expires_at
+                FROM map_export_jobs
+                WHERE id = %s
+            """, (job_id,))
+            return cursor.fetchone()
+
+    def fail_export_job(self, job_id: str, error_message: str) -> None:
+        """Mark a job that could not be run as failed"""
+        with get_cursor() as cursor:
+            cursor.execute("""
+                UPDATE map_export_jobs
+                SET status = 'failed', error_message = %s, completed_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            """, (error_message, job_id))
+
+    def run_export_job(self, job_id: str, progress_callback=None) -> Dict:
+        """
+        Run a pending map_export_jobs row and record its outcome.
+
+        Args:
+            job_id: UUID of a job created by create_export_job()
+            progress_callback: Optional callable receiving {'features': n}
 
         Returns:
-            List of sample GeoJSON features
+            create_export_package() result
+
+        Raises:
+            ValueError: Job not found or not pending
         """
-        minx, miny, maxx, maxy = bbox
-        
-        features = []
-        
-        if layer_type == 'parcels':
-            # Create a sample parcel polygon
-            features.append({
-                'type': 'Feature',
-                'geometry': {
-                    'type': 'Polygon',
-                    'coordinates': [[
-                        [minx + (maxx-minx)*0.1, miny + (maxy-miny)*0.1],
-                        [maxx - (maxx-minx)*0.1, miny + (maxy-miny)*0.1],
-                        [maxx - (maxx-minx)*0.1, maxy - (maxy-miny)*0.1],
-                        [minx + (maxx-minx)*0.1, maxy - (maxy-miny)*0.1],
-                        [minx + (maxx-minx)*0.1, miny + (maxy-miny)*0.1],
-                    ]]
-                },
-                'properties': {'id': 1, 'name': 'Sample Parcel'}
-            })
-        
-        return features
-    
+        with get_cursor() as cursor:
+            cursor.execute("""
+                UPDATE map_export_jobs
+                SET status = 'running', started_at = CURRENT_TIMESTAMP
+                WHERE id = %s AND status = 'pending'
+                RETURNING params, project_id
+            """, (job_id,))
+            job = cursor.fetchone()
+        if not job:
+            raise ValueError(f"Export job {job_id} not found or not pending")
+
+        project_id = str(job['project_id']) if job['project_id'] else None
+        result = self.create_export_package(job_id, job['params'], project_id,
+                                            progress_callback=progress_callback)
+
+        with get_cursor() as cursor:
+            cursor.execute("""
+                UPDATE map_export_jobs
+                SET status = %s,
+                    download_url = %s,
+                    file_size_mb = %s,
+                    feature_count = %s,
+                    format_timings = %s,
+                    error_message = %s,
+                    completed_at = CURRENT_TIMESTAMP,
+                    expires_at = %s
+                WHERE id = %s
+            """, (
+                result['status'],
+                result.get('download_url'),
+                result.get('file_size_mb'),
+                result.get('feature_count'),
+                json.dumps(result['format_timings']) if result.get('format_timings') else None,
+                result.get('error_message'),
+                result.get('expires_at'),
+                job_id
+            ))
+        return result
+
     def cleanup_expired_jobs(self):
         """Remove expired export files"""
         try:
@@ -4,11 +4,77 @@ Automatically connects pipes to structures based on spatial proximity.
 """
 
 import os
+import math
+import time
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 from typing import Dict, List, Optional, Tuple
 
 
+class StructureGridIndex:
+    """
+    Uniform grid over structure points for fixed-radius nearest lookups.
+
+    With the cell size equal to the snap tolerance, every structure within
+    tolerance of a point lies in the point's cell or one of its 8 neighbours,
+    so a lookup checks a handful of structures instead of all of them.
+    """
+
+    def __init__(self, structures: List[Dict], tolerance: float):
+        """
+        Build the grid.
+
+        Args:
+            structures: Structure dictionaries with a 'point' (x, y)
+            tolerance: Maximum snap distance in feet (also the cell size)
+        """
+        self.tolerance = tolerance
+        self.cell_size = tolerance if tolerance > 0 else 1.0
+        self.cells = {}
+        self.indexed = 0
+        self.distance_checks = 0
+
+        for order, struct in enumerate(structures):
+            x, y = struct['point']
+            if x is None or y is None:
+                continue
+            self.cells.setdefault(self._cell(x, y), []).append((order, struct))
+            self.indexed += 1
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def nearest(self, point: Tuple[float, float]) -> Optional[Dict]:
+        """
+        Find the nearest structure within tolerance of a point.
+
+        Ties go to the structure listed first, as with a linear scan.
+
+        Args:
+            point: (x, y) coordinates
+
+        Returns:
+            Nearest structure dictionary or None
+        """
+        x, y = point
+        if x is None or y is None or self.tolerance < 0:
+            return None
+
+        cx, cy = self._cell(x, y)
+        best = None  # (distance, order, struct)
+
+        for gx in (cx - 1, cx, cx + 1):
+            for gy in (cy - 1, cy, cy + 1):
+                for order, struct in self.cells.get((gx, gy), ()):
+                    self.distance_checks += 1
+                    sx, sy = struct['point']
+                    distance = ((x - sx) ** 2 + (y - sy) ** 2) ** 0.5
+                    if distance <= self.tolerance and (best is None or (distance, order) < best[:2]):
+                        best = (distance, order, struct)
+
+        return best[2] if best else None
+
+
 class PipeStructureConnector:
     """Automatically connects pipes to structures based on endpoint proximity."""
     
@@ -34,56 +100,60 @@ class PipeStructureConnector:
     def connect_network_pipes(self, network_id: str) -> Dict:
         """
         Connect all pipes in a network to nearby structures.
+
+        Structures are indexed in a StructureGridIndex, both endpoints of every
+        pipe are snapped against it, and all changed connections are written
+        with a single batched UPDATE.
         
         Args:
             network_id: The pipe network UUID
             
         Returns:
-            Dictionary with connection results
+            Dictionary with connection results, plus 'timings' (seconds per
+            phase) and 'match_stats'
         """
         conn = self.get_db_connection()
+        started = time.perf_counter()
         
         try:
             # Get all pipes and structures in this network
             pipes = self._get_network_pipes(conn, network_id)
             structures = self._get_network_structures(conn, network_id)
+            loaded = time.perf_counter()
+
+            index = StructureGridIndex(structures, self.tolerance_feet)
+            indexed = time.perf_counter()
             
             connected_count = 0
             unconnected_start = []
             unconnected_end = []
+            endpoints_matched = 0
+            updates = []
             
             for pipe in pipes:
-                from_struct = self._find_nearest_structure(
-                    pipe['start_point'], 
-                    structures, 
-                    self.tolerance_feet
-                )
-                to_struct = self._find_nearest_structure(
-                    pipe['end_point'], 
-                    structures, 
-                    self.tolerance_feet
-                )
+                from_struct = index.nearest(pipe['start_point'])
+                to_struct = index.nearest(pipe['end_point'])
                 
                 # Preserve existing connections if no new structure found
                 new_from_id = from_struct['structure_id'] if from_struct else pipe['from_structure_id']
                 new_to_id = to_struct['structure_id'] if to_struct else pipe['to_structure_id']
+
+                if (new_from_id, new_to_id) != (pipe['from_structure_id'], pipe['to_structure_id']):
+                    updates.append((pipe['line_id'], new_from_id, new_to_id))
                 
-                # Update pipe connections
-                updated = self._update_pipe_connections(
-                    conn, 
-                    pipe['line_id'],
-                    new_from_id,
-                    new_to_id
-                )
-                
-                if updated:
-                    if from_struct and to_struct:
-                        connected_count += 1
-                    else:
-                        if not from_struct:
-                            unconnected_start.append(pipe['line_number'] or pipe['line_id'])
-                        if not to_struct:
-                            unconnected_end.append(pipe['line_number'] or pipe['line_id'])
+                endpoints_matched += bool(from_struct) + bool(to_struct)
+                if from_struct and to_struct:
+                    connected_count += 1
+                else:
+                    if not from_struct:
+                        unconnected_start.append(pipe['line_number'] or pipe['line_id'])
+                    if not to_struct:
+                        unconnected_end.append(pipe['line_number'] or pipe['line_id'])
+            matched = time.perf_counter()
+
+            # Update pipe connections
+            self._apply_pipe_connections(conn, updates)
+            finished = time.perf_counter()
             
             conn.close()
             
@@ -94,10 +164,27 @@ class PipeStructureConnector:
                 'partially_connected': len(unconnected_start) + len(unconnected_end),
                 'unconnected_start': unconnected_start[:10],  # First 10
                 'unconnected_end': unconnected_end[:10],
-                'tolerance_feet': self.tolerance_feet
+                'tolerance_feet': self.tolerance_feet,
+                'timings': {
+                    'load_seconds': round(loaded - started, 4),
+                    'index_seconds': round(indexed - loaded, 4),
+                    'match_seconds': round(matched - indexed, 4),
+                    'update_seconds': round(finished - matched, 4),
+                    'total_seconds': round(finished - started, 4)
+                },
+                'match_stats': {
+                    'total_structures': len(structures),
+                    'structures_indexed': index.indexed,
+                    'grid_cells': len(index.cells),
+                    'endpoints_matched': endpoints_matched,
+                    'endpoints_unmatched': 2 * len(pipes) - endpoints_matched,
+                    'distance_checks': index.distance_checks,
+                    'pipes_updated': len(updates)
+                }
             }
             
         except Exception as e:
+            conn.rollback()
             conn.close()
             return {
                 'success': False,
@@ -105,7 +192,7 @@ class PipeStructureConnector:
             }
     
     def _get_network_pipes(self, conn, network_id: str) -> List[Dict]:
-        """Get all pipes in a network with their geometries."""
+        """Get all pipes in a network with their endpoint coordinates."""
         cur = conn.cursor(cursor_factory=RealDictCursor)
         
         cur.execute("""
@@ -114,8 +201,6 @@ class PipeStructureConnector:
                 ul.line_number,
                 ul.from_structure_id,
                 ul.to_structure_id,
-                ST_StartPoint(ul.geometry) as start_geom,
-                ST_EndPoint(ul.geometry) as end_geom,
                 ST_X(ST_StartPoint(ul.geometry)) as start_x,
                 ST_Y(ST_StartPoint(ul.geometry)) as start_y,
                 ST_X(ST_EndPoint(ul.geometry)) as end_x,
@@ -167,77 +252,33 @@ class PipeStructureConnector:
         cur.close()
         return structures
     
-    def _find_nearest_structure(
-        self, 
-        point: Tuple[float, float], 
-        structures: List[Dict],
-        tolerance: float
-    ) -> Optional[Dict]:
-        """
-        Find the nearest structure to a point within tolerance.
-        
-        Args:
-            point: (x, y) coordinates
-            structures: List of structure dictionaries
-            tolerance: Maximum distance in feet
-            
-        Returns:
-            Nearest structure dictionary or None
-        """
-        if not structures:
-            return None
-        
-        nearest = None
-        min_distance = float('inf')
-        
-        for struct in structures:
-            distance = self._calculate_distance(point, struct['point'])
-            if distance < min_distance and distance <= tolerance:
-                min_distance = distance
-                nearest = struct
-        
-        return nearest
-    
-    def _calculate_distance(
-        self, 
-        point1: Tuple[float, float], 
-        point2: Tuple[float, float]
-    ) -> float:
-        """Calculate Euclidean distance between two points."""
-        dx = point1[0] - point2[0]
-        dy = point1[1] - point2[1]
-        return (dx**2 + dy**2)**0.5
-    
-    def _update_pipe_connections(
+    def _apply_pipe_connections(
         self,
         conn,
-        line_id: str,
-        from_structure_id: Optional[str],
-        to_structure_id: Optional[str]
-    ) -> bool:
+        updates: List[Tuple[str, Optional[str], Optional[str]]]
+    ):
         """
-        Update pipe from/to structure connections.
-        Note: Caller should pass existing IDs when no new structure found.
+        Write pipe from/to structure connections in one batched UPDATE.
+
+        Args:
+            conn: Database connection (committed on success)
+            updates: (line_id, from_structure_id, to_structure_id) tuples
         """
+        if not updates:
+            return
+
         cur = conn.cursor()
-        
         try:
-            cur.execute("""
-                UPDATE utility_lines
-                SET from_structure_id = %s,
-                    to_structure_id = %s
-                WHERE line_id = %s
-            """, (from_structure_id, to_structure_id, line_id))
-            
+            execute_values(cur, """
+                UPDATE utility_lines AS ul
+                SET from_structure_id = v.from_structure_id::uuid,
+                    to_structure_id = v.to_structure_id::uuid
+                FROM (VALUES %s) AS v(line_id, from_structure_id, to_structure_id)
+                WHERE ul.line_id = v.line_id::uuid
+            """, updates, page_size=len(updates))
             conn.commit()
+        finally:
             cur.close()
-            return True
-            
-        except Exception as e:
-            print(f"Error updating pipe connections: {e}")
-            conn.rollback()
-            cur.close()
-            return False
 
 
 def test_connector():
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Embedding Provider Benchmark
+
+Measures embedding throughput without network access, using the local
+hashed n-gram provider:
+1. Raw local provider throughput (texts/s)
+2. One request per entity (the previous behaviour) against multi-input
+   requests pipelined with bounded concurrency, with a simulated
+   per-request latency (--request-ms) standing in for the API round trip
+
+Usage:
+    python scripts/bench_embedding_providers.py
+    python scripts/bench_embedding_providers.py --texts 5000 --request-ms 150 --concurrency 8
+"""
+
+import sys
+import os
+import argparse
+import random
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.embeddings.providers import HashedNgramEmbeddingProvider, embed_in_batches
+
+WORDS = ['storm', 'sanitary', 'manhole', 'inlet', 'curb', 'gutter', 'pipe', 'valve',
+         'hydrant', 'detail', 'standard', 'concrete', 'asphalt', 'trench', 'backfill',
+         'layer', 'block', 'note', 'material', 'pvc', 'rcp', 'ductile', 'iron']
+TYPES = ['layer_standard', 'block_standard', 'detail_standard', 'material_standard']
+
+
+class LatencyProvider(HashedNgramEmbeddingProvider):
+    """Local provider that sleeps once per request, like a network call."""
+
+    def __init__(self, request_ms: float, **kwargs):
+        super().__init__(**kwargs)
+        self.request_ms = request_ms
+        self.requests = 0
+
+    def embed(self, texts):
+        self.requests += 1
+        time.sleep(self.request_ms / 1000.0)
+        return super().embed(texts)
+
+
+def synthetic_texts(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [f"{rng.choice(TYPES)}: " + ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 8)))
+            for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark embedding generation throughput')
+    parser.add_argument('--texts', type=int, default=2000, help='Number of texts')
+    parser.add_argument('--request-ms', type=float, default=100.0,
+                        help='Simulated latency per embedding request (ms)')
+    parser.add_argument('--batch-size', type=int, default=100, help='Texts per request')
+    parser.add_argument('--concurrency', type=int, default=4, help='Requests in flight')
+    args = parser.parse_args()
+
+    texts = synthetic_texts(args.texts)
+
+    provider = HashedNgramEmbeddingProvider()
+    start = time.perf_counter()
+    provider.embed(texts)
+    seconds = time.perf_counter() - start
+    print(f"Local provider ({provider.model}, {provider.dimensions} dims): "
+          f"{len(texts) / seconds:,.0f} texts/s")
+
+    # Per-entity requests would take len(texts) round trips; time a sample
+    sample = texts[:min(len(texts), 50)]
+    legacy = LatencyProvider(args.request_ms)
+    start = time.perf_counter()
+    for text in sample:
+        legacy.embed([text])
+    per_request = (time.perf_counter() - start) / len(sample)
+    legacy_seconds = per_request * len(texts)
+    print(f"  one request per text: {len(texts)} requests, ~{legacy_seconds:8.2f}s "
+          f"(extrapolated from {len(sample)})")
+
+    for concurrency in sorted({1, args.concurrency}):
+        pipelined = LatencyProvider(args.request_ms)
+        start = time.perf_counter()
+        embedded = sum(len(batch.vectors) for _, batch in
+                       embed_in_batches(pipelined, texts, args.batch_size, concurrency))
+        seconds = time.perf_counter() - start
+        print(f"  batches of {args.batch_size}, concurrency {concurrency}: "
+              f"{pipelined.requests} requests, {seconds:8.2f}s, "
+              f"{embedded / seconds:10,.0f} texts/s ({legacy_seconds / seconds:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
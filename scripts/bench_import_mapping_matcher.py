@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Import Mapping Matcher Micro-Benchmark
+
+Compares ImportMappingManager.find_match (prefix-filtered, memoized) with the
+previous full scan over every pattern, on a synthetic pattern set. No database
+is required.
+
+Usage:
+    python scripts/bench_import_mapping_matcher.py
+    python scripts/bench_import_mapping_matcher.py --patterns 5000 --layers 2000 --repeat 3
+"""
+
+import sys
+import os
+import argparse
+import random
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from standards.import_mapping_manager import ImportMappingManager
+
+PHASES = ['NEW', 'EXIST', 'PROP', 'DEMO']
+
+
+def synthetic_patterns(count: int, clients: int, seed: int = 42):
+    """Build pattern rows shaped like import_mapping_patterns query results."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        code = f"C{i:04d}"
+        client = f"CLIENT-{i % clients}" if i % 10 else None
+        if i % 50 == 0:
+            # A few patterns without a literal prefix (always candidates)
+            regex = rf'^(?P<size>\d+)IN-{code}(-(?P<phase>{"|".join(PHASES)}))?$'
+        else:
+            regex = rf'^{code}-(?P<size>\d+)(-(?P<phase>{"|".join(PHASES)}))?$'
+        rows.append({
+            'mapping_id': i + 1,
+            'client_name': client,
+            'source_pattern': f'{code}-<size>-<phase>',
+            'regex_pattern': regex,
+            'extraction_rules': {'type': 'PIPE', 'attributes': ['group:size'],
+                                 'phase': 'group:phase'},
+            'confidence_score': 100 - rng.randint(0, 40),
+            'discipline_code': 'CIV',
+            'category_code': 'UTIL',
+            'type_code': 'PIPE'
+        })
+    rows.sort(key=lambda r: r['confidence_score'], reverse=True)
+    return rows
+
+
+def synthetic_layers(count: int, patterns: int, seed: int = 7):
+    """Layer names: ~80% hit a pattern, the rest match nothing."""
+    rng = random.Random(seed)
+    layers = []
+    for _ in range(count):
+        if rng.random() < 0.8:
+            layers.append(f"C{rng.randrange(patterns):04d}-{rng.choice([6, 8, 12])}-{rng.choice(PHASES)}")
+        else:
+            layers.append(f"X-{rng.randrange(10000)}-MISC")
+    return layers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--patterns', type=int, default=5000)
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--layers', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='passes over the layer list (later passes hit the memo)')
+    args = parser.parse_args()
+
+    rows = synthetic_patterns(args.patterns, args.clients)
+    layers = synthetic_layers(args.layers, args.patterns)
+    manager = ImportMappingManager(validate_entities=False, patterns=rows,
+                                   cache_size=max(4096, args.layers))
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        scan_results = [manager._match_patterns(name, manager.patterns) for name in layers]
+    scan_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    first_pass = [manager.find_match(name) for name in layers]
+    cold_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(args.repeat - 1):
+        [manager.find_match(name) for name in layers]
+    warm_seconds = time.perf_counter() - start
+
+    identical = all(
+        (a.to_dict() if a else None) == (b.to_dict() if b else None)
+        for a, b in zip(scan_results, first_pass)
+    )
+    lookups = len(layers) * args.repeat
+
+    print(f"Patterns: {len(rows)}  Layers: {len(layers)}  Passes: {args.repeat}")
+    print(f"Full scan:         {scan_seconds:8.3f}s  ({lookups / scan_seconds:10.0f} lookups/s)")
+    print(f"Matcher (cold):    {cold_seconds:8.3f}s  ({len(layers) / cold_seconds:10.0f} lookups/s)")
+    if args.repeat > 1:
+        warm_lookups = len(layers) * (args.repeat - 1)
+        print(f"Matcher (memo):    {warm_seconds:8.3f}s  ({warm_lookups / max(warm_seconds, 1e-9):10.0f} lookups/s)")
+    print(f"Identical results: {identical}")
+    return 0 if identical else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
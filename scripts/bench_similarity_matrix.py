@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Similarity Matrix Benchmark
+
+Measures the in-memory similarity and clustering paths of semantic search
+on synthetic clustered embeddings, without a database:
+1. Previous client-side cost: one row per pair (N^2 dicts, as returned by
+   the CROSS JOIN) folded into the nested matrix dict
+2. Blockwise NumPy similarity into the same nested dict
+3. Top-k rows for a large selection, with peak traced memory per block size
+4. K-means / hierarchical clustering time
+
+Usage:
+    python scripts/bench_similarity_matrix.py
+    python scripts/bench_similarity_matrix.py --entities 2000 --large 20000 --dims 1536
+"""
+
+import sys
+import os
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.embedding_matrix import EmbeddingMatrix
+
+
+def synthetic_matrix(count: int, dims: int, clusters: int = 50, seed: int = 7) -> EmbeddingMatrix:
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dims)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, count)] + \
+        0.3 * rng.standard_normal((count, dims)).astype(np.float32)
+    ids = [f'{i:08x}-0000-0000-0000-000000000000' for i in range(count)]
+    return EmbeddingMatrix(ids, vectors, [{'entity_type': 'layer'}] * count)
+
+
+def legacy_matrix(matrix: EmbeddingMatrix):
+    """Nested dict built from one result row per pair, as the SQL path did."""
+    ids = matrix.entity_ids
+    rows = []
+    for start, block in matrix.similarity_blocks():
+        for offset, row in enumerate(block.tolist()):
+            for column, score in enumerate(row):
+                rows.append({'entity1_id': ids[start + offset], 'entity2_id': ids[column],
+                             'similarity_score': score})
+    result = {}
+    for sim in rows:
+        result.setdefault(sim['entity1_id'], {})[sim['entity2_id']] = round(sim['similarity_score'], 4)
+    return result
+
+
+def timed(function, *args, **kwargs):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark in-memory similarity and clustering')
+    parser.add_argument('--entities', type=int, default=2000, help='Entities in the dense matrix')
+    parser.add_argument('--large', type=int, default=20000, help='Entities in the top-k run')
+    parser.add_argument('--dims', type=int, default=1536, help='Vector dimensions')
+    parser.add_argument('--top-k', type=int, default=50)
+    parser.add_argument('--clusters', type=int, default=20)
+    args = parser.parse_args()
+
+    matrix = synthetic_matrix(args.entities, args.dims)
+    print(f"Dense matrix, {args.entities:,} entities ({args.entities ** 2:,} pairs)")
+    _, seconds, peak = timed(legacy_matrix, matrix)
+    print(f"  row per pair:   {seconds:8.2f}s  peak {peak:8.1f} MB")
+    _, seconds, peak = timed(matrix.similarity_rows)
+    print(f"  blockwise:      {seconds:8.2f}s  peak {peak:8.1f} MB")
+
+    large = synthetic_matrix(args.large, args.dims)
+    print(f"\nTop-{args.top_k} rows, {args.large:,} entities "
+          f"(vectors alone {large.vectors.nbytes / 1024 / 1024:.0f} MB)")
+    for block_mb in (16, 64, 256):
+        block_size = large.block_rows(block_mb * 1024 * 1024)
+        _, seconds, peak = timed(large.similarity_rows, top_k=args.top_k, block_size=block_size)
+        print(f"  block {block_mb:>3} MB ({block_size:>5} rows): {seconds:8.2f}s  peak {peak:8.1f} MB")
+
+    print(f"\nClustering, {args.entities:,} entities into {args.clusters}")
+    for method in ('kmeans', 'hierarchical'):
+        _, seconds, peak = timed(matrix.cluster, args.clusters, method)
+        print(f"  {method:<13} {seconds:8.2f}s  peak {peak:8.1f} MB")
+    _, seconds, peak = timed(large.cluster, args.clusters, 'hierarchical')
+    print(f"  hierarchical, {args.large:,} (micro-clusters): {seconds:8.2f}s  peak {peak:8.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
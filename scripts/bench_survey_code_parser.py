@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Survey Code Parser Benchmark
+
+Measures shot throughput of SurveyCodeParser.simulate_field_sequence and
+batch_validate with the cached code library, against the previous behaviour
+of one connection and one query per shot.
+
+No database is required: psycopg2.connect is replaced by an in-memory code
+library with a configurable per-connection latency (--connect-ms), so the
+numbers show how connection overhead scales with shot count.
+
+Usage:
+    python scripts/bench_survey_code_parser.py
+    python scripts/bench_survey_code_parser.py --shots 10000 --codes 300 --connect-ms 2
+"""
+
+import sys
+import os
+import argparse
+import random
+import time
+import uuid
+from unittest.mock import patch
+
+import psycopg2
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from survey_code_parser import SurveyCodeLibraryCache, SurveyCodeParser
+
+CONNECTIVITY = ['NODE', 'LINE', 'EDGE', 'POINT']
+
+
+def synthetic_library(count: int):
+    """Rows shaped like survey_code_library query results."""
+    rows = []
+    for i in range(count):
+        connectivity = CONNECTIVITY[i % len(CONNECTIVITY)]
+        rows.append({
+            'code_id': uuid.UUID(int=i + 1),
+            'code': f'CODE{i:04d}',
+            'display_name': f'Code {i}',
+            'description': None,
+            'discipline_code': 'CIV',
+            'category_code': 'UTIL',
+            'feature_type': f'FEATURE-{i}',
+            'connectivity_type': connectivity,
+            'geometry_output': 'BL' if connectivity == 'NODE' else 'LN',
+            'category_group': None,
+            'auto_connect': connectivity in ('LINE', 'EDGE'),
+            'create_block': connectivity == 'NODE',
+            'block_name': None,
+            'layer_template': '{discipline}-{category}-{feature}-{phase}',
+            'default_phase': 'EXIST',
+            'is_favorite': False,
+            'usage_count': 0,
+            'is_active': True
+        })
+    return rows
+
+
+def synthetic_shots(count: int, codes: int, seed: int = 42):
+    """Field shots in runs of the same code, ~2% with unknown codes."""
+    rng = random.Random(seed)
+    shots = []
+    while len(shots) < count:
+        code = f'CODE{rng.randrange(codes):04d}' if rng.random() > 0.02 else 'UNKNOWN'
+        for _ in range(rng.randint(1, 12)):
+            shots.append({
+                'point_number': str(len(shots) + 1),
+                'code': code,
+                'northing': rng.uniform(2100000, 2101000),
+                'easting': rng.uniform(6000000, 6001000),
+                'elevation': rng.uniform(100, 200)
+            })
+    return shots[:count]
+
+
+class FakeCursor:
+    """Answers the parser's two queries from the in-memory library."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.result = []
+
+    def execute(self, sql, params=None):
+        if params:
+            self.result = [r for r in self.rows if r['code'].upper() == params[0]]
+        else:
+            self.result = list(self.rows)
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self.rows)
+
+    def close(self):
+        pass
+
+
+class LegacySurveyCodeParser(SurveyCodeParser):
+    """The previous parser: one connection and query per parse_code() call."""
+
+    def parse_codes(self, codes):
+        return [self.parse_code(code) for code in codes]
+
+    def simulate_field_sequence(self, shots):
+        # The old loop looked up every shot's code (plus the trailing run)
+        codes = [shot.get('code', '').strip().upper() for shot in shots]
+        for code in codes:
+            if code:
+                self.parse_code(code)
+        return super().simulate_field_sequence(shots)
+
+    def parse_code(self, code):
+        if not code or not isinstance(code, str):
+            return {'valid': False, 'error': 'Code is required and must be a string'}
+        conn = psycopg2.connect(**self.db_config)
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT ... WHERE UPPER(code) = %s", (code.strip().upper(),))
+            row = cur.fetchone()
+            if not row:
+                return {'valid': False,
+                        'error': f'Code "{code}" not found in library or is inactive'}
+            return self._code_result(row)
+        finally:
+            cur.close()
+            conn.close()
+
+
+def run(parser_cls, shots, rows, connect_ms):
+    stats = {'connections': 0}
+
+    def connect(**kwargs):
+        stats['connections'] += 1
+        if connect_ms:
+            time.sleep(connect_ms / 1000.0)
+        return FakeConnection(rows)
+
+    with patch('psycopg2.connect', side_effect=connect):
+        parser = parser_cls({'host': 'bench'}, cache=SurveyCodeLibraryCache())
+
+        start = time.perf_counter()
+        simulated = parser.simulate_field_sequence(shots)
+        simulate_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        validated = parser.batch_validate([shot['code'] for shot in shots])
+        validate_seconds = time.perf_counter() - start
+
+    return {
+        'simulate_seconds': simulate_seconds,
+        'validate_seconds': validate_seconds,
+        'connections': stats['connections'],
+        'simulated': simulated,
+        'validated': validated
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark survey code parsing throughput')
+    parser.add_argument('--shots', type=int, default=10000, help='Number of field shots')
+    parser.add_argument('--codes', type=int, default=300, help='Size of the code library')
+    parser.add_argument('--connect-ms', type=float, default=1.0,
+                        help='Simulated latency per database connection (ms)')
+    args = parser.parse_args()
+
+    rows = synthetic_library(args.codes)
+    shots = synthetic_shots(args.shots, args.codes)
+
+    print(f"{args.shots} shots, {args.codes} codes, {args.connect_ms}ms per connection")
+    results = {}
+    for label, parser_cls in [('per-shot queries', LegacySurveyCodeParser),
+                              ('cached library', SurveyCodeParser)]:
+        result = run(parser_cls, shots, rows, args.connect_ms)
+        results[label] = result
+        for phase in ('simulate', 'validate'):
+            seconds = result[f'{phase}_seconds']
+            print(f"  {label:<17} {phase:<9} {seconds:8.3f}s "
+                  f"{args.shots / seconds:12,.0f} shots/s")
+        print(f"  {label:<17} connections: {result['connections']}")
+
+    legacy, cached = results['per-shot queries'], results['cached library']
+    same = legacy['simulated'] == cached['simulated'] and legacy['validated'] == cached['validated']
+    print(f"Results identical: {same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Vector Index Benchmark
+
+Compares exact KNN (sequential scan) with HNSW and IVFFlat ANN indexes on a
+synthetic table of clustered unit vectors, reporting recall@k against the
+exact results and per-query p50/p95 latency:
+1. Loads --rows vectors (default 1M) into an UNLOGGED scratch table via COPY
+2. Runs --queries exact KNN queries (index scans disabled) as ground truth
+3. For each index method, builds the index and sweeps its search parameter
+   (hnsw.ef_search / ivfflat.probes)
+
+Requires PostgreSQL with the pgvector extension (DB_* settings as for the
+application). The scratch table is dropped afterwards unless --keep.
+
+Usage:
+    python scripts/bench_vector_index.py
+    python scripts/bench_vector_index.py --rows 200000 --dims 384 --queries 100
+    python scripts/bench_vector_index.py --methods hnsw --ef-search 40 100 200
+"""
+
+import sys
+import os
+import argparse
+import io
+import time
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.db_utils import get_connection
+from tools.embeddings.providers import vector_literal
+
+TABLE = 'bench_vector_index'
+KNN = f"SELECT id FROM {TABLE} ORDER BY embedding <=> %s::vector LIMIT %s"
+
+
+def load_table(conn, rows: int, dims: int, clusters: int, chunk: int, seed: int):
+    rng = np.random.default_rng(seed)
+    with conn.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.execute(f"CREATE UNLOGGED TABLE {TABLE} (id integer PRIMARY KEY, embedding vector({dims}))")
+        # Embeddings are clustered, not uniform: sample around fixed random centres
+        centres = rng.standard_normal((clusters, dims)).astype(np.float32)
+        centres /= np.linalg.norm(centres, axis=1, keepdims=True)
+        for start in range(0, rows, chunk):
+            count = min(chunk, rows - start)
+            vectors = centres[rng.integers(0, clusters, count)] + \
+                0.05 * rng.standard_normal((count, dims)).astype(np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            buffer = io.StringIO()
+            for offset, vector in enumerate(vectors):
+                buffer.write(f"{start + offset}\t{vector_literal(vector)}\n")
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {TABLE} (id, embedding) FROM STDIN", buffer)
+            print(f"\r  loaded {start + count:,}/{rows:,}", end='', flush=True)
+        print()
+        cursor.execute(f"ANALYZE {TABLE}")
+    conn.commit()
+    return centres
+
+
+def run_queries(conn, queries, k: int, settings: dict):
+    """Run each query; returns (result id sets, per-query latencies in ms)."""
+    results, latencies = [], []
+    with conn.cursor() as cursor:
+        for name, value in settings.items():
+            cursor.execute("SELECT set_config(%s, %s, false)", (name, str(value)))
+        for query in queries:
+            literal = vector_literal(query)
+            start = time.perf_counter()
+            cursor.execute(KNN, (literal, k))
+            ids = {row[0] for row in cursor.fetchall()}
+            latencies.append((time.perf_counter() - start) * 1000)
+            results.append(ids)
+        cursor.execute("RESET ALL")
+    conn.commit()
+    return results, np.array(latencies)
+
+
+def report(label: str, truth, results, latencies, k: int):
+    recall = np.mean([len(found & exact) / k for found, exact in zip(results, truth)])
+    print(f"  {label:<28} recall@{k} {recall:6.3f}   "
+          f"p50 {np.percentile(latencies, 50):8.2f} ms   p95 {np.percentile(latencies, 95):8.2f} ms")
+
+
+def build(conn, statement: str) -> float:
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("DROP INDEX IF EXISTS idx_bench_vector_index_ann")
+            start = time.perf_counter()
+            cursor.execute(statement)
+            return time.perf_counter() - start
+    finally:
+        conn.autocommit = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark exact vs ANN KNN queries with pgvector')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Vectors in the scratch table')
+    parser.add_argument('--dims', type=int, default=1536, help='Vector dimensions')
+    parser.add_argument('--clusters', type=int, default=1000, help='Synthetic cluster centres')
+    parser.add_argument('--queries', type=int, default=200, help='Queries per configuration')
+    parser.add_argument('--k', type=int, default=10, help='Neighbours per query')
+    parser.add_argument('--methods', nargs='+', choices=['hnsw', 'ivfflat'], default=['hnsw', 'ivfflat'])
+    parser.add_argument('--ef-search', type=int, nargs='+', default=[40, 100, 200])
+    parser.add_argument('--probes', type=int, nargs='+', help='IVFFlat probes (default: 1, sqrt(lists), 2*sqrt(lists))')
+    parser.add_argument('--chunk', type=int, default=10000, help='Rows per COPY')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch table')
+    args = parser.parse_args()
+
+    with get_connection() as conn:
+        print(f"Loading {args.rows:,} x {args.dims}-d vectors into {TABLE}")
+        centres = load_table(conn, args.rows, args.dims, args.clusters, args.chunk, args.seed)
+
+        rng = np.random.default_rng(args.seed + 1)
+        queries = centres[rng.integers(0, args.clusters, args.queries)] + \
+            0.05 * rng.standard_normal((args.queries, args.dims)).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        print(f"\n{args.queries} queries, k={args.k}")
+        truth, latencies = run_queries(conn, queries, args.k, {'enable_indexscan': 'off'})
+        report('exact (seq scan)', truth, truth, latencies, args.k)
+
+        try:
+            if 'hnsw' in args.methods:
+                seconds = build(conn, f"CREATE INDEX idx_bench_vector_index_ann ON {TABLE} "
+                                      f"USING hnsw (embedding vector_cosine_ops) "
+                                      f"WITH (m = 16, ef_construction = 64)")
+                print(f"\nHNSW (m=16, ef_construction=64), built in {seconds:.1f}s")
+                for ef_search in args.ef_search:
+                    results, latencies = run_queries(conn, queries, args.k, {'hnsw.ef_search': ef_search})
+                    report(f"ef_search={ef_search}", truth, results, latencies, args.k)
+
+            if 'ivfflat' in args.methods:
+                lists = max(int(np.sqrt(args.rows)) if args.rows > 1_000_000 else args.rows // 1000, 10)
+                seconds = build(conn, f"CREATE INDEX idx_bench_vector_index_ann ON {TABLE} "
+                                      f"USING ivfflat (embedding vector_cosine_ops) "
+                                      f"WITH (lists = {lists})")
+                print(f"\nIVFFlat (lists={lists}), built in {seconds:.1f}s")
+                root = max(1, round(np.sqrt(lists)))
+                for probes in args.probes or sorted({1, root, 2 * root}):
+                    results, latencies = run_queries(conn, queries, args.k, {'ivfflat.probes': probes})
+                    report(f"probes={probes}", truth, results, latencies, args.k)
+        finally:
+            if not args.keep:
+                with conn.cursor() as cursor:
+                    cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+                conn.commit()
+
+
+if __name__ == '__main__':
+    main()
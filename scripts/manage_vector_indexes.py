@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Vector Index Maintenance
+
+Builds, rebuilds and reports the per-model ANN indexes on entity_embeddings
+used by semantic search (see services/vector_index_manager.py).
+
+Usage:
+    python scripts/manage_vector_indexes.py status
+    python scripts/manage_vector_indexes.py build --model text-embedding-3-small
+    python scripts/manage_vector_indexes.py build --all --method ivfflat --replace
+    python scripts/manage_vector_indexes.py reindex --model <model_id or name>
+    python scripts/manage_vector_indexes.py drop --model <model_id or name>
+
+Rebuild (reindex) after large backfills: IVFFlat lists are fixed at build
+time, and both index types degrade after heavy churn.
+"""
+
+import sys
+import os
+import argparse
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.vector_index_manager import vector_index_manager as manager
+
+
+def resolve_models(args):
+    """Model rows selected by --model (id or name) or --all."""
+    models = manager.list_indexes()
+    if args.all:
+        return models
+    selected = []
+    for model in models:
+        if args.model in (model['model_id'], model['model_name']):
+            selected.append(model)
+    if not selected:
+        raise SystemExit(f"No embedding model matches '{args.model}'")
+    return selected
+
+
+def print_status(models):
+    print(f"{'model':<32} {'provider':<10} {'vectors':>10}  index")
+    for model in models:
+        index = model['index']
+        if index:
+            size_mb = (index['size_bytes'] or 0) / 1024 / 1024
+            options = ', '.join(f"{k}={v}" for k, v in index['options'].items())
+            description = f"{index['method']} ({options}) {size_mb:.1f} MB"
+        else:
+            description = '-'
+        print(f"{model['model_name']:<32} {model['provider'] or '':<10} "
+              f"{model['vectors']:>10,}  {description}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage per-model ANN indexes on entity_embeddings')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('status', help='List models, vector counts and their indexes')
+
+    for command in ('build', 'reindex', 'drop'):
+        sub = subparsers.add_parser(command)
+        target = sub.add_mutually_exclusive_group(required=True)
+        target.add_argument('--model', help='Model id or model_name')
+        target.add_argument('--all', action='store_true', help='Every registered model')
+        if command == 'build':
+            sub.add_argument('--method', choices=['hnsw', 'ivfflat'], default='hnsw')
+            sub.add_argument('--m', type=int, default=16, help='HNSW max connections per layer')
+            sub.add_argument('--ef-construction', type=int, default=64, help='HNSW build candidate list')
+            sub.add_argument('--lists', type=int, help='IVFFlat lists (default: from row count)')
+            sub.add_argument('--replace', action='store_true',
+                             help='Drop and rebuild an existing index')
+
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        print_status(manager.list_indexes())
+        return
+
+    for model in resolve_models(args):
+        label = f"{model['model_name']} ({model['model_id']})"
+        if args.command == 'build':
+            if model['vectors'] == 0:
+                print(f"  skip {label}: no current embeddings")
+                continue
+            result = manager.build_index(model['model_id'], method=args.method, m=args.m,
+                                         ef_construction=args.ef_construction, lists=args.lists,
+                                         replace=args.replace)
+            print(f"  built {result['index_name']} for {label}: {result['method']} "
+                  f"{result['parameters']} in {result['seconds']}s")
+        elif args.command == 'reindex':
+            if model['index'] is None:
+                print(f"  skip {label}: no index")
+                continue
+            result = manager.reindex(model['model_id'])
+            print(f"  reindexed {result['index_name']} in {result['seconds']}s")
+        else:
+            dropped = manager.drop_index(model['model_id'])
+            print(f"  {'dropped' if dropped else 'no index for'} {label}")
+
+
+if __name__ == '__main__':
+    main()
@@ -111,7 +111,8 @@ class RelationshipBuilder:
             ON CONFLICT (subject_entity_id, predicate, object_entity_id)
             DO UPDATE SET
                 confidence_score = EXCLUDED.confidence_score,
-                attributes = EXCLUDED.attributes
+                attributes = EXCLUDED.attributes,
+                updated_at = CURRENT_TIMESTAMP
         """, (subject_id, object_id, similarity, similarity))
 
         # Create reverse relationship: object → subject
@@ -132,7 +133,8 @@ class RelationshipBuilder:
             ON CONFLICT (subject_entity_id, predicate, object_entity_id)
             DO UPDATE SET
                 confidence_score = EXCLUDED.confidence_score,
-                attributes = EXCLUDED.attributes
+                attributes = EXCLUDED.attributes,
+                updated_at = CURRENT_TIMESTAMP
         """, (object_id, subject_id, similarity, similarity))
 
         self.conn.commit()
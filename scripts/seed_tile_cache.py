@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tile Cache Seeding
+
+Pre-renders the vector tiles of a project's extent into the on-disk tile
+cache (see services/tile_cache.py), so the first viewers of a large project
+are not served by PostGIS tile by tile.
+
+Usage:
+    python scripts/seed_tile_cache.py seed --project <project_id> --min-zoom 12 --max-zoom 17
+    python scripts/seed_tile_cache.py seed --project <project_id> --max-zoom 19 --layers utility_lines utility_structures
+    python scripts/seed_tile_cache.py stats
+    python scripts/seed_tile_cache.py clear
+
+Tiles already rendered from the project's current data version are
+skipped, so re-running after an import only renders the retired tiles.
+The cache file is $TILE_CACHE_PATH; use the same value as the web workers.
+"""
+
+import sys
+import os
+import argparse
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.tile_cache import tile_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-render and manage the vector tile cache')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    seed = subparsers.add_parser('seed', help="Render a zoom range over a project's extent")
+    seed.add_argument('--project', required=True, help='Project id')
+    seed.add_argument('--min-zoom', type=int, default=12)
+    seed.add_argument('--max-zoom', type=int, default=17)
+    seed.add_argument('--layers', nargs='+', help='Tile layers (default: all)')
+    seed.add_argument('--workers', type=int, default=4, help='Tiles rendered concurrently')
+    seed.add_argument('--max-tiles', type=int, default=100000,
+                      help='Refuse to seed more tiles than this')
+
+    subparsers.add_parser('stats', help='Cache size and location')
+    subparsers.add_parser('clear', help='Remove every cached tile')
+
+    args = parser.parse_args()
+
+    if args.command == 'stats':
+        stats = tile_cache.stats()
+        print(f"{stats['path']}: {stats['tiles']:,} tiles, "
+              f"{(stats['size_bytes'] or 0) / 1024 / 1024:.1f} of "
+              f"{stats['max_bytes'] / 1024 / 1024:.0f} MB")
+        return
+
+    if args.command == 'clear':
+        tile_cache.clear()
+        print(f"Cleared {tile_cache.path}")
+        return
+
+    try:
+        result = tile_cache.seed(args.project, args.min_zoom, args.max_zoom, layers=args.layers,
+                                 workers=args.workers, max_tiles=args.max_tiles)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    print(f"  {result['tiles']:,} tiles for zooms {args.min_zoom}-{args.max_zoom} in {result['seconds']}s: "
+          f"{result['rendered']:,} rendered, {result['already_cached']:,} already cached, "
+          f"{result['failed']:,} failed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,435 @@
+"""
+Advanced Search Engine - Filtered entity search behind /api/search/execute
+
+1. Keyset (cursor) pagination: results are ordered by (sort column, primary
+   key) and the next page starts after the last row's values, so page 1000
+   is the same index range scan as page 1 (no OFFSET)
+2. Search text is matched with ILIKE '%text%' on trigram-indexed columns
+3. Project entity counts come from the pre-aggregated project_entity_counts
+   table instead of joining and counting three child tables per request
+4. search_history rows are queued in memory and written in batches by a
+   background thread; the search_id is assigned up front so it can be
+   returned immediately
+"""
+
+import atexit
+import base64
+import json
+import threading
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from psycopg2.extras import execute_values
+from tools.db_utils import get_cursor
+
+MAX_PER_PAGE = 500
+
+
+@dataclass(frozen=True)
+class SearchEntity:
+    """How one entity type is selected, filtered and paged."""
+    alias: str
+    key: str
+    query: str
+    text_columns: Tuple[str, ...] = ()
+    # Public sort field -> (SQL expression, SQL type for cursor values)
+    sort_fields: Dict[str, Tuple[str, str]] = field(default_factory=dict)
+    date_fields: Tuple[str, ...] = ('created_at',)
+    geometry: Optional[str] = None
+
+
+ENTITIES = {
+    'utility_structures': SearchEntity(
+        alias='us',
+        key='us.structure_id',
+        query="""
+            SELECT us.structure_id, us.structure_number, us.structure_type,
+                   sts.type_name, us.rim_elevation, us.invert_elevation,
+                   p.project_name, p.municipality,
+                   ST_X(us.rim_geometry) as lon, ST_Y(us.rim_geometry) as lat,
+                   us.created_at
+            FROM utility_structures us
+            LEFT JOIN structure_type_standards sts ON us.structure_type_id = sts.type_id
+            LEFT JOIN projects p ON us.project_id = p.project_id
+            WHERE us.is_active = TRUE
+        """,
+        text_columns=('us.structure_number', 'us.structure_type'),
+        sort_fields={
+            'created_at': ('us.created_at', 'timestamp'),
+            'structure_number': ('us.structure_number', 'text'),
+            'rim_elevation': ('us.rim_elevation', 'numeric'),
+        },
+        date_fields=('created_at', 'updated_at', 'install_date'),
+        geometry='us.rim_geometry',
+    ),
+    'survey_points': SearchEntity(
+        alias='sp',
+        key='sp.point_id',
+        query="""
+            SELECT sp.point_id, sp.point_number, sp.point_description,
+                   spd.description_text, sp.northing, sp.easting, sp.elevation,
+                   sp.survey_date, smt.method_name, sp.surveyed_by,
+                   p.project_name, sp.created_at
+            FROM survey_points sp
+            LEFT JOIN survey_point_description_standards spd ON sp.point_description_id = spd.description_id
+            LEFT JOIN survey_method_types smt ON sp.survey_method_id = smt.method_id
+            LEFT JOIN projects p ON sp.project_id = p.project_id
+            WHERE sp.is_active = TRUE
+        """,
+        text_columns=('sp.point_number', 'sp.point_description'),
+        sort_fields={
+            'created_at': ('sp.created_at', 'timestamp'),
+            'point_number': ('sp.point_number', 'text'),
+            'elevation': ('sp.elevation', 'numeric'),
+            'survey_date': ('sp.survey_date', 'date'),
+        },
+        date_fields=('created_at', 'updated_at', 'survey_date'),
+        geometry='sp.geometry',
+    ),
+    'utility_lines': SearchEntity(
+        alias='ul',
+        key='ul.line_id',
+        query="""
+            SELECT ul.line_id, ul.line_number, ul.line_type, ul.material,
+                   ul.diameter, ul.slope, ul.length_ft,
+                   us1.structure_number as upstream_structure,
+                   us2.structure_number as downstream_structure,
+                   p.project_name, ul.created_at
+            FROM utility_lines ul
+            LEFT JOIN utility_structures us1 ON ul.upstream_structure_id = us1.structure_id
+            LEFT JOIN utility_structures us2 ON ul.downstream_structure_id = us2.structure_id
+            LEFT JOIN projects p ON ul.project_id = p.project_id
+            WHERE ul.is_active = TRUE
+        """,
+        text_columns=('ul.line_number',),
+        sort_fields={
+            'created_at': ('ul.created_at', 'timestamp'),
+            'line_number': ('ul.line_number', 'text'),
+            'length_ft': ('ul.length_ft', 'numeric'),
+        },
+        date_fields=('created_at', 'updated_at', 'install_date'),
+        geometry='ul.geometry',
+    ),
+    'projects': SearchEntity(
+        alias='p',
+        key='p.project_id',
+        query="""
+            SELECT p.project_id, p.project_number, p.project_name,
+                   p.client, p.municipality, p.status, p.start_date,
+                   COALESCE(pc.structure_count, 0) as structure_count,
+                   COALESCE(pc.point_count, 0) as point_count,
+                   COALESCE(pc.line_count, 0) as line_count,
+                   p.created_at
+            FROM projects p
+            LEFT JOIN project_entity_counts pc ON pc.project_id = p.project_id
+            WHERE p.is_active = TRUE
+        """,
+        text_columns=('p.project_name', 'p.project_number'),
+        sort_fields={
+            'created_at': ('p.created_at', 'timestamp'),
+            'project_name': ('p.project_name', 'text'),
+            'project_number': ('p.project_number', 'text'),
+        },
+        date_fields=('created_at', 'updated_at', 'start_date'),
+    ),
+}
+
+
+def encode_cursor(sort_field: str, direction: str, sort_value: Any, key: Any) -> str:
+    """Opaque cursor for the page after a row."""
+    payload = json.dumps([sort_field, direction, sort_value, key], default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str, Any, str]:
+    """(sort field, direction, sort value, key) from encode_cursor()."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_field, direction, sort_value, key = json.loads(base64.urlsafe_b64decode(padded))
+        return sort_field, direction, sort_value, str(uuid.UUID(str(key)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def _like_pattern(text: str) -> str:
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+class AdvancedSearchEngine:
+    """Builds and runs keyset-paginated searches."""
+
+    def build_query(self, entity_type: str, filter_config: Dict[str, Any],
+                    sort_field: str = 'created_at', sort_direction: str = 'DESC',
+                    per_page: int = 50, cursor: Optional[str] = None,
+                    null_tail: bool = False) -> Tuple[str, List[Any]]:
+        """
+        Build the SQL for one page.
+
+        One row more than per_page is selected so the caller can tell
+        whether another page follows. With null_tail, only rows whose sort
+        value is NULL are selected (the end of an ASC ordering, which the
+        keyset predicate after a non-NULL value leaves out).
+
+        Raises:
+            ValueError: Unknown entity type, sort field or direction, or a
+                cursor issued for a different sort
+        """
+        entity = ENTITIES.get(entity_type)
+        if entity is None:
+            raise ValueError(f"Unsupported entity type: {entity_type}")
+        if sort_field not in entity.sort_fields:
+            raise ValueError(f"Unsupported sort field for {entity_type}: {sort_field}")
+        direction = str(sort_direction).upper()
+        if direction not in ('ASC', 'DESC'):
+            raise ValueError(f"Invalid sort direction: {sort_direction}")
+
+        where_clauses, params = self._filters(entity, filter_config or {})
+
+        sort_expr, sort_type = entity.sort_fields[sort_field]
+        if null_tail:
+            where_clauses.append(f"{sort_expr} IS NULL")
+        elif cursor:
+            cursor_field, cursor_direction, sort_value, key = decode_cursor(cursor)
+            if (cursor_field, cursor_direction) != (sort_field, direction):
+                raise ValueError("Cursor was issued for a different sort order")
+            clause, clause_params = self._after(sort_expr, sort_type, entity.key, direction,
+                                                sort_value, key)
+            where_clauses.append(clause)
+            params.extend(clause_params)
+
+        query = entity.query.rstrip()
+        if where_clauses:
+            query += "\n              AND " + "\n              AND ".join(where_clauses)
+        query += f"\n            ORDER BY {sort_expr} {direction}, {entity.key} {direction}"
+        query += "\n            LIMIT %s"
+        params.append(per_page + 1)
+        return query, params
+
+    def search(self, entity_type: str, filter_config: Dict[str, Any],
+               sort_field: str = 'created_at', sort_direction: str = 'DESC',
+               per_page: int = 50, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Run one page of a search.
+
+        Returns:
+            results, count, has_more, next_cursor and execution_time_ms
+        """
+        per_page = max(1, min(int(per_page), MAX_PER_PAGE))
+        direction = str(sort_direction).upper()
+        query, params = self.build_query(entity_type, filter_config, sort_field, direction,
+                                         per_page, cursor)
+
+        start_time = datetime.now()
+        with get_cursor() as cur:
+            cur.execute(query, params)
+            rows = cur.fetchall()
+            if len(rows) <= per_page and self._needs_null_tail(direction, cursor):
+                # Non-NULL values are exhausted; NULLs sort last in ASC order
+                query, params = self.build_query(entity_type, filter_config, sort_field, direction,
+                                                 per_page - len(rows), null_tail=True)
+                cur.execute(query, params)
+                rows = list(rows) + list(cur.fetchall())
+        execution_time = int((datetime.now() - start_time).total_seconds() * 1000)
+
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        next_cursor = None
+        if has_more:
+            last = rows[-1]
+            key_column = ENTITIES[entity_type].key.split('.', 1)[1]
+            next_cursor = encode_cursor(sort_field, direction, last[sort_field], last[key_column])
+
+        return {
+            'results': rows,
+            'count': len(rows),
+            'has_more': has_more,
+            'next_cursor': next_cursor,
+            'execution_time_ms': execution_time,
+        }
+
+    @staticmethod
+    def _needs_null_tail(direction: str, cursor: Optional[str]) -> bool:
+        """Whether a short page must be continued with the NULL sort values."""
+        return direction == 'ASC' and bool(cursor) and decode_cursor(cursor)[2] is not None
+
+    @staticmethod
+    def _after(sort_expr: str, sort_type: str, key: str, direction: str,
+               sort_value: Any, key_value: str) -> Tuple[str, List[Any]]:
+        """
+        Keyset predicate for rows after (sort_value, key_value).
+
+        Follows PostgreSQL's default NULL ordering (NULLS FIRST for DESC,
+        NULLS LAST for ASC) so the (sort column, key) btree index serves the
+        ORDER BY in either direction. After a non-NULL value in ASC order the
+        predicate is the bare row comparison, which the index can use as a
+        range condition; search() fetches the NULL tail separately.
+        """
+        if direction == 'DESC':
+            if sort_value is None:
+                return f"(({sort_expr} IS NULL AND {key} < %s::uuid) OR {sort_expr} IS NOT NULL)", [key_value]
+            return f"({sort_expr}, {key}) < (%s::{sort_type}, %s::uuid)", [sort_value, key_value]
+        if sort_value is None:
+            return f"({sort_expr} IS NULL AND {key} > %s::uuid)", [key_value]
+        return f"({sort_expr}, {key}) > (%s::{sort_type}, %s::uuid)", [sort_value, key_value]
+
+    @staticmethod
+    def _filters(entity: SearchEntity, filter_config: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
+        a = entity.alias
+        where_clauses = []
+        params = []
+
+        # Text search (trigram-indexed ILIKE)
+        if filter_config.get('search_text') and entity.text_columns:
+            pattern = _like_pattern(filter_config['search_text'])
+            where_clauses.append(
+                "(" + " OR ".join(f"{column} ILIKE %s" for column in entity.text_columns) + ")")
+            params.extend([pattern] * len(entity.text_columns))
+
+        if filter_config.get('project_id'):
+            where_clauses.append(f"{a}.project_id = %s")
+            params.append(filter_config['project_id'])
+
+        if a == 'us' and filter_config.get('structure_type_id'):
+            where_clauses.append("us.structure_type_id = %s")
+            params.append(filter_config['structure_type_id'])
+
+        if a == 'ul' and filter_config.get('material'):
+            where_clauses.append("ul.material ILIKE %s")
+            params.append(_like_pattern(filter_config['material']))
+
+        if a == 'sp':
+            elev_range = filter_config.get('elevation_range') or {}
+            if elev_range.get('min') is not None:
+                where_clauses.append("sp.elevation >= %s")
+                params.append(elev_range['min'])
+            if elev_range.get('max') is not None:
+                where_clauses.append("sp.elevation <= %s")
+                params.append(elev_range['max'])
+            if filter_config.get('elevation_null'):
+                where_clauses.append("sp.elevation IS NULL")
+
+        date_range = filter_config.get('date_range')
+        if date_range:
+            date_field = date_range.get('field', 'created_at')
+            if date_field not in entity.date_fields:
+                raise ValueError(f"Unsupported date field: {date_field}")
+            if date_range.get('start'):
+                where_clauses.append(f"{a}.{date_field} >= %s")
+                params.append(date_range['start'])
+            if date_range.get('end'):
+                where_clauses.append(f"{a}.{date_field} <= %s")
+                params.append(date_range['end'])
+
+        spatial = filter_config.get('spatial_search')
+        if spatial and entity.geometry:
+            if spatial['type'] == 'radius':
+                where_clauses.append(
+                    f"ST_DWithin({entity.geometry}, ST_SetSRID(ST_MakePoint(%s, %s), 2226), %s)")
+                params.extend([spatial['center_lon'], spatial['center_lat'], spatial['radius_feet']])
+            elif spatial['type'] == 'bbox':
+                where_clauses.append(
+                    f"{entity.geometry} && ST_MakeEnvelope(%s, %s, %s, %s, 2226)")
+                params.extend([
+                    spatial['min_easting'], spatial['min_northing'],
+                    spatial['max_easting'], spatial['max_northing']
+                ])
+
+        if a == 'us' and filter_config.get('has_no_connections'):
+            where_clauses.append("""NOT EXISTS (
+                SELECT 1 FROM utility_lines ul1
+                WHERE ul1.upstream_structure_id = us.structure_id
+                   OR ul1.downstream_structure_id = us.structure_id
+            )""")
+
+        return where_clauses, params
+
+
+class SearchHistoryLog:
+    """Queues search_history rows and writes them in batches."""
+
+    def __init__(self, flush_interval: Optional[float] = 2.0, max_pending: int = 500):
+        """
+        Args:
+            flush_interval: Seconds between background flushes (None: only
+                on flush() or when max_pending rows are queued)
+            max_pending: Queue length that triggers an immediate flush
+        """
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+        self._stop = threading.Event()
+
+    def record(self, entity_type: str, filter_config: Dict[str, Any], result_count: int,
+               execution_time_ms: int, executed_by: str = 'system',
+               template_id: Optional[str] = None) -> str:
+        """Queue a history row and return its search_id."""
+        search_id = str(uuid.uuid4())
+        with self._lock:
+            self._pending.append((
+                search_id, template_id, entity_type, json.dumps(filter_config, default=str),
+                result_count, execution_time_ms, datetime.now(), executed_by
+            ))
+            full = len(self._pending) >= self.max_pending
+            if self._flusher is None and self.flush_interval:
+                self._flusher = threading.Thread(target=self._flush_loop, name='search-history-flush',
+                                                 daemon=True)
+                self._flusher.start()
+                atexit.register(self.close)
+        if full:
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Search history flush error: {e}")
+        return search_id
+
+    def flush(self) -> int:
+        """Write queued rows; returns how many were written."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return 0
+            try:
+                with get_cursor() as cursor:
+                    execute_values(cursor, """
+                        INSERT INTO search_history
+                        (search_id, template_id, entity_type, filter_config, result_count,
+                         execution_time_ms, executed_at, executed_by)
+                        VALUES %s
+                        ON CONFLICT (search_id) DO NOTHING
+                    """, pending, template='(%s::uuid, %s::uuid, %s, %s::jsonb, %s, %s, %s, %s)')
+            except Exception:
+                with self._lock:
+                    self._pending[:0] = pending
+                raise
+            return len(pending)
+
+    def close(self):
+        """Stop the background flusher and write what is queued."""
+        self._stop.set()
+        if not self._pending:
+            return
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Search history flush error: {e}")
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Search history flush error: {e}")
+
+
+advanced_search_engine = AdvancedSearchEngine()
+search_history_log = SearchHistoryLog()
@@ -13,6 +13,8 @@ from typing import Dict, List, Optional
 import json
 from collections import defaultdict
 
+from services.spatial_proximity_service import spatial_proximity_service
+
 
 class AIClassificationService:
     """Service for AI-powered classification suggestions using embeddings."""
@@ -211,42 +213,37 @@ class AIClassificationService:
             self.conn = psycopg2.connect(**self.db_config)
 
         try:
-            cur = self.conn.cursor(cursor_factory=RealDictCursor)
-
-            # Get entity geometry
-            cur.execute("""
-                SELECT geometry
-                FROM drawing_entities
-                WHERE entity_id = %s
-            """, (entity_id,))
-
-            entity = cur.fetchone()
-            if not entity:
+            # Nearby drawing entities via an indexed ST_DWithin / KNN scan,
+            # then keep those already classified (nearest 50)
+            source = spatial_proximity_service.geometry_of(entity_id, ['drawing_entity'], conn=self.conn)
+            if source is None:
                 return {}
 
-            # Find nearby entities within search radius
-            cur.execute("""
-                WITH target_geom AS (
-                    SELECT ST_Buffer(geometry, %s) as search_area
-                    FROM drawing_entities
-                    WHERE entity_id = %s
-                )
-                SELECT
-                    se.entity_type,
-                    de.layer_name,
-                    se.classification_state,
-                    ST_Distance(de.geometry, (SELECT geometry FROM drawing_entities WHERE entity_id = %s)) as distance
-                FROM drawing_entities de
-                JOIN standards_entities se ON de.entity_id = se.entity_id
-                CROSS JOIN target_geom
-                WHERE ST_Intersects(de.geometry, target_geom.search_area)
-                  AND de.entity_id != %s
-                  AND se.classification_state IN ('auto_classified', 'user_classified')
-                ORDER BY distance
-                LIMIT 50
-            """, (search_radius_feet, entity_id, entity_id, entity_id))
+            candidates = spatial_proximity_service.find_nearby(
+                source['wkt'], source['srid'], search_radius_feet,
+                entity_types=['drawing_entity'], exclude_entity_id=entity_id,
+                limit=500, conn=self.conn
+            )
 
-            nearby = cur.fetchall()
+            nearby = []
+            if candidates:
+                cur = self.conn.cursor(cursor_factory=RealDictCursor)
+                cur.execute("""
+                    SELECT
+                        de.entity_id::text AS entity_id,
+                        se.entity_type,
+                        l.layer_name,
+                        se.classification_state
+                    FROM drawing_entities de
+                    JOIN standards_entities se ON de.entity_id = se.entity_id
+                    LEFT JOIN layers l ON l.layer_id = de.layer_id
+                    WHERE de.entity_id = ANY(%s::uuid[])
+                      AND se.classification_state IN ('auto_classified', 'user_classified')
+                """, ([c['object_id'] for c in candidates],))
+                classified = {row['entity_id']: row for row in cur.fetchall()}
+                cur.close()
+                nearby = [dict(classified[c['object_id']], distance=c['distance_ft'])
+                          for c in candidates if c['object_id'] in classified][:50]
 
             if not nearby:
                 return {
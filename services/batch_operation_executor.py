@@ -0,0 +1,390 @@
+"""
+Batch Operation Executor - Set-based execution of /api/batch/* operations
+
+1. A bulk_update / bulk_delete (or a seeded batch_operation_templates
+   config) is compiled once into a SET clause over validated columns
+2. Entities are changed in chunks with one UPDATE ... WHERE id = ANY(%s)
+   per chunk. The same statement records each row's original and new values
+   on its batch_operation_items row, which is what rollback restores.
+3. Jobs run in a Celery task (app.tasks.execute_batch_job). Each chunk is
+   its own transaction, progress is reported per chunk, and a job cancelled
+   through the API stops before its next chunk.
+4. Every chunk that changes rows bumps the data version of the projects it
+   touched in the same transaction, so cached map tiles are re-rendered.
+"""
+
+import uuid
+from datetime import datetime
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from psycopg2.extras import Json
+from tools.db_utils import get_cursor
+from services.tile_cache import bump_project_data_version
+
+# entity_type -> (table, id column)
+ENTITY_TABLES = {
+    'utility_structures': ('utility_structures', 'structure_id'),
+    'utility_lines': ('utility_lines', 'line_id'),
+    'survey_points': ('survey_points', 'point_id'),
+    'drawing_entities': ('drawing_entities', 'entity_id'),
+}
+
+OPERATION_TYPES = ('bulk_update', 'bulk_delete')
+DEFAULT_CHUNK_SIZE = 5000
+
+
+class BatchOperationExecutor:
+    """Runs batch operations as chunked set-based statements."""
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._columns = {}
+
+    # ------------------------------------------------------------------
+    # Compilation
+    # ------------------------------------------------------------------
+
+    def table_columns(self, table: str) -> set:
+        """Column names of a table (cached)."""
+        if table not in self._columns:
+            with get_cursor() as cursor:
+                cursor.execute("""
+                    SELECT column_name
+                    FROM information_schema.columns
+                    WHERE table_schema = 'public' AND table_name = %s
+                """, (table,))
+                self._columns[table] = {row['column_name'] for row in cursor.fetchall()}
+        return self._columns[table]
+
+    def compile_operation(self, operation_type: str, entity_type: str,
+                          config: Dict[str, Any]) -> Tuple[str, Dict[str, Any], List[str]]:
+        """
+        Compile an operation into a SET clause.
+
+        Supports the config shapes of the seeded templates:
+            {"field": f, "value": v}              set f to v
+            {"field": f, f: v}                    value supplied under the field name
+            {"field": f, "operation": "add_offset", "offset": d}
+            {"fields": [...], "trim_whitespace", "uppercase", "remove_special_chars"}
+        bulk_delete is a soft delete (is_active = FALSE).
+
+        Returns:
+            (SET clause, named parameters, changed columns)
+
+        Raises:
+            ValueError: Unsupported operation or entity type, unknown column,
+                or a missing value
+        """
+        if operation_type not in OPERATION_TYPES:
+            raise ValueError(f"Unsupported operation type: {operation_type}")
+        if entity_type not in ENTITY_TABLES:
+            raise ValueError(f"Unsupported entity type: {entity_type}")
+        table, id_column = ENTITY_TABLES[entity_type]
+        columns = self.table_columns(table)
+        config = config or {}
+
+        def column(name):
+            if name not in columns or name == id_column:
+                raise ValueError(f"Unknown or read-only field for {entity_type}: {name}")
+            return name
+
+        if operation_type == 'bulk_delete':
+            return f"{column('is_active')} = FALSE", {}, ['is_active']
+
+        if config.get('fields'):
+            assignments = []
+            changed = []
+            for name in config['fields']:
+                expr = column(name)
+                if config.get('trim_whitespace', True):
+                    expr = f"TRIM({expr})"
+                if config.get('uppercase'):
+                    expr = f"UPPER({expr})"
+                if config.get('remove_special_chars'):
+                    expr = f"regexp_replace({expr}, '[^A-Za-z0-9 _.-]', '', 'g')"
+                assignments.append(f"{name} = {expr}")
+                changed.append(name)
+            return ", ".join(assignments), {}, changed
+
+        field = config.get('field')
+        if not field:
+            raise ValueError('Missing field for bulk update')
+        field = column(field)
+
+        if config.get('operation') == 'add_offset':
+            if config.get('offset') is None:
+                raise ValueError('Missing offset for add_offset')
+            return f"{field} = {field} + %(offset)s", {'offset': config['offset']}, [field]
+        if config.get('operation'):
+            raise ValueError(f"Unsupported update operation: {config['operation']}")
+
+        if 'value' in config:
+            value = config['value']
+        elif field in config:
+            value = config[field]
+        else:
+            raise ValueError(f"Missing value for {field}")
+        return f"{field} = %(value)s", {'value': value}, [field]
+
+    # ------------------------------------------------------------------
+    # Immediate execution
+    # ------------------------------------------------------------------
+
+    def apply(self, operation_type: str, entity_type: str, entity_ids: List[str],
+              config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Apply an operation to entity_ids in one transaction, chunk by chunk.
+
+        Returns:
+            {'successful': [ids], 'failed': [{'entity_id', 'error'}], 'total'}
+        """
+        assignments, params, _ = self.compile_operation(operation_type, entity_type, config)
+        table, id_column = ENTITY_TABLES[entity_type]
+        valid, failed = _split_ids(entity_ids)
+
+        successful = []
+        with get_cursor() as cursor:
+            for chunk in _chunks(valid, self.chunk_size):
+                cursor.execute(f"""
+                    UPDATE {table}
+                    SET {assignments}
+                    WHERE {id_column} = ANY(%(ids)s::uuid[])
+                    RETURNING {id_column}::text AS entity_id, project_id::text AS project_id
+                """, dict(params, ids=chunk))
+                rows = cursor.fetchall()
+                _bump_projects(cursor, rows)
+                updated = {row['entity_id'] for row in rows}
+                for entity_id in chunk:
+                    if entity_id in updated:
+                        successful.append(entity_id)
+                    else:
+                        failed.append({'entity_id': entity_id, 'error': 'Not found'})
+
+        return {'successful': successful, 'failed': failed, 'total': len(entity_ids)}
+
+    # ------------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------------
+
+    def run_job(self, job_id: str,
+                progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Execute a running batch_operation_jobs row.
+
+        Args:
+            job_id: Job started through /api/batch/jobs/<id>/start
+            progress_callback: Called after each chunk with processed/total
+
+        Returns:
+            Job summary (status, counts, chunks, execution_time_ms)
+        """
+        job = self._load_job(job_id)
+        if job['status'] != 'running':
+            raise ValueError(f"Job {job_id} is {job['status']}, not running")
+
+        try:
+            assignments, params, changed = self.compile_operation(
+                job['operation_type'], job['entity_type'], job['operation_config'])
+        except ValueError as e:
+            self._finish(job_id, 'failed', {'columns': []}, error=str(e))
+            raise
+
+        table, id_column = ENTITY_TABLES[job['entity_type']]
+        snapshot = ", ".join(f"'{name}', t.{name}" for name in changed)
+        start_time = datetime.now()
+        processed = 0
+        chunks = 0
+        after = None
+
+        while True:
+            chunk = self._next_items(job_id, 'pending', after, require_running=True)
+            if not chunk:
+                break
+            after = chunk[-1]
+            chunks += 1
+            try:
+                with get_cursor() as cursor:
+                    cursor.execute(f"""
+                        WITH targets AS (
+                            SELECT t.{id_column} AS entity_id,
+                                   jsonb_build_object({snapshot}) AS original_values
+                            FROM {table} t
+                            WHERE t.{id_column} = ANY(%(ids)s::uuid[])
+                            FOR UPDATE
+                        ), changed AS (
+                            UPDATE {table} t
+                            SET {assignments}
+                            FROM targets
+                            WHERE t.{id_column} = targets.entity_id
+                            RETURNING t.{id_column} AS entity_id, t.project_id, targets.original_values,
+                                      jsonb_build_object({snapshot}) AS new_values
+                        )
+                        UPDATE batch_operation_items i
+                        SET status = 'success',
+                            processed_at = CURRENT_TIMESTAMP,
+                            original_values = changed.original_values,
+                            new_values = changed.new_values
+                        FROM changed
+                        WHERE i.job_id = %(job_id)s
+                          AND i.entity_id = changed.entity_id
+                        RETURNING changed.project_id::text AS project_id
+                    """, dict(params, ids=chunk, job_id=job_id))
+                    _bump_projects(cursor, cursor.fetchall())
+                    self._fail_pending(cursor, job_id, chunk, 'Not found')
+            except Exception as e:
+                with get_cursor() as cursor:
+                    self._fail_pending(cursor, job_id, chunk, str(e))
+
+            processed += len(chunk)
+            if progress_callback:
+                progress_callback({'job_id': job_id, 'processed': processed,
+                                   'total': job['total_items'], 'chunks': chunks})
+
+        summary = {'columns': changed, 'chunks': chunks}
+        return self._finish(job_id, 'completed', summary, start_time=start_time)
+
+    def rollback_job(self, job_id: str,
+                     progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Restore the original values recorded for a job's successful items.
+
+        Raises:
+            ValueError: Job still running, not reversible or already rolled back
+        """
+        job = self._load_job(job_id)
+        if (job['status'] not in ('completed', 'cancelled') or not job['is_reversible']
+                or job['rolled_back_at'] is not None):
+            raise ValueError('Job not found or not reversible')
+
+        table, id_column = ENTITY_TABLES[job['entity_type']]
+        changed = (job['result_summary'] or {}).get('columns') or []
+        columns = self.table_columns(table)
+        if not changed or not set(changed) <= columns:
+            raise ValueError('Job has no recorded columns to restore')
+        assignments = ", ".join(f"{name} = r.{name}" for name in changed)
+
+        restored = 0
+        after = None
+        while True:
+            chunk = self._next_items(job_id, 'success', after)
+            if not chunk:
+                break
+            after = chunk[-1]
+            with get_cursor() as cursor:
+                cursor.execute(f"""
+                    UPDATE {table} t
+                    SET {assignments}
+                    FROM batch_operation_items i,
+                         LATERAL jsonb_populate_record(NULL::{table}, i.original_values) r
+                    WHERE i.job_id = %(job_id)s
+                      AND i.status = 'success'
+                      AND i.entity_id = ANY(%(ids)s::uuid[])
+                      AND t.{id_column} = i.entity_id
+                    RETURNING t.project_id::text AS project_id
+                """, {'job_id': job_id, 'ids': chunk})
+                rows = cursor.fetchall()
+                _bump_projects(cursor, rows)
+                restored += len(rows)
+            if progress_callback:
+                progress_callback({'job_id': job_id, 'restored': restored,
+                                   'total': job['successful_items']})
+
+        with get_cursor() as cursor:
+            cursor.execute("""
+                UPDATE batch_operation_jobs
+                SET rolled_back_at = CURRENT_TIMESTAMP,
+                    is_reversible = FALSE
+                WHERE job_id = %s
+            """, (job_id,))
+        return {'job_id': job_id, 'restored_items': restored}
+
+    def _load_job(self, job_id: str) -> Dict[str, Any]:
+        with get_cursor() as cursor:
+            cursor.execute("""
+                SELECT job_id, operation_type, entity_type, operation_config, status,
+                       total_items, successful_items, is_reversible, rolled_back_at,
+                       result_summary
+                FROM batch_operation_jobs
+                WHERE job_id = %s
+            """, (job_id,))
+            job = cursor.fetchone()
+        if job is None:
+            raise ValueError(f"Job not found: {job_id}")
+        return job
+
+    def _next_items(self, job_id: str, status: str, after: Optional[str],
+                    require_running: bool = False) -> List[str]:
+        running = """
+              AND EXISTS (SELECT 1 FROM batch_operation_jobs
+                          WHERE job_id = %(job_id)s AND status = 'running')
+        """ if require_running else ""
+        with get_cursor() as cursor:
+            cursor.execute(f"""
+                SELECT entity_id::text AS entity_id
+                FROM batch_operation_items
+                WHERE job_id = %(job_id)s
+                  AND status = %(status)s
+                  AND (%(after)s::uuid IS NULL OR entity_id > %(after)s::uuid)
+                  {running}
+                ORDER BY entity_id
+                LIMIT %(limit)s
+            """, {'job_id': job_id, 'status': status, 'after': after, 'limit': self.chunk_size})
+            return [row['entity_id'] for row in cursor.fetchall()]
+
+    @staticmethod
+    def _fail_pending(cursor, job_id: str, chunk: List[str], error: str):
+        cursor.execute("""
+            UPDATE batch_operation_items
+            SET status = 'failed',
+                processed_at = CURRENT_TIMESTAMP,
+                error_message = %s
+            WHERE job_id = %s
+              AND entity_id = ANY(%s::uuid[])
+              AND status = 'pending'
+        """, (error, job_id, chunk))
+
+    @staticmethod
+    def _finish(job_id: str, status: str, summary: Dict[str, Any], error: Optional[str] = None,
+                start_time: Optional[datetime] = None) -> Dict[str, Any]:
+        execution_time = int((datetime.now() - start_time).total_seconds() * 1000) if start_time else None
+        with get_cursor() as cursor:
+            cursor.execute("""
+                UPDATE batch_operation_jobs
+                SET status = CASE WHEN status = 'cancelled' THEN status ELSE %s END,
+                    completed_at = COALESCE(completed_at, CURRENT_TIMESTAMP),
+                    execution_time_ms = COALESCE(%s, execution_time_ms),
+                    result_summary = %s,
+                    error_summary = %s,
+                    is_reversible = successful_items > 0
+                WHERE job_id = %s
+                RETURNING job_id::text, status, total_items, processed_items,
+                          successful_items, failed_items, execution_time_ms
+            """, (status, execution_time, Json(summary),
+                  Json({'error': error}) if error else None, job_id))
+            result = dict(cursor.fetchone())
+        result['chunks'] = summary.get('chunks', 0)
+        return result
+
+
+def _split_ids(entity_ids: List[str]) -> Tuple[List[str], List[Dict[str, str]]]:
+    valid = []
+    failed = []
+    for entity_id in entity_ids:
+        try:
+            valid.append(str(uuid.UUID(str(entity_id))))
+        except ValueError:
+            failed.append({'entity_id': entity_id, 'error': 'Invalid id'})
+    return valid, failed
+
+
+def _bump_projects(cursor, rows: List[Dict[str, Any]]):
+    for project_id in sorted({row['project_id'] for row in rows if row['project_id']}):
+        bump_project_data_version(project_id, cursor)
+
+
+def _chunks(items: List[Any], size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+batch_operation_executor = BatchOperationExecutor()
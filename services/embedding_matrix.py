@@ -0,0 +1,200 @@
+"""
+Embedding Matrix - In-process similarity and clustering over entity embeddings
+
+Loads the current embeddings of a set of entities once, as an (N, d)
+float32 NumPy array of unit vectors, instead of having PostgreSQL compute
+and ship every pair:
+1. Cosine similarity is a dot product of normalised rows, computed one
+   block of rows at a time, so working memory is block_size x N floats
+2. Per-row top-k / minimum-similarity selection keeps large results sparse
+3. K-means, hierarchical and DBSCAN clustering run on the array itself;
+   hierarchical clustering of large sets agglomerates mini-batch k-means
+   micro-clusters so it never needs the full N x N distance matrix
+"""
+
+from collections import Counter
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from tools.db_utils import execute_query
+
+
+# Rows per similarity block are sized so one block stays under this many bytes
+DEFAULT_BLOCK_BYTES = 64 * 1024 * 1024
+CLUSTER_METHODS = ('kmeans', 'hierarchical', 'dbscan')
+
+
+def parse_vectors(texts: List[str]) -> np.ndarray:
+    """Parse pgvector text values ('[x,y,...]') into an (N, d) float32 array."""
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    flat = np.fromstring(','.join(text.strip()[1:-1] for text in texts), dtype=np.float32, sep=',')
+    return flat.reshape(len(texts), -1)
+
+
+class EmbeddingMatrix:
+    """Current embeddings of a set of entities, one L2-normalised row per entity."""
+
+    def __init__(self, entity_ids: List[str], vectors: np.ndarray,
+                 entities: Optional[List[Dict[str, Any]]] = None, model_id: Optional[str] = None):
+        """
+        Args:
+            entity_ids: Entity id per row
+            vectors: (N, d) embedding array (normalised here)
+            entities: Metadata per row (entity_type, canonical_name)
+            model_id: Embedding model the vectors belong to
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True) if vectors.size else 1.0
+        self.vectors = vectors / np.where(norms == 0, 1.0, norms)
+        self.entity_ids = [str(entity_id) for entity_id in entity_ids]
+        self.entities = entities or [{} for _ in self.entity_ids]
+        self.model_id = model_id
+
+    def __len__(self) -> int:
+        return len(self.entity_ids)
+
+    @classmethod
+    def load(cls, entity_ids: List[str], model_id: Optional[str] = None) -> 'EmbeddingMatrix':
+        """
+        Fetch the entities' current embeddings in one query.
+
+        Similarities are only meaningful within one model, so vectors come
+        from model_id, or from the model that covers most of the entities.
+        Entities without an embedding for that model are left out.
+        """
+        entity_ids = [str(entity_id) for entity_id in entity_ids]
+        if model_id is None:
+            rows = execute_query("""
+                SELECT model_id, COUNT(*) AS vectors
+                FROM entity_embeddings
+                WHERE entity_id = ANY(%s::uuid[]) AND is_current = TRUE
+                GROUP BY model_id
+                ORDER BY vectors DESC, model_id
+                LIMIT 1
+            """, (entity_ids,))
+            if not rows:
+                return cls([], np.zeros((0, 0), dtype=np.float32))
+            model_id = rows[0]['model_id']
+
+        rows = execute_query("""
+            SELECT ee.entity_id, ee.embedding::text AS embedding,
+                   se.entity_type, se.canonical_name
+            FROM entity_embeddings ee
+            JOIN standards_entities se ON se.entity_id = ee.entity_id
+            WHERE ee.entity_id = ANY(%s::uuid[])
+              AND ee.model_id = %s
+              AND ee.is_current = TRUE
+            ORDER BY ee.entity_id
+        """, (entity_ids, str(model_id))) or []
+
+        return cls([row['entity_id'] for row in rows],
+                   parse_vectors([row['embedding'] for row in rows]),
+                   [{'entity_type': row['entity_type'], 'canonical_name': row['canonical_name']}
+                    for row in rows],
+                   str(model_id))
+
+    def block_rows(self, block_bytes: int = DEFAULT_BLOCK_BYTES) -> int:
+        """Rows per similarity block so that one block fits in block_bytes."""
+        return max(1, min(len(self), block_bytes // (4 * max(len(self), 1))))
+
+    def similarity_blocks(self, block_size: Optional[int] = None) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Cosine similarities, one block of rows at a time.
+
+        Yields:
+            (first row, (rows, N) float32 block of similarities)
+        """
+        block_size = block_size or self.block_rows()
+        for start in range(0, len(self), block_size):
+            yield start, self.vectors[start:start + block_size] @ self.vectors.T
+
+    def similarity_rows(self, top_k: Optional[int] = None, min_similarity: Optional[float] = None,
+                        block_size: Optional[int] = None, decimals: int = 4) -> Dict[str, Dict[str, float]]:
+        """
+        Similarity matrix as {entity_id: {entity_id: score}}.
+
+        Without top_k or min_similarity every pair is returned. With them,
+        each row keeps its top_k most similar entities (itself included)
+        and/or those at or above min_similarity.
+        """
+        ids = self.entity_ids
+        matrix = {}
+        for start, block in self.similarity_blocks(block_size):
+            for offset, row in enumerate(block):
+                if top_k is not None and top_k < len(ids):
+                    columns = np.argpartition(-row, top_k - 1)[:top_k]
+                    columns = columns[np.argsort(-row[columns], kind='stable')]
+                else:
+                    columns = np.arange(len(ids))
+                if min_similarity is not None:
+                    columns = columns[row[columns] >= min_similarity]
+                scores = np.round(row[columns], decimals).tolist()
+                matrix[ids[start + offset]] = dict(zip((ids[c] for c in columns), scores))
+        return matrix
+
+    def cluster(self, num_clusters: int = 5, method: str = 'kmeans', eps: float = 0.15,
+                min_samples: int = 2, max_linkage_points: int = 2000,
+                random_state: int = 0) -> np.ndarray:
+        """
+        Cluster label per row (-1 marks DBSCAN noise).
+
+        Args:
+            num_clusters: Clusters for kmeans / hierarchical
+            method: 'kmeans', 'hierarchical' or 'dbscan'
+            eps: DBSCAN neighbourhood radius in cosine distance (1 - similarity)
+            min_samples: DBSCAN core point size
+            max_linkage_points: Above this many rows, hierarchical clustering
+                links mini-batch k-means micro-clusters (20 per cluster, at
+                most max_linkage_points) instead of the rows themselves
+            random_state: Seed for k-means
+        """
+        from sklearn.cluster import KMeans, MiniBatchKMeans, DBSCAN, AgglomerativeClustering
+
+        if method not in CLUSTER_METHODS:
+            raise ValueError(f"Unknown clustering method '{method}'. Use one of: {', '.join(CLUSTER_METHODS)}")
+
+        n = len(self)
+        if method == 'dbscan':
+            return DBSCAN(eps=eps, min_samples=min_samples, metric='cosine',
+                          algorithm='brute').fit_predict(self.vectors)
+
+        num_clusters = max(1, min(num_clusters, n))
+        if method == 'kmeans':
+            # Euclidean k-means on unit vectors ranks like cosine similarity
+            return KMeans(n_clusters=num_clusters, n_init=3,
+                          random_state=random_state).fit_predict(self.vectors)
+
+        points, assignment = self.vectors, None
+        if n > max_linkage_points:
+            micro_clusters = min(max_linkage_points, max(20 * num_clusters, 200))
+            micro = MiniBatchKMeans(n_clusters=micro_clusters, n_init=1, batch_size=2048,
+                                    random_state=random_state).fit(self.vectors)
+            points, assignment = micro.cluster_centers_, micro.labels_
+        labels = AgglomerativeClustering(n_clusters=num_clusters, metric='cosine',
+                                         linkage='average').fit_predict(points)
+        return labels if assignment is None else labels[assignment]
+
+    def describe_clusters(self, labels: np.ndarray, decimals: int = 4) -> List[Dict[str, Any]]:
+        """
+        Summarise clusters: members, size, most common entity type, the
+        member closest to the centroid and cohesion (mean similarity of
+        members to the centroid direction).
+        """
+        clusters = []
+        for label in sorted(set(labels.tolist()) - {-1}):
+            members = np.flatnonzero(labels == label)
+            centroid = self.vectors[members].mean(axis=0)
+            norm = np.linalg.norm(centroid)
+            similarity = self.vectors[members] @ (centroid / norm if norm else centroid)
+            types = Counter(self.entities[i].get('entity_type') for i in members)
+            clusters.append({
+                'cluster_id': label,
+                'entity_ids': [self.entity_ids[i] for i in members],
+                'size': int(len(members)),
+                'representative_type': types.most_common(1)[0][0],
+                'representative_entity_id': self.entity_ids[members[int(np.argmax(similarity))]],
+                'cohesion': round(float(similarity.mean()), decimals)
+            })
+        return clusters
@@ -0,0 +1,131 @@
+"""
+GeoJSON Stream - Streamed GeoJSON / NDJSON responses for map layer endpoints
+
+1. Rows are read through a server-side (named) cursor, itersize rows at a
+   time, so a request holds one batch in memory whatever the layer size
+2. The ST_AsGeoJSON text of each row is spliced into the output as is;
+   only the properties are serialized by Python
+3. Output is a FeatureCollection written in chunks, or NDJSON (one Feature
+   per line); members known only at the end (such as the feature count)
+   are written after the features array
+4. The query is executed before the response starts, so SQL errors can
+   still be answered with an error status
+"""
+
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from tools.db_utils import get_connection
+
+GEOJSON_MIMETYPE = 'application/geo+json'
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# (query, params, property transform or None)
+FeatureSource = Tuple[str, Any, Optional[Callable[[Dict[str, Any]], Dict[str, Any]]]]
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def feature_text(geometry_json: Optional[str], properties: Dict[str, Any]) -> str:
+    """A GeoJSON Feature with the geometry text spliced in unparsed."""
+    return ('{"type":"Feature","geometry":' + (geometry_json or 'null') +
+            ',"properties":' + json.dumps(properties, default=_json_default, separators=(',', ':')) + '}')
+
+
+def _features(sources: Iterable[FeatureSource], geometry_column: str, itersize: int,
+              counter: List[int]) -> Iterator[str]:
+    """Feature texts of each source query, read with a named cursor."""
+    with get_connection() as conn:
+        try:
+            for query, params, transform in sources:
+                with conn.cursor(name=f'geojson_{uuid.uuid4().hex}') as cursor:
+                    cursor.itersize = itersize
+                    cursor.execute(query, params)
+                    columns = None
+                    for row in cursor:
+                        if columns is None:
+                            columns = [column[0] for column in cursor.description]
+                            geometry_index = columns.index(geometry_column)
+                        properties = {name: value for name, value in zip(columns, row)
+                                      if name != geometry_column and value is not None}
+                        if transform is not None:
+                            properties = transform(properties)
+                        counter[0] += 1
+                        yield feature_text(row[geometry_index], properties)
+        finally:
+            conn.rollback()
+
+
+def _chunks(texts: Iterator[str], separator: str, chunk_features: int,
+            first_prefix: str = '') -> Iterator[str]:
+    """Join feature texts into chunks of chunk_features features."""
+    batch = []
+    prefix = first_prefix
+    for text in texts:
+        batch.append(text)
+        if len(batch) >= chunk_features:
+            yield prefix + separator.join(batch)
+            prefix = separator
+            batch = []
+    if batch:
+        yield prefix + separator.join(batch)
+
+
+def stream_features(sources: Iterable[FeatureSource], format: str = 'geojson',
+                    geometry_column: str = 'geometry_json', itersize: int = 2000,
+                    chunk_features: int = 500,
+                    trailer: Optional[Callable[[int], Dict[str, Any]]] = None) -> Iterator[str]:
+    """
+    Response body streaming the features of one or more queries.
+
+    Args:
+        sources: (query, params, property transform) per query; each query
+            returns a geometry_column of ST_AsGeoJSON text and property columns
+            (NULL properties are omitted)
+        format: 'geojson' (FeatureCollection) or 'ndjson'
+        itersize: Rows fetched per round trip
+        chunk_features: Features per yielded chunk
+        trailer: Called with the feature count; its members are appended to
+            the FeatureCollection after 'features'
+
+    Raises:
+        ValueError: Unknown format
+        Exception: Database errors of the first query, raised here rather
+            than mid-response
+    """
+    if format not in ('geojson', 'ndjson'):
+        raise ValueError(f"Unknown format: {format}")
+
+    counter = [0]
+    features = _features(sources, geometry_column, itersize, counter)
+    # Run the first query now so errors surface before the response starts
+    first = next(features, None)
+    texts = chain([first], features) if first is not None else iter(())
+
+    if format == 'ndjson':
+        return (chunk + '\n' for chunk in _chunks(texts, '\n', chunk_features))
+
+    def collection():
+        yield '{"type":"FeatureCollection","features":['
+        yield from _chunks(texts, ',', chunk_features)
+        members = trailer(counter[0]) if trailer else {}
+        tail = ''.join(f',{json.dumps(key)}:{json.dumps(value, default=_json_default)}'
+                       for key, value in members.items())
+        yield ']' + tail + '}'
+
+    return collection()
+
+
+def mimetype(format: str) -> str:
+    """Content type of a stream_features format."""
+    return NDJSON_MIMETYPE if format == 'ndjson' else GEOJSON_MIMETYPE
@@ -0,0 +1,199 @@
+"""
+Geometry Generalization Service
+
+Precomputed simplified geometry for the map viewer's GeoJSON layers.
+
+1. Lines and polygons with more than MIN_POINTS vertices (tessellated
+   circles and arcs, contours, parcel boundaries) get one row per
+   generalization level in generalized_geometries: snapped to a grid of a
+   quarter of the level's tolerance, then ST_SimplifyPreserveTopology'd to
+   the tolerance, in 2D.
+2. refresh() is incremental: rows are keyed by an md5 of the source
+   geometry, so only new or changed features are simplified and rows of
+   deleted or edited features are dropped. It runs in the import
+   transaction of DXF imports, DXF re-imports and GIS snapshot imports.
+3. The serving side picks the coarsest level whose tolerance is under one
+   screen pixel for the requested zoom (or bbox and viewport width), falls
+   back to the source geometry for features without a generalized row,
+   skips features smaller than a pixel and rounds GeoJSON coordinates to
+   the pixel size.
+"""
+
+import math
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+from psycopg2 import errors
+
+from tools.db_utils import get_cursor
+from services.map_viewer_service import pixel_size_ft
+
+# (level, tolerance in feet), finest first
+GENERALIZATION_LEVELS = ((1, 2.0), (2, 8.0), (3, 32.0), (4, 128.0))
+
+# table -> (id column, geometry column)
+GENERALIZED_TABLES = {
+    'drawing_entities': ('entity_id', 'geometry'),
+    'parcels': ('parcel_id', 'boundary_geometry'),
+    'utility_lines': ('line_id', 'geometry'),
+    'surface_features': ('feature_id', 'geometry'),
+}
+
+# Features with fewer vertices gain little from simplification
+MIN_POINTS = 8
+
+FEET_PER_DEGREE = 364000.0
+
+
+class GeometryGeneralizationService:
+    """Maintains and selects generalized geometry for map layers."""
+
+    def __init__(self, levels: Tuple[Tuple[int, float], ...] = GENERALIZATION_LEVELS,
+                 tables: Optional[Dict[str, Tuple[str, str]]] = None):
+        self.levels = levels
+        self.tables = tables if tables is not None else GENERALIZED_TABLES
+
+    # ------------------------------------------------------------------
+    # Level selection
+    # ------------------------------------------------------------------
+
+    def level_for_resolution(self, feet_per_pixel: float) -> Optional[int]:
+        """Coarsest level whose tolerance is at most one pixel, or None for full resolution."""
+        level = None
+        for candidate, tolerance in self.levels:
+            if tolerance <= feet_per_pixel:
+                level = candidate
+        return level
+
+    def level_for_zoom(self, zoom: int) -> Optional[int]:
+        """Generalization level for a web map zoom."""
+        return self.level_for_resolution(pixel_size_ft(zoom))
+
+    @staticmethod
+    def coordinate_digits(feet_per_pixel: float) -> int:
+        """GeoJSON decimal places (WGS84) that keep coordinates within a pixel."""
+        degrees = feet_per_pixel / FEET_PER_DEGREE
+        return min(max(math.ceil(-math.log10(degrees)) + 1, 5), 9)
+
+    def geometry_sql(self, table: str, alias: str, level: Optional[int],
+                     geometry_column: str = 'geometry') -> Tuple[str, str]:
+        """
+        JOIN clause and geometry expression serving a table at a level.
+
+        Tables without generalized rows, and level None, use the source
+        geometry unchanged (geometry_column for tables that are not
+        generalized).
+        """
+        id_column, geometry_column = self.tables.get(table, (None, geometry_column))
+        if level is None or id_column is None:
+            return '', f"{alias}.{geometry_column}"
+        join = (f"LEFT JOIN generalized_geometries gg ON gg.source_table = '{table}' "
+                f"AND gg.source_id = {alias}.{id_column} AND gg.level = {int(level)}")
+        return join, f"COALESCE(gg.geometry, {alias}.{geometry_column})"
+
+    @staticmethod
+    def min_size_sql(geometry: str) -> str:
+        """Filter dropping lines and polygons smaller than %(min_size)s (points are kept)."""
+        return (f"(ST_Dimension({geometry}) = 0 OR "
+                f"(ST_XMax({geometry}) - ST_XMin({geometry})) + "
+                f"(ST_YMax({geometry}) - ST_YMin({geometry})) >= %(min_size)s)")
+
+    # ------------------------------------------------------------------
+    # Refresh
+    # ------------------------------------------------------------------
+
+    def refresh(self, project_id: Optional[str] = None, tables: Optional[Iterable[str]] = None,
+                cursor=None) -> Dict[str, Any]:
+        """
+        Bring generalized rows up to date with the source tables.
+
+        Args:
+            project_id: Only refresh this project's features (all if None)
+            tables: Source tables (default: all generalized tables; others
+                are ignored)
+            cursor: Cursor of the caller's transaction (default: own connection)
+
+        Returns:
+            Rows removed and added per table (empty if generalized_geometries
+            does not exist)
+        """
+        if cursor is None:
+            with get_cursor(dict_cursor=False) as own_cursor:
+                return self.refresh(project_id, tables, own_cursor)
+
+        # A savepoint keeps the caller's transaction usable when migration 047
+        # has not been applied; layers then serve the source geometry
+        cursor.execute("SAVEPOINT generalized_geometries")
+        try:
+            summary = self._refresh_tables(project_id, tables, cursor)
+        except (errors.UndefinedTable, errors.UndefinedFunction) as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT generalized_geometries")
+            print(f"Generalized geometry not refreshed (migration 047 not applied): {e}")
+            return {}
+        cursor.execute("RELEASE SAVEPOINT generalized_geometries")
+        return summary
+
+    def _refresh_tables(self, project_id: Optional[str], tables: Optional[Iterable[str]],
+                        cursor) -> Dict[str, Any]:
+        levels = ', '.join(f"({level}, {float(tolerance)})" for level, tolerance in self.levels)
+        params = {'project_id': str(project_id) if project_id else None, 'min_points': MIN_POINTS}
+        summary = {}
+        for table in tables or self.tables:
+            if table not in self.tables:
+                continue
+            id_column, geometry_column = self.tables[table]
+            params['table'] = table
+            source_filter = "AND t.project_id = %(project_id)s" if project_id else ""
+            generalized_filter = "AND g.project_id = %(project_id)s" if project_id else ""
+
+            # Rows whose source was deleted or whose geometry changed
+            cursor.execute(f"""
+                DELETE FROM generalized_geometries g
+                WHERE g.source_table = %(table)s
+                  {generalized_filter}
+                  AND NOT EXISTS (
+                      SELECT 1 FROM {table} t
+                      WHERE t.{id_column} = g.source_id
+                        AND md5(ST_AsEWKB(t.{geometry_column})) = g.source_hash
+                  )
+            """, params)
+            removed = cursor.rowcount
+
+            cursor.execute(f"""
+                INSERT INTO generalized_geometries
+                    (source_table, source_id, level, project_id, source_hash, geometry)
+                SELECT %(table)s, s.source_id, s.level, s.project_id, s.source_hash, s.geometry
+                FROM (
+                    SELECT t.{id_column} AS source_id,
+                           lv.level,
+                           t.project_id,
+                           md5(ST_AsEWKB(t.{geometry_column})) AS source_hash,
+                           ST_SimplifyPreserveTopology(
+                               ST_SnapToGrid(ST_Force2D(t.{geometry_column}), lv.tolerance / 4),
+                               lv.tolerance) AS geometry
+                    FROM {table} t
+                    CROSS JOIN (VALUES {levels}) AS lv(level, tolerance)
+                    WHERE t.{geometry_column} IS NOT NULL
+                      AND ST_Dimension(t.{geometry_column}) > 0
+                      AND ST_NPoints(t.{geometry_column}) > %(min_points)s
+                      {source_filter}
+                      AND NOT EXISTS (
+                          SELECT 1 FROM generalized_geometries g
+                          WHERE g.source_table = %(table)s
+                            AND g.source_id = t.{id_column}
+                            AND g.level = lv.level
+                      )
+                ) s
+                WHERE s.geometry IS NOT NULL
+                  AND NOT ST_IsEmpty(s.geometry)
+                ON CONFLICT (source_table, source_id, level) DO UPDATE
+                SET source_hash = EXCLUDED.source_hash,
+                    geometry = EXCLUDED.geometry,
+                    project_id = EXCLUDED.project_id
+            """, params)
+            summary[table] = {'removed': removed, 'added': cursor.rowcount}
+
+        return summary
+
+
+# Global instance
+geometry_generalization_service = GeometryGeneralizationService()
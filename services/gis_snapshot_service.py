@@ -16,6 +16,8 @@ from datetime import datetime
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from services.coordinate_system_service import CoordinateSystemService
+from services.tile_cache import bump_project_data_version
+from services.geometry_generalization_service import geometry_generalization_service
 
 
 class GISSnapshotService:
@@ -89,6 +91,12 @@ class GISSnapshotService:
             # 5. Update snapshot record
             self._update_snapshot_complete(snapshot_id, entity_count, conn)
 
+            # Refresh simplified map geometry and retire cached map tiles
+            with conn.cursor() as cur:
+                geometry_generalization_service.refresh(
+                    project_id, tables=[snapshot_info['target_table_name']], cursor=cur)
+                bump_project_data_version(project_id, cur)
+
             # Commit transaction
             conn.commit()
 
@@ -9,6 +9,9 @@ Provides graph analytics capabilities:
 5. Structural analysis (density, components, etc.)
 6. Temporal analysis of relationship changes
 
+Graphs come from the shared, incrementally refreshed GraphStore rather than
+being rebuilt from entity_relationships on every call.
+
 Author: AI Agent Toolkit
 Date: 2025-11-18
 """
@@ -18,7 +21,9 @@ from typing import List, Dict, Any, Optional, Tuple, Set
 from datetime import datetime, timedelta
 from collections import defaultdict
 import networkx as nx
+import numpy as np
 from database import execute_query, get_db
+from services.graph_store import GraphStore, graph_store, graph_to_csr, pagerank_csr
 
 
 class GraphAnalyticsService:
@@ -26,10 +31,16 @@ class GraphAnalyticsService:
     Advanced graph analytics using NetworkX algorithms
     """
 
-    def __init__(self):
-        """Initialize the graph analytics service"""
+    def __init__(self, store: Optional[GraphStore] = None):
+        """
+        Initialize the graph analytics service
+
+        Args:
+            store: Graph store to read from (defaults to the process-wide store)
+        """
         self.cache_ttl = 3600  # 1 hour cache TTL for analytics
         self.min_confidence_score = 0.3  # Minimum relationship confidence to include
+        self.graph_store = store or graph_store
 
     def compute_pagerank(self, project_id: Optional[str] = None,
                         entity_type: Optional[str] = None,
@@ -51,14 +62,13 @@ class GraphAnalyticsService:
             if cached:
                 return cached['result_data']
 
-        # Build NetworkX graph
-        G = self._build_networkx_graph(project_id, entity_type)
+        nodes, A = self._get_adjacency_matrix(project_id, entity_type)
 
-        if G.number_of_nodes() == 0:
+        if not nodes:
             return {}
 
-        # Compute PageRank
-        pagerank_scores = nx.pagerank(G, alpha=0.85, max_iter=100)
+        # Compute PageRank on the cached CSR matrix
+        pagerank_scores = pagerank_csr(nodes, A, alpha=0.85, max_iter=100)
 
         # Cache the result
         if use_cache:
@@ -67,8 +77,8 @@ class GraphAnalyticsService:
                 'project' if project_id else 'global',
                 project_id,
                 {'pagerank_scores': pagerank_scores},
-                G.number_of_nodes(),
-                G.number_of_edges()
+                len(nodes),
+                A.nnz
             )
 
         return pagerank_scores
@@ -198,21 +208,17 @@ class GraphAnalyticsService:
         results = {}
 
         if 'degree' in measures:
-            if G.is_directed():
-                in_degree = dict(G.in_degree())
-                out_degree = dict(G.out_degree())
-                results['in_degree'] = in_degree
-                results['out_degree'] = out_degree
-                results['degree'] = {k: in_degree.get(k, 0) + out_degree.get(k, 0) for k in G.nodes()}
-            else:
-                results['degree'] = dict(G.degree())
+            in_degree, out_degree = self._degree_counts(project_id)
+            results['in_degree'] = in_degree
+            results['out_degree'] = out_degree
+            results['degree'] = {k: in_degree[k] + out_degree[k] for k in in_degree}
 
         if 'betweenness' in measures:
             results['betweenness'] = nx.betweenness_centrality(G)
 
         if 'closeness' in measures:
             # Handle disconnected graphs
-            if nx.is_connected(G.to_undirected()):
+            if nx.is_weakly_connected(G):
                 results['closeness'] = nx.closeness_centrality(G)
             else:
                 results['closeness'] = {node: 0.0 for node in G.nodes()}
@@ -381,8 +387,8 @@ class GraphAnalyticsService:
         if metric == 'pagerank':
             scores = self.compute_pagerank(project_id)
         elif metric == 'degree':
-            G = self._build_networkx_graph(project_id)
-            scores = dict(G.degree())
+            in_degree, out_degree = self._degree_counts(project_id)
+            scores = {k: in_degree[k] + out_degree[k] for k in in_degree}
         elif metric == 'betweenness':
             centrality = self.compute_centrality_measures(project_id, ['betweenness'])
             scores = centrality['betweenness']
@@ -520,47 +526,46 @@ class GraphAnalyticsService:
                              entity_type: Optional[str] = None,
                              directed: bool = True) -> nx.Graph:
         """
-        Build a NetworkX graph from the database
+        Get the shared NetworkX graph for a scope from the graph store
 
         Args:
             project_id: Optional project scope
-            entity_type: Optional entity type filter
-            directed: Whether to create a directed graph
+            entity_type: Optional entity type filter (keeps edges whose
+                subject and object are both of this type)
+            directed: Whether to return the directed graph
 
         Returns:
-            NetworkX Graph or DiGraph
+            Read-only NetworkX Graph or DiGraph
         """
-        # Query relationships
-        query = """
-            SELECT
-                subject_entity_id,
-                object_entity_id,
-                relationship_type,
-                confidence_score,
-                attributes
-            FROM entity_relationships
-            WHERE confidence_score >= %s
-        """
-
-        params = [self.min_confidence_score]
+        project_graph = self.graph_store.get(project_id, self.min_confidence_score)
+        G = project_graph.graph if directed else project_graph.undirected()
 
-        # Add filters if needed (simplified - full implementation would join with entities table)
-        relationships = execute_query(query, tuple(params))
+        if entity_type:
+            G = G.subgraph([node for node, node_type in G.nodes(data='entity_type')
+                            if node_type == entity_type])
 
-        # Create graph
-        G = nx.DiGraph() if directed else nx.Graph()
+        return G
 
-        # Add edges
-        for rel in relationships:
-            G.add_edge(
-                rel['subject_entity_id'],
-                rel['object_entity_id'],
-                relationship_type=rel['relationship_type'],
-                confidence=rel['confidence_score'],
-                attributes=rel.get('attributes', {})
-            )
+    def _get_adjacency_matrix(self, project_id: Optional[str] = None,
+                              entity_type: Optional[str] = None):
+        """
+        Get the CSR adjacency matrix for a scope
 
-        return G
+        Returns:
+            Tuple of (node list in matrix order, scipy.sparse csr_array)
+        """
+        if entity_type:
+            return graph_to_csr(self._build_networkx_graph(project_id, entity_type))
+        return self.graph_store.get(project_id, self.min_confidence_score).csr()
+
+    def _degree_counts(self, project_id: Optional[str] = None,
+                       entity_type: Optional[str] = None) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """In- and out-degree of every node, from the CSR adjacency matrix"""
+        nodes, A = self._get_adjacency_matrix(project_id, entity_type)
+        out_counts = np.asarray(A.sum(axis=1)).ravel().astype(int)
+        in_counts = np.asarray(A.sum(axis=0)).ravel().astype(int)
+        return (dict(zip(nodes, map(int, in_counts))),
+                dict(zip(nodes, map(int, out_counts))))
 
     def _get_cached_analytics(self, analysis_type: str, scope_type: str,
                              scope_id: Optional[str]) -> Optional[Dict[str, Any]]:
@@ -616,7 +621,8 @@ class GraphAnalyticsService:
             print(f"Cache write error: {e}")
 
     def invalidate_analytics_cache(self, project_id: Optional[str] = None):
-        """Invalidate analytics cache for a project or globally"""
+        """Invalidate analytics cache (and in-process graphs) for a project or globally"""
+        self.graph_store.invalidate(project_id)
         if project_id:
             query = "UPDATE graph_analytics_cache SET is_valid = FALSE WHERE scope_id = %s"
             execute_query(query, (project_id,))
@@ -0,0 +1,313 @@
+"""
+Graph Store - In-process relationship graphs for graph analytics
+
+Keeps one NetworkX graph per scope (a project, or the whole database) built
+from entity_relationships, so analytics calls share a graph instead of
+re-reading the table each time:
+1. Graphs are loaded once per scope, filtered to that project in SQL
+2. Later calls apply only inserted/updated/deleted relationships
+3. A CSR (scipy.sparse) adjacency matrix is cached per graph version for
+   numeric algorithms such as PageRank and degree counts
+
+Graphs returned by the store are shared and must be treated as read-only.
+"""
+
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+import networkx as nx
+import numpy as np
+import scipy.sparse
+from database import execute_query
+
+
+RELATIONSHIP_COLUMNS = """
+    er.relationship_id,
+    er.subject_entity_id,
+    er.object_entity_id,
+    er.relationship_type,
+    er.confidence_score,
+    er.attributes,
+    er.updated_at,
+    se.entity_type AS subject_entity_type,
+    oe.entity_type AS object_entity_type
+"""
+
+
+class ProjectGraph:
+    """
+    Directed relationship graph for one scope, updated in place.
+
+    Every relationship in scope is tracked by relationship_id so that deletes
+    and confidence changes can be applied without a rebuild; only
+    relationships at or above min_confidence become graph edges. When several
+    relationships join the same pair of entities, the most recently applied
+    one supplies the edge attributes.
+    """
+
+    def __init__(self, project_id: Optional[str], min_confidence: float):
+        self.project_id = project_id
+        self.min_confidence = min_confidence
+        self.graph = nx.DiGraph()
+        self.version = 0
+        self.watermark = None       # Latest updated_at seen
+        self.loaded_at = None
+        self.refreshed_at = None
+        self._relationships = {}    # relationship_id -> (subject, object) or None if below threshold
+        self._pair_relationships = {}  # (subject, object) -> {relationship_id: edge attrs}
+        self._derived = {}          # version-bound caches (undirected graph, CSR)
+
+    def __len__(self) -> int:
+        return len(self._relationships)
+
+    def apply(self, upserts: Iterable[Dict[str, Any]] = (), deleted_ids: Iterable[str] = ()) -> int:
+        """
+        Apply inserted/updated relationship rows and deletions.
+
+        Args:
+            upserts: Rows with the RELATIONSHIP_COLUMNS keys
+            deleted_ids: relationship_ids that no longer exist
+
+        Returns:
+            Number of relationships added, changed or removed
+        """
+        changed = 0
+
+        for relationship_id in deleted_ids:
+            if relationship_id in self._relationships:
+                self._remove(relationship_id)
+                changed += 1
+
+        for row in upserts:
+            relationship_id = row['relationship_id']
+            if relationship_id in self._relationships:
+                self._remove(relationship_id)
+            self._add(row)
+            changed += 1
+
+            updated_at = row.get('updated_at')
+            if updated_at is not None and (self.watermark is None or updated_at > self.watermark):
+                self.watermark = updated_at
+
+        if changed:
+            self.version += 1
+            self._derived.clear()
+        return changed
+
+    def _add(self, row: Dict[str, Any]):
+        relationship_id = row['relationship_id']
+        confidence = row.get('confidence_score')
+        if confidence is None or float(confidence) < self.min_confidence:
+            self._relationships[relationship_id] = None
+            return
+
+        subject_id, object_id = row['subject_entity_id'], row['object_entity_id']
+        attrs = {
+            'relationship_type': row['relationship_type'],
+            'confidence': float(confidence),
+            'attributes': row.get('attributes') or {}
+        }
+        self._relationships[relationship_id] = (subject_id, object_id)
+        self._pair_relationships.setdefault((subject_id, object_id), {})[relationship_id] = attrs
+
+        self.graph.add_edge(subject_id, object_id, **attrs)
+        for node, entity_type in ((subject_id, row.get('subject_entity_type')),
+                                  (object_id, row.get('object_entity_type'))):
+            if entity_type is not None:
+                self.graph.nodes[node]['entity_type'] = entity_type
+
+    def _remove(self, relationship_id: str):
+        pair = self._relationships.pop(relationship_id)
+        if pair is None:
+            return
+
+        remaining = self._pair_relationships[pair]
+        remaining.pop(relationship_id, None)
+        if remaining:
+            # Another relationship still joins this pair; it now supplies the attributes
+            self.graph.edges[pair].clear()
+            self.graph.edges[pair].update(next(reversed(remaining.values())))
+            return
+
+        del self._pair_relationships[pair]
+        self.graph.remove_edge(*pair)
+        for node in set(pair):
+            if self.graph.degree(node) == 0:
+                self.graph.remove_node(node)
+
+    def relationship_ids(self) -> set:
+        """relationship_ids currently tracked (including those below the threshold)."""
+        return set(self._relationships)
+
+    def undirected(self) -> nx.Graph:
+        """Undirected copy of the graph, cached until the next change."""
+        if 'undirected' not in self._derived:
+            self._derived['undirected'] = self.graph.to_undirected()
+        return self._derived['undirected']
+
+    def csr(self) -> Tuple[List[str], scipy.sparse.csr_array]:
+        """Node order and CSR adjacency matrix, cached until the next change."""
+        if 'csr' not in self._derived:
+            self._derived['csr'] = graph_to_csr(self.graph)
+        return self._derived['csr']
+
+
+def graph_to_csr(G: nx.DiGraph) -> Tuple[List[str], scipy.sparse.csr_array]:
+    """
+    Build a CSR adjacency matrix (row = source, column = target) for a graph.
+
+    Returns:
+        Tuple of (node list in matrix order, N x N csr_array of edge counts)
+    """
+    nodes = list(G.nodes())
+    index = {node: i for i, node in enumerate(nodes)}
+    n = len(nodes)
+    rows = np.fromiter((index[u] for u, v in G.edges()), dtype=np.int64, count=G.number_of_edges())
+    cols = np.fromiter((index[v] for u, v in G.edges()), dtype=np.int64, count=G.number_of_edges())
+    data = np.ones(len(rows), dtype=np.float64)
+    return nodes, scipy.sparse.csr_array((data, (rows, cols)), shape=(n, n))
+
+
+def pagerank_csr(nodes: List[str], A: scipy.sparse.csr_array, alpha: float = 0.85,
+                 max_iter: int = 100, tol: float = 1.0e-6) -> Dict[str, float]:
+    """
+    PageRank by power iteration over a CSR adjacency matrix.
+
+    Same formulation as nx.pagerank (uniform teleport, dangling nodes spread
+    uniformly), without converting the graph on every call.
+
+    Raises:
+        nx.PowerIterationFailedConvergence: If max_iter is reached
+    """
+    N = len(nodes)
+    if N == 0:
+        return {}
+
+    out_degree = np.asarray(A.sum(axis=1)).ravel()
+    inverse = np.zeros(N)
+    nonzero = out_degree != 0
+    inverse[nonzero] = 1.0 / out_degree[nonzero]
+    transition = scipy.sparse.diags_array(inverse) @ A
+    dangling = np.where(~nonzero)[0]
+
+    p = np.full(N, 1.0 / N)
+    x = p.copy()
+    for _ in range(max_iter):
+        xlast = x
+        x = alpha * (x @ transition + x[dangling].sum() * p) + (1 - alpha) * p
+        if np.absolute(x - xlast).sum() < N * tol:
+            return dict(zip(nodes, map(float, x)))
+
+    raise nx.PowerIterationFailedConvergence(max_iter)
+
+
+class GraphStore:
+    """
+    Process-wide cache of ProjectGraphs keyed by (project_id, min_confidence),
+    where a project_id of None is the global scope.
+
+    get() loads a scope on first use. Afterwards it pulls rows whose
+    updated_at is at or after the graph's watermark and diffs the scope's
+    relationship_ids against the graph to apply deletes.
+    Graphs older than max_age_seconds are rebuilt from scratch to pick up
+    anything the watermark cannot see (e.g. rows committed late by long
+    transactions).
+
+    Updates are only seen incrementally because every UPDATE stamps
+    updated_at (trigger from migration 049). A change is therefore visible
+    within refresh_interval, except for a row committed with an updated_at
+    older than the watermark, which can stay stale for up to
+    max_age_seconds.
+    """
+
+    def __init__(self, min_confidence: float = 0.3, refresh_interval: float = 5.0,
+                 max_age_seconds: float = 3600):
+        self.min_confidence = min_confidence
+        self.refresh_interval = refresh_interval
+        self.max_age_seconds = max_age_seconds
+        self._graphs = {}   # (project_id, min_confidence) -> ProjectGraph
+        self._locks = {}    # (project_id, min_confidence) -> Lock
+        self._lock = threading.Lock()
+
+    def get(self, project_id: Optional[str] = None,
+            min_confidence: Optional[float] = None) -> ProjectGraph:
+        """
+        Return the current graph for a scope, loading or refreshing it as needed.
+
+        Args:
+            project_id: Project scope, or None for every relationship
+            min_confidence: Edge confidence threshold (defaults to the store's)
+        """
+        if min_confidence is None:
+            min_confidence = self.min_confidence
+        key = (project_id, min_confidence)
+
+        with self._lock:
+            scope_lock = self._locks.setdefault(key, threading.Lock())
+
+        with scope_lock:
+            graph = self._graphs.get(key)
+            now = time.monotonic()
+
+            if graph is None or now - graph.loaded_at >= self.max_age_seconds:
+                graph = ProjectGraph(project_id, min_confidence)
+                graph.apply(self._fetch_relationships(project_id))
+                graph.loaded_at = graph.refreshed_at = now
+                self._graphs[key] = graph
+
+            elif now - graph.refreshed_at >= self.refresh_interval:
+                self._refresh(graph)
+                graph.refreshed_at = now
+
+            return graph
+
+    def invalidate(self, project_id: Optional[str] = None):
+        """Drop the graphs for one project (at any threshold), or all graphs."""
+        with self._lock:
+            for key in list(self._graphs):
+                if project_id is None or key[0] == project_id:
+                    del self._graphs[key]
+
+    def _refresh(self, graph: ProjectGraph):
+        """Apply changes made since the graph was last read."""
+        upserts = self._fetch_relationships(graph.project_id, since=graph.watermark)
+        graph.apply(upserts)
+
+        # Compare id sets rather than row counts: a delete and an insert
+        # between two refreshes leave the count unchanged
+        id_rows = execute_query(
+            f"SELECT er.relationship_id FROM entity_relationships er WHERE {self._scope_clause()}",
+            self._scope_params(graph.project_id)
+        )
+        current = {row['relationship_id'] for row in id_rows}
+        graph.apply(deleted_ids=graph.relationship_ids() - current)
+
+    def _fetch_relationships(self, project_id: Optional[str], since=None) -> List[Dict[str, Any]]:
+        """Relationship rows in scope, optionally only those updated since a watermark."""
+        query = f"""
+            SELECT {RELATIONSHIP_COLUMNS}
+            FROM entity_relationships er
+            LEFT JOIN standards_entities se ON se.entity_id = er.subject_entity_id
+            LEFT JOIN standards_entities oe ON oe.entity_id = er.object_entity_id
+            WHERE {self._scope_clause()}
+        """
+        params = self._scope_params(project_id)
+
+        if since is not None:
+            # Re-reading rows stamped exactly at the watermark is harmless (upserts)
+            query += " AND er.updated_at >= %s"
+            params = params + (since,)
+
+        return execute_query(query, params)
+
+    @staticmethod
+    def _scope_clause() -> str:
+        return "(%s IS NULL OR er.attributes->>'project_id' = %s)"
+
+    @staticmethod
+    def _scope_params(project_id: Optional[str]) -> Tuple:
+        return (project_id, project_id)
+
+
+# Shared by every GraphAnalyticsService in this process
+graph_store = GraphStore()
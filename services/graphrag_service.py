@@ -13,13 +13,13 @@ Date: 2025-11-18
 """
 
 import re
-import hashlib
-import json
 from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime, timedelta
+from datetime import datetime
 from database import execute_query, get_db
 from psycopg2.extras import RealDictCursor
 import psycopg2
+from services.query_result_cache import QueryResultCache, query_result_cache
+from services.spatial_proximity_service import SpatialProximityService, spatial_proximity_service
 
 
 class GraphRAGService:
@@ -65,10 +65,13 @@ class GraphRAGService:
         ],
     }
 
-    def __init__(self):
+    def __init__(self, cache: Optional[QueryResultCache] = None,
+                 spatial: Optional[SpatialProximityService] = None):
         """Initialize the GraphRAG service"""
         self.max_hops = 10  # Maximum traversal depth
         self.default_cache_ttl = 3600  # 1 hour cache TTL
+        self.cache = cache if cache is not None else query_result_cache  # Local LRU in front of ai_query_cache
+        self.spatial = spatial or spatial_proximity_service  # Proximity across all geometry tables
         self.min_similarity_threshold = 0.7  # Minimum similarity for semantic relationships
 
     def parse_query(self, query_text: str) -> Dict[str, Any]:
@@ -158,9 +161,9 @@ class GraphRAGService:
         """
         start_time = datetime.now()
 
-        # Check cache first
+        # Check cache first (in-process tier, then ai_query_cache)
         if use_cache:
-            cached_result = self._get_cached_result(query_text)
+            cached_result = self.cache.get(query_text, max_results)
             if cached_result:
                 return cached_result
 
@@ -198,7 +201,8 @@ class GraphRAGService:
 
         # Cache the result
         if use_cache and result['entities']:
-            self._cache_result(query_text, query_type, result, execution_time)
+            self.cache.put(query_text, max_results, query_type, result, execution_time,
+                           ttl_seconds=self.default_cache_ttl)
 
         # Log the query
         self._log_query(query_text, query_type, True, len(result['entities']), execution_time, False)
@@ -421,57 +425,15 @@ class GraphRAGService:
         if params.get('distance_unit') in ['meters', 'm']:
             distance_ft *= 3.28084
 
-        # Get source geometry
-        source_geom_query = """
-            SELECT ST_AsText(geometry) as geometry
-            FROM (
-                SELECT geometry FROM survey_points WHERE point_id = %s
-                UNION ALL
-                SELECT geometry FROM utility_structures WHERE structure_id = %s
-                UNION ALL
-                SELECT ST_Centroid(geometry) as geometry FROM utility_lines WHERE line_id = %s
-            ) geoms
-            WHERE geometry IS NOT NULL
-            LIMIT 1
-        """
-
-        source_geom = execute_query(source_geom_query, (source['entity_id'], source['entity_id'], source['entity_id']))
+        # Source geometry from whichever spatial table holds the entity, then
+        # nearby features across every geometry table in EntityRegistry
+        source_geom, nearby_entities = self.spatial.find_nearby_entity(
+            source['entity_id'], distance_ft, limit=max_results
+        )
 
         if not source_geom:
             return {'entities': [], 'relationships': [], 'explanation': 'Source entity has no geometry'}
 
-        # Find nearby entities (this is a simplified version - you'd need to query each table)
-        # For a complete implementation, you'd union queries across all spatial tables
-        nearby_query = """
-            SELECT
-                'survey_point' as entity_type,
-                point_id as entity_id,
-                point_name as name,
-                ST_Distance(geometry, ST_GeomFromText(%s, 6423)) as distance_ft
-            FROM survey_points
-            WHERE ST_DWithin(geometry, ST_GeomFromText(%s, 6423), %s)
-              AND point_id != %s
-            UNION ALL
-            SELECT
-                'utility_structure' as entity_type,
-                structure_id as entity_id,
-                structure_name as name,
-                ST_Distance(geometry, ST_GeomFromText(%s, 6423)) as distance_ft
-            FROM utility_structures
-            WHERE ST_DWithin(geometry, ST_GeomFromText(%s, 6423), %s)
-              AND structure_id != %s
-            ORDER BY distance_ft
-            LIMIT %s
-        """
-
-        geom_text = source_geom[0]['geometry']
-        nearby_entities = execute_query(
-            nearby_query,
-            (geom_text, geom_text, distance_ft, source['entity_id'],
-             geom_text, geom_text, distance_ft, source['entity_id'],
-             max_results)
-        )
-
         return {
             'entities': [source] + nearby_entities,
             'relationships': [],
@@ -666,80 +628,6 @@ class GraphRAGService:
 
         return execute_query(query, (entity_ids, entity_ids))
 
-    def _get_cached_result(self, query_text: str) -> Optional[Dict[str, Any]]:
-        """Retrieve cached query result if available and valid"""
-        query_hash = hashlib.sha256(query_text.lower().encode()).hexdigest()
-
-        query = """
-            SELECT result_json, cache_id
-            FROM ai_query_cache
-            WHERE query_hash = %s
-              AND is_valid = TRUE
-              AND (expires_at IS NULL OR expires_at > NOW())
-            LIMIT 1
-        """
-
-        try:
-            result = execute_query(query, (query_hash,))
-
-            if result:
-                # Update hit count
-                update_query = """
-                    UPDATE ai_query_cache
-                    SET hit_count = hit_count + 1,
-                        last_accessed_at = NOW()
-                    WHERE cache_id = %s
-                """
-                execute_query(update_query, (result[0]['cache_id'],))
-
-                cached_data = result[0]['result_json']
-                cached_data['metadata']['from_cache'] = True
-                return cached_data
-
-        except Exception as e:
-            print(f"Cache retrieval error: {e}")
-
-        return None
-
-    def _cache_result(self, query_text: str, query_type: str, result: Dict[str, Any],
-                     execution_time_ms: float):
-        """Cache query result for future use"""
-        query_hash = hashlib.sha256(query_text.lower().encode()).hexdigest()
-
-        query = """
-            INSERT INTO ai_query_cache (
-                query_hash,
-                query_text,
-                query_type,
-                result_json,
-                entity_count,
-                relationship_count,
-                execution_time_ms,
-                expires_at
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (query_hash) DO UPDATE
-            SET result_json = EXCLUDED.result_json,
-                execution_time_ms = EXCLUDED.execution_time_ms,
-                created_at = NOW(),
-                is_valid = TRUE
-        """
-
-        try:
-            expires_at = datetime.now() + timedelta(seconds=self.default_cache_ttl)
-
-            execute_query(query, (
-                query_hash,
-                query_text,
-                query_type,
-                json.dumps(result),
-                len(result['entities']),
-                len(result.get('relationships', [])),
-                round(execution_time_ms, 2),
-                expires_at
-            ))
-        except Exception as e:
-            print(f"Cache write error: {e}")
-
     def _log_query(self, query_text: str, query_type: str, was_successful: bool,
                    result_count: int, execution_time_ms: float, used_cache: bool):
         """Log query execution for analytics"""
@@ -767,27 +655,19 @@ class GraphRAGService:
             print(f"Query logging error: {e}")
 
     def invalidate_cache(self, entity_ids: Optional[List[str]] = None,
-                        reason: str = 'manual_invalidation'):
-        """Invalidate cached query results"""
-        if entity_ids:
-            # Invalidate queries that might involve these entities
-            # This is a simple implementation - could be more sophisticated
-            query = """
-                UPDATE ai_query_cache
-                SET is_valid = FALSE,
-                    invalidation_reason = %s
-                WHERE is_valid = TRUE
-            """
-            execute_query(query, (reason,))
-        else:
-            # Invalidate all cache
-            query = """
-                UPDATE ai_query_cache
-                SET is_valid = FALSE,
-                    invalidation_reason = %s
-                WHERE is_valid = TRUE
-            """
-            execute_query(query, (reason,))
+                        reason: str = 'manual_invalidation') -> int:
+        """
+        Invalidate cached query results
+
+        Args:
+            entity_ids: Invalidate only results containing these entities
+                (all results if None)
+            reason: Recorded as invalidation_reason
+
+        Returns:
+            Number of cached results invalidated
+        """
+        return self.cache.invalidate(entity_ids, reason)
 
     def get_query_suggestions(self, partial_query: str, limit: int = 5) -> List[str]:
         """Get query suggestions based on partial input and history"""
@@ -0,0 +1,652 @@
+"""
+Map Export Engine - Single-pass, parallel multi-format map exports
+
+1. Features are read once, through a server-side (named) cursor, and handed
+   to every requested format writer in batches of batch_size features
+2. Each writer runs in its own thread behind a queue of at most
+   queue_batches batches, so the reader is throttled to the slowest writer
+   and memory stays bounded whatever the export size. Threads rather than
+   processes: batches are shared by all writers without copying, and the
+   heavy lifting (GDAL writes, zlib) releases the GIL
+3. Writers stream to disk: fiona collections (Shapefile, GeoPackage,
+   FlatGeobuf), an R12 DXF stream, KML written Placemark by Placemark and a
+   fixed-size PNG canvas
+4. A writer's files are added to the zip archive as soon as it finishes and
+   then removed from the job directory
+5. Per-format timings (seconds spent writing, features, files, bytes, zip
+   time) are returned for the job status
+"""
+
+import json
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import fiona
+from fiona.crs import CRS
+from ezdxf.addons.r12writer import R12FastStreamWriter
+from shapely.geometry import shape
+
+from services.map_viewer_service import NATIVE_SRID
+
+# Entity types left out of map exports (annotation and fills)
+EXCLUDED_ENTITY_TYPES = ('TEXT', 'MTEXT', 'HATCH', 'ATTDEF', 'ATTRIB')
+
+
+class ExportFeature(NamedTuple):
+    """One feature of an export: geometry in the export CRS (and WGS84 for KML)."""
+    layer: str
+    geometry: Dict[str, Any]
+    properties: Dict[str, Any]
+    geometry_wgs84: Optional[Dict[str, Any]] = None
+
+
+def safe_name(name: str, used: set, suffix: str = '') -> str:
+    """File-system safe, case-insensitively unique name for a layer."""
+    base = re.sub(r'[^\w\-]+', '_', name or 'Default').strip('_') or 'layer'
+    base += suffix
+    candidate, n = base, 1
+    while candidate.lower() in used:
+        n += 1
+        candidate = f"{base}_{n}"
+    used.add(candidate.lower())
+    return candidate
+
+
+def iter_drawing_entities(conn, bbox: Tuple[float, float, float, float], bbox_srid: int,
+                          target_srid: int = NATIVE_SRID, project_id: Optional[str] = None,
+                          wgs84: bool = False, itersize: int = 2000) -> Iterator[ExportFeature]:
+    """
+    Drawing entities intersecting a bbox, read with a named cursor.
+
+    Args:
+        conn: psycopg2 connection (the read runs in its own transaction,
+            which is rolled back afterwards)
+        bbox: (minx, miny, maxx, maxy) in bbox_srid
+        target_srid: SRID of the exported geometry
+        project_id: Only this project's entities
+        wgs84: Also return 2D WGS84 geometry (for KML)
+        itersize: Rows fetched per round trip
+
+    Yields:
+        ExportFeature per entity, ordered by layer name
+    """
+    minx, miny, maxx, maxy = bbox
+    params = {
+        'minx': minx, 'miny': miny, 'maxx': maxx, 'maxy': maxy,
+        'bbox_srid': bbox_srid, 'target_srid': target_srid,
+        'project_id': str(project_id) if project_id else None,
+        'excluded': list(EXCLUDED_ENTITY_TYPES),
+    }
+    wgs84_column = ("ST_AsGeoJSON(ST_Transform(ST_Force2D(e.geometry), 4326))"
+                    if wgs84 else "NULL")
+    project_filter = "AND e.project_id = %(project_id)s" if project_id else ""
+    query = f"""
+        SELECT
+            COALESCE(l.layer_name, 'Default') AS layer_name,
+            e.entity_id,
+            e.entity_type,
+            e.color_aci,
+            e.linetype,
+            e.lineweight,
+            ST_AsGeoJSON(ST_Transform(e.geometry, %(target_srid)s)) AS geometry_json,
+            {wgs84_column} AS wgs84_json
+        FROM drawing_entities e
+        LEFT JOIN layers l ON e.layer_id = l.layer_id
+        WHERE ST_Intersects(
+            e.geometry,
+            ST_Transform(ST_MakeEnvelope(%(minx)s, %(miny)s, %(maxx)s, %(maxy)s, %(bbox_srid)s),
+                         {NATIVE_SRID})
+        )
+        AND e.entity_type <> ALL(%(excluded)s)
+        {project_filter}
+        ORDER BY 1, e.entity_type
+    """
+    try:
+        with conn.cursor(name=f'map_export_{uuid.uuid4().hex}') as cursor:
+            cursor.itersize = itersize
+            cursor.execute(query, params)
+            for layer_name, entity_id, entity_type, color_aci, linetype, lineweight, \
+                    geometry_json, wgs84_json in cursor:
+                if geometry_json is None:
+                    continue
+                yield ExportFeature(
+                    layer=layer_name,
+                    geometry=json.loads(geometry_json),
+                    properties={
+                        'entity_id': str(entity_id),
+                        'entity_type': entity_type,
+                        'layer_name': layer_name,
+                        'color_aci': color_aci,
+                        'linetype': linetype,
+                        'lineweight': lineweight,
+                        'srid': target_srid,
+                    },
+                    geometry_wgs84=json.loads(wgs84_json) if wgs84_json else None,
+                )
+    finally:
+        conn.rollback()
+
+
+# ----------------------------------------------------------------------
+# Format writers
+# ----------------------------------------------------------------------
+
+class FormatWriter:
+    """
+    Writes a stream of features, in layer order, to one export format.
+
+    write_batch() is called from the writer's own thread with lists of
+    ExportFeature; close() finishes the output and returns the written file
+    names (relative to the job directory); abort() releases open files after
+    a failure.
+    """
+
+    def __init__(self, job_dir: str, srid: int = NATIVE_SRID):
+        self.job_dir = job_dir
+        self.srid = srid
+        self.skipped = 0
+
+    def write_batch(self, features: List[ExportFeature]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> List[str]:
+        raise NotImplementedError
+
+    def abort(self) -> None:
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def _schema_type(value) -> str:
+    if isinstance(value, int):
+        return 'int'
+    if isinstance(value, float):
+        return 'float'
+    return 'str'
+
+
+def _record_value(value, field_type: str):
+    if value is None:
+        return None
+    try:
+        if field_type == 'int':
+            return int(value)
+        if field_type == 'float':
+            return float(value)
+    except (TypeError, ValueError):
+        return None
+    return str(value)
+
+
+class FionaWriter(FormatWriter):
+    """
+    Writer for OGR formats through fiona.
+
+    Collections are opened when a layer's first feature arrives, with a
+    property schema taken from that feature, and closed when the next layer
+    starts, so only one layer's files are open at a time.
+    """
+
+    driver = None
+
+    def __init__(self, job_dir: str, srid: int = NATIVE_SRID):
+        super().__init__(job_dir, srid)
+        self.crs = CRS.from_epsg(srid)
+        self.files = []
+        self.used_names = set()
+        self.current_layer = None
+        self.collections = {}
+
+    def collection_key(self, feature: ExportFeature) -> Optional[str]:
+        """Collection a feature is written to within its layer (None: skip)."""
+        return ''
+
+    def open_collection(self, feature: ExportFeature, key: str, schema: Dict):
+        raise NotImplementedError
+
+    def write_batch(self, features: List[ExportFeature]) -> None:
+        records = {}
+        for feature in features:
+            if feature.layer != self.current_layer:
+                self._flush(records)
+                self._close_collections()
+                self.current_layer = feature.layer
+            key = self.collection_key(feature)
+            if key is None:
+                self.skipped += 1
+                continue
+            if key not in self.collections:
+                properties = {name: _schema_type(value)
+                              for name, value in feature.properties.items()}
+                schema = {'geometry': self.geometry_schema(feature, key),
+                          'properties': properties or {'id': 'str'}}
+                collection = self.open_collection(feature, key, schema)
+                # Drivers may rename fields (Shapefile truncates to 10 characters)
+                fields = [(source, name, schema['properties'][source])
+                          for source, name in zip(schema['properties'], collection.schema['properties'])]
+                self.collections[key] = (collection, fields)
+            fields = self.collections[key][1]
+            records.setdefault(key, []).append({
+                'geometry': feature.geometry,
+                'properties': {name: _record_value(feature.properties.get(source), field_type)
+                               for source, name, field_type in fields},
+            })
+        self._flush(records)
+
+    def geometry_schema(self, feature: ExportFeature, key: str) -> str:
+        return 'Unknown'
+
+    def _flush(self, records: Dict[str, List[Dict]]) -> None:
+        for key, batch in records.items():
+            self.collections[key][0].writerecords(batch)
+        records.clear()
+
+    def _close_collections(self) -> None:
+        collections, self.collections = self.collections, {}
+        for collection, _ in collections.values():
+            collection.close()
+
+    def close(self) -> List[str]:
+        self._close_collections()
+        return [name for name in self.files if os.path.exists(os.path.join(self.job_dir, name))]
+
+
+# Shapefile geometry families: one .shp per layer and family
+SHAPEFILE_FAMILIES = {
+    'Point': ('point', 'Point'),
+    'MultiPoint': ('multipoint', 'MultiPoint'),
+    'LineString': ('line', 'LineString'),
+    'MultiLineString': ('line', 'LineString'),
+    'Polygon': ('polygon', 'Polygon'),
+    'MultiPolygon': ('polygon', 'Polygon'),
+}
+
+
+def _has_z(geometry: Dict[str, Any]) -> bool:
+    coordinates = geometry.get('coordinates')
+    while isinstance(coordinates, (list, tuple)) and coordinates and isinstance(coordinates[0], (list, tuple)):
+        coordinates = coordinates[0]
+    return isinstance(coordinates, (list, tuple)) and len(coordinates) > 2
+
+
+class ShapefileWriter(FionaWriter):
+    """ESRI Shapefile: one file set per layer and geometry family (with Z if present)."""
+
+    driver = 'ESRI Shapefile'
+
+    def __init__(self, job_dir: str, srid: int = NATIVE_SRID):
+        super().__init__(job_dir, srid)
+        self.layer_names = {}
+
+    def collection_key(self, feature: ExportFeature) -> Optional[str]:
+        family = SHAPEFILE_FAMILIES.get(feature.geometry.get('type'))
+        return family[0] if family else None
+
+    def geometry_schema(self, feature: ExportFeature, key: str) -> str:
+        geometry_type = SHAPEFILE_FAMILIES[feature.geometry['type']][1]
+        return f"3D {geometry_type}" if _has_z(feature.geometry) else geometry_type
+
+    def open_collection(self, feature: ExportFeature, key: str, schema: Dict):
+        # A layer's first family keeps the layer's name; others get a suffix
+        suffix = '' if not self.collections else f"_{key}"
+        name = safe_name(feature.layer, self.used_names, suffix)
+        for extension in ('.shp', '.shx', '.dbf', '.prj', '.cpg'):
+            self.files.append(name + extension)
+        return fiona.open(os.path.join(self.job_dir, name + '.shp'), 'w', driver=self.driver,
+                          crs=self.crs, schema=schema)
+
+
+class GeoPackageWriter(FionaWriter):
+    """GeoPackage: a single export.gpkg with one table per layer."""
+
+    driver = 'GPKG'
+    filename = 'export.gpkg'
+
+    def open_collection(self, feature: ExportFeature, key: str, schema: Dict):
+        if not self.files:
+            self.files.append(self.filename)
+        return fiona.open(os.path.join(self.job_dir, self.filename), 'w', driver=self.driver,
+                          layer=safe_name(feature.layer, self.used_names), crs=self.crs, schema=schema)
+
+
+class FlatGeobufWriter(FionaWriter):
+    """FlatGeobuf: one .fgb per layer, with a packed spatial index."""
+
+    driver = 'FlatGeobuf'
+
+    def open_collection(self, feature: ExportFeature, key: str, schema: Dict):
+        name = safe_name(feature.layer, self.used_names) + '.fgb'
+        self.files.append(name)
+        return fiona.open(os.path.join(self.job_dir, name), 'w', driver=self.driver,
+                          crs=self.crs, schema=schema)
+
+
+def _dxf_layer(name: str) -> str:
+    return re.sub(r'[<>/\\":;?*|=`]+', '_', name or '0')[:255] or '0'
+
+
+class DxfWriter(FormatWriter):
+    """
+    DXF R12 streamed with ezdxf's fast stream writer.
+
+    Entities are written as they arrive rather than built into a document
+    model; layers are created implicitly and ACI colors are kept.
+    """
+
+    filename = 'export.dxf'
+
+    def __init__(self, job_dir: str, srid: int = NATIVE_SRID):
+        super().__init__(job_dir, srid)
+        self.stream = open(os.path.join(job_dir, self.filename), 'wt', encoding='cp1252', errors='replace')
+        self.dxf = R12FastStreamWriter(self.stream)
+
+    def write_batch(self, features: List[ExportFeature]) -> None:
+        for feature in features:
+            attribs = {'layer': _dxf_layer(feature.layer)}
+            color = feature.properties.get('color_aci')
+            if isinstance(color, int) and 0 <= color <= 256:
+                attribs['color'] = color
+            if not self._add_geometry(feature.geometry, attribs):
+                self.skipped += 1
+
+    def _add_geometry(self, geometry: Dict[str, Any], attribs: Dict) -> bool:
+        geometry_type = geometry.get('type')
+        coordinates = geometry.get('coordinates')
+        if geometry_type == 'Point':
+            self.dxf.add_point(tuple(coordinates), **attribs)
+        elif geometry_type == 'LineString':
+            self._add_polyline(coordinates, False, attribs)
+        elif geometry_type == 'Polygon':
+            for ring in coordinates:
+                self._add_polyline(ring[:-1], True, attribs)
+        elif geometry_type in ('MultiPoint', 'MultiLineString', 'MultiPolygon'):
+            part_type = geometry_type[len('Multi'):]
+            for part in coordinates:
+                self._add_geometry({'type': part_type, 'coordinates': part}, attribs)
+        elif geometry_type == 'GeometryCollection':
+            for part in geometry.get('geometries', []):
+                self._add_geometry(part, attribs)
+        else:
+            return False
+        return True
+
+    def _add_polyline(self, points, closed: bool, attribs: Dict) -> None:
+        if len(points) < 2:
+            return
+        if len(points[0]) > 2:
+            self.dxf.add_polyline(points, closed=closed, **attribs)
+        else:
+            self.dxf.add_polyline_2d(points, closed=closed, **attribs)
+
+    def close(self) -> List[str]:
+        if self.stream.closed:
+            return []
+        self.dxf.close()
+        self.stream.close()
+        return [self.filename]
+
+
+def add_kml_geometry(parent, geom) -> None:
+    """Append the KML element(s) of a shapely geometry in WGS84 to parent."""
+    def coordinates(coords):
+        return ' '.join(f'{c[0]},{c[1]},0' for c in coords)
+
+    if geom.geom_type == 'Point':
+        point = ET.SubElement(parent, 'Point')
+        ET.SubElement(point, 'coordinates').text = f'{geom.x},{geom.y},0'
+    elif geom.geom_type == 'LineString':
+        linestring = ET.SubElement(parent, 'LineString')
+        ET.SubElement(linestring, 'coordinates').text = coordinates(geom.coords)
+    elif geom.geom_type == 'Polygon':
+        polygon = ET.SubElement(parent, 'Polygon')
+        outer = ET.SubElement(polygon, 'outerBoundaryIs')
+        linear_ring = ET.SubElement(outer, 'LinearRing')
+        ET.SubElement(linear_ring, 'coordinates').text = coordinates(geom.exterior.coords)
+    elif geom.geom_type == 'MultiPoint':
+        # Points are added side by side, as before
+        for point in geom.geoms:
+            add_kml_geometry(parent, point)
+    elif geom.geom_type in ('MultiLineString', 'MultiPolygon'):
+        multigeom = ET.SubElement(parent, 'MultiGeometry')
+        for part in geom.geoms:
+            add_kml_geometry(multigeom, part)
+
+
+class KmlWriter(FormatWriter):
+    """KML written incrementally: a Folder per layer, a Placemark per feature (WGS84)."""
+
+    filename = 'export.kml'
+
+    def __init__(self, job_dir: str, srid: int = NATIVE_SRID):
+        super().__init__(job_dir, srid)
+        self.stream = open(os.path.join(job_dir, self.filename), 'w', encoding='utf-8')
+        self.stream.write('<?xml version="1.0" encoding="utf-8"?>\n'
+                          '<kml xmlns="http://www.opengis.net/kml/2.2">\n'
+                          '<Document>\n<name>Map Export</name>\n')
+        self.current_layer = None
+
+    def write_batch(self, features: List[ExportFeature]) -> None:
+        parts = []
+        for feature in features:
+            if feature.geometry_wgs84 is None:
+                self.skipped += 1
+                continue
+            if feature.layer != self.current_layer:
+                if self.current_layer is not None:
+                    parts.append('</Folder>\n')
+                folder_name = ET.Element('name')
+                folder_name.text = feature.layer
+                parts.append('<Folder>' + ET.tostring(folder_name, encoding='unicode') + '\n')
+                self.current_layer = feature.layer
+
+            placemark = ET.Element('Placemark')
+            if feature.properties:
+                rows = ''.join(f'<tr><td><b>{key}:</b></td><td>{value}</td></tr>'
+                               for key, value in feature.properties.items())
+                ET.SubElement(placemark, 'description').text = f'<table>{rows}</table>'
+            add_kml_geometry(placemark, shape(feature.geometry_wgs84))
+            parts.append(ET.tostring(placemark, encoding='unicode') + '\n')
+        self.stream.write(''.join(parts))
+
+    def close(self) -> List[str]:
+        if self.stream.closed:
+            return []
+        if self.current_layer is not None:
+            self.stream.write('</Folder>\n')
+        self.stream.write('</Document>\n</kml>\n')
+        self.stream.close()
+        return [self.filename]
+
+
+class PngWriter(FormatWriter):
+    """
+    Map image drawn feature by feature on a fixed-size canvas.
+
+    renderer provides begin_map_image(bbox, width, height),
+    draw_map_feature(canvas, layer_name, geometry) and
+    finish_map_image(canvas, path, north_arrow, scale_bar) (MapExportService).
+    """
+
+    filename = 'map.png'
+
+    def __init__(self, job_dir: str, srid: int, renderer, bbox: Dict[str, float],
+                 width: int = 1200, height: int = 900,
+                 north_arrow: bool = True, scale_bar: bool = True):
+        super().__init__(job_dir, srid)
+        self.renderer = renderer
+        self.canvas = renderer.begin_map_image(bbox, width, height)
+        self.north_arrow = north_arrow
+        self.scale_bar = scale_bar
+
+    def write_batch(self, features: List[ExportFeature]) -> None:
+        for feature in features:
+            self.renderer.draw_map_feature(self.canvas, feature.layer, feature.geometry)
+
+    def close(self) -> List[str]:
+        if self.canvas is None:
+            return []
+        canvas, self.canvas = self.canvas, None
+        self.renderer.finish_map_image(canvas, os.path.join(self.job_dir, self.filename),
+                                       north_arrow=self.north_arrow, scale_bar=self.scale_bar)
+        return [self.filename]
+
+    def abort(self) -> None:
+        self.canvas = None
+
+
+# Vector formats built from the job directory and CRS alone; png needs a renderer
+FORMAT_WRITERS = {
+    'shp': ShapefileWriter,
+    'gpkg': GeoPackageWriter,
+    'fgb': FlatGeobufWriter,
+    'dxf': DxfWriter,
+    'kml': KmlWriter,
+}
+
+EXPORT_FORMATS = ('shp', 'gpkg', 'fgb', 'dxf', 'kml', 'png')
+
+
+# ----------------------------------------------------------------------
+# Engine
+# ----------------------------------------------------------------------
+
+_END = object()
+_ABORT = object()
+
+
+class MapExportEngine:
+    """Fans one feature stream out to concurrent format writers and zips the results."""
+
+    def __init__(self, batch_size: int = 1000, queue_batches: int = 4,
+                 compression: int = zipfile.ZIP_DEFLATED):
+        self.batch_size = batch_size
+        self.queue_batches = queue_batches
+        self.compression = compression
+
+    def run(self, features: Iterable[ExportFeature], writers: Dict[str, FormatWriter],
+            zip_path: str, progress_callback: Optional[Callable[[Dict], None]] = None) -> Dict[str, Any]:
+        """
+        Write every feature with every writer and zip the written files.
+
+        Args:
+            features: Feature stream, ordered by layer
+            writers: Format name -> writer
+            zip_path: Archive to create; written files are moved into it
+            progress_callback: Called with {'features': n} after each batch
+
+        Returns:
+            {'feature_count', 'timings': {format: {...}, 'read': {...}},
+             'files': [...]} - a format's timing holds an 'error' if it failed
+
+        Raises:
+            Exception: Errors of the feature stream (writers are aborted)
+        """
+        started = time.perf_counter()
+        done = queue.Queue()
+        queues = {}
+        for name, writer in writers.items():
+            queues[name] = queue.Queue(maxsize=self.queue_batches)
+            threading.Thread(target=self._drain, args=(name, writer, queues[name], done, started),
+                             name=f'map-export-{name}', daemon=True).start()
+
+        count = 0
+        read_seconds = 0.0
+        try:
+            iterator = iter(features)
+            while True:
+                read_started = time.perf_counter()
+                batch = []
+                for feature in iterator:
+                    batch.append(feature)
+                    if len(batch) >= self.batch_size:
+                        break
+                read_seconds += time.perf_counter() - read_started
+                if not batch:
+                    break
+                count += len(batch)
+                for batch_queue in queues.values():
+                    batch_queue.put(batch)
+                if progress_callback:
+                    progress_callback({'features': count})
+        except Exception:
+            for batch_queue in queues.values():
+                batch_queue.put(_ABORT)
+            for _ in writers:
+                done.get()
+            raise
+
+        for batch_queue in queues.values():
+            batch_queue.put(_END)
+
+        timings = {'read': {'seconds': round(read_seconds, 3), 'features': count}}
+        files = []
+        with zipfile.ZipFile(zip_path, 'w', self.compression) as archive:
+            # Zip each format's files as soon as its writer is done
+            for _ in writers:
+                name, written, timing = done.get()
+                zip_started = time.perf_counter()
+                size = 0
+                for filename in written:
+                    path = os.path.join(os.path.dirname(zip_path), filename)
+                    size += os.path.getsize(path)
+                    archive.write(path, filename)
+                    os.remove(path)
+                timing.update(files=written, bytes=size,
+                              zip_seconds=round(time.perf_counter() - zip_started, 3))
+                timings[name] = timing
+                files.extend(written)
+
+        return {'feature_count': count, 'timings': timings, 'files': files}
+
+    @staticmethod
+    def _drain(name: str, writer: FormatWriter, batches: queue.Queue, done: queue.Queue,
+               started: float) -> None:
+        """Writer thread: write batches until the end marker, then close."""
+        seconds = 0.0
+        written = 0
+        error = None
+        files = []
+        while True:
+            batch = batches.get()
+            if batch is _END or batch is _ABORT:
+                break
+            if error is not None:
+                continue  # keep draining so the reader never blocks
+            write_started = time.perf_counter()
+            try:
+                writer.write_batch(batch)
+                written += len(batch)
+            except Exception as e:
+                print(f"Error writing {name} export: {e}")
+                error = e
+                writer.abort()
+            seconds += time.perf_counter() - write_started
+
+        if batch is _ABORT:
+            writer.abort()
+        elif error is None:
+            close_started = time.perf_counter()
+            try:
+                files = writer.close()
+            except Exception as e:
+                print(f"Error finishing {name} export: {e}")
+                error = e
+                writer.abort()
+            seconds += time.perf_counter() - close_started
+
+        done.put((name, files, {
+            'seconds': round(seconds, 3),
+            'finished_after_seconds': round(time.perf_counter() - started, 3),
+            'features': written - writer.skipped,
+            'skipped': writer.skipped,
+            'error': str(error) if error is not None else None,
+        }))
@@ -4,29 +4,97 @@ Map Viewer Service
 Service responsible for handling optimized, tiled spatial data retrieval
 for the web map viewer interface, leveraging PostGIS functions for speed.
 
-Implements Mapbox Vector Tile (MVT) generation using PostGIS ST_AsMVTGeom
-to efficiently serve large spatial datasets to web mapping interfaces.
+Implements Mapbox Vector Tile (MVT) generation with ST_AsMVT / ST_AsMVTGeom.
+Features are selected in their native SRID (EPSG:2226) by transforming the
+Web Mercator tile envelope once per tile, so the spatial index is used and
+only the rows inside the tile are projected to EPSG:3857. Each layer has a
+minimum zoom, a set of attributes that is widened at detail zooms, and (for
+lines and polygons) a minimum feature size below which features are dropped
+at overview zooms.
 """
 
-from typing import Dict, Any, List, Optional
-from sqlalchemy import text
 import logging
-import json
-from contextlib import contextmanager
-import textwrap
+import math
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+from tools.db_utils import get_cursor
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# --- Mock PostGIS Context ---
-# Assuming a connection can be acquired (similar to previous tools)
-@contextmanager
-def _mock_get_connection():
-    class MockConnection:
-        def execute(self, stmt):
-            logger.info(f"MOCK QUERY: Executing vector tile spatial check: {stmt.text[:70]}...")
-            return [("MVT_TILE_DATA_012345",)] # Mock MVT tile binary/data
-    yield MockConnection()
+NATIVE_SRID = 2226
+MVT_EXTENT = 4096
+MVT_BUFFER = 64
+MAX_ZOOM = 22
+WEB_MERCATOR_WIDTH_M = 40075016.686
+FEET_PER_METER = 3.28084
+# Latitude used to convert screen pixels to ground distance (Sonoma County)
+REFERENCE_LATITUDE = 38.4
+
+
+@dataclass(frozen=True)
+class TileLayer:
+    """A table served as an MVT layer."""
+    table: str
+    geometry: str
+    key: str
+    kind: str                                   # 'point', 'line', 'polygon' or 'mixed'
+    min_zoom: int
+    attributes: Tuple[Tuple[str, str], ...]     # (name, SQL expression) at every zoom
+    detail_attributes: Tuple[Tuple[str, str], ...] = ()
+    detail_zoom: int = 17
+    join: str = ''
+
+
+TILE_LAYERS = {
+    'drawing_entities': TileLayer(
+        table='drawing_entities', geometry='geometry', key='entity_id', kind='mixed', min_zoom=13,
+        attributes=(('entity_type', 't.entity_type'), ('color_aci', 't.color_aci'),
+                    ('project_id', 't.project_id::text')),
+        detail_attributes=(('layer_name', 'l.layer_name'), ('linetype', 't.linetype'),
+                           ('lineweight', 't.lineweight')),
+        join='LEFT JOIN layers l ON l.layer_id = t.layer_id',
+    ),
+    'utility_lines': TileLayer(
+        table='utility_lines', geometry='geometry', key='line_id', kind='line', min_zoom=12,
+        attributes=(('utility_system', 't.utility_system'), ('line_type', 't.line_type')),
+        detail_attributes=(('line_number', 't.line_number'), ('material', 't.material'),
+                           ('diameter_mm', 't.diameter_mm'), ('slope', 't.slope::float8'),
+                           ('flow_direction', 't.flow_direction')),
+    ),
+    'utility_structures': TileLayer(
+        table='utility_structures', geometry='rim_geometry', key='structure_id', kind='point',
+        min_zoom=14,
+        attributes=(('structure_type', 't.structure_type'), ('utility_system', 't.utility_system')),
+        detail_attributes=(('structure_number', 't.structure_number'),
+                           ('rim_elevation', 't.rim_elevation::float8'),
+                           ('invert_elevation', 't.invert_elevation::float8'),
+                           ('condition', 't.condition')),
+    ),
+    'survey_points': TileLayer(
+        table='survey_points', geometry='geometry', key='point_id', kind='point', min_zoom=15,
+        attributes=(('point_type', 't.point_type'),),
+        detail_attributes=(('point_number', 't.point_number'), ('point_code', 't.point_code'),
+                           ('point_description', 't.point_description'),
+                           ('elevation', 't.elevation::float8')),
+    ),
+    'parcels': TileLayer(
+        table='parcels', geometry='boundary_geometry', key='parcel_id', kind='polygon', min_zoom=12,
+        attributes=(('parcel_number', 't.parcel_number'),),
+        detail_attributes=(('parcel_name', 't.parcel_name'), ('owner_name', 't.owner_name'),
+                           ('zoning', 't.zoning'), ('land_use', 't.land_use'),
+                           ('area_acres', 't.area_acres::float8')),
+        detail_zoom=16,
+    ),
+}
+
+
+def pixel_size_ft(z: int) -> float:
+    """Ground distance in feet covered by one 256px screen pixel at zoom z."""
+    meters = WEB_MERCATOR_WIDTH_M / (256 * 2 ** z) * math.cos(math.radians(REFERENCE_LATITUDE))
+    return meters * FEET_PER_METER
+
 
 class MapViewerService:
     """
@@ -34,76 +102,146 @@ class MapViewerService:
     for the web map viewer interface, leveraging PostGIS functions for speed.
     """
 
-    def __init__(self):
+    def __init__(self, layers: Optional[Dict[str, TileLayer]] = None):
+        self.layers = layers if layers is not None else TILE_LAYERS
         logger.info("MapViewerService initialized. Optimized spatial retrieval is active.")
 
-    def get_vector_tile_data(self, z: int, x: int, y: int, layer_name: str, extent_wkt: str) -> Optional[str]:
+    def list_tile_layers(self) -> List[Dict[str, Any]]:
+        """Layers served by get_vector_tile_data, with their zoom ranges and fields."""
+        return [{
+            'id': name,
+            'geometry_type': layer.kind,
+            'minzoom': layer.min_zoom,
+            'maxzoom': MAX_ZOOM,
+            'fields': [attr for attr, _ in layer.attributes + layer.detail_attributes],
+            'detail_zoom': layer.detail_zoom,
+        } for name, layer in self.layers.items()]
+
+    def build_tile_query(self, z: int, x: int, y: int, layer_name: str,
+                         project_id: Optional[str] = None) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        SQL and parameters for one tile, or None below the layer's minimum zoom.
+
+        Raises:
+            ValueError: Unknown layer or tile coordinates outside the zoom's grid
+        """
+        layer = self.layers.get(layer_name)
+        if layer is None:
+            raise ValueError(f"Unknown tile layer: {layer_name}")
+        if not 0 <= z <= MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            raise ValueError(f"Invalid tile coordinates: {z}/{x}/{y}")
+        if z < layer.min_zoom:
+            return None
+
+        attributes = layer.attributes + (layer.detail_attributes if z >= layer.detail_zoom else ())
+        columns = ",\n                       ".join(f"{expr} AS {name}" for name, expr in attributes)
+        params = {'z': z, 'x': x, 'y': y, 'layer': layer_name,
+                  'margin': MVT_BUFFER / MVT_EXTENT}
+
+        filters = [f"t.{layer.geometry} && bounds.native"]
+        if project_id:
+            filters.append("t.project_id = %(project_id)s")
+            params['project_id'] = project_id
+        if layer.kind != 'point' and z < layer.detail_zoom:
+            # Drop features smaller than a pixel at overview zooms
+            filters.append(
+                f"(ST_XMax(t.{layer.geometry}) - ST_XMin(t.{layer.geometry})) + "
+                f"(ST_YMax(t.{layer.geometry}) - ST_YMin(t.{layer.geometry})) >= %(min_size)s")
+            params['min_size'] = pixel_size_ft(z)
+
+        query = f"""
+            WITH bounds AS (
+                SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS tile,
+                       ST_Transform(ST_TileEnvelope(%(z)s, %(x)s, %(y)s, margin => %(margin)s),
+                                    {NATIVE_SRID}) AS native
+            ),
+            features AS (
+                SELECT ST_AsMVTGeom(ST_Transform(ST_Force2D(t.{layer.geometry}), 3857), bounds.tile,
+                                    {MVT_EXTENT}, {MVT_BUFFER}, true) AS geom,
+                       t.{layer.key}::text AS id,
+                       {columns}
+                FROM bounds
+                CROSS JOIN {layer.table} t
+                {layer.join}
+                WHERE {' AND '.join(filters)}
+            )
+            SELECT ST_AsMVT(features, %(layer)s, {MVT_EXTENT}, 'geom')
+            FROM features
+            WHERE geom IS NOT NULL
+        """
+        return query, params
+
+    def project_extent(self, project_id: str) -> Optional[Tuple[float, float, float, float]]:
+        """
+        WGS84 bounds (min lon, min lat, max lon, max lat) of a project's
+        features across all tile layers, or None if it has none.
+        """
+        extents = "\n                UNION ALL\n                ".join(
+            f"SELECT ST_Extent({layer.geometry})::geometry AS box "
+            f"FROM {layer.table} WHERE project_id = %(project_id)s"
+            for layer in self.layers.values())
+        query = f"""
+            WITH extents AS (
+                {extents}
+            )
+            SELECT ST_XMin(b), ST_YMin(b), ST_XMax(b), ST_YMax(b)
+            FROM (
+                SELECT ST_Transform(ST_SetSRID(ST_Extent(box)::geometry, {NATIVE_SRID}), 4326) AS b
+                FROM extents
+            ) e
+            WHERE b IS NOT NULL
+        """
+        with get_cursor(dict_cursor=False) as cursor:
+            cursor.execute(query, {'project_id': project_id})
+            row = cursor.fetchone()
+        return tuple(float(v) for v in row) if row else None
+
+    def get_vector_tile_data(self, z: int, x: int, y: int, layer_name: str,
+                             project_id: Optional[str] = None) -> Optional[bytes]:
         """
-        Simulates retrieving a Mapbox Vector Tile (MVT) using Z/X/Y coordinates.
-        This is how modern web GIS layers handle massive datasets efficiently.
+        Retrieve a Mapbox Vector Tile (MVT) using Z/X/Y coordinates.
 
         Args:
             z: Zoom level (0-22, where higher = more detailed)
             x: Tile column index at the given zoom level
             y: Tile row index at the given zoom level
-            layer_name: Name of the spatial layer/table to query
-            extent_wkt: Well-Known Text representation of the query extent (currently unused in mock)
+            layer_name: Tile layer (a key of TILE_LAYERS)
+            project_id: Only include features of this project
 
         Returns:
-            Mock MVT tile data as a string, or None if no data found
+            Encoded tile (b'' when the tile has no features), or None if the
+            query failed
+
+        Raises:
+            ValueError: Unknown layer or invalid tile coordinates
         """
         logger.info(f"Requesting vector tile Z={z}, X={x}, Y={y} for layer: {layer_name}")
 
-        # The core PostGIS query logic being mocked:
-        # ST_AsMVTGeom handles clipping and projection into the final tile format.
-
-        # NOTE: We use a placeholder bounding box calculation (BBox) derived from Z/X/Y
-        # which would typically be calculated upstream based on the web Mercator grid.
-
-        mock_tile_query = text(textwrap.dedent(f"""
-            SELECT ST_AsMVTGeom(
-                geom_4326,
-                ST_TileEnvelope({z}, {x}, {y})
-            ) AS geom_mvt,
-            feature_code, attribute_json
-            FROM {layer_name}
-            WHERE ST_Intersects(geom_4326, ST_TileEnvelope({z}, {x}, {y}));
-        """))
+        built = self.build_tile_query(z, x, y, layer_name, project_id)
+        if built is None:
+            return b''
+        query, params = built
 
         try:
-            with _mock_get_connection() as conn:
-                # Mock execution returns a tuple with the mock MVT data
-                results = conn.execute(mock_tile_query)
-
-                # Fetch the mock MVT data (first column of the first row)
-                mvt_data = results[0][0] if results else None
-
-                if mvt_data:
-                    logger.info("MVT tile successfully generated and retrieved.")
-                    return mvt_data
-
-                logger.warning("No data found for the requested tile extent.")
-                return None
-
+            with get_cursor(dict_cursor=False) as cursor:
+                cursor.execute(query, params)
+                row = cursor.fetchone()
         except Exception as e:
             logger.error(f"Error executing vector tile query: {e}")
             return None
 
+        tile = bytes(row[0]) if row and row[0] is not None else b''
+        if not tile:
+            logger.debug("No data found for the requested tile extent.")
+        return tile
+
+
 # --- Example Execution ---
 if __name__ == '__main__':
     service = MapViewerService()
 
-    # Simulate a request for a tile at Zoom 16, Column 12345, Row 6789
-    tile_data = service.get_vector_tile_data(
-        z=16,
-        x=12345,
-        y=6789,
-        layer_name="ssm_points_layer",
-        extent_wkt="BBOX(WKT)"
-    )
-
-    print("\n--- VECTOR TILE SERVICE TEST ---")
-    if tile_data:
-        print(f"Tile Generation SUCCESS. Data Preview: {tile_data[:20]}...")
-    else:
-        print("Tile Generation FAILED.")
+    # Print the SQL for a utility lines tile at zoom 16 over Santa Rosa
+    query, params = service.build_tile_query(z=16, x=10429, y=25177, layer_name='utility_lines')
+    print("\n--- VECTOR TILE QUERY ---")
+    print(query)
+    print(params)
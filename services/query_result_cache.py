@@ -0,0 +1,284 @@
+"""
+Query Result Cache - Two-tier cache for GraphRAG query results
+
+1. Local tier: a per-process LRU keyed by the hash of the normalised query
+   text, so a warm hit is a dict lookup with no database round trip
+2. Shared tier: the ai_query_cache table, read on a local miss and shared
+   by every worker
+3. Hit counts are accumulated in memory and flushed by a background thread
+   in one set-based UPDATE, instead of an UPDATE per hit
+4. Each result records the entity ids it touches (the entity_ids column and
+   an in-process entity -> key index), so invalidating entities drops only
+   the results containing them. The flush thread also pulls invalidations
+   made by other workers, so a worker serves an invalidated result for at
+   most one flush interval (and never past local_ttl_seconds).
+"""
+
+import atexit
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterable, List, Optional
+
+from psycopg2.extras import execute_values
+from tools.db_utils import get_cursor
+
+
+def normalize_query(query_text: str) -> str:
+    """Case- and whitespace-insensitive form of a query."""
+    return ' '.join(query_text.lower().split())
+
+
+def touched_entity_ids(result: Dict[str, Any]) -> List[str]:
+    """Entity ids in a result: its entities and its relationships' endpoints."""
+    ids = set()
+    for entity in result.get('entities') or []:
+        if entity.get('entity_id'):
+            ids.add(str(entity['entity_id']))
+    for relationship in result.get('relationships') or []:
+        for key, value in relationship.items():
+            if key.endswith('_entity_id') and value:
+                ids.add(str(value))
+    return sorted(ids)
+
+
+class QueryResultCache:
+    """In-process LRU in front of ai_query_cache."""
+
+    def __init__(self, max_entries: int = 1000, local_ttl_seconds: float = 300,
+                 flush_interval: Optional[float] = 5.0):
+        """
+        Args:
+            max_entries: Results held in the local tier
+            local_ttl_seconds: Longest a local entry is served without
+                re-reading the shared tier
+            flush_interval: Seconds between background flushes of hit
+                counts and invalidation polls (None: only on flush())
+        """
+        self.max_entries = max_entries
+        self.local_ttl_seconds = local_ttl_seconds
+        self.flush_interval = flush_interval
+
+        self._entries = OrderedDict()   # key -> (result, expires at (monotonic), entity ids)
+        self._by_entity = {}            # entity_id -> set of keys
+        self._pending_hits = {}         # key -> (hits, last accessed)
+        self._invalidations_seen = None
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def key(query_text: str, max_results: int) -> str:
+        """ai_query_cache.query_hash for a query and result limit."""
+        return hashlib.sha256(f'{normalize_query(query_text)}\0{max_results}'.encode()).hexdigest()
+
+    def get(self, query_text: str, max_results: int) -> Optional[Dict[str, Any]]:
+        """Cached result for a query, from the local tier or else the shared one."""
+        key = self.key(query_text, max_results)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._record_hit(key)
+                return self._served(entry[0], 'local')
+            if entry is not None:
+                self._evict(key)
+
+        try:
+            with get_cursor() as cursor:
+                cursor.execute("""
+                    SELECT result_json, entity_ids,
+                           EXTRACT(EPOCH FROM (expires_at - NOW())) AS expires_in
+                    FROM ai_query_cache
+                    WHERE query_hash = %s
+                      AND is_valid = TRUE
+                      AND (expires_at IS NULL OR expires_at > NOW())
+                """, (key,))
+                row = cursor.fetchone()
+        except Exception as e:
+            print(f"Cache retrieval error: {e}")
+            return None
+
+        if row is None:
+            return None
+
+        result = row['result_json']
+        entity_ids = [str(entity_id) for entity_id in row['entity_ids'] or []]
+        ttl = self.local_ttl_seconds
+        if row['expires_in'] is not None:
+            ttl = min(ttl, float(row['expires_in']))
+        with self._lock:
+            self._store(key, result, entity_ids, ttl)
+            self._record_hit(key)
+        return self._served(result, 'shared')
+
+    def put(self, query_text: str, max_results: int, query_type: str, result: Dict[str, Any],
+            execution_time_ms: float, ttl_seconds: Optional[float] = 3600):
+        """Cache a result in both tiers."""
+        key = self.key(query_text, max_results)
+        entity_ids = touched_entity_ids(result)
+        expires_at = datetime.now() + timedelta(seconds=ttl_seconds) if ttl_seconds else None
+
+        try:
+            with get_cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO ai_query_cache (
+                        query_hash, query_text, query_type, result_json, entity_ids,
+                        entity_count, relationship_count, execution_time_ms, expires_at
+                    ) VALUES (%s, %s, %s, %s, %s::uuid[], %s, %s, %s, %s)
+                    ON CONFLICT (query_hash) DO UPDATE
+                    SET result_json = EXCLUDED.result_json,
+                        entity_ids = EXCLUDED.entity_ids,
+                        execution_time_ms = EXCLUDED.execution_time_ms,
+                        expires_at = EXCLUDED.expires_at,
+                        created_at = NOW(),
+                        is_valid = TRUE,
+                        invalidation_reason = NULL,
+                        invalidated_at = NULL
+                """, (
+                    key, query_text, query_type, json.dumps(result, default=str), entity_ids,
+                    len(result.get('entities', [])), len(result.get('relationships', [])),
+                    round(execution_time_ms), expires_at
+                ))
+        except Exception as e:
+            print(f"Cache write error: {e}")
+            return
+
+        with self._lock:
+            self._store(key, dict(result), entity_ids,
+                        min(self.local_ttl_seconds, ttl_seconds or self.local_ttl_seconds))
+
+    def invalidate(self, entity_ids: Optional[Iterable[str]] = None,
+                   reason: str = 'manual_invalidation') -> int:
+        """
+        Invalidate results containing any of entity_ids (all results if None).
+
+        Rows cached before entity ids were recorded (entity_ids IS NULL)
+        are invalidated too, since their contents are unknown.
+
+        Returns:
+            Number of shared-tier rows invalidated
+        """
+        entity_ids = [str(entity_id) for entity_id in entity_ids] if entity_ids else None
+        with self._lock:
+            if entity_ids is None:
+                keys = list(self._entries)
+            else:
+                keys = set()
+                for entity_id in entity_ids:
+                    keys |= self._by_entity.get(entity_id, set())
+            for key in keys:
+                self._evict(key)
+
+        entity_filter = "AND (entity_ids && %s::uuid[] OR entity_ids IS NULL)" if entity_ids else ""
+        params = (reason, entity_ids) if entity_ids else (reason,)
+        with get_cursor() as cursor:
+            cursor.execute(f"""
+                UPDATE ai_query_cache
+                SET is_valid = FALSE,
+                    invalidation_reason = %s,
+                    invalidated_at = NOW()
+                WHERE is_valid = TRUE
+                  {entity_filter}
+            """, params)
+            return cursor.rowcount
+
+    def flush(self):
+        """Write accumulated hit counts and drop results other workers invalidated."""
+        with self._lock:
+            pending, self._pending_hits = self._pending_hits, {}
+
+        with get_cursor() as cursor:
+            if pending:
+                execute_values(cursor, """
+                    UPDATE ai_query_cache c
+                    SET hit_count = c.hit_count + v.hits,
+                        last_accessed_at = GREATEST(c.last_accessed_at, v.last_accessed)
+                    FROM (VALUES %s) AS v(query_hash, hits, last_accessed)
+                    WHERE c.query_hash = v.query_hash
+                """, [(key, hits, last) for key, (hits, last) in pending.items()],
+                    template='(%s, %s::integer, %s::timestamp)')
+
+            cursor.execute("""
+                SELECT query_hash, invalidated_at
+                FROM ai_query_cache
+                WHERE invalidated_at > COALESCE(%s, NOW() - INTERVAL '1 hour')
+            """, (self._invalidations_seen,))
+            invalidated = cursor.fetchall()
+
+        with self._lock:
+            for row in invalidated:
+                self._evict(row['query_hash'])
+                if self._invalidations_seen is None or row['invalidated_at'] > self._invalidations_seen:
+                    self._invalidations_seen = row['invalidated_at']
+
+    def clear(self):
+        """Empty the local tier."""
+        with self._lock:
+            self._entries.clear()
+            self._by_entity.clear()
+
+    def close(self):
+        """Stop the background flusher and flush what is pending."""
+        self._stop.set()
+        if not self._pending_hits:
+            return
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Cache flush error: {e}")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _served(result: Dict[str, Any], tier: str) -> Dict[str, Any]:
+        # Copy the top level so callers never mutate the cached entry's metadata
+        metadata = dict(result.get('metadata') or {}, from_cache=True, cache_tier=tier)
+        return dict(result, metadata=metadata)
+
+    def _store(self, key: str, result: Dict[str, Any], entity_ids: List[str], ttl: float):
+        # Invalidation polls must run while anything is held locally, hit or not
+        self._start_flusher()
+        self._evict(key)
+        self._entries[key] = (result, time.monotonic() + ttl, entity_ids)
+        for entity_id in entity_ids:
+            self._by_entity.setdefault(entity_id, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for entity_id in entry[2]:
+            keys = self._by_entity.get(entity_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_entity[entity_id]
+
+    def _record_hit(self, key: str):
+        hits, _ = self._pending_hits.get(key, (0, None))
+        self._pending_hits[key] = (hits + 1, datetime.now())
+
+    def _start_flusher(self):
+        if self._flusher is None and self.flush_interval:
+            self._flusher = threading.Thread(target=self._flush_loop, name='query-cache-flush',
+                                             daemon=True)
+            self._flusher.start()
+            atexit.register(self.close)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Cache flush error: {e}")
+
+
+# Shared by every GraphRAGService in this process
+query_result_cache = QueryResultCache()
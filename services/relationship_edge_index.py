@@ -0,0 +1,213 @@
+"""
+Relationship Edge Index
+In-memory adjacency index over relationship_edges rows.
+
+Traversals (subgraphs, paths, cycles) load the edges they need with one
+query and walk this index instead of querying the database per visited
+node. Nodes are interned to integer ids (entity ids are UUIDs, compared
+case-insensitively); the adjacency follows the same rules as the per-node
+SQL it replaces: an edge leads from its source to its target, and also from
+its target back to its source when is_bidirectional.
+
+References:
+    - services/relationship_query_service.py
+    - database/migrations/022_create_relationship_edges.sql
+"""
+
+from collections import deque
+from typing import Dict, List, Optional, Any, Tuple
+
+
+# Edges within `depth` traversal steps of a root entity, in one round trip.
+# Parameters: project_id, root entity_type, root entity_id, depth
+# ({type_filter} adds "AND relationship_type = ANY(%s)" and one parameter
+# after project_id). UNION (not UNION ALL) keeps one row per (node, depth),
+# which together with the depth bound guards against cycles. Edges are
+# matched by their source, and bidirectional edges also by their target, in
+# two separate joins so each can use a hash semi-join on expanded.
+NEIGHBORHOOD_EDGES_QUERY = """
+    WITH RECURSIVE project_edges AS (
+        SELECT * FROM relationship_edges
+        WHERE project_id = %s
+          AND is_active = TRUE
+          {type_filter}
+    ),
+    steps AS (
+        SELECT source_entity_type AS from_type, source_entity_id AS from_id,
+               target_entity_type AS to_type, target_entity_id AS to_id
+        FROM project_edges
+        UNION ALL
+        SELECT target_entity_type, target_entity_id, source_entity_type, source_entity_id
+        FROM project_edges
+        WHERE is_bidirectional = TRUE
+    ),
+    reachable(entity_type, entity_id, depth) AS (
+        SELECT %s::varchar, %s::uuid, 0
+        UNION
+        SELECT s.to_type::varchar, s.to_id, r.depth + 1
+        FROM reachable r
+        JOIN steps s ON s.from_type = r.entity_type AND s.from_id = r.entity_id
+        WHERE r.depth + 1 < %s
+    ),
+    expanded AS (
+        SELECT DISTINCT entity_type, entity_id FROM reachable
+    ),
+    matched AS (
+        SELECT e.edge_id
+        FROM project_edges e
+        JOIN expanded x ON x.entity_type = e.source_entity_type AND x.entity_id = e.source_entity_id
+        UNION
+        SELECT e.edge_id
+        FROM project_edges e
+        JOIN expanded x ON x.entity_type = e.target_entity_type AND x.entity_id = e.target_entity_id
+        WHERE e.is_bidirectional = TRUE
+    )
+    SELECT e.* FROM project_edges e
+    JOIN matched m ON m.edge_id = e.edge_id
+"""
+
+
+class EdgeIndex:
+    """Adjacency lists over relationship edge rows, keyed by integer node id."""
+
+    OUTGOING = 'outgoing'
+    INCOMING = 'incoming'
+
+    def __init__(self, edges: List[Dict[str, Any]]):
+        """
+        Build the index.
+
+        Args:
+            edges: relationship_edges rows (kept as-is and returned by lookups)
+        """
+        self.edges = edges
+        self.node_ids: Dict[Tuple[str, str], int] = {}
+        self.node_keys: List[Tuple[str, str]] = []
+        # node id -> [(edge index, neighbour node id, direction)] in edge order
+        self.adjacency: List[List[Tuple[int, int, str]]] = []
+
+        for edge_index, edge in enumerate(edges):
+            source = self._intern(edge['source_entity_type'], edge['source_entity_id'])
+            target = self._intern(edge['target_entity_type'], edge['target_entity_id'])
+            self.adjacency[source].append((edge_index, target, self.OUTGOING))
+            if edge.get('is_bidirectional') and source != target:
+                self.adjacency[target].append((edge_index, source, self.INCOMING))
+
+    def __len__(self) -> int:
+        return len(self.node_keys)
+
+    def _intern(self, entity_type: str, entity_id: Any) -> int:
+        key = (entity_type, str(entity_id).lower())
+        node = self.node_ids.get(key)
+        if node is None:
+            node = len(self.node_keys)
+            self.node_ids[key] = node
+            self.node_keys.append(key)
+            self.adjacency.append([])
+        return node
+
+    def node_id(self, entity_type: str, entity_id: Any) -> Optional[int]:
+        """Integer id of an entity, or None if it has no edges in the index."""
+        return self.node_ids.get((entity_type, str(entity_id).lower()))
+
+    def neighbors(self, node: int) -> List[Tuple[int, int, str]]:
+        """(edge index, neighbour node id, direction) for every edge leaving a node."""
+        return self.adjacency[node]
+
+    def strongly_connected_components(self) -> List[List[int]]:
+        """
+        Strongly connected components of the index, by iterative Tarjan.
+
+        Uses an explicit work stack instead of recursion, so arbitrarily deep
+        graphs are safe.
+
+        Returns:
+            Components as lists of node ids, in reverse topological order
+        """
+        n = len(self.node_keys)
+        adjacency = self.adjacency
+        order = [-1] * n
+        low = [0] * n
+        on_stack = [False] * n
+        stack = []
+        components = []
+        counter = 0
+
+        for root in range(n):
+            if order[root] != -1:
+                continue
+
+            order[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            work = [(root, 0)]
+
+            while work:
+                node, position = work[-1]
+                neighbors = adjacency[node]
+
+                if position < len(neighbors):
+                    work[-1] = (node, position + 1)
+                    neighbor = neighbors[position][1]
+                    if order[neighbor] == -1:
+                        order[neighbor] = low[neighbor] = counter
+                        counter += 1
+                        stack.append(neighbor)
+                        on_stack[neighbor] = True
+                        work.append((neighbor, 0))
+                    elif on_stack[neighbor] and order[neighbor] < low[node]:
+                        low[node] = order[neighbor]
+                    continue
+
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    if low[node] < low[parent]:
+                        low[parent] = low[node]
+
+                if low[node] == order[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+
+        return components
+
+    def has_self_loop(self, node: int) -> bool:
+        """Whether a node has an edge to itself."""
+        return any(neighbor == node for _, neighbor, _ in self.adjacency[node])
+
+    def shortest_cycle(self, start: int, members: set) -> List[int]:
+        """
+        Shortest cycle through a node, staying inside a set of nodes.
+
+        Args:
+            start: Node the cycle starts and ends at
+            members: Nodes the cycle may use (normally start's component)
+
+        Returns:
+            Edge indexes forming the cycle, or [] if there is none
+        """
+        parents = {start: None}  # node -> (previous node, edge index)
+        queue = deque([start])
+
+        while queue:
+            node = queue.popleft()
+            for edge_index, neighbor, _ in self.adjacency[node]:
+                if neighbor == start:
+                    cycle = [edge_index]
+                    while parents[node] is not None:
+                        node, step = parents[node]
+                        cycle.append(step)
+                    cycle.reverse()
+                    return cycle
+                if neighbor in members and neighbor not in parents:
+                    parents[neighbor] = (node, edge_index)
+                    queue.append(neighbor)
+
+        return []
@@ -14,20 +14,53 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from database import get_db, execute_query as db_execute_query
-from tools.db_utils import execute_query
+from psycopg2.extras import execute_values
+from tools.db_utils import execute_query, get_cursor
 from services.entity_registry import EntityRegistry
 from typing import Dict, List, Optional, Any, Tuple
 import json
+import time
+import uuid
 from datetime import datetime, date
 from decimal import Decimal
 
 
+EDGE_REQUIRED_FIELDS = ('source_entity_type', 'source_entity_id',
+                        'target_entity_type', 'target_entity_id',
+                        'relationship_type')
+
+# Multi-row insert for create_edges_batch. Existing active edges are left
+# alone (and return no row); soft-deleted ones are restored with the new
+# properties. xmax = 0 only for freshly inserted rows.
+EDGE_UPSERT_QUERY = """
+    INSERT INTO relationship_edges (
+        project_id, source_entity_type, source_entity_id,
+        target_entity_type, target_entity_id, relationship_type,
+        relationship_strength, is_bidirectional, relationship_metadata,
+        created_by, source, confidence_score, valid_from, valid_to
+    )
+    VALUES %s
+    ON CONFLICT ON CONSTRAINT unique_directed_edge DO UPDATE SET
+        relationship_strength = EXCLUDED.relationship_strength,
+        is_bidirectional = EXCLUDED.is_bidirectional,
+        relationship_metadata = EXCLUDED.relationship_metadata,
+        source = EXCLUDED.source,
+        confidence_score = EXCLUDED.confidence_score,
+        valid_from = EXCLUDED.valid_from,
+        valid_to = EXCLUDED.valid_to,
+        is_active = TRUE,
+        status = 'active'
+    WHERE relationship_edges.is_active = FALSE
+    RETURNING *, (xmax = 0) AS inserted
+"""
+
+
 class RelationshipGraphService:
     """Service for managing relationship edges in the graph model"""
 
     def __init__(self):
         self.registry = EntityRegistry()
+        self.batch_metrics = {}
 
     # ============================================================================
     # CRUD OPERATIONS
@@ -141,11 +174,20 @@ class RelationshipGraphService:
     def create_edges_batch(
         self,
         project_id: str,
-        edges: List[Dict[str, Any]]
+        edges: List[Dict[str, Any]],
+        page_size: int = 1000
     ) -> List[Dict[str, Any]]:
         """
         Create multiple relationship edges in a single transaction.
 
+        The whole batch is validated before anything is written (entity types
+        once per distinct type, relationship types with one registry query,
+        ids parsed as UUIDs). Edges are then written with one multi-row
+        INSERT per page: an edge that already exists and is active is
+        skipped, and a soft-deleted one is restored with the new properties,
+        as create_edge does. Repeats of the same edge within the batch are
+        written once. Per-page metrics are left in self.batch_metrics.
+
         Args:
             project_id: Project UUID
             edges: List of edge dictionaries with keys:
@@ -153,73 +195,61 @@ class RelationshipGraphService:
                 - target_entity_type, target_entity_id
                 - relationship_type
                 - (optional) relationship_strength, is_bidirectional, relationship_metadata, etc.
+            page_size: Edges per INSERT statement
 
         Returns:
-            List of created edge records
+            Created or restored edge records, in input order
 
         Raises:
             ValueError: If validation fails for any edge
         """
-        created_edges = []
-
-        with get_db() as conn:
-            with conn.cursor() as cur:
-                try:
-                    for edge in edges:
-                        # Validate required fields
-                        required_fields = ['source_entity_type', 'source_entity_id',
-                                         'target_entity_type', 'target_entity_id',
-                                         'relationship_type']
-                        for field in required_fields:
-                            if field not in edge:
-                                raise ValueError(f"Missing required field: {field}")
-
-                        # Validate entity types
-                        if not self.registry.is_valid_entity_type(edge['source_entity_type']):
-                            raise ValueError(f"Invalid source_entity_type '{edge['source_entity_type']}'")
-
-                        if not self.registry.is_valid_entity_type(edge['target_entity_type']):
-                            raise ValueError(f"Invalid target_entity_type '{edge['target_entity_type']}'")
-
-                        # Insert edge
-                        cur.execute(
-                            """
-                            INSERT INTO relationship_edges (
-                                project_id, source_entity_type, source_entity_id,
-                                target_entity_type, target_entity_id, relationship_type,
-                                relationship_strength, is_bidirectional, relationship_metadata,
-                                created_by, source, confidence_score, valid_from, valid_to
-                            )
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                            RETURNING *
-                            """,
-                            (
-                                project_id,
-                                edge['source_entity_type'],
-                                str(edge['source_entity_id']),
-                                edge['target_entity_type'],
-                                str(edge['target_entity_id']),
-                                edge['relationship_type'],
-                                edge.get('relationship_strength'),
-                                edge.get('is_bidirectional', False),
-                                json.dumps(edge.get('relationship_metadata', {})),
-                                edge.get('created_by'),
-                                edge.get('source', 'manual'),
-                                edge.get('confidence_score'),
-                                edge.get('valid_from'),
-                                edge.get('valid_to')
-                            )
-                        )
-                        created_edge = cur.fetchone()
-                        if created_edge:
-                            created_edges.append(dict(created_edge))
-
-                    conn.commit()
-                except Exception as e:
-                    conn.rollback()
-                    raise e
-
-        return created_edges
+        started = time.perf_counter()
+        rows = self._validate_edges_batch(project_id, edges)
+
+        # Repeats within the batch collapse onto their first occurrence
+        unique_rows, seen = [], set()
+        for row in rows:
+            if row[:6] not in seen:
+                seen.add(row[:6])
+                unique_rows.append(row)
+
+        self.batch_metrics = {
+            'requested': len(edges),
+            'duplicates_in_batch': len(rows) - len(unique_rows),
+            'created': 0,
+            'restored': 0,
+            'skipped_existing': 0,
+            'pages': []
+        }
+
+        written = {}  # edge key -> edge record
+        with get_cursor() as cur:
+            for offset in range(0, len(unique_rows), page_size):
+                page = unique_rows[offset:offset + page_size]
+                page_started = time.perf_counter()
+                results = execute_values(cur, EDGE_UPSERT_QUERY, page,
+                                         page_size=len(page), fetch=True)
+
+                created = 0
+                for result in results:
+                    record = dict(result)
+                    created += record.pop('inserted')
+                    written[self._edge_key(record)] = record
+
+                page_metrics = {
+                    'edges': len(page),
+                    'created': created,
+                    'restored': len(results) - created,
+                    'skipped_existing': len(page) - len(results),
+                    'ms': round((time.perf_counter() - page_started) * 1000, 2)
+                }
+                self.batch_metrics['pages'].append(page_metrics)
+                for key in ('created', 'restored', 'skipped_existing'):
+                    self.batch_metrics[key] += page_metrics[key]
+
+        self.batch_metrics['ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+        return [written[row[:6]] for row in unique_rows if row[:6] in written]
 
     def get_edge(self, edge_id: str) -> Optional[Dict[str, Any]]:
         """Get a single relationship edge by ID"""
@@ -407,37 +437,64 @@ class RelationshipGraphService:
     def delete_edges_batch(
         self,
         edge_ids: List[str],
-        soft_delete: bool = True
+        soft_delete: bool = True,
+        page_size: int = 5000
     ) -> int:
         """
         Delete multiple edges at once.
 
+        Ids are checked up front and deleted a page at a time in a single
+        transaction; soft deletes only touch edges that are still active.
+        Per-page metrics are left in self.batch_metrics.
+
         Args:
             edge_ids: List of edge UUIDs
             soft_delete: If True, set is_active=False; if False, hard delete
+            page_size: Ids per statement
 
         Returns:
             Number of edges deleted
+
+        Raises:
+            ValueError: If any id is not a valid UUID
         """
-        if not edge_ids:
+        started = time.perf_counter()
+        ids = []
+        for index, edge_id in enumerate(edge_ids):
+            try:
+                ids.append(str(uuid.UUID(str(edge_id))))
+            except ValueError:
+                raise ValueError(f"Edge {index}: invalid edge_id '{edge_id}'")
+        ids = list(dict.fromkeys(ids))
+
+        self.batch_metrics = {'requested': len(edge_ids), 'deleted': 0, 'pages': []}
+        if not ids:
             return 0
 
         if soft_delete:
             query = """
                 UPDATE relationship_edges
                 SET is_active = FALSE, status = 'deleted'
-                WHERE edge_id = ANY(%s)
+                WHERE edge_id = ANY(%s::uuid[])
+                  AND is_active = TRUE
             """
         else:
-            query = "DELETE FROM relationship_edges WHERE edge_id = ANY(%s)"
-
-        with get_db() as conn:
-            with conn.cursor() as cur:
-                cur.execute(query, (edge_ids,))
-                count = cur.rowcount
-                conn.commit()
-
-        return count
+            query = "DELETE FROM relationship_edges WHERE edge_id = ANY(%s::uuid[])"
+
+        with get_cursor() as cur:
+            for offset in range(0, len(ids), page_size):
+                page = ids[offset:offset + page_size]
+                page_started = time.perf_counter()
+                cur.execute(query, (page,))
+                self.batch_metrics['pages'].append({
+                    'edges': len(page),
+                    'deleted': cur.rowcount,
+                    'ms': round((time.perf_counter() - page_started) * 1000, 2)
+                })
+                self.batch_metrics['deleted'] += cur.rowcount
+
+        self.batch_metrics['ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return self.batch_metrics['deleted']
 
     # ============================================================================
     # HELPER METHODS
@@ -453,6 +510,116 @@ class RelationshipGraphService:
 
         return self.update_edge(edge_id, **update_data)
 
+    def _validate_edges_batch(
+        self,
+        project_id: str,
+        edges: List[Dict[str, Any]]
+    ) -> List[Tuple]:
+        """
+        Validate a batch of edge dictionaries and build their insert rows.
+
+        Registry lookups are made once per distinct entity type and
+        relationship type rather than once per edge.
+
+        Returns:
+            One row per edge in the column order of EDGE_UPSERT_QUERY's
+            INSERT list (project_id through valid_to); the first six values
+            are the edge's unique key
+
+        Raises:
+            ValueError: Listing the failing edges by position
+        """
+        try:
+            project_id = str(uuid.UUID(str(project_id)))
+        except ValueError:
+            raise ValueError(f"Invalid project_id '{project_id}'")
+
+        errors = []
+        for index, edge in enumerate(edges):
+            missing = [field for field in EDGE_REQUIRED_FIELDS if edge.get(field) in (None, '')]
+            if missing:
+                errors.append(f"Edge {index}: Missing required field: {', '.join(missing)}")
+        if errors:
+            raise ValueError(self._batch_error(errors))
+
+        entity_types = {edge[field] for edge in edges
+                        for field in ('source_entity_type', 'target_entity_type')}
+        valid_entity_types = {t for t in entity_types if self.registry.is_valid_entity_type(t)}
+
+        relationship_types = sorted({edge['relationship_type'] for edge in edges})
+        type_rows = execute_query(
+            """
+            SELECT type_code, valid_source_types, valid_target_types
+            FROM relationship_type_registry
+            WHERE type_code = ANY(%s) AND is_active = TRUE
+            """,
+            (relationship_types,)
+        ) if relationship_types else []
+        type_rules = {row['type_code']: row for row in type_rows}
+
+        rows = []
+        for index, edge in enumerate(edges):
+            source_type, target_type = edge['source_entity_type'], edge['target_entity_type']
+            relationship_type = edge['relationship_type']
+
+            if source_type not in valid_entity_types:
+                errors.append(f"Edge {index}: Invalid source_entity_type '{source_type}'")
+            if target_type not in valid_entity_types:
+                errors.append(f"Edge {index}: Invalid target_entity_type '{target_type}'")
+
+            rule = type_rules.get(relationship_type)
+            if rule is None:
+                errors.append(f"Edge {index}: Invalid relationship_type '{relationship_type}'")
+            else:
+                if rule.get('valid_source_types') is not None and source_type not in rule['valid_source_types']:
+                    errors.append(f"Edge {index}: Invalid source_entity_type '{source_type}' "
+                                  f"for relationship_type '{relationship_type}'")
+                if rule.get('valid_target_types') is not None and target_type not in rule['valid_target_types']:
+                    errors.append(f"Edge {index}: Invalid target_entity_type '{target_type}' "
+                                  f"for relationship_type '{relationship_type}'")
+
+            try:
+                source_id = str(uuid.UUID(str(edge['source_entity_id'])))
+                target_id = str(uuid.UUID(str(edge['target_entity_id'])))
+            except ValueError:
+                errors.append(f"Edge {index}: entity ids must be UUIDs")
+                continue
+
+            rows.append((
+                project_id,
+                source_type,
+                source_id,
+                target_type,
+                target_id,
+                relationship_type,
+                edge.get('relationship_strength'),
+                edge.get('is_bidirectional', False),
+                json.dumps(edge.get('relationship_metadata', {})),
+                edge.get('created_by'),
+                edge.get('source', 'manual'),
+                edge.get('confidence_score'),
+                edge.get('valid_from'),
+                edge.get('valid_to')
+            ))
+
+        if errors:
+            raise ValueError(self._batch_error(errors))
+        return rows
+
+    @staticmethod
+    def _batch_error(errors: List[str], limit: int = 20) -> str:
+        """Join per-edge validation errors into one message."""
+        message = '; '.join(errors[:limit])
+        if len(errors) > limit:
+            message += f" (and {len(errors) - limit} more)"
+        return message
+
+    @staticmethod
+    def _edge_key(edge: Dict[str, Any]) -> Tuple:
+        """Unique key of an edge record, matching the first six insert values."""
+        return (str(edge['project_id']), edge['source_entity_type'], str(edge['source_entity_id']),
+                edge['target_entity_type'], str(edge['target_entity_id']), edge['relationship_type'])
+
     def get_edge_count(
         self,
         project_id: Optional[str] = None,
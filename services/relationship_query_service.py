@@ -3,11 +3,12 @@ Relationship Query Service
 Graph traversal and querying operations for the relationship graph.
 
 This service provides advanced querying capabilities including:
-- Graph traversal (BFS/DFS)
+- Graph traversal (BFS/DFS over an in-memory edge index loaded with one
+  recursive query)
 - Path finding
 - Subgraph extraction
 - Orphan detection
-- Cycle detection
+- Cycle detection (strongly connected components)
 
 References:
     - docs/PHASE_3_COMPREHENSIVE_ANALYSIS.md
@@ -18,16 +19,62 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import time
 from tools.db_utils import execute_query
 from typing import Dict, List, Optional, Any, Set, Tuple
-from collections import deque, defaultdict
+from collections import deque
+from services.relationship_edge_index import EdgeIndex, NEIGHBORHOOD_EDGES_QUERY
 
 
 class RelationshipQueryService:
     """Service for querying and traversing the relationship graph"""
 
     def __init__(self):
-        pass
+        # Database round trips made by this instance (reported by the API routes)
+        self.query_stats = {'query_count': 0, 'query_ms': 0.0}
+
+    def _execute(self, query: str, params: Optional[tuple] = None) -> List[Dict[str, Any]]:
+        """Run a query through execute_query, recording count and latency."""
+        start = time.perf_counter()
+        try:
+            return execute_query(query, params)
+        finally:
+            self.query_stats['query_count'] += 1
+            self.query_stats['query_ms'] += (time.perf_counter() - start) * 1000
+
+    def _load_neighborhood(
+        self,
+        project_id: str,
+        entity_type: str,
+        entity_id: str,
+        depth: int,
+        relationship_types: Optional[List[str]] = None
+    ) -> EdgeIndex:
+        """
+        Load every active edge a traversal of `depth` steps from an entity can use.
+
+        Args:
+            project_id: Project UUID
+            entity_type: Type of the root entity
+            entity_id: UUID of the root entity
+            depth: Number of expansion steps (nodes closer than this are expanded)
+            relationship_types: Optional list of relationship types to include
+
+        Returns:
+            EdgeIndex over the edges leaving every node within depth - 1 steps
+        """
+        if depth <= 0:
+            return EdgeIndex([])
+
+        params = [project_id]
+        type_filter = ''
+        if relationship_types:
+            type_filter = 'AND relationship_type = ANY(%s)'
+            params.append(list(relationship_types))
+        params.extend([entity_type, str(entity_id), depth])
+
+        edges = self._execute(NEIGHBORHOOD_EDGES_QUERY.format(type_filter=type_filter), tuple(params))
+        return EdgeIndex(edges or [])
 
     # ============================================================================
     # BASIC QUERIES
@@ -60,18 +107,15 @@ class RelationshipQueryService:
 
         params = (entity_type, entity_id, relationship_type, direction)
 
-        results = execute_query(query, params)
+        results = self._execute(query, params)
 
         # If project_id is specified, filter results
-        if project_id:
+        if project_id and results:
             # Get edge details to filter by project
-            filtered_results = []
-            for result in results:
-                edge_query = "SELECT project_id FROM relationship_edges WHERE edge_id = %s"
-                edge_data = execute_query(edge_query, (result['edge_id'],))
-                if edge_data and str(edge_data[0]['project_id']) == str(project_id):
-                    filtered_results.append(result)
-            return filtered_results
+            edge_query = "SELECT edge_id FROM relationship_edges WHERE edge_id = ANY(%s::uuid[]) AND project_id = %s"
+            edge_data = self._execute(edge_query, ([str(r['edge_id']) for r in results], project_id))
+            project_edges = {str(row['edge_id']) for row in edge_data}
+            return [result for result in results if str(result['edge_id']) in project_edges]
 
         return results
 
@@ -96,10 +140,10 @@ class RelationshipQueryService:
         Returns:
             Dictionary with 'nodes' and 'edges' representing the subgraph
         """
+        index = self._load_neighborhood(project_id, entity_type, entity_id, depth, relationship_types)
+
         nodes = {}
         edges = []
-        visited = set()
-        queue = deque([(entity_type, entity_id, 0)])  # (type, id, current_depth)
 
         # Add root node
         nodes[f"{entity_type}:{entity_id}"] = {
@@ -107,45 +151,20 @@ class RelationshipQueryService:
             'entity_id': entity_id,
             'depth': 0
         }
-        visited.add(f"{entity_type}:{entity_id}")
+
+        root = index.node_id(entity_type, entity_id)
+        visited = {root}
+        queue = deque([(root, 0)] if root is not None else [])  # (node id, current_depth)
 
         while queue:
-            curr_type, curr_id, curr_depth = queue.popleft()
+            curr_node, curr_depth = queue.popleft()
 
             if curr_depth >= depth:
                 continue
 
-            # Get all edges from this node
-            edge_query = """
-                SELECT * FROM relationship_edges
-                WHERE project_id = %s
-                  AND is_active = TRUE
-                  AND (
-                    (source_entity_type = %s AND source_entity_id = %s)
-                    OR
-                    (target_entity_type = %s AND target_entity_id = %s AND is_bidirectional = TRUE)
-                  )
-            """
-            params = [project_id, curr_type, str(curr_id), curr_type, str(curr_id)]
-
-            if relationship_types:
-                edge_query += " AND relationship_type = ANY(%s)"
-                params.append(relationship_types)
-
-            edge_results = execute_query(edge_query, tuple(params))
-
-            for edge in edge_results:
-                # Determine the connected node
-                if edge['source_entity_type'] == curr_type and str(edge['source_entity_id']) == str(curr_id):
-                    connected_type = edge['target_entity_type']
-                    connected_id = edge['target_entity_id']
-                    direction = 'outgoing'
-                else:
-                    connected_type = edge['source_entity_type']
-                    connected_id = edge['source_entity_id']
-                    direction = 'incoming'
-
-                node_key = f"{connected_type}:{connected_id}"
+            for edge_index, next_node, direction in index.neighbors(curr_node):
+                edge = index.edges[edge_index]
+                connected_type, connected_id = index.node_keys[next_node]
 
                 # Add edge to results
                 edges.append({
@@ -160,14 +179,14 @@ class RelationshipQueryService:
                 })
 
                 # Add connected node if not visited
-                if node_key not in visited:
-                    visited.add(node_key)
-                    nodes[node_key] = {
+                if next_node not in visited:
+                    visited.add(next_node)
+                    nodes[f"{connected_type}:{connected_id}"] = {
                         'entity_type': connected_type,
-                        'entity_id': str(connected_id),
+                        'entity_id': connected_id,
                         'depth': curr_depth + 1
                     }
-                    queue.append((connected_type, str(connected_id), curr_depth + 1))
+                    queue.append((next_node, curr_depth + 1))
 
         return {
             'nodes': list(nodes.values()),
@@ -209,48 +228,32 @@ class RelationshipQueryService:
         if source_key == target_key:
             return []  # Same entity
 
-        visited = set([source_key])
-        queue = deque([(source_key, [])])  # (node_key, path)
+        index = self._load_neighborhood(project_id, source_entity_type, source_entity_id, max_depth)
+        source = index.node_id(source_entity_type, source_entity_id)
+        target = index.node_id(target_entity_type, target_entity_id)
+
+        if source is None or target is None:
+            return None
+
+        visited = {source}
+        queue = deque([(source, [])])  # (node id, path)
 
         while queue:
-            curr_key, path = queue.popleft()
+            curr_node, path = queue.popleft()
 
             if len(path) >= max_depth:
                 continue
 
-            curr_type, curr_id = curr_key.split(':', 1)
-
-            # Get edges from current node
-            edge_query = """
-                SELECT * FROM relationship_edges
-                WHERE project_id = %s
-                  AND is_active = TRUE
-                  AND (
-                    (source_entity_type = %s AND source_entity_id = %s)
-                    OR
-                    (target_entity_type = %s AND target_entity_id = %s AND is_bidirectional = TRUE)
-                  )
-            """
-            edges = execute_query(edge_query, (project_id, curr_type, curr_id, curr_type, curr_id))
-
-            for edge in edges:
-                # Determine next node
-                if edge['source_entity_type'] == curr_type and str(edge['source_entity_id']) == str(curr_id):
-                    next_type = edge['target_entity_type']
-                    next_id = edge['target_entity_id']
-                else:
-                    next_type = edge['source_entity_type']
-                    next_id = edge['source_entity_id']
-
-                next_key = f"{next_type}:{next_id}"
+            for edge_index, next_node, _ in index.neighbors(curr_node):
+                edge = index.edges[edge_index]
 
-                if next_key == target_key:
+                if next_node == target:
                     # Found path!
                     return path + [edge]
 
-                if next_key not in visited:
-                    visited.add(next_key)
-                    queue.append((next_key, path + [edge]))
+                if next_node not in visited:
+                    visited.add(next_node)
+                    queue.append((next_node, path + [edge]))
 
         return None  # No path found
 
@@ -285,47 +288,30 @@ class RelationshipQueryService:
         if source_key == target_key:
             return [[]]  # Same entity
 
+        index = self._load_neighborhood(project_id, source_entity_type, source_entity_id, max_depth)
+        source = index.node_id(source_entity_type, source_entity_id)
+        target = index.node_id(target_entity_type, target_entity_id)
+
         paths = []
 
-        def dfs(curr_key: str, path: List[Dict], visited: Set[str]):
+        if source is None or target is None:
+            return paths
+
+        def dfs(curr_node: int, path: List[Dict], visited: Set[int]):
             if len(paths) >= max_paths or len(path) >= max_depth:
                 return
 
-            if curr_key == target_key:
+            if curr_node == target:
                 paths.append(list(path))
                 return
 
-            curr_type, curr_id = curr_key.split(':', 1)
-            visited.add(curr_key)
-
-            # Get edges from current node
-            edge_query = """
-                SELECT * FROM relationship_edges
-                WHERE project_id = %s
-                  AND is_active = TRUE
-                  AND (
-                    (source_entity_type = %s AND source_entity_id = %s)
-                    OR
-                    (target_entity_type = %s AND target_entity_id = %s AND is_bidirectional = TRUE)
-                  )
-            """
-            edges = execute_query(edge_query, (project_id, curr_type, curr_id, curr_type, curr_id))
-
-            for edge in edges:
-                # Determine next node
-                if edge['source_entity_type'] == curr_type and str(edge['source_entity_id']) == str(curr_id):
-                    next_type = edge['target_entity_type']
-                    next_id = edge['target_entity_id']
-                else:
-                    next_type = edge['source_entity_type']
-                    next_id = edge['source_entity_id']
-
-                next_key = f"{next_type}:{next_id}"
+            visited.add(curr_node)
 
-                if next_key not in visited:
-                    dfs(next_key, path + [edge], visited.copy())
+            for edge_index, next_node, _ in index.neighbors(curr_node):
+                if next_node not in visited:
+                    dfs(next_node, path + [index.edges[edge_index]], visited.copy())
 
-        dfs(source_key, [], set())
+        dfs(source, [], set())
         return paths
 
     # ============================================================================
@@ -372,78 +358,88 @@ class RelationshipQueryService:
 
         query += " ORDER BY entity_type, entity_id"
 
-        return execute_query(query, tuple(params))
+        return self._execute(query, tuple(params))
 
-    def detect_cycles(self, project_id: str) -> List[List[Dict[str, Any]]]:
+    def detect_cycles(self, project_id: str, max_cycles: int = 100) -> List[List[Dict[str, Any]]]:
         """
         Detect cycles in the relationship graph.
 
+        Returns one representative (shortest) cycle per strongly connected
+        component; see analyze_cycles() for component details.
+
         Args:
             project_id: Project UUID
+            max_cycles: Maximum number of cycles to return
 
         Returns:
             List of cycles (each cycle is a list of edges forming a loop)
         """
-        # Get all edges for the project
+        return self.analyze_cycles(project_id, max_cycles=max_cycles)['cycles']
+
+    def analyze_cycles(
+        self,
+        project_id: str,
+        max_cycles: int = 20,
+        max_component_nodes: int = 100
+    ) -> Dict[str, Any]:
+        """
+        Find the cyclic strongly connected components of a project's graph.
+
+        Every entity in a cyclic component lies on at least one cycle. A
+        bidirectional edge connects its two entities both ways, so it forms a
+        two-step cycle on its own.
+
+        Args:
+            project_id: Project UUID
+            max_cycles: Maximum number of representative cycles to return
+                (one per component, largest components first)
+            max_component_nodes: Maximum entities listed per component
+
+        Returns:
+            Dictionary with 'components' (size, edge count and entities of
+            each cyclic component, largest first), representative 'cycles'
+            (lists of edges) and graph counts
+        """
         edges_query = """
             SELECT * FROM relationship_edges
             WHERE project_id = %s AND is_active = TRUE
             ORDER BY source_entity_type, source_entity_id
         """
-        all_edges = execute_query(edges_query, (project_id,))
+        index = EdgeIndex(self._execute(edges_query, (project_id,)) or [])
 
-        # Build adjacency list
-        graph = defaultdict(list)
-        edge_map = {}
+        cyclic = [component for component in index.strongly_connected_components()
+                  if len(component) > 1 or index.has_self_loop(component[0])]
+        cyclic.sort(key=len, reverse=True)
 
-        for edge in all_edges:
-            source_key = f"{edge['source_entity_type']}:{edge['source_entity_id']}"
-            target_key = f"{edge['target_entity_type']}:{edge['target_entity_id']}"
-            graph[source_key].append(target_key)
-            edge_map[(source_key, target_key)] = edge
+        components = []
+        cycles = []
 
-            # Add reverse edge if bidirectional
-            if edge['is_bidirectional']:
-                graph[target_key].append(source_key)
-                edge_map[(target_key, source_key)] = edge
+        for component in cyclic:
+            members = set(component)
+            edge_count = sum(1 for node in component
+                             for _, neighbor, _ in index.neighbors(node) if neighbor in members)
 
-        # DFS-based cycle detection
-        cycles = []
-        visited = set()
-        rec_stack = set()
-
-        def dfs_cycle(node: str, path: List[str]):
-            visited.add(node)
-            rec_stack.add(node)
-
-            for neighbor in graph[node]:
-                if neighbor not in visited:
-                    if dfs_cycle(neighbor, path + [node]):
-                        return True
-                elif neighbor in rec_stack:
-                    # Found cycle
-                    cycle_start = path.index(neighbor) if neighbor in path else 0
-                    cycle_path = path[cycle_start:] + [node, neighbor]
-
-                    # Convert path to edges
-                    cycle_edges = []
-                    for i in range(len(cycle_path) - 1):
-                        edge_key = (cycle_path[i], cycle_path[i + 1])
-                        if edge_key in edge_map:
-                            cycle_edges.append(edge_map[edge_key])
-
-                    if cycle_edges and cycle_edges not in cycles:
-                        cycles.append(cycle_edges)
-
-            rec_stack.remove(node)
-            return False
-
-        # Check all nodes
-        for node in graph.keys():
-            if node not in visited:
-                dfs_cycle(node, [])
-
-        return cycles
+            components.append({
+                'size': len(component),
+                'edge_count': edge_count,
+                'entities': [
+                    {'entity_type': index.node_keys[node][0], 'entity_id': index.node_keys[node][1]}
+                    for node in sorted(component)[:max_component_nodes]
+                ]
+            })
+
+            if len(cycles) < max_cycles:
+                cycle = index.shortest_cycle(min(component), members)
+                cycles.append([index.edges[edge_index] for edge_index in cycle])
+
+        return {
+            'node_count': len(index),
+            'edge_count': len(index.edges),
+            'cyclic_component_count': len(components),
+            'components': components,
+            'cycles': cycles,
+            'cycles_truncated': len(cyclic) > len(cycles)
+        }
 
     def get_entity_connections_count(
         self,
@@ -473,7 +469,7 @@ class RelationshipQueryService:
 
         query += " ORDER BY total_connections DESC, entity_type, entity_id"
 
-        return execute_query(query, tuple(params))
+        return self._execute(query, tuple(params))
 
     def get_most_connected_entities(
         self,
@@ -506,7 +502,7 @@ class RelationshipQueryService:
         query += " ORDER BY total_connections DESC LIMIT %s"
         params.append(limit)
 
-        return execute_query(query, tuple(params))
+        return self._execute(query, tuple(params))
 
     # ============================================================================
     # STATISTICS & ANALYTICS
@@ -523,13 +519,13 @@ class RelationshipQueryService:
             Dictionary with various relationship statistics
         """
         # Get counts by relationship type
-        type_summary = execute_query(
+        type_summary = self._execute(
             "SELECT * FROM vw_relationship_summary_by_type WHERE project_id = %s",
             (project_id,)
         )
 
         # Get overall counts
-        overall = execute_query(
+        overall = self._execute(
             """
             SELECT
                 COUNT(*) as total_edges,
@@ -559,7 +555,7 @@ class RelationshipQueryService:
         Returns:
             Density value between 0.0 and 1.0
         """
-        result = execute_query(
+        result = self._execute(
             """
             WITH entity_counts AS (
                 SELECT COUNT(DISTINCT entity_id) as n
@@ -16,19 +16,84 @@ import json
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from database import execute_query, get_db
+from tools.db_utils import get_cursor
+from services.vector_index_manager import VectorIndexManager, vector_index_manager
+from services.embedding_matrix import EmbeddingMatrix, CLUSTER_METHODS
 import numpy as np
 
 
+# Nearest current embeddings of one model to a query vector. Ordering by the
+# bare distance expression with a LIMIT (and filtering on exactly the
+# model_id / is_current predicate of the model's partial index) is what lets
+# pgvector answer it from an HNSW/IVFFlat index. MATERIALIZED keeps the join
+# and any post-filtering outside the index scan.
+KNN_QUERY = """
+    WITH knn AS MATERIALIZED (
+        SELECT ee.entity_id,
+               ee.embedding <=> %(vector)s::vector AS distance,
+               ee.embedding_text
+        FROM entity_embeddings ee
+        WHERE ee.model_id = %(model_id)s
+          AND ee.is_current = TRUE
+        ORDER BY ee.embedding <=> %(vector)s::vector
+        LIMIT %(k)s
+    )
+    SELECT
+        se.entity_id,
+        se.entity_type,
+        se.canonical_name,
+        se.description,
+        se.attributes,
+        se.quality_score,
+        1 - knn.distance AS similarity_score,
+        knn.embedding_text,
+        (SELECT COUNT(*) FROM knn) AS candidate_count
+    FROM knn
+    JOIN standards_entities se ON se.entity_id = knn.entity_id
+    ORDER BY knn.distance
+"""
+
+# Exact (sequential) nearest neighbours of one model for models without an
+# ANN index. No index limits the candidates, so threshold, type and source
+# are filtered in the scan itself and a rare type is never crowded out.
+EXACT_KNN_QUERY = """
+    SELECT
+        se.entity_id,
+        se.entity_type,
+        se.canonical_name,
+        se.description,
+        se.attributes,
+        se.quality_score,
+        1 - (ee.embedding <=> %(vector)s::vector) AS similarity_score,
+        ee.embedding_text
+    FROM entity_embeddings ee
+    JOIN standards_entities se ON se.entity_id = ee.entity_id
+    WHERE ee.model_id = %(model_id)s
+      AND ee.is_current = TRUE
+      AND 1 - (ee.embedding <=> %(vector)s::vector) >= %(threshold)s
+      AND (%(entity_type)s::text IS NULL OR se.entity_type = %(entity_type)s)
+      AND (%(exclude_entity_id)s::text IS NULL OR ee.entity_id::text <> %(exclude_entity_id)s)
+    ORDER BY ee.embedding <=> %(vector)s::vector
+    LIMIT %(k)s
+"""
+
+
 class SemanticSearchService:
     """
     Semantic search using vector embeddings
     """
 
-    def __init__(self):
+    def __init__(self, index_manager: Optional[VectorIndexManager] = None):
         """Initialize the semantic search service"""
         self.default_similarity_threshold = 0.7
         self.default_max_results = 50
         self.cache_similar_pairs = True  # Cache pairwise similarity scores
+        self.index_manager = index_manager or vector_index_manager
+        self.ann_overfetch = 4          # Candidate multiplier when results are post-filtered
+        self.max_knn_candidates = 1000  # Upper bound when widening (HNSW's ef_search limit)
+        self.last_plan = None           # Plan of the most recent KNN query, for diagnostics
+        self.max_dense_matrix = 2000    # Larger similarity matrices default to top-k rows
+        self.matrix_top_k = 50
 
     def find_similar_entities(self,
                              entity_id: str,
@@ -51,40 +116,24 @@ class SemanticSearchService:
         """
         threshold = similarity_threshold or self.default_similarity_threshold
         limit = max_results or self.default_max_results
+        type_filter = entity_type if entity_type and not include_cross_type else None
 
-        # Build type filter
-        type_filter = ""
-        params = [entity_id, entity_id, threshold]
-
-        if entity_type and not include_cross_type:
-            type_filter = "AND se.entity_type = %s"
-            params.append(entity_type)
+        # Fetch the source vector(s) once (one per model the entity is embedded with)
+        sources = execute_query("""
+            SELECT model_id, embedding::text AS embedding
+            FROM entity_embeddings
+            WHERE entity_id = %s AND is_current = TRUE
+        """, (entity_id,))
 
-        query = f"""
-            SELECT
-                se.entity_id,
-                se.entity_type,
-                se.canonical_name,
-                se.description,
-                se.attributes,
-                se.quality_score,
-                1 - (e1.embedding <=> e2.embedding) as similarity_score,
-                e2.embedding_text
-            FROM entity_embeddings e1
-            JOIN entity_embeddings e2 ON e1.model_id = e2.model_id
-            JOIN standards_entities se ON se.entity_id = e2.entity_id
-            WHERE e1.entity_id = %s
-              AND e2.entity_id != %s
-              AND e1.is_current = TRUE
-              AND e2.is_current = TRUE
-              AND (1 - (e1.embedding <=> e2.embedding)) >= %s
-              {type_filter}
-            ORDER BY similarity_score DESC
-            LIMIT %s
-        """
+        matches = {}
+        for source in sources or []:
+            for row in self.knn_search(source['model_id'], source['embedding'], limit,
+                                       threshold, type_filter, exclude_entity_id=entity_id):
+                key = str(row['entity_id'])
+                if key not in matches or row['similarity_score'] > matches[key]['similarity_score']:
+                    matches[key] = row
 
-        params.append(limit)
-        results = execute_query(query, tuple(params))
+        results = sorted(matches.values(), key=lambda r: r['similarity_score'], reverse=True)[:limit]
 
         # Cache pairwise similarities
         if self.cache_similar_pairs and results:
@@ -92,6 +141,101 @@ class SemanticSearchService:
 
         return results
 
+    def plan_knn(self, model_id: str, limit: int, post_filtered: bool) -> Dict[str, Any]:
+        """
+        Choose how to run a KNN query for a model.
+
+        With an ANN index the query over-fetches candidates when results will
+        be post-filtered (by type or threshold) and sizes the index's search
+        parameter to the candidate count. Without one the query is an exact
+        scan filtered in SQL (EXACT_KNN_QUERY), with index scans disabled so
+        that an unrelated (global, low-recall) vector index is not picked
+        instead.
+
+        Returns:
+            Dict with strategy ('ann' or 'exact'), candidates (k) and the
+            session settings to apply
+        """
+        index = self.index_manager.get_index(model_id)
+        if index is None:
+            return {'strategy': 'exact', 'index': None, 'candidates': limit,
+                    'settings': {'enable_indexscan': 'off'}}
+
+        candidates = (limit + 1) * (self.ann_overfetch if post_filtered else 1)
+        candidates = min(candidates, self.max_knn_candidates)
+        if index['method'] == 'hnsw':
+            # ef_search bounds how many rows an HNSW scan can return
+            settings = {'hnsw.ef_search': str(min(max(40, candidates), 1000))}
+        else:
+            settings = {'ivfflat.probes': str(index['probes'])}
+        return {'strategy': 'ann', 'index': index['index_name'], 'candidates': candidates,
+                'settings': settings}
+
+    def knn_search(self, model_id: str, vector: str, limit: int, threshold: float,
+                   entity_type: Optional[str] = None,
+                   exclude_entity_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Nearest entities to a vector above a threshold, optionally of one type.
+
+        The exact strategy filters in SQL. With an ANN index the candidates
+        are post-filtered; when that leaves fewer than `limit` rows while the
+        furthest candidate still clears the threshold, the candidate set is
+        widened (up to max_knn_candidates) and the query re-run.
+
+        Args:
+            model_id: Embedding model the vector belongs to
+            vector: Query vector in pgvector text form ('[x,y,...]')
+            limit: Maximum results
+            threshold: Minimum similarity score
+            entity_type: Only return entities of this type
+            exclude_entity_id: Entity to leave out (the source)
+
+        Returns:
+            Matching entities, most similar first
+        """
+        plan = self.plan_knn(model_id, limit,
+                             post_filtered=entity_type is not None or threshold > 0)
+        exclude = str(exclude_entity_id) if exclude_entity_id else None
+
+        if plan['strategy'] == 'exact':
+            with get_cursor() as cursor:
+                for name, value in plan['settings'].items():
+                    cursor.execute("SELECT set_config(%s, %s, true)", (name, value))
+                cursor.execute(EXACT_KNN_QUERY, {
+                    'vector': vector, 'model_id': str(model_id), 'k': plan['candidates'],
+                    'threshold': threshold, 'entity_type': entity_type,
+                    'exclude_entity_id': exclude
+                })
+                results = [dict(row) for row in cursor.fetchall()]
+            self.last_plan = dict(plan, returned=len(results))
+            return results
+
+        while True:
+            with get_cursor() as cursor:
+                for name, value in plan['settings'].items():
+                    cursor.execute("SELECT set_config(%s, %s, true)", (name, value))
+                cursor.execute(KNN_QUERY, {'vector': vector, 'model_id': str(model_id),
+                                           'k': plan['candidates']})
+                candidates = [dict(row) for row in cursor.fetchall()]
+            returned = candidates[0].pop('candidate_count') if candidates else 0
+            for row in candidates[1:]:
+                row.pop('candidate_count', None)
+
+            results = [row for row in candidates
+                       if str(row['entity_id']) != exclude
+                       and row['similarity_score'] >= threshold
+                       and (entity_type is None or row['entity_type'] == entity_type)]
+
+            exhausted = returned < plan['candidates'] or \
+                (candidates and candidates[-1]['similarity_score'] < threshold)
+            if len(results) >= limit or exhausted or plan['candidates'] >= self.max_knn_candidates:
+                self.last_plan = dict(plan, returned=returned)
+                return results[:limit]
+
+            plan['candidates'] = min(plan['candidates'] * self.ann_overfetch, self.max_knn_candidates)
+            if 'hnsw.ef_search' in plan['settings']:
+                plan['settings']['hnsw.ef_search'] = str(min(max(40, plan['candidates']), 1000))
+
     def find_similar_by_text(self,
                             search_text: str,
                             entity_type: Optional[str] = None,
@@ -211,6 +355,9 @@ class SemanticSearchService:
         """
         Cluster entities based on their embeddings
 
+        Vectors are fetched once into an in-memory matrix and clustered
+        there (see EmbeddingMatrix.cluster).
+
         Args:
             entity_ids: List of entity IDs to cluster
             num_clusters: Number of clusters
@@ -219,64 +366,16 @@ class SemanticSearchService:
         Returns:
             Dictionary with cluster assignments and centroids
         """
-        # Get embeddings for entities
-        query = """
-            SELECT
-                ee.entity_id,
-                ee.embedding,
-                se.canonical_name,
-                se.entity_type
-            FROM entity_embeddings ee
-            JOIN standards_entities se ON se.entity_id = ee.entity_id
-            WHERE ee.entity_id = ANY(%s)
-              AND ee.is_current = TRUE
-        """
+        if method not in CLUSTER_METHODS:
+            return {'clusters': [], 'method': method,
+                    'error': f"Unknown clustering method. Use one of: {', '.join(CLUSTER_METHODS)}"}
 
-        results = execute_query(query, (entity_ids,))
-
-        if not results:
+        matrix = EmbeddingMatrix.load(entity_ids)
+        if not len(matrix):
             return {'clusters': [], 'method': method}
 
-        # Extract embeddings and IDs
-        embeddings_dict = {r['entity_id']: r['embedding'] for r in results}
-        entity_data = {r['entity_id']: r for r in results}
-
-        # Convert embeddings to numpy array
-        # Note: In practice, you'd need to properly parse the pgvector format
-        # This is a placeholder - actual implementation would depend on how pgvector stores data
-
         try:
-            from sklearn.cluster import KMeans, DBSCAN, AgglomerativeClustering
-            from sklearn.preprocessing import StandardScaler
-
-            # For now, return a placeholder response
-            # Full implementation would:
-            # 1. Extract embedding vectors from pgvector format
-            # 2. Apply clustering algorithm
-            # 3. Return cluster assignments
-
-            # Placeholder clustering based on entity types
-            clusters = {}
-            for entity_id, data in entity_data.items():
-                etype = data['entity_type']
-                if etype not in clusters:
-                    clusters[etype] = []
-                clusters[etype].append(entity_id)
-
-            return {
-                'clusters': [
-                    {
-                        'cluster_id': i,
-                        'entity_ids': entities,
-                        'size': len(entities),
-                        'representative_type': cluster_type
-                    }
-                    for i, (cluster_type, entities) in enumerate(clusters.items())
-                ],
-                'method': method,
-                'num_clusters': len(clusters)
-            }
-
+            labels = matrix.cluster(num_clusters, method)
         except ImportError:
             return {
                 'clusters': [],
@@ -284,6 +383,17 @@ class SemanticSearchService:
                 'method': method
             }
 
+        clusters = matrix.describe_clusters(labels)
+        result = {
+            'clusters': clusters,
+            'method': method,
+            'num_clusters': len(clusters),
+            'model_id': matrix.model_id
+        }
+        if method == 'dbscan':
+            result['noise_entity_ids'] = [matrix.entity_ids[i] for i in np.flatnonzero(labels == -1)]
+        return result
+
     def find_semantic_duplicates(self,
                                 entity_type: Optional[str] = None,
                                 similarity_threshold: float = 0.95,
@@ -395,43 +505,31 @@ class SemanticSearchService:
         return results
 
     def compute_entity_similarity_matrix(self,
-                                        entity_ids: List[str]) -> Dict[str, Any]:
+                                        entity_ids: List[str],
+                                        top_k: Optional[int] = None,
+                                        min_similarity: Optional[float] = None) -> Dict[str, Any]:
         """
         Compute pairwise similarity matrix for a set of entities
 
+        The entities' vectors are fetched once and compared in memory, a
+        block of rows at a time. Selections larger than max_dense_matrix
+        entities return each entity's top matrix_top_k neighbours unless
+        top_k or min_similarity is given.
+
         Args:
             entity_ids: List of entity IDs
+            top_k: Keep each entity's k most similar entities
+            min_similarity: Keep pairs at or above this score
 
         Returns:
             Dictionary with similarity matrix and entity metadata
         """
-        # Get all pairwise similarities
-        query = """
-            SELECT
-                e1.entity_id as entity1_id,
-                e2.entity_id as entity2_id,
-                1 - (e1.embedding <=> e2.embedding) as similarity_score
-            FROM entity_embeddings e1
-            CROSS JOIN entity_embeddings e2
-            WHERE e1.entity_id = ANY(%s)
-              AND e2.entity_id = ANY(%s)
-              AND e1.is_current = TRUE
-              AND e2.is_current = TRUE
-              AND e1.model_id = e2.model_id
-        """
-
-        similarities = execute_query(query, (entity_ids, entity_ids))
-
-        # Build similarity matrix
-        matrix = {}
-        for sim in similarities:
-            e1 = sim['entity1_id']
-            e2 = sim['entity2_id']
+        matrix = EmbeddingMatrix.load(entity_ids)
 
-            if e1 not in matrix:
-                matrix[e1] = {}
+        if top_k is None and min_similarity is None and len(matrix) > self.max_dense_matrix:
+            top_k = self.matrix_top_k
 
-            matrix[e1][e2] = round(sim['similarity_score'], 4)
+        similarity_matrix = matrix.similarity_rows(top_k=top_k, min_similarity=min_similarity)
 
         # Get entity metadata
         metadata_query = """
@@ -443,9 +541,11 @@ class SemanticSearchService:
         metadata = execute_query(metadata_query, (entity_ids,))
 
         return {
-            'similarity_matrix': matrix,
+            'similarity_matrix': similarity_matrix,
             'entities': metadata,
-            'size': len(entity_ids)
+            'size': len(entity_ids),
+            'sparse': top_k is not None or min_similarity is not None,
+            'model_id': matrix.model_id
         }
 
     def _cache_pairwise_similarities(self, source_entity_id: str,
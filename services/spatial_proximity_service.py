@@ -0,0 +1,377 @@
+"""
+Spatial Proximity Service - Nearby features across every geometry table
+
+Keeps a catalog of the geometry-bearing tables behind EntityRegistry
+(from PostGIS geometry_columns) and answers proximity questions across all
+of them in one round trip:
+1. One UNION ALL branch per table, each with its own ST_DWithin filter,
+   <-> KNN ordering and LIMIT, so every branch is a GiST index scan over
+   the table's own geometry column and SRID (the source geometry is
+   transformed once per branch, never the column)
+2. Branch results are merged by distance (always reported in feet)
+3. Counts and nearest-feature lookups use the same branches
+
+Used by GraphRAG spatial queries, IntelligentObjectCreator spatial context
+and AI classification spatial context.
+"""
+
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+from services.entity_registry import ENTITY_REGISTRY, EntityRegistry
+from tools.db_utils import get_cursor
+
+FEET_PER_METER = 3.28084
+DEFAULT_SRID = 2226  # NAD83 / California zone 3 (US ft), the project CRS
+IDENTIFIER = re.compile(r'^[a-z_][a-z0-9_]*$')
+
+CATALOG_QUERY = """
+    SELECT gc.f_table_name AS table_name,
+           gc.f_geometry_column AS geometry_column,
+           gc.srid,
+           srs.proj4text,
+           EXISTS (
+               SELECT 1
+               FROM pg_index i
+               JOIN pg_class ic ON ic.oid = i.indexrelid
+               JOIN pg_am am ON am.oid = ic.relam
+               JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+               WHERE i.indrelid = format('%%I.%%I', gc.f_table_schema, gc.f_table_name)::regclass
+                 AND am.amname = 'gist'
+                 AND a.attname = gc.f_geometry_column
+           ) AS indexed,
+           (SELECT jsonb_object_agg(c.column_name, c.data_type)
+            FROM information_schema.columns c
+            WHERE c.table_schema = gc.f_table_schema
+              AND c.table_name = gc.f_table_name) AS columns
+    FROM geometry_columns gc
+    LEFT JOIN spatial_ref_sys srs ON srs.srid = gc.srid
+    WHERE gc.f_table_schema = 'public'
+      AND gc.f_table_name = ANY(%s)
+"""
+
+
+@dataclass
+class SpatialTable:
+    """A geometry-bearing entity table and how to query it."""
+    entity_type: str
+    table: str
+    primary_key: str
+    uuid_key: bool
+    geometry_column: str
+    srid: int
+    feet_per_unit: Optional[float]   # None for geographic (degree) SRIDs
+    indexed: bool
+    has_project_id: bool
+    has_entity_id: bool
+    name_column: Optional[str]
+
+
+def _feet_per_unit(proj4text: Optional[str]) -> Optional[float]:
+    """Feet per coordinate unit of an SRID, from its proj4 definition."""
+    proj4text = proj4text or ''
+    if '+proj=longlat' in proj4text:
+        return None
+    if '+units=m' in proj4text:
+        return FEET_PER_METER
+    return 1.0  # us-ft, ft, or unknown (assume the project's foot-based CRS)
+
+
+def _name_column(table: str, primary_key: str, columns: Dict[str, str]) -> Optional[str]:
+    """Display column for a table, by naming convention (e.g. line_number, point_number)."""
+    stem = primary_key[:-3] if primary_key.endswith('_id') else table.rstrip('s')
+    for candidate in (f'{stem}_name', f'{stem}_number', 'name', f'{table.rstrip("s")}_name'):
+        if candidate in columns:
+            return candidate
+    return None
+
+
+class SpatialProximityService:
+    """Proximity queries across all geometry tables in EntityRegistry."""
+
+    def __init__(self, catalog_ttl_seconds: float = 300):
+        """
+        Args:
+            catalog_ttl_seconds: How long the table catalog is reused
+        """
+        self.catalog_ttl_seconds = catalog_ttl_seconds
+        self._catalog = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get_catalog(self, conn=None, refresh: bool = False) -> List[SpatialTable]:
+        """
+        Geometry tables behind EntityRegistry, one entry per entity type.
+
+        A table with several geometry columns is queried on the GiST-indexed
+        one (then one named 'geometry').
+        """
+        with self._lock:
+            if refresh or self._catalog is None or \
+                    time.monotonic() - self._loaded_at >= self.catalog_ttl_seconds:
+                self._catalog = self._load_catalog(conn)
+                self._loaded_at = time.monotonic()
+            return self._catalog
+
+    def tables(self, entity_types: Optional[List[str]] = None, conn=None) -> List[SpatialTable]:
+        """Catalog entries, optionally restricted to entity types."""
+        catalog = self.get_catalog(conn)
+        if entity_types is None:
+            return catalog
+        wanted = set(entity_types)
+        return [table for table in catalog if table.entity_type in wanted]
+
+    def geometry_of(self, entity_id: str, entity_types: Optional[List[str]] = None,
+                    conn=None) -> Optional[Dict[str, Any]]:
+        """
+        Geometry of an entity, by a table's primary key or its entity_id
+        (the standards_entities id) column.
+
+        Returns:
+            Dict with wkt, srid and entity_type, or None
+        """
+        try:
+            entity_id = str(uuid.UUID(str(entity_id)))
+        except ValueError:
+            return None
+
+        branches = []
+        for table in self.tables(entity_types, conn):
+            matches = [f"t.{table.primary_key} = %(id)s::uuid"] if table.uuid_key else []
+            if table.has_entity_id and table.primary_key != 'entity_id':
+                matches.append("t.entity_id = %(id)s::uuid")
+            if not matches:
+                continue
+            match = ' OR '.join(matches)
+            branches.append(f"""
+                (SELECT ST_AsText(t.{table.geometry_column}) AS wkt,
+                        ST_SRID(t.{table.geometry_column}) AS srid,
+                        '{table.entity_type}' AS entity_type
+                 FROM {table.table} t
+                 WHERE ({match}) AND t.{table.geometry_column} IS NOT NULL
+                 LIMIT 1)""")
+        if not branches:
+            return None
+
+        rows = self._fetch(' UNION ALL '.join(branches) + ' LIMIT 1', {'id': entity_id}, conn)
+        return dict(rows[0]) if rows else None
+
+    def find_nearby(self, geometry_wkt: str, srid: int = DEFAULT_SRID,
+                    radius_ft: Optional[float] = None, project_id: Optional[str] = None,
+                    entity_types: Optional[List[str]] = None,
+                    exclude_entity_id: Optional[str] = None, limit: int = 100,
+                    conn=None) -> List[Dict[str, Any]]:
+        """
+        Features near a geometry across all (or the given) entity tables.
+
+        Args:
+            geometry_wkt: Source geometry as WKT
+            srid: SRID of the source geometry (0: same as each table)
+            radius_ft: Search radius in feet (None: nearest features, any distance)
+            project_id: Only features of this project (tables without a
+                project_id column are skipped)
+            entity_types: Only these entity types
+            exclude_entity_id: Leave out this feature (by primary key or entity_id)
+            limit: Maximum results overall
+            conn: Connection to read through (default: pool)
+
+        Returns:
+            Dicts with entity_type, source_table, object_id, entity_id,
+            name and distance_ft, nearest first
+        """
+        params = {'wkt': geometry_wkt, 'srid': srid, 'project_id': project_id,
+                  'exclude': str(exclude_entity_id) if exclude_entity_id else None,
+                  'limit': limit}
+        branches = []
+        for i, table in enumerate(self._scoped_tables(entity_types, project_id, conn)):
+            source = self._source_geometry(table, srid)
+            geom = f"t.{table.geometry_column}"
+            entity_id = 't.entity_id' if table.has_entity_id else f't.{table.primary_key}'
+            name = f"t.{table.name_column}::text" if table.name_column else 'NULL::text'
+            where, order = self._distance_filter(table, geom, source, radius_ft, params, i)
+            if project_id:
+                where.append("t.project_id = %(project_id)s")
+            if exclude_entity_id:
+                where.append(f"t.{table.primary_key}::text IS DISTINCT FROM %(exclude)s")
+                where.append(f"{entity_id}::text IS DISTINCT FROM %(exclude)s")
+            branches.append(f"""
+                (SELECT '{table.entity_type}' AS entity_type,
+                        '{table.table}' AS source_table,
+                        t.{table.primary_key}::text AS object_id,
+                        {entity_id}::text AS entity_id,
+                        {name} AS name,
+                        {self._distance_ft(table, geom, source)} AS distance_ft
+                 FROM {table.table} t
+                 WHERE {' AND '.join(where)}
+                 ORDER BY {order}
+                 LIMIT %(limit)s)""")
+        if not branches:
+            return []
+
+        # Each branch returns its own nearest `limit`, so the merged top `limit` is exact
+        query = f"""
+            SELECT * FROM ({' UNION ALL '.join(branches)}) nearby
+            ORDER BY distance_ft
+            LIMIT %(limit)s
+        """
+        return [dict(row) for row in self._fetch(query, params, conn)]
+
+    def find_nearby_entity(self, entity_id: str, radius_ft: float,
+                           entity_types: Optional[List[str]] = None, limit: int = 100,
+                           conn=None, **kwargs) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Features near an entity's geometry, excluding the entity itself.
+
+        Returns:
+            (source geometry dict or None, nearby features)
+        """
+        source = self.geometry_of(entity_id, conn=conn)
+        if source is None:
+            return None, []
+        return source, self.find_nearby(source['wkt'], source['srid'], radius_ft,
+                                        entity_types=entity_types, exclude_entity_id=entity_id,
+                                        limit=limit, conn=conn, **kwargs)
+
+    def count_nearby(self, geometry_wkt: str, srid: int, radius_ft: float,
+                     project_id: Optional[str] = None, entity_types: Optional[List[str]] = None,
+                     conn=None) -> Dict[str, int]:
+        """Number of features within radius_ft, per entity type (one query)."""
+        params = {'wkt': geometry_wkt, 'srid': srid, 'project_id': project_id}
+        tables = self._scoped_tables(entity_types, project_id, conn)
+        branches = []
+        for i, table in enumerate(tables):
+            source = self._source_geometry(table, srid)
+            where, _ = self._distance_filter(table, f"t.{table.geometry_column}", source,
+                                             radius_ft, params, i)
+            if project_id:
+                where.append("t.project_id = %(project_id)s")
+            branches.append(f"""
+                SELECT '{table.entity_type}' AS entity_type, COUNT(*) AS count
+                FROM {table.table} t
+                WHERE {' AND '.join(where)}""")
+
+        counts = {table.entity_type: 0 for table in tables}
+        if branches:
+            for row in self._fetch(' UNION ALL '.join(branches), params, conn):
+                counts[row['entity_type']] = int(row['count'])
+        return counts
+
+    def nearest(self, geometry_wkt: str, srid: int, entity_types: List[str],
+                project_id: Optional[str] = None, conn=None) -> Optional[Dict[str, Any]]:
+        """Nearest feature of the given types at any distance (KNN), or None."""
+        rows = self.find_nearby(geometry_wkt, srid, None, project_id, entity_types,
+                                limit=1, conn=conn)
+        return rows[0] if rows else None
+
+    def _scoped_tables(self, entity_types, project_id, conn) -> List[SpatialTable]:
+        tables = self.tables(entity_types, conn)
+        if project_id:
+            tables = [table for table in tables if table.has_project_id]
+        return tables
+
+    @staticmethod
+    def _source_geometry(table: SpatialTable, srid: int) -> str:
+        """Source geometry expression in the table's SRID (constant-folded by the planner)."""
+        if not srid or not table.srid or srid == table.srid:
+            return f"ST_GeomFromText(%(wkt)s, {table.srid or 0})"
+        return f"ST_Transform(ST_GeomFromText(%(wkt)s, %(srid)s), {table.srid})"
+
+    @staticmethod
+    def _distance_ft(table: SpatialTable, geom: str, source: str) -> str:
+        if table.feet_per_unit is None:
+            return f"ST_Distance({geom}::geography, ({source})::geography) * {FEET_PER_METER}"
+        return f"ST_Distance({geom}, {source}) * {table.feet_per_unit}"
+
+    @staticmethod
+    def _distance_filter(table: SpatialTable, geom: str, source: str, radius_ft: Optional[float],
+                         params: Dict[str, Any], i: int) -> Tuple[List[str], str]:
+        """WHERE conditions and ORDER BY for a branch, in the table's own units."""
+        where = [f"{geom} IS NOT NULL"]
+        if table.feet_per_unit is None:
+            # Geographic columns: metres on the spheroid (no GiST use without a geography index)
+            if radius_ft is not None:
+                params[f'r{i}'] = radius_ft / FEET_PER_METER
+                where.append(f"ST_DWithin({geom}::geography, ({source})::geography, %(r{i})s)")
+            return where, 'distance_ft'
+        if radius_ft is not None:
+            params[f'r{i}'] = radius_ft / table.feet_per_unit
+            where.append(f"ST_DWithin({geom}, {source}, %(r{i})s)")
+        return where, f"{geom} <-> {source}"
+
+    def _load_catalog(self, conn=None) -> List[SpatialTable]:
+        registry = dict(ENTITY_REGISTRY)
+        try:
+            for entity_type in EntityRegistry.get_all_entity_types():
+                info = EntityRegistry.get_table_info(entity_type)
+                if info:
+                    registry.setdefault(entity_type, info)
+        except Exception as e:
+            # The static registry covers the core spatial tables
+            print(f"Dynamic entity registry unavailable: {e}")
+
+        # Table and column names are interpolated into SQL; only plain identifiers qualify
+        registry = {entity_type: info for entity_type, info in registry.items()
+                    if IDENTIFIER.match(info[0]) and IDENTIFIER.match(info[1])}
+        rows = self._fetch(CATALOG_QUERY, (sorted({info[0] for info in registry.values()}),), conn)
+
+        by_table = {}
+        for row in rows:
+            if not IDENTIFIER.match(row['geometry_column']):
+                continue
+            rank = (not row['indexed'], row['geometry_column'] != 'geometry', row['geometry_column'])
+            if row['table_name'] not in by_table or rank < by_table[row['table_name']][0]:
+                by_table[row['table_name']] = (rank, row)
+
+        catalog = []
+        for entity_type, (table_name, primary_key) in sorted(registry.items()):
+            if table_name not in by_table:
+                continue
+            row = by_table[table_name][1]
+            columns = row['columns'] or {}
+            if primary_key not in columns:
+                continue
+            catalog.append(SpatialTable(
+                entity_type=entity_type,
+                table=table_name,
+                primary_key=primary_key,
+                uuid_key=columns[primary_key] == 'uuid',
+                geometry_column=row['geometry_column'],
+                srid=int(row['srid'] or 0),
+                feet_per_unit=_feet_per_unit(row['proj4text']),
+                indexed=bool(row['indexed']),
+                has_project_id='project_id' in columns,
+                has_entity_id=columns.get('entity_id') == 'uuid',
+                name_column=_name_column(table_name, primary_key, columns)
+            ))
+        return catalog
+
+    @staticmethod
+    def _fetch(query: str, params, conn=None) -> List[Dict[str, Any]]:
+        with _cursor(conn) as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+
+@contextmanager
+def _cursor(conn=None):
+    """Dict cursor on the caller's connection (its transaction), or a pooled one."""
+    if conn is None:
+        with get_cursor() as cursor:
+            yield cursor
+        return
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        yield cursor
+    finally:
+        cursor.close()
+
+
+# Shared catalog for GraphRAG, object creation and classification
+spatial_proximity_service = SpatialProximityService()
@@ -0,0 +1,401 @@
+"""
+Tile Cache - On-disk cache in front of MapViewerService tile generation
+
+1. Tiles are stored in a SQLite file (one row per layer / project / z / x / y),
+   shared by every worker process on the host
+2. Each row records the project data version it was rendered from. The
+   version lives in project_data_versions and is bumped in the same
+   transaction as DXF imports, DXF re-imports (DXFChangeDetector), GIS
+   snapshot imports, survey imports and survey point deletes / restores,
+   batch operations and pipe network edits, and a tile whose version differs
+   from the current one is re-rendered.
+3. Versions are read at most once per version_ttl seconds per process, so
+   panning the map costs one small query per project rather than one per tile.
+   A tile rendered before an edit can therefore still be served for up to
+   version_ttl after the edit commits: other processes keep their cached
+   version until it expires, and forget_version() runs before the editing
+   transaction commits, so the editing process can re-read the old version.
+   Tiles for all projects use MAX(version) over every project; versions come
+   from one sequence, but a bump that commits after a higher one does not
+   move MAX(version), so those tiles are best-effort.
+4. The file is kept under max_bytes by evicting the least recently used
+   tiles. Access times are batched in memory and written with the eviction
+   check, so a hit does not take SQLite's write lock.
+5. Hit / miss / stale counts are kept per process (stats())
+"""
+
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from psycopg2 import errors
+
+from tools.db_utils import get_cursor
+from services.map_viewer_service import MapViewerService
+
+ALL_PROJECTS = '*'
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), 'acad_gis_tile_cache.sqlite')
+# Lookup outcome -> stats() counter
+OUTCOME_COUNTERS = {'hit': 'hits', 'miss': 'misses', 'stale': 'stale', 'bypassed': 'bypassed'}
+
+
+def bump_project_data_version(project_id: Optional[str], cursor=None) -> None:
+    """
+    Mark a project's data as changed, retiring its cached tiles.
+
+    Args:
+        project_id: Project whose map data changed (ignored if None)
+        cursor: Cursor of the transaction making the change; the bump then
+            commits or rolls back with it. Without one the bump is committed
+            on its own connection.
+    """
+    if not project_id:
+        return
+    if cursor is None:
+        with get_cursor() as own_cursor:
+            return bump_project_data_version(project_id, own_cursor)
+
+    # A savepoint keeps the caller's transaction usable when migration 046
+    # has not been applied; cached tiles then live until evicted
+    cursor.execute("SAVEPOINT project_data_version")
+    try:
+        cursor.execute("SELECT bump_project_data_version(%s)", (str(project_id),))
+    except (errors.UndefinedTable, errors.UndefinedFunction) as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT project_data_version")
+        print(f"Project data version not bumped (migration 046 not applied): {e}")
+        return
+    cursor.execute("RELEASE SAVEPOINT project_data_version")
+    tile_cache.forget_version(project_id)
+
+
+def lonlat_to_tile(lon: float, lat: float, z: int) -> Tuple[int, int]:
+    """XYZ tile containing a WGS84 coordinate at zoom z."""
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_for_bounds(bounds: Tuple[float, float, float, float], z: int) -> List[Tuple[int, int]]:
+    """(x, y) of every tile at zoom z covering (min lon, min lat, max lon, max lat)."""
+    min_lon, min_lat, max_lon, max_lat = bounds
+    min_x, min_y = lonlat_to_tile(min_lon, max_lat, z)
+    max_x, max_y = lonlat_to_tile(max_lon, min_lat, z)
+    return [(x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
+
+
+class TileCache:
+    """SQLite tile store keyed by layer, project, z/x/y and data version."""
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None,
+                 map_viewer: Optional[MapViewerService] = None, version_ttl: float = 2.0,
+                 check_interval_bytes: Optional[int] = None):
+        """
+        Args:
+            path: SQLite file (default: $TILE_CACHE_PATH or a temp file)
+            max_bytes: Size limit of stored tiles (default: $TILE_CACHE_MAX_MB, 512 MB)
+            map_viewer: Tile renderer
+            version_ttl: Seconds a project's data version is reused before
+                re-reading it
+            check_interval_bytes: Bytes written between size checks
+                (default: 5% of max_bytes)
+        """
+        self.path = path or os.getenv('TILE_CACHE_PATH', DEFAULT_PATH)
+        if max_bytes is None:
+            max_bytes = int(os.getenv('TILE_CACHE_MAX_MB', '512')) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self.map_viewer = map_viewer if map_viewer is not None else MapViewerService()
+        self.version_ttl = version_ttl
+        self.check_interval_bytes = check_interval_bytes or max(max_bytes // 20, 1)
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._versions = {}         # scope -> (version, expires at (monotonic))
+        self._touched = {}          # (layer, scope, z, x, y) -> last access
+        self._written = 0           # bytes stored since the last size check
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'bypassed': 0, 'evicted': 0}
+        self._by_layer = {}         # layer -> {'hits': n, 'misses': n}
+        self._schema_ready = False
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's connection to the cache file."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if not self._schema_ready:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS tiles (
+                        layer TEXT NOT NULL,
+                        scope TEXT NOT NULL,
+                        zoom_level INTEGER NOT NULL,
+                        tile_column INTEGER NOT NULL,
+                        tile_row INTEGER NOT NULL,
+                        version INTEGER NOT NULL,
+                        tile_data BLOB NOT NULL,
+                        size INTEGER NOT NULL,
+                        last_access REAL NOT NULL,
+                        PRIMARY KEY (layer, scope, zoom_level, tile_column, tile_row)
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_tiles_last_access ON tiles(last_access)")
+                self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def _read(self, key: Tuple) -> Optional[Tuple[int, bytes]]:
+        row = self._connection().execute("""
+            SELECT version, tile_data FROM tiles
+            WHERE layer = ? AND scope = ? AND zoom_level = ? AND tile_column = ? AND tile_row = ?
+        """, key).fetchone()
+        return (row[0], bytes(row[1])) if row else None
+
+    def _write(self, key: Tuple, version: int, tile: bytes):
+        self._connection().execute("""
+            INSERT OR REPLACE INTO tiles
+                (layer, scope, zoom_level, tile_column, tile_row, version, tile_data, size, last_access)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, key + (version, sqlite3.Binary(tile), len(tile), time.time()))
+        with self._lock:
+            self._written += len(tile)
+            check = self._written >= self.check_interval_bytes
+            if check:
+                self._written = 0
+        if check:
+            self.enforce_size_limit()
+
+    # ------------------------------------------------------------------
+    # Data versions
+    # ------------------------------------------------------------------
+
+    def data_version(self, project_id: Optional[str] = None) -> Optional[int]:
+        """Current data version of a project (all projects if None), or None if unknown."""
+        scope = str(project_id) if project_id else ALL_PROJECTS
+        with self._lock:
+            cached = self._versions.get(scope)
+            if cached is not None and cached[1] > time.monotonic():
+                return cached[0]
+
+        try:
+            with get_cursor(dict_cursor=False) as cursor:
+                if project_id:
+                    cursor.execute("SELECT version FROM project_data_versions WHERE project_id = %s",
+                                   (scope,))
+                else:
+                    cursor.execute("SELECT MAX(version) FROM project_data_versions")
+                row = cursor.fetchone()
+        except Exception as e:
+            print(f"Tile cache version lookup error: {e}")
+            return None
+
+        version = row[0] if row and row[0] is not None else 0
+        with self._lock:
+            self._versions[scope] = (version, time.monotonic() + self.version_ttl)
+        return version
+
+    def forget_version(self, project_id: Optional[str] = None):
+        """Drop this process's copy of a project's version (and the all-projects one)."""
+        with self._lock:
+            self._versions.pop(ALL_PROJECTS, None)
+            if project_id:
+                self._versions.pop(str(project_id), None)
+
+    # ------------------------------------------------------------------
+    # Tiles
+    # ------------------------------------------------------------------
+
+    def _fetch(self, layer: str, z: int, x: int, y: int,
+               project_id: Optional[str]) -> Tuple[Optional[bytes], str]:
+        """Tile and how it was obtained: 'hit', 'miss', 'stale' or 'bypassed'."""
+        version = self.data_version(project_id)
+        if version is None:
+            return self.map_viewer.get_vector_tile_data(z, x, y, layer, project_id), 'bypassed'
+
+        key = (layer, str(project_id) if project_id else ALL_PROJECTS, z, x, y)
+        try:
+            cached = self._read(key)
+        except sqlite3.Error as e:
+            print(f"Tile cache read error: {e}")
+            return self.map_viewer.get_vector_tile_data(z, x, y, layer, project_id), 'bypassed'
+
+        if cached is not None and cached[0] == version:
+            with self._lock:
+                self._touched[key] = time.time()
+                flush = len(self._touched) >= 1000
+            if flush:
+                self.flush()
+            return cached[1], 'hit'
+
+        tile = self.map_viewer.get_vector_tile_data(z, x, y, layer, project_id)
+        if tile is not None:
+            try:
+                self._write(key, version, tile)
+            except sqlite3.Error as e:
+                print(f"Tile cache write error: {e}")
+        return tile, 'stale' if cached is not None else 'miss'
+
+    def get_tile(self, layer: str, z: int, x: int, y: int,
+                 project_id: Optional[str] = None) -> Optional[bytes]:
+        """
+        Encoded tile from the cache, rendering and storing it on a miss.
+
+        Returns:
+            Tile bytes (b'' for an empty tile), or None if rendering failed
+
+        Raises:
+            ValueError: Unknown layer or invalid tile coordinates
+        """
+        tile, outcome = self._fetch(layer, z, x, y, project_id)
+        with self._lock:
+            self._stats[OUTCOME_COUNTERS[outcome]] += 1
+            layer_stats = self._by_layer.setdefault(layer, {'hits': 0, 'misses': 0})
+            layer_stats['hits' if outcome == 'hit' else 'misses'] += 1
+        return tile
+
+    def seed(self, project_id: str, min_zoom: int, max_zoom: int,
+             layers: Optional[Iterable[str]] = None, workers: int = 4,
+             max_tiles: int = 100000) -> Dict[str, Any]:
+        """
+        Render every tile of a project's extent for a zoom range.
+
+        Tiles already current in the cache are skipped, so seeding can be
+        re-run after an edit to re-render only what changed. Seeding does
+        not count towards the hit-rate stats.
+
+        Raises:
+            ValueError: Unknown layer, project without geometry, or more
+                than max_tiles tiles
+        """
+        layers = list(layers) if layers else list(self.map_viewer.layers)
+        unknown = [name for name in layers if name not in self.map_viewer.layers]
+        if unknown:
+            raise ValueError(f"Unknown tile layers: {', '.join(unknown)}")
+
+        bounds = self.map_viewer.project_extent(project_id)
+        if bounds is None:
+            raise ValueError(f"Project {project_id} has no map data")
+
+        jobs = []
+        for z in range(min_zoom, max_zoom + 1):
+            zoom_layers = [name for name in layers if z >= self.map_viewer.layers[name].min_zoom]
+            for x, y in tiles_for_bounds(bounds, z) if zoom_layers else []:
+                jobs.extend((name, z, x, y) for name in zoom_layers)
+        if len(jobs) > max_tiles:
+            raise ValueError(f"{len(jobs)} tiles exceeds the limit of {max_tiles}; "
+                             f"narrow the zoom range or raise max_tiles")
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            outcomes = list(pool.map(lambda job: self._fetch(*job, project_id), jobs))
+        self.flush()
+
+        return {
+            'project_id': project_id,
+            'bounds': bounds,
+            'tiles': len(jobs),
+            'rendered': sum(1 for tile, outcome in outcomes if outcome != 'hit' and tile is not None),
+            'already_cached': sum(1 for _, outcome in outcomes if outcome == 'hit'),
+            'failed': sum(1 for tile, _ in outcomes if tile is None),
+            'seconds': round(time.perf_counter() - started, 2),
+        }
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    def flush(self):
+        """Write batched access times."""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if not touched:
+            return
+        try:
+            self._connection().executemany("""
+                UPDATE tiles SET last_access = ?
+                WHERE layer = ? AND scope = ? AND zoom_level = ? AND tile_column = ? AND tile_row = ?
+            """, [(accessed,) + key for key, accessed in touched.items()])
+        except sqlite3.Error as e:
+            print(f"Tile cache flush error: {e}")
+
+    def enforce_size_limit(self) -> int:
+        """
+        Evict least recently used tiles until the cache is under 90% of max_bytes.
+
+        Returns:
+            Number of tiles evicted
+        """
+        self.flush()
+        conn = self._connection()
+        try:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM tiles").fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+
+            to_free = total - int(self.max_bytes * 0.9)
+            rowids = []
+            for rowid, size in conn.execute("SELECT rowid, size FROM tiles ORDER BY last_access"):
+                rowids.append((rowid,))
+                to_free -= size
+                if to_free <= 0:
+                    break
+            conn.executemany("DELETE FROM tiles WHERE rowid = ?", rowids)
+        except sqlite3.Error as e:
+            print(f"Tile cache eviction error: {e}")
+            return 0
+
+        with self._lock:
+            self._stats['evicted'] += len(rowids)
+        return len(rowids)
+
+    def clear(self):
+        """Remove every cached tile."""
+        with self._lock:
+            self._touched = {}
+            self._versions = {}
+        self._connection().execute("DELETE FROM tiles")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit-rate counters for this process and the size of the cache file."""
+        with self._lock:
+            counts = dict(self._stats)
+            by_layer = {layer: dict(values) for layer, values in self._by_layer.items()}
+
+        lookups = counts['hits'] + counts['misses'] + counts['stale'] + counts['bypassed']
+        try:
+            tiles, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM tiles").fetchone()
+        except sqlite3.Error:
+            tiles, size = None, None
+
+        for values in by_layer.values():
+            total = values['hits'] + values['misses']
+            values['hit_rate'] = round(values['hits'] / total, 4) if total else None
+
+        return {
+            **counts,
+            'requests': lookups,
+            'hit_rate': round(counts['hits'] / lookups, 4) if lookups else None,
+            'by_layer': by_layer,
+            'tiles': tiles,
+            'size_bytes': size,
+            'max_bytes': self.max_bytes,
+            'path': self.path,
+        }
+
+
+# Global instance
+tile_cache = TileCache()
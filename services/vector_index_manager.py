@@ -0,0 +1,204 @@
+"""
+Vector Index Manager - Approximate nearest-neighbour indexes for embeddings
+
+Maintains one pgvector ANN index per embedding model on entity_embeddings:
+1. HNSW (default) or IVFFlat, cosine distance (vector_cosine_ops)
+2. Partial on (model_id = <model>, is_current = TRUE), so each index only
+   holds vectors that KNN queries for that model can return
+3. Built and rebuilt CONCURRENTLY, so searches keep running during maintenance
+
+KNN queries must filter on the same model_id and is_current = TRUE for the
+planner to use a model's index (see SemanticSearchService). Run maintenance
+from scripts/manage_vector_indexes.py.
+"""
+
+import math
+import threading
+import time
+import uuid
+from typing import Dict, Any, List, Optional
+
+from tools.db_utils import execute_query, get_connection
+
+
+INDEX_PREFIX = 'idx_entity_embeddings_ann_'
+METHODS = ('hnsw', 'ivfflat')
+
+
+class VectorIndexManager:
+    """Builds, rebuilds and describes per-model ANN indexes."""
+
+    def __init__(self, cache_ttl_seconds: float = 60):
+        """
+        Args:
+            cache_ttl_seconds: How long get_index() results are reused
+        """
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self._indexes = None        # model_id -> index description
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def index_name(model_id: str) -> str:
+        """Index name for a model (one ANN index per model)."""
+        return INDEX_PREFIX + uuid.UUID(str(model_id)).hex
+
+    def get_index(self, model_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Describe a model's ANN index, or None if it has none.
+
+        Cached for cache_ttl_seconds; build_index/drop_index refresh it.
+
+        Returns:
+            Dict with index_name, method, lists (IVFFlat) and probes (IVFFlat)
+        """
+        with self._lock:
+            if self._indexes is None or time.monotonic() - self._loaded_at >= self.cache_ttl_seconds:
+                self._indexes = {row['model_id']: row for row in self._load_indexes()}
+                self._loaded_at = time.monotonic()
+            return self._indexes.get(str(model_id).lower())
+
+    def invalidate(self):
+        """Forget cached index descriptions."""
+        with self._lock:
+            self._indexes = None
+
+    def list_indexes(self) -> List[Dict[str, Any]]:
+        """Every model with its vector count and ANN index (if any)."""
+        counts = execute_query("""
+            SELECT em.model_id, em.provider, em.model_name, COUNT(ee.embedding_id) AS vectors
+            FROM embedding_models em
+            LEFT JOIN entity_embeddings ee
+              ON ee.model_id = em.model_id AND ee.is_current = TRUE
+            GROUP BY em.model_id, em.provider, em.model_name
+            ORDER BY em.model_name
+        """)
+        indexes = {row['model_id']: row for row in self._load_indexes()}
+        return [dict(row, model_id=str(row['model_id']), index=indexes.get(str(row['model_id'])))
+                for row in counts]
+
+    def build_index(self, model_id: str, method: str = 'hnsw', m: int = 16,
+                    ef_construction: int = 64, lists: Optional[int] = None,
+                    replace: bool = False) -> Dict[str, Any]:
+        """
+        Create a model's ANN index (CREATE INDEX CONCURRENTLY).
+
+        Args:
+            model_id: embedding_models.model_id
+            method: 'hnsw' or 'ivfflat'
+            m, ef_construction: HNSW build parameters
+            lists: IVFFlat list count (default: rows/1000, or sqrt(rows)
+                above one million rows; at least 10)
+            replace: Drop an existing index for the model first (e.g. to
+                change method or parameters)
+
+        Returns:
+            Dict with index_name, method, parameters and build seconds
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown index method '{method}'. Use one of: {', '.join(METHODS)}")
+
+        model_id = str(uuid.UUID(str(model_id)))
+        name = self.index_name(model_id)
+
+        if method == 'hnsw':
+            options = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+            parameters = {'m': int(m), 'ef_construction': int(ef_construction)}
+        else:
+            if lists is None:
+                rows = self._vector_count(model_id)
+                lists = int(math.sqrt(rows)) if rows > 1_000_000 else rows // 1000
+            lists = max(int(lists), 10)
+            options = f"lists = {lists}"
+            parameters = {'lists': lists}
+
+        statements = []
+        # Without a valid index, drop any invalid one a failed concurrent
+        # build left behind; IF NOT EXISTS would otherwise keep it
+        self.invalidate()
+        if replace or self.get_index(model_id) is None:
+            statements.append(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        # model_id is a validated UUID, so interpolating it is safe; the
+        # predicate has to be a constant for the index to be partial
+        statements.append(f"""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS {name}
+            ON entity_embeddings USING {method} (embedding vector_cosine_ops)
+            WITH ({options})
+            WHERE model_id = '{model_id}' AND is_current = TRUE
+        """)
+
+        started = time.perf_counter()
+        self._run_autocommit(statements)
+        self.invalidate()
+
+        return {'index_name': name, 'method': method, 'parameters': parameters,
+                'seconds': round(time.perf_counter() - started, 2)}
+
+    def reindex(self, model_id: str) -> Dict[str, Any]:
+        """Rebuild a model's ANN index in place (REINDEX INDEX CONCURRENTLY)."""
+        name = self.index_name(model_id)
+        if self.get_index(model_id) is None:
+            raise ValueError(f"No ANN index for model {model_id}; build one first")
+
+        started = time.perf_counter()
+        self._run_autocommit([f"REINDEX INDEX CONCURRENTLY {name}"])
+        return {'index_name': name, 'seconds': round(time.perf_counter() - started, 2)}
+
+    def drop_index(self, model_id: str) -> bool:
+        """Drop a model's ANN index; returns whether one existed."""
+        existed = self.get_index(model_id) is not None
+        self._run_autocommit([f"DROP INDEX CONCURRENTLY IF EXISTS {self.index_name(model_id)}"])
+        self.invalidate()
+        return existed
+
+    def _load_indexes(self) -> List[Dict[str, Any]]:
+        rows = execute_query("""
+            SELECT c.relname AS index_name, am.amname AS method,
+                   c.reloptions, pg_relation_size(c.oid) AS size_bytes
+            FROM pg_class c
+            JOIN pg_am am ON am.oid = c.relam
+            JOIN pg_index i ON i.indexrelid = c.oid
+            WHERE c.relkind = 'i' AND c.relname LIKE %s
+              AND i.indisvalid
+        """, (INDEX_PREFIX + '%',)) or []
+
+        indexes = []
+        for row in rows:
+            options = dict(option.split('=', 1) for option in row.get('reloptions') or [])
+            index = {
+                'model_id': str(uuid.UUID(row['index_name'][len(INDEX_PREFIX):])),
+                'index_name': row['index_name'],
+                'method': row['method'],
+                'options': options,
+                'size_bytes': row.get('size_bytes')
+            }
+            if row['method'] == 'ivfflat':
+                index['lists'] = int(options.get('lists', 100))
+                index['probes'] = max(1, round(math.sqrt(index['lists'])))
+            indexes.append(index)
+        return indexes
+
+    @staticmethod
+    def _vector_count(model_id: str) -> int:
+        rows = execute_query("""
+            SELECT COUNT(*) AS count FROM entity_embeddings
+            WHERE model_id = %s AND is_current = TRUE
+        """, (model_id,))
+        return rows[0]['count'] if rows else 0
+
+    @staticmethod
+    def _run_autocommit(statements: List[str]):
+        """CONCURRENTLY operations cannot run inside a transaction block."""
+        with get_connection() as conn:
+            previous = conn.autocommit
+            conn.autocommit = True
+            try:
+                with conn.cursor() as cursor:
+                    for statement in statements:
+                        cursor.execute(statement)
+            finally:
+                conn.autocommit = previous
+
+
+# Shared by SemanticSearchService and the maintenance script
+vector_index_manager = VectorIndexManager()
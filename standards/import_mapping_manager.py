@@ -4,20 +4,23 @@ Manages regex patterns for translating client CAD layer names to standard format
 
 Key Features:
 - Pre-compiled regex patterns for performance
+- Literal-prefix candidate filtering and per-layer result memoization
 - Conflict detection when multiple patterns match
 - Entity Registry validation
 - Standards compliance checking
 """
 
 import re
+from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from tools.db_utils import execute_query
 from services.entity_registry import EntityRegistry
+from standards.pattern_matcher import PatternMatcher
 import logging
 
 # Configure logging
@@ -72,26 +75,36 @@ class ImportMappingManager:
 
     Features:
     - Pre-compiled regex patterns for performance (no recompilation on each match)
+    - Literal-prefix trie pre-filter (PatternMatcher) so only patterns that can
+      match a layer name are evaluated
+    - Bounded LRU memo of results per layer name
     - Conflict detection when multiple patterns match
     - Entity Registry validation for extracted types
     - Comprehensive logging and error handling
     """
 
-    def __init__(self, validate_entities: bool = True):
+    def __init__(self, validate_entities: bool = True,
+                 patterns: Optional[List[Dict]] = None,
+                 cache_size: int = 4096):
         """
         Initialize mapping manager and load patterns from database.
 
         Args:
             validate_entities: Whether to validate extracted types against Entity Registry
+            patterns: Optional pre-loaded pattern rows (skips the database load)
+            cache_size: Maximum number of memoized find_match results
         """
         self.patterns = []
         self.compiled_patterns = {}  # Cache for compiled regex patterns
         self.validate_entities = validate_entities
         self.entity_registry = EntityRegistry()
-        self._load_patterns()
+        self.cache_size = cache_size
+        self._match_cache = OrderedDict()  # (layer_name, detect_conflicts, client) -> result
+        self.matcher = PatternMatcher([], {})
+        self._load_patterns(patterns)
         logger.info(f"Loaded {len(self.patterns)} import mapping patterns")
     
-    def _load_patterns(self):
+    def _load_patterns(self, rows: Optional[List[Dict]] = None):
         """Load all active mapping patterns from database and pre-compile regex"""
         query = """
             SELECT
@@ -112,7 +125,7 @@ class ImportMappingManager:
             ORDER BY m.confidence_score DESC
         """
 
-        results = execute_query(query)
+        results = rows if rows is not None else execute_query(query)
         if results:
             self.patterns = results
             # Pre-compile all regex patterns for performance
@@ -126,31 +139,69 @@ class ImportMappingManager:
                     logger.error(f"Failed to compile pattern {mapping_id}: {e}")
                     # Mark pattern as invalid in compiled cache
                     self.compiled_patterns[mapping_id] = None
+
+        # Rebuild the candidate index; memoized results are stale now
+        self.matcher = PatternMatcher(self.patterns, self.compiled_patterns)
+        self._match_cache.clear()
     
-    def find_match(self, layer_name: str, detect_conflicts: bool = True) -> Optional[MappingMatch]:
+    def find_match(self, layer_name: str, detect_conflicts: bool = True,
+                   client_name: Optional[str] = None) -> Optional[MappingMatch]:
         """
         Find the best matching pattern for a layer name.
 
         Args:
             layer_name: Client CAD layer name
             detect_conflicts: Whether to detect and report conflicting patterns
+            client_name: Optional client whose patterns (plus client-agnostic
+                ones) are considered; all patterns when None
 
         Returns:
             MappingMatch object or None if no match found
 
         Features:
         - Uses pre-compiled regex patterns for performance
+        - Evaluates only patterns whose literal prefix fits the layer name
+        - Memoizes results per layer name (bounded LRU)
         - Detects conflicting patterns
         - Validates against Entity Registry
         """
         if not layer_name:
             return None
 
+        key = (layer_name, detect_conflicts, client_name)
+        if key in self._match_cache:
+            self._match_cache.move_to_end(key)
+            result = self._match_cache[key]
+        else:
+            candidates = self.matcher.candidates(layer_name, client_name)
+            result = self._match_patterns(layer_name, candidates, detect_conflicts)
+            self._match_cache[key] = result
+            if len(self._match_cache) > self.cache_size:
+                self._match_cache.popitem(last=False)
+
+        # Hand out copies so callers cannot alter memoized results
+        if result is None:
+            return None
+        return replace(result, attributes=list(result.attributes),
+                       conflict_patterns=list(result.conflict_patterns))
+    
+    def _match_patterns(self, layer_name: str, patterns: List[Dict],
+                        detect_conflicts: bool = True) -> Optional[MappingMatch]:
+        """
+        Evaluate pattern rows in order and pick the best match.
+
+        Args:
+            layer_name: Client CAD layer name
+            patterns: Pattern rows to try, in confidence order
+            detect_conflicts: Whether to detect and report conflicting patterns
+
+        Returns:
+            MappingMatch object or None if no match found
+        """
         matches = []
-        conflict_patterns = []
 
         # Try each pattern in order (sorted by confidence)
-        for pattern_data in self.patterns:
+        for pattern_data in patterns:
             mapping_id = pattern_data['mapping_id']
             compiled_regex = self.compiled_patterns.get(mapping_id)
 
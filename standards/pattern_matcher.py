@@ -0,0 +1,156 @@
+"""
+Pattern Matcher
+Pre-filters import mapping regex patterns by their literal prefix.
+
+ImportMappingManager matches patterns with re.match (anchored at the start of
+the layer name), so a pattern that begins with a literal such as "SD-" can only
+match names starting with that text. PatternMatcher indexes these literal
+prefixes in a trie, partitioned per client, and returns only the patterns that
+can possibly match a layer name - in their original (confidence) order, so the
+caller's match/conflict logic produces exactly the same results as a full scan.
+"""
+
+from typing import Dict, List, Optional
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants  # Python 3.11+
+except ImportError:  # pragma: no cover - older Python
+    import sre_parse
+    import sre_constants
+
+
+def literal_prefix(regex_pattern: str) -> str:
+    """
+    Extract the literal text every match of an anchored regex must start with.
+
+    Only plain ASCII literals at the top level of the pattern are used; the
+    prefix stops at the first group, class, repeat, alternation or non-ASCII
+    character. Returns '' when nothing can be guaranteed.
+
+    Args:
+        regex_pattern: Regular expression source
+
+    Returns:
+        Lowercased literal prefix (patterns are matched case-insensitively)
+    """
+    try:
+        parsed = sre_parse.parse(regex_pattern)
+    except Exception:
+        return ''
+
+    prefix = []
+    for op, av in parsed:
+        if op is sre_constants.AT and av in (sre_constants.AT_BEGINNING,
+                                             sre_constants.AT_BEGINNING_STRING):
+            continue
+        if op is sre_constants.LITERAL and av < 128:
+            prefix.append(chr(av))
+            continue
+        break
+
+    return ''.join(prefix).lower()
+
+
+class _PrefixTrie:
+    """Character trie mapping literal prefixes to pattern indices."""
+
+    _INDICES = ''  # Child keys are single characters, so '' never collides
+
+    def __init__(self):
+        self._root = {}
+
+    def insert(self, prefix: str, index: int):
+        node = self._root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node.setdefault(self._INDICES, []).append(index)
+
+    def lookup(self, text: str) -> List[int]:
+        """Indices of all prefixes (including '') that text starts with, sorted."""
+        node = self._root
+        found = list(node.get(self._INDICES, ()))
+        for char in text:
+            node = node.get(char)
+            if node is None:
+                break
+            found.extend(node.get(self._INDICES, ()))
+        found.sort()
+        return found
+
+
+class _Partition:
+    """Patterns visible to one client scope, with their prefix trie."""
+
+    def __init__(self):
+        self.indices = []
+        self.trie = _PrefixTrie()
+
+    def add(self, index: int, prefix: str):
+        self.indices.append(index)
+        self.trie.insert(prefix, index)
+
+
+class PatternMatcher:
+    """
+    Candidate pre-filter over a confidence-ordered list of mapping patterns.
+
+    Partitions:
+    - all patterns (client_name=None lookups)
+    - per client: that client's patterns plus client-agnostic ones
+      (rows with a NULL client_name); unknown clients see only the latter
+    """
+
+    def __init__(self, patterns: List[Dict], compiled_patterns: Dict):
+        """
+        Build the prefix index.
+
+        Args:
+            patterns: Pattern rows in evaluation order
+            compiled_patterns: mapping_id -> compiled regex (None if invalid)
+        """
+        self.patterns = patterns
+        self._all = _Partition()
+        self._generic = _Partition()
+        self._clients = {}
+
+        clients = {row.get('client_name') for row in patterns} - {None}
+        for client in clients:
+            self._clients[client] = _Partition()
+
+        for index, row in enumerate(patterns):
+            # Patterns that failed to compile can never match
+            if compiled_patterns.get(row['mapping_id']) is None:
+                continue
+
+            prefix = literal_prefix(row['regex_pattern'])
+            self._all.add(index, prefix)
+
+            client = row.get('client_name')
+            if client is None:
+                self._generic.add(index, prefix)
+                for partition in self._clients.values():
+                    partition.add(index, prefix)
+            else:
+                self._clients[client].add(index, prefix)
+
+    def candidates(self, layer_name: str, client_name: Optional[str] = None) -> List[Dict]:
+        """
+        Return the pattern rows that can match layer_name, in original order.
+
+        Args:
+            layer_name: Client CAD layer name
+            client_name: Optional client to restrict the patterns to
+        """
+        if client_name is None:
+            partition = self._all
+        else:
+            partition = self._clients.get(client_name, self._generic)
+
+        if layer_name.isascii():
+            indices = partition.trie.lookup(layer_name.lower())
+        else:
+            # Case-insensitive regex matching of non-ASCII text does not
+            # follow str.lower(); skip the prefix filter to stay exact
+            indices = partition.indices
+
+        return [self.patterns[i] for i in indices]
@@ -1,7 +1,63 @@
 import psycopg2
 from psycopg2.extras import RealDictCursor
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 import re
+import threading
+import time
+
+
+class SurveyCodeLibraryCache:
+    """
+    Process-wide snapshot of the active survey_code_library, keyed by code.
+
+    Field imports resolve one code per shot; holding the library in memory
+    turns each lookup into a dict access instead of a database round trip.
+    Snapshots are reloaded after ttl_seconds, and invalidate() (called by the
+    survey codes blueprint on every edit) drops them immediately and bumps
+    the version so callers can tell a reload happened.
+    """
+
+    def __init__(self, ttl_seconds: float = 300):
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self._snapshots = {}  # database key -> (loaded_at, version, {CODE: row})
+        self._lock = threading.Lock()
+
+    def get_library(self, key: Tuple, loader: Callable[[], Dict[str, Dict]]) -> Dict[str, Dict]:
+        """
+        Return the code library for a database, loading it if stale.
+
+        Args:
+            key: Hashable identifier of the database
+            loader: Callable returning {UPPER(code): row} for active codes
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot and snapshot[1] == self.version and \
+                    time.monotonic() - snapshot[0] < self.ttl_seconds:
+                return snapshot[2]
+            version = self.version
+
+        library = loader()
+
+        with self._lock:
+            # An edit during the load leaves the snapshot stale; don't keep it
+            if version == self.version:
+                self._snapshots[key] = (time.monotonic(), version, library)
+        return library
+
+    def invalidate(self, key: Optional[Tuple] = None):
+        """Drop the snapshot for one database, or all snapshots."""
+        with self._lock:
+            self.version += 1
+            if key is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(key, None)
+
+
+# Shared by every SurveyCodeParser in this process
+survey_code_cache = SurveyCodeLibraryCache()
 
 
 class SurveyCodeParser:
@@ -10,8 +66,76 @@ class SurveyCodeParser:
     Resolves layer templates, extracts properties, and provides CAD generation guidance.
     """
     
-    def __init__(self, db_config: Dict):
+    def __init__(self, db_config: Dict, cache: Optional[SurveyCodeLibraryCache] = None):
         self.db_config = db_config
+        self.cache = cache or survey_code_cache
+    
+    def _database_key(self) -> Tuple:
+        """Identify the target database for the shared code library cache."""
+        return tuple(str(self.db_config.get(k)) for k in ('host', 'port', 'database', 'dbname'))
+    
+    def _load_library(self) -> Dict[str, Dict]:
+        """Load every active code, keyed by upper-cased code."""
+        conn = psycopg2.connect(**self.db_config)
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        
+        try:
+            cur.execute("""
+                SELECT 
+                    code_id,
+                    code,
+                    display_name,
+                    description,
+                    discipline_code,
+                    category_code,
+                    feature_type,
+                    connectivity_type,
+                    geometry_output,
+                    category_group,
+                    auto_connect,
+                    create_block,
+                    block_name,
+                    layer_template,
+                    default_phase,
+                    is_favorite,
+                    usage_count,
+                    is_active
+                FROM survey_code_library
+                WHERE is_active = true
+            """)
+            
+            library = {}
+            for row in cur.fetchall():
+                library.setdefault(row['code'].upper(), row)
+            return library
+            
+        finally:
+            cur.close()
+            conn.close()
+    
+    @staticmethod
+    def _code_result(row: Dict) -> Dict:
+        """Build the parse_code() result for a library row."""
+        return {
+            'valid': True,
+            'code_id': str(row['code_id']),
+            'code': row['code'],
+            'display_name': row['display_name'],
+            'description': row['description'],
+            'discipline': row['discipline_code'],
+            'category': row['category_code'],
+            'feature_type': row['feature_type'],
+            'connectivity_type': row['connectivity_type'],
+            'geometry_output': row['geometry_output'],
+            'category_group': row['category_group'],
+            'auto_connect': row['auto_connect'],
+            'create_block': row['create_block'],
+            'block_name': row['block_name'] or '',
+            'layer_template': row['layer_template'],
+            'default_phase': row['default_phase'],
+            'is_favorite': row['is_favorite'],
+            'usage_count': row['usage_count']
+        }
     
     def parse_code(self, code: str) -> Dict:
         """
@@ -41,74 +165,44 @@ class SurveyCodeParser:
                 - usage_count: int
                 - error: str (if invalid)
         """
-        if not code or not isinstance(code, str):
-            return {
-                'valid': False,
-                'error': 'Code is required and must be a string'
-            }
+        return self.parse_codes([code])[0]
+    
+    def parse_codes(self, codes: List[str]) -> List[Dict]:
+        """
+        Parse many survey codes against one snapshot of the library.
         
-        code_upper = code.strip().upper()
+        Args:
+            codes: Survey codes to parse
         
-        conn = psycopg2.connect(**self.db_config)
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        Returns:
+            One parse_code() result per input code, in input order. Each
+            result is an independent dict.
+        """
+        library = None
+        results = []
         
-        try:
-            cur.execute("""
-                SELECT 
-                    code_id,
-                    code,
-                    display_name,
-                    description,
-                    discipline_code,
-                    category_code,
-                    feature_type,
-                    connectivity_type,
-                    geometry_output,
-                    category_group,
-                    auto_connect,
-                    create_block,
-                    block_name,
-                    layer_template,
-                    default_phase,
-                    is_favorite,
-                    usage_count,
-                    is_active
-                FROM survey_code_library
-                WHERE UPPER(code) = %s AND is_active = true
-            """, (code_upper,))
+        for code in codes:
+            if not code or not isinstance(code, str):
+                results.append({
+                    'valid': False,
+                    'error': 'Code is required and must be a string'
+                })
+                continue
             
-            row = cur.fetchone()
+            if library is None:
+                library = self.cache.get_library(self._database_key(), self._load_library)
             
+            row = library.get(code.strip().upper())
             if not row:
-                return {
+                results.append({
                     'valid': False,
                     'error': f'Code "{code}" not found in library or is inactive'
-                }
-            
-            return {
-                'valid': True,
-                'code_id': str(row['code_id']),
-                'code': row['code'],
-                'display_name': row['display_name'],
-                'description': row['description'],
-                'discipline': row['discipline_code'],
-                'category': row['category_code'],
-                'feature_type': row['feature_type'],
-                'connectivity_type': row['connectivity_type'],
-                'geometry_output': row['geometry_output'],
-                'category_group': row['category_group'],
-                'auto_connect': row['auto_connect'],
-                'create_block': row['create_block'],
-                'block_name': row['block_name'] or '',
-                'layer_template': row['layer_template'],
-                'default_phase': row['default_phase'],
-                'is_favorite': row['is_favorite'],
-                'usage_count': row['usage_count']
-            }
+                })
+                continue
             
-        finally:
-            cur.close()
-            conn.close()
+            results.append(self._code_result(row))
+        
+        return results
     
     def resolve_layer_name(self, code_data: Dict, phase: Optional[str] = None) -> str:
         """
@@ -192,15 +286,19 @@ class SurveyCodeParser:
         current_line = []
         current_code = None
         
+        shot_codes = [shot.get('code', '').strip().upper() for shot in shots]
+        unique_codes = list(dict.fromkeys(code for code in shot_codes if code))
+        parsed_codes = dict(zip(unique_codes, self.parse_codes(unique_codes)))
+        
         for idx, shot in enumerate(shots):
             point_num = shot.get('point_number', f'PT{idx+1}')
-            code = shot.get('code', '').strip().upper()
+            code = shot_codes[idx]
             
             if not code:
                 warnings.append(f'Point {point_num}: No code provided')
                 continue
             
-            code_data = self.parse_code(code)
+            code_data = parsed_codes[code]
             
             if not code_data.get('valid'):
                 warnings.append(f'Point {point_num}: {code_data.get("error")}')
@@ -322,7 +420,7 @@ class SurveyCodeParser:
             processed_shots.append(shot_info)
         
         if current_line:
-            closed = current_code and self.parse_code(current_code).get('connectivity_type') == 'EDGE'
+            closed = current_code and parsed_codes[current_code].get('connectivity_type') == 'EDGE'
             polylines.append({
                 'code': current_code,
                 'points': current_line.copy(),
@@ -355,8 +453,7 @@ class SurveyCodeParser:
         valid_count = 0
         invalid_count = 0
         
-        for code in codes:
-            parsed = self.parse_code(code)
+        for parsed in self.parse_codes(codes):
             if parsed.get('valid'):
                 valid_count += 1
             else:
@@ -18,6 +18,7 @@ from survey_code_parser import SurveyCodeParser
 # Import coordinate system service for dynamic CRS support
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from services.coordinate_system_service import CoordinateSystemService
+from services.tile_cache import bump_project_data_version
 
 
 class ConnectivityProcessor:
@@ -217,7 +218,7 @@ class SurveyImportService:
         
         pnezd_parser = PNEZDParser(self.db_config)
         
-        parsed_data = pnezd_parser.parse_file(file_content, 'uploaded_file.txt')
+        parsed_data = pnezd_parser.parse_file(file_content, 'uploaded_file.txt', code_parser=self.parser)
         
         points = []
         errors = []
@@ -240,7 +241,7 @@ class SurveyImportService:
                 continue
             
             try:
-                parsed_code = self.parser.parse_code(code)
+                parsed_code = record['code_data']
                 
                 if not parsed_code.get('valid'):
                     errors.append(f"Point {point_number}: {parsed_code.get('error', 'Invalid code')}")
@@ -415,7 +416,8 @@ class SurveyImportService:
                 result = cursor.fetchone()
                 if result:
                     segments_inserted.append(result['segment_id'])
-            
+
+            bump_project_data_version(project_id, cursor)
             conn.commit()
             
             return {
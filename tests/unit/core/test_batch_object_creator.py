@@ -0,0 +1,135 @@
+"""
+Unit tests for the batch intelligent object creator.
+
+Tests cover:
+- Classification is done once per distinct layer name
+- Entities are grouped and written with one statement per target table
+- Geometry type filtering matches the per-entity creators
+- Entity links are deduplicated per DXF handle
+- Failed groups are rolled back to a savepoint and reported
+"""
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from layer_classifier import LayerClassification
+
+
+@pytest.fixture
+def mock_conn():
+    """Mock connection whose cursor records executed SQL."""
+    conn = MagicMock()
+    cursor = MagicMock()
+    conn.cursor.return_value = cursor
+    return conn, cursor
+
+
+@pytest.fixture
+def creator(mock_conn):
+    """Batch creator with the layer classifier and layer lookups mocked out."""
+    conn, _ = mock_conn
+    with patch('intelligent_object_creator.LayerClassifier') as mock_classifier_cls, \
+         patch('intelligent_object_creator.DXFLookupService') as mock_lookup_cls:
+        from batch_object_creator import BatchIntelligentObjectCreator
+        instance = BatchIntelligentObjectCreator({}, conn=conn)
+        mock_lookup_cls.return_value.get_or_create_layer.return_value = ('layer-id', None)
+        yield instance, mock_classifier_cls.return_value
+
+
+def _entity(handle, layer, geometry_type='LineString', wkt='LINESTRING Z (0 0 0, 1 1 0)'):
+    return {
+        'entity_id': f'e-{handle}',
+        'entity_type': 'LINE',
+        'layer_name': layer,
+        'geometry_wkt': wkt,
+        'geometry_type': geometry_type,
+        'dxf_handle': handle,
+        'color_aci': 256,
+        'linetype': 'ByLayer'
+    }
+
+
+def _executed_sql(cursor):
+    return [c.args[0] for c in cursor.execute.call_args_list]
+
+
+class TestBatchCreation:
+    """Test set-based object creation."""
+
+    def test_classifies_each_layer_once(self, creator):
+        batch_creator, classifier = creator
+        classifier.classify.return_value = LayerClassification(
+            object_type='utility_line', properties={'utility_type': 'Storm'}, confidence=0.9)
+
+        with patch('batch_object_creator.execute_values'):
+            batch_creator.create_from_entities(
+                [_entity(str(i), 'C-STORM-PIPE') for i in range(50)], 'project-1')
+
+        assert classifier.classify.call_count == 1
+
+    def test_group_written_with_single_statement(self, creator):
+        batch_creator, classifier = creator
+        classifier.classify.return_value = LayerClassification(
+            object_type='utility_line', properties={'utility_type': 'Unknown'}, confidence=0.9)
+
+        with patch('batch_object_creator.execute_values') as mock_execute_values:
+            created = batch_creator.create_from_entities(
+                [_entity(str(i), 'C-UTIL') for i in range(25)], 'project-1')
+
+        assert created == 25
+        line_inserts = [c for c in mock_execute_values.call_args_list
+                        if 'INSERT INTO utility_lines' in c.args[1]]
+        assert len(line_inserts) == 1
+        assert len(line_inserts[0].args[2]) == 25
+
+    def test_rejects_wrong_geometry_type(self, creator):
+        batch_creator, classifier = creator
+        classifier.classify.return_value = LayerClassification(
+            object_type='utility_structure', properties={}, confidence=0.9)
+
+        with patch('batch_object_creator.execute_values') as mock_execute_values:
+            created = batch_creator.create_from_entities(
+                [_entity('A1', 'C-STRUCT')], 'project-1')
+
+        assert created == 0
+        mock_execute_values.assert_not_called()
+
+    def test_entity_links_deduplicated_by_handle(self, creator):
+        batch_creator, classifier = creator
+        classifier.classify.return_value = LayerClassification(
+            object_type='utility_line', properties={}, confidence=0.9)
+
+        with patch('batch_object_creator.execute_values') as mock_execute_values:
+            batch_creator.create_from_entities(
+                [_entity('A1', 'C-UTIL'), _entity('A1', 'C-UTIL')], 'project-1')
+
+        link_calls = [c for c in mock_execute_values.call_args_list
+                      if 'INSERT INTO dxf_entity_links' in c.args[1]]
+        assert len(link_calls) == 1
+        assert len(link_calls[0].args[2]) == 1
+
+    def test_low_confidence_flagged_for_review(self, creator):
+        batch_creator, classifier = creator
+        classifier.classify.return_value = None
+
+        with patch('batch_object_creator.execute_values') as mock_execute_values:
+            batch_creator.create_from_entities([_entity('A1', 'MYSTERY')], 'project-1')
+
+        metadata_calls = [c for c in mock_execute_values.call_args_list
+                          if 'UPDATE standards_entities' in c.args[1]]
+        assert metadata_calls[0].args[2][0][1] == 'needs_review'
+
+    def test_failed_group_rolls_back_to_savepoint(self, creator, mock_conn):
+        _, cursor = mock_conn
+        batch_creator, classifier = creator
+        classifier.classify.return_value = LayerClassification(
+            object_type='utility_line', properties={}, confidence=0.9)
+        stats = {'errors': []}
+
+        with patch('batch_object_creator.execute_values', side_effect=Exception('boom')):
+            created = batch_creator.create_from_entities(
+                [_entity('A1', 'C-UTIL')], 'project-1', stats)
+
+        assert created == 0
+        assert 'ROLLBACK TO SAVEPOINT batch_object_group' in _executed_sql(cursor)
+        assert 'utility_line' in stats['errors'][0]
@@ -0,0 +1,149 @@
+"""
+Unit tests for the DXF bulk writer.
+
+Tests cover:
+- Single-row INSERT generation shared with the row-at-a-time path
+- COPY payload encoding (NULLs, quoting)
+- Batch flushing and per-batch timing statistics
+- Separate buffers for rows with different column sets
+"""
+
+import pytest
+from unittest.mock import MagicMock
+
+from dxf_bulk_writer import DXFBulkWriter, build_insert_sql, _copy_field
+
+
+@pytest.fixture
+def mock_conn():
+    """Mock connection that records COPY payloads."""
+    conn = MagicMock()
+    cursor = MagicMock()
+    cursor.copied = []
+    cursor.copy_expert.side_effect = lambda sql, f: cursor.copied.append((sql, f.read()))
+    conn.cursor.return_value = cursor
+    return conn, cursor
+
+
+def _entity_row(handle):
+    return {
+        'project_id': 'p-1',
+        'entity_type': 'LINE',
+        'layer_id': 'l-1',
+        'geometry': 'LINESTRING Z (0 0 1, 1 1 2)',
+        'dxf_handle': handle,
+        'attributes': '{"layer_name": "C-UTIL"}'
+    }
+
+
+class TestBuildInsertSql:
+    """Test single-row INSERT generation."""
+
+    def test_geometry_column_uses_srid(self):
+        sql = build_insert_sql('drawing_entities', ['project_id', 'geometry'], 2226)
+        assert 'INSERT INTO drawing_entities (project_id, geometry)' in sql
+        assert '%s::uuid' in sql
+        assert 'ST_GeomFromText(%s, 2226)' in sql
+
+    def test_unknown_column_raises(self):
+        with pytest.raises(KeyError):
+            build_insert_sql('drawing_entities', ['not_a_column'], 0)
+
+
+class TestCopyEncoding:
+    """Test CSV field encoding for COPY."""
+
+    def test_none_is_null_marker(self):
+        assert _copy_field(None) == '\\N'
+
+    def test_empty_string_is_quoted(self):
+        assert _copy_field('') == '""'
+
+    def test_quotes_are_doubled(self):
+        assert _copy_field('a"b') == '"a""b"'
+
+    def test_numbers_are_stringified(self):
+        assert _copy_field(0.5) == '"0.5"'
+
+
+class TestDXFBulkWriter:
+    """Test buffering and flushing behavior."""
+
+    def test_rows_buffered_until_batch_size(self, mock_conn):
+        conn, cursor = mock_conn
+        writer = DXFBulkWriter(conn, srid=2226, batch_size=3)
+
+        writer.add('drawing_entities', _entity_row('A1'))
+        writer.add('drawing_entities', _entity_row('A2'))
+        assert writer.pending() == 2
+        cursor.copy_expert.assert_not_called()
+
+        writer.add('drawing_entities', _entity_row('A3'))
+        assert writer.pending() == 0
+        assert len(cursor.copied) == 1
+        assert cursor.copied[0][1].count('\n') == 3
+
+    def test_flush_records_batch_timings(self, mock_conn):
+        conn, cursor = mock_conn
+        stats = {}
+        writer = DXFBulkWriter(conn, srid=0, batch_size=100, stats=stats)
+
+        writer.add('drawing_entities', _entity_row('A1'))
+        writer.flush()
+
+        assert len(stats['batch_timings']) == 1
+        timing = stats['batch_timings'][0]
+        assert timing['table'] == 'drawing_entities'
+        assert timing['rows'] == 1
+        assert 'copy_seconds' in timing and 'insert_seconds' in timing
+
+    def test_insert_select_builds_geometry(self, mock_conn):
+        conn, cursor = mock_conn
+        writer = DXFBulkWriter(conn, srid=2226, batch_size=100)
+
+        writer.add('drawing_entities', _entity_row('A1'))
+        writer.flush()
+
+        executed = ' '.join(c.args[0] for c in cursor.execute.call_args_list)
+        assert 'INSERT INTO drawing_entities' in executed
+        assert 'ST_GeomFromText(s.geometry, 2226)' in executed
+        assert 's.attributes::jsonb' in executed
+
+    def test_different_column_sets_use_separate_buffers(self, mock_conn):
+        conn, cursor = mock_conn
+        writer = DXFBulkWriter(conn, srid=0, batch_size=100)
+
+        row = _entity_row('A1')
+        writer.add('drawing_entities', row)
+        writer.add('drawing_entities', dict(row, quality_score=0.5))
+        writer.flush()
+
+        assert len(cursor.copied) == 2
+        assert 'quality_score' not in cursor.copied[0][0]
+        assert 'quality_score' in cursor.copied[1][0]
+
+    def test_null_values_are_copied_as_null(self, mock_conn):
+        conn, cursor = mock_conn
+        writer = DXFBulkWriter(conn, srid=0, batch_size=100)
+
+        writer.add('drawing_entities', _entity_row(None))
+        writer.flush()
+
+        assert '\\N' in cursor.copied[0][1]
+
+    def test_close_drops_staging_tables(self, mock_conn):
+        conn, cursor = mock_conn
+        writer = DXFBulkWriter(conn, srid=0, batch_size=100)
+
+        writer.add('drawing_entities', _entity_row('A1'))
+        writer.close()
+
+        executed = [c.args[0] for c in cursor.execute.call_args_list]
+        assert any(sql.startswith('DROP TABLE IF EXISTS _bulk_drawing_entities') for sql in executed)
+
+    def test_unsupported_table_rejected(self, mock_conn):
+        conn, _ = mock_conn
+        writer = DXFBulkWriter(conn, srid=0)
+
+        with pytest.raises(ValueError):
+            writer.add('projects', {'project_id': 'p-1'})
@@ -0,0 +1,290 @@
+"""
+Unit tests for incremental DXF re-import change detection.
+
+Tests cover:
+- Unchanged entities (by stable geometry hash and layer) cause no writes
+- Geometry/property updates are one statement per target table
+- Link updates, soft-deletes and new-object creation are set-based
+- Reading DXF entities client-side without touching the database
+"""
+
+import inspect
+import os
+import re
+import pytest
+import ezdxf
+from unittest.mock import MagicMock, patch
+
+from dxf_geometry import geometry_hash
+from layer_classifier import LayerClassification
+
+
+@pytest.fixture
+def detector():
+    """Change detector with the legacy layer classifier mocked out."""
+    with patch('dxf_change_detector.LayerClassifier') as mock_classifier_cls:
+        from dxf_change_detector import DXFChangeDetector
+        instance = DXFChangeDetector({})
+        yield instance, mock_classifier_cls.return_value
+
+
+@pytest.fixture
+def mock_conn():
+    conn = MagicMock()
+    cursor = MagicMock()
+    conn.cursor.return_value = cursor
+    return conn, cursor
+
+
+def _link(handle, wkt, layer='C-STORM-PIPE', table='utility_lines'):
+    return {
+        'dxf_handle': handle, 'entity_type': 'LINE', 'layer_name': layer,
+        'entity_geom_hash': geometry_hash(wkt), 'object_id': f'obj-{handle}',
+        'object_table_name': table, 'sync_state': 'active'
+    }
+
+
+def _entity(handle, wkt, layer='C-STORM-PIPE'):
+    return {'dxf_handle': handle, 'entity_type': 'LINE', 'layer_name': layer,
+            'geometry_wkt': wkt, 'geometry_type': 'LineString'}
+
+
+def _run(detector, conn, links, entities):
+    with patch('dxf_change_detector.psycopg2.connect', return_value=conn), \
+         patch.object(detector, '_get_existing_links', return_value=links), \
+         patch('dxf_change_detector.execute_values') as mock_execute_values, \
+         patch('dxf_change_detector.BatchIntelligentObjectCreator') as mock_creator_cls:
+        mock_creator_cls.return_value.create_from_entities.return_value = 1
+        stats = detector.detect_changes('project-1', entities)
+    return stats, mock_execute_values, mock_creator_cls
+
+
+class TestDetectChanges:
+    """Test in-memory diffing and set-based writes."""
+
+    def test_unchanged_entities_write_nothing(self, detector, mock_conn):
+        batch_detector, _ = detector
+        conn, cursor = mock_conn
+        links = {str(i): _link(str(i), f'LINESTRING Z ({i} 0 0,{i} 10 0)') for i in range(100)}
+        # Client-side WKT formats numbers differently from PostGIS ST_AsText
+        entities = [_entity(str(i), f'LINESTRING Z ({float(i)} 0.0 0.0, {float(i)} 10.0 0.0)')
+                    for i in range(100)]
+
+        stats, mock_execute_values, mock_creator_cls = _run(batch_detector, conn, links, entities)
+
+        assert stats['errors'] == []
+        assert stats['entities_unchanged'] == 100
+        mock_execute_values.assert_not_called()
+        cursor.execute.assert_not_called()
+        mock_creator_cls.assert_not_called()
+        conn.commit.assert_called_once()
+
+    def test_changes_applied_per_table(self, detector, mock_conn):
+        batch_detector, classifier = detector
+        conn, cursor = mock_conn
+        classifier.classify.return_value = LayerClassification(
+            object_type='utility_line', properties={'utility_type': 'Sanitary', 'diameter_inches': 8},
+            confidence=0.9)
+        links = {
+            'A': _link('A', 'LINESTRING Z (0 0 0,1 1 0)'),
+            'B': _link('B', 'LINESTRING Z (0 0 0,2 2 0)'),
+            'C': _link('C', 'LINESTRING Z (0 0 0,3 3 0)'),
+            'D': _link('D', 'POINT Z (5 5 5)', table='survey_points'),
+            'GONE': _link('GONE', 'LINESTRING Z (9 9 0,8 8 0)'),
+        }
+        entities = [
+            _entity('A', 'LINESTRING Z (0 0 0, 1 1 5)'),                   # geometry
+            _entity('B', 'LINESTRING Z (0 0 0, 2 2 7)'),                   # geometry
+            _entity('C', 'LINESTRING Z (0 0 0, 3 3 0)', 'C-SS-8IN'),       # layer
+            _entity('D', 'POINT Z (5 5 6)'),                               # geometry
+            _entity('NEW', 'LINESTRING Z (4 4 0, 5 5 0)'),
+        ]
+
+        stats, mock_execute_values, mock_creator_cls = _run(batch_detector, conn, links, entities)
+
+        assert stats['geometry_changes'] == 3
+        assert stats['layer_changes'] == 1
+        assert stats['new_entities'] == 1
+        assert stats['new_objects_created'] == 1
+        assert stats['deleted_entities'] == 1
+
+        statements = [c.args[1] for c in mock_execute_values.call_args_list]
+        assert len([s for s in statements if 'UPDATE utility_lines' in s and 'ST_GeomFromText' in s]) == 1
+        assert len([s for s in statements if 'UPDATE survey_points' in s]) == 1
+        assert len([s for s in statements if 'UPDATE dxf_entity_links' in s]) == 1
+
+        property_call = [c for c in mock_execute_values.call_args_list
+                         if 'COALESCE(v.utility_system::text' in c.args[1]][0]
+        assert property_call.args[2] == [('obj-C', 'Sanitary', 8 * 25.4)]
+
+        link_call = [c for c in mock_execute_values.call_args_list
+                     if 'UPDATE dxf_entity_links' in c.args[1]][0]
+        assert len(link_call.args[2]) == 4
+
+        deletes = [c for c in cursor.execute.call_args_list
+                   if "sync_state = 'deleted'" in c.args[0]]
+        assert deletes[0].args[1] == ('project-1', ['GONE'])
+
+        new_entities = mock_creator_cls.return_value.create_from_entities.call_args.args[0]
+        assert [e['dxf_handle'] for e in new_entities] == ['NEW']
+
+    def test_low_confidence_layer_marked_conflict(self, detector, mock_conn):
+        batch_detector, classifier = detector
+        conn, _ = mock_conn
+        classifier.classify.return_value = None
+        links = {'A': _link('A', 'LINESTRING Z (0 0 0,1 1 0)')}
+
+        stats, mock_execute_values, _ = _run(
+            batch_detector, conn, links, [_entity('A', 'LINESTRING Z (0 0 0,1 1 0)', 'MYSTERY')])
+
+        assert stats['conflicts'] == 1
+        link_rows = mock_execute_values.call_args.args[2]
+        assert link_rows == [('A', 'obj-A', None, 'MYSTERY', 'conflict')]
+
+    def test_failed_table_update_keeps_links_unsynced(self, detector, mock_conn):
+        batch_detector, _ = detector
+        conn, cursor = mock_conn
+        links = {'A': _link('A', 'LINESTRING Z (0 0 0,1 1 0)')}
+
+        def fail_geometry(cur, sql, rows, **kwargs):
+            if 'ST_GeomFromText' in sql:
+                raise Exception('boom')
+
+        with patch('dxf_change_detector.psycopg2.connect', return_value=conn), \
+             patch.object(batch_detector, '_get_existing_links', return_value=links), \
+             patch('dxf_change_detector.execute_values', side_effect=fail_geometry) as mock_ev:
+            stats = batch_detector.detect_changes('project-1', [_entity('A', 'LINESTRING Z (0 0 0,1 1 9)')])
+
+        assert 'utility_lines' in stats['errors'][0]
+        assert 'ROLLBACK TO SAVEPOINT change_detector_group' in [c.args[0] for c in cursor.execute.call_args_list]
+        assert not [c for c in mock_ev.call_args_list if 'dxf_entity_links' in c.args[1]]
+
+
+    def test_table_without_geometry_keeps_old_hash(self, detector, mock_conn):
+        batch_detector, _ = detector
+        conn, _ = mock_conn
+        links = {'S': _link('S', 'LINESTRING Z (0 0 1,1 1 1)', layer='C-TOPO-MAJR', table='surface_models')}
+
+        stats, mock_execute_values, _ = _run(
+            batch_detector, conn, links, [_entity('S', 'LINESTRING Z (0 0 2,1 1 2)', 'C-TOPO-MAJR')])
+
+        assert stats['geometry_changes'] == 1
+        statements = [c.args[1] for c in mock_execute_values.call_args_list]
+        assert not [s for s in statements if 'ST_GeomFromText' in s]
+        link_call = [c for c in mock_execute_values.call_args_list
+                     if 'UPDATE dxf_entity_links' in c.args[1]][0]
+        assert link_call.args[2] == [('S', 'obj-S', None, None, 'pending')]
+
+    def test_storm_bmp_geometry_stored_as_created(self, detector, mock_conn):
+        batch_detector, _ = detector
+        conn, _ = mock_conn
+        links = {'B': _link('B', 'POLYGON Z ((0 0 0,1 0 0,1 1 0,0 0 0))', layer='C-BMP', table='storm_bmps')}
+
+        _, mock_execute_values, _ = _run(
+            batch_detector, conn, links, [_entity('B', 'POLYGON Z ((0 0 0,2 0 0,2 2 0,0 0 0))', 'C-BMP')])
+
+        update = [c.args[1] for c in mock_execute_values.call_args_list if 'UPDATE storm_bmps' in c.args[1]][0]
+        assert 'SET geometry = ST_Multi(ST_Force2D(ST_Transform(ST_GeomFromText(' in update
+
+
+class TestDeletedLinks:
+    """Test links already marked deleted by an earlier re-import."""
+
+    def test_still_missing_handles_write_nothing(self, detector, mock_conn):
+        batch_detector, _ = detector
+        conn, cursor = mock_conn
+        links = {'A': _link('A', 'LINESTRING Z (0 0 0,1 1 0)'),
+                 'GONE': dict(_link('GONE', 'LINESTRING Z (9 9 0,8 8 0)'), sync_state='deleted')}
+
+        with patch('dxf_change_detector.geometry_generalization_service') as generalization, \
+             patch('dxf_change_detector.bump_project_data_version') as bump:
+            stats, mock_execute_values, _ = _run(
+                batch_detector, conn, links, [_entity('A', 'LINESTRING Z (0 0 0,1 1 0)')])
+
+        assert stats['deleted_entities'] == 0
+        mock_execute_values.assert_not_called()
+        cursor.execute.assert_not_called()
+        generalization.refresh.assert_not_called()
+        bump.assert_not_called()
+
+    def test_reappearing_handle_is_reactivated(self, detector, mock_conn):
+        batch_detector, _ = detector
+        conn, _ = mock_conn
+        links = {'BACK': dict(_link('BACK', 'LINESTRING Z (0 0 0,1 1 0)'), sync_state='deleted')}
+
+        stats, mock_execute_values, _ = _run(
+            batch_detector, conn, links, [_entity('BACK', 'LINESTRING Z (0 0 0,1 1 0)')])
+
+        assert stats['restored_entities'] == 1
+        assert stats['entities_unchanged'] == 0
+        link_call = [c for c in mock_execute_values.call_args_list
+                     if 'UPDATE dxf_entity_links' in c.args[1]][0]
+        assert link_call.args[2] == [('BACK', 'obj-BACK', None, None, 'active')]
+
+
+def _creator_link_columns():
+    """dxf_entity_links columns written by the object creators."""
+    from batch_object_creator import BatchIntelligentObjectCreator
+    source = inspect.getsource(BatchIntelligentObjectCreator._bulk_create_entity_links)
+    inserted = re.search(r'INSERT INTO dxf_entity_links \((.*?)\)', source, re.S).group(1)
+    updated = re.findall(r'(\w+) = (?:EXCLUDED|CURRENT_TIMESTAMP|\'active\')', source)
+    return {column.strip() for column in inserted.split(',')} | set(updated)
+
+
+def _link_sql_columns(sql):
+    """Columns of dxf_entity_links read or written by a statement."""
+    columns = set(re.findall(r'\bl\.(\w+)', sql))
+    select = re.search(r'SELECT(.*?)FROM dxf_entity_links', sql, re.S)
+    if select:
+        columns |= {column.strip() for column in select.group(1).split(',')}
+    assignments = re.search(r'\bSET(.*?)(?:FROM|WHERE)', sql, re.S)
+    if assignments:
+        columns |= set(re.findall(r'(\w+) =', assignments.group(1)))
+    where = re.search(r'WHERE(.*)', sql, re.S)
+    if where and 'l.' not in where.group(1):
+        columns |= set(re.findall(r'(\w+) (?:=|IS)', where.group(1)))
+    return columns
+
+
+class TestLinkColumns:
+    """The detector's link SQL uses the columns the object creators write."""
+
+    def test_link_sql_matches_creator_columns(self, detector):
+        batch_detector, _ = detector
+        creator_columns = _creator_link_columns()
+        assert {'entity_geom_hash', 'object_table_name', 'sync_state'} <= creator_columns
+
+        conn = MagicMock()
+        cursor = conn.cursor.return_value
+        cursor.fetchall.return_value = []
+        batch_detector._get_existing_links('project-1', conn)
+        with patch('dxf_change_detector.execute_values') as mock_execute_values:
+            batch_detector._apply_link_updates(cursor, [('A', 'obj-A', 'h', None, 'active')], set())
+        batch_detector._mark_as_deleted(cursor, 'project-1', ['A'])
+
+        statements = [c.args[0] for c in cursor.execute.call_args_list]
+        statements.append(mock_execute_values.call_args.args[1])
+        assert len(statements) == 3
+        for sql in statements:
+            assert _link_sql_columns(sql) <= creator_columns, sql
+
+
+class TestReadDXFEntities:
+    """Test client-side entity reading."""
+
+    def test_reads_geometry_and_handles(self, detector, temp_dir):
+        batch_detector, _ = detector
+        path = os.path.join(temp_dir, 'reimport.dxf')
+        doc = ezdxf.new('R2010')
+        msp = doc.modelspace()
+        msp.add_line((0, 0, 1), (10, 0, 1), dxfattribs={'layer': 'C-STORM-PIPE'})
+        msp.add_point((1, 2, 3), dxfattribs={'layer': 'V-NODE'})
+        msp.add_text('label')
+        doc.saveas(path)
+
+        entities = batch_detector.read_dxf_entities(path)
+
+        assert [e['entity_type'] for e in entities] == ['LINE', 'POINT']
+        assert entities[0]['geometry_type'] == 'LineString'
+        assert entities[1]['geometry_wkt'] == 'POINT Z (1.0 2.0 3.0)'
+        assert all(e['dxf_handle'] for e in entities)
@@ -0,0 +1,137 @@
+"""
+Unit tests for DXF geometry conversion and the parallel conversion stage.
+
+Tests cover:
+- Extracted geometry is plain, picklable data
+- Batch conversion keeps results aligned with the input order
+- Geometry hashes are independent of WKT number formatting
+- DXFImporter with conversion workers writes the same rows, in the same
+  order, as an inline import
+"""
+
+import os
+import pickle
+import pytest
+import ezdxf
+from unittest.mock import MagicMock, patch
+
+from dxf_geometry import (convert_geometry_batch, extract_entity_geometry, geometry_hash,
+                          geometry_to_wkt)
+from dxf_importer import DXFImporter
+
+
+@pytest.fixture
+def mixed_dxf_file(temp_dir):
+    """DXF file with every converted geometry type plus non-geometry entities."""
+    filepath = os.path.join(temp_dir, "parallel_test.dxf")
+    doc = ezdxf.new('R2010')
+    msp = doc.modelspace()
+    for i in range(6):
+        msp.add_line((0, 0, i), (10, 10, i), dxfattribs={'layer': 'C-STORM-PIPE'})
+        msp.add_circle((i, i, 1), radius=2.5, dxfattribs={'layer': 'C-MH'})
+        msp.add_arc((i, 0, 0), radius=3, start_angle=30, end_angle=300)
+        msp.add_lwpolyline([(0, 0), (5, 0), (5, 5)], close=True)
+        msp.add_polyline3d([(0, 0, 1), (5, 0, 2), (5, 5, 3)])
+        msp.add_ellipse((i, 0, 0), major_axis=(4, 0, 0), ratio=0.5)
+        msp.add_point((i, 2, 3), dxfattribs={'layer': 'V-NODE'})
+    doc.saveas(filepath)
+    return filepath
+
+
+def _entity_rows(conn):
+    """WKT/handle pairs written to drawing_entities, in execution order."""
+    rows = []
+    for call in conn.cursor.return_value.execute.call_args_list:
+        sql, params = call.args
+        if sql.startswith('INSERT INTO drawing_entities'):
+            rows.append((params[1], params[3], params[4]))
+    return rows
+
+
+def _run_import(db_config, path, **kwargs):
+    conn = MagicMock()
+    with patch('dxf_importer.DXFLookupService') as mock_lookup:
+        mock_lookup.return_value.get_or_create_layer.return_value = ('layer-id', None)
+        importer = DXFImporter(db_config, create_intelligent_objects=False,
+                               use_name_translator=False)
+        stats = importer.import_dxf(path, 'project-1', external_conn=conn, **kwargs)
+    return stats, conn
+
+
+class TestGeometryConversion:
+    """Test the extract/convert split."""
+
+    def test_extracted_geometry_is_picklable(self, mixed_dxf_file):
+        doc = ezdxf.readfile(mixed_dxf_file)
+        for entity in doc.modelspace():
+            data = extract_entity_geometry(entity)
+            assert pickle.loads(pickle.dumps(data)) == data
+
+    def test_lwpolyline_closed_polygon(self, mixed_dxf_file):
+        doc = ezdxf.readfile(mixed_dxf_file)
+        lwpline = doc.modelspace().query('LWPOLYLINE').first
+
+        wkt = geometry_to_wkt(extract_entity_geometry(lwpline))
+
+        assert wkt.startswith('POLYGON Z ((0.0 0.0 0')
+        assert wkt.endswith('0.0 0.0 0))')
+
+    def test_batch_results_stay_aligned(self):
+        batch = [
+            {'type': 'LINE', 'start': (0, 0, 0), 'end': (1, 1, 1)},
+            None,
+            {'type': 'LINE', 'start': (0, 0, 0)},  # malformed -> None
+            {'type': 'POINT'},
+        ]
+
+        results = convert_geometry_batch(batch)
+
+        assert results == ['LINESTRING Z (0 0 0, 1 1 1)', None, None, None]
+
+
+class TestParallelImport:
+    """Test DXFImporter with a conversion process pool."""
+
+    def test_workers_match_inline_import(self, db_config, mixed_dxf_file):
+        inline_stats, inline_conn = _run_import(db_config, mixed_dxf_file)
+        pool_stats, pool_conn = _run_import(db_config, mixed_dxf_file,
+                                            workers=2, chunk_size=5)
+
+        assert pool_stats['errors'] == []
+        assert pool_stats['conversion_workers'] == 2
+        assert pool_stats['chunks'] == 9
+        assert pool_stats['entities'] == inline_stats['entities'] == 36
+        assert pool_stats['points'] == 6
+        assert _entity_rows(pool_conn) == _entity_rows(inline_conn)
+
+    def test_workers_with_streaming_bulk_writes(self, db_config, mixed_dxf_file):
+        stats, _ = _run_import(db_config, mixed_dxf_file, streaming=True,
+                               workers=2, chunk_size=10)
+
+        assert stats['errors'] == []
+        assert stats['chunks'] == 5
+        assert stats['entities'] == 36
+        assert sum(batch['rows'] for batch in stats['batch_timings']) == 42
+
+    def test_daemonic_process_converts_inline(self, db_config, mixed_dxf_file):
+        with patch('dxf_importer.multiprocessing.current_process') as mock_process:
+            mock_process.return_value.daemon = True
+            stats, _ = _run_import(db_config, mixed_dxf_file, workers=4)
+
+        assert stats['conversion_workers'] == 0
+        assert stats['entities'] == 36
+
+
+class TestGeometryHash:
+    """Test the stable geometry hash used for change detection."""
+
+    def test_formatting_independent(self):
+        assert geometry_hash('LINESTRING Z (0.0 0.0 -0.0, 10.5 10.0 2.0)') == \
+               geometry_hash('LINESTRING Z (0 0 0,10.5 10 2)')
+
+    def test_coordinate_change_detected(self):
+        assert geometry_hash('POINT Z (1 2 3)') != geometry_hash('POINT Z (1 2 3.001)')
+
+    def test_empty_geometry(self):
+        assert geometry_hash(None) is None
+        assert geometry_hash('') is None
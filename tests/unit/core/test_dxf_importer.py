@@ -466,6 +466,34 @@ class TestIntelligentObjectsCreation:
         # IntelligentObjectCreator should not have been instantiated
         mock_creator.assert_not_called()
 
+    def test_entities_read_in_chunks_from_named_cursor(self):
+        """Test that entities stream from a server-side cursor, one creator call per chunk."""
+        rows = [{'entity_id': f'e{i}', 'entity_type': 'LINE', 'layer_name': 'C-UTIL',
+                 'geometry_wkt': 'LINESTRING(0 0,1 1)', 'geometry_type': 'ST_LineString',
+                 'dxf_handle': str(i), 'color_aci': 7, 'linetype': 'Continuous'}
+                for i in range(5)]
+        conn = MagicMock()
+        cursor = conn.cursor.return_value.__enter__.return_value
+        cursor.fetchmany.side_effect = [rows[:2], rows[2:4], rows[4:], []]
+        importer = DXFImporter({'host': 'localhost'}, use_name_translator=False)
+        importer.import_batch_id = 'batch-1'
+
+        with patch('dxf_importer.BatchIntelligentObjectCreator') as mock_creator:
+            mock_creator.return_value.create_from_entities.side_effect = lambda entities, *args: len(entities)
+            created = importer._create_intelligent_objects('p1', conn, {'errors': []},
+                                                           batched=True, chunk_size=2)
+
+        assert created == 5
+        assert conn.cursor.call_args.kwargs['name'].startswith('intelligent_objects_')
+        assert conn.cursor.call_args.kwargs['withhold'] is True
+        assert cursor.itersize == 2
+        query, params = cursor.execute.call_args.args
+        assert "de.attributes ? 'import_batch_id'" in query
+        assert params == ('p1', 'batch-1')
+        chunks = [c.args[0] for c in mock_creator.return_value.create_from_entities.call_args_list]
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        assert chunks[0][0]['geometry_type'] == 'LineString'
+
 
 # ============================================================================
 # Test Special Entity Types
@@ -0,0 +1,146 @@
+"""
+Unit tests for DXFLookupService bulk warm-up and shared layer_standards cache.
+
+Tests cover:
+- Layers are resolved with one query per table and missing ones bulk-created
+- Warmed names are answered from the cache without further queries
+- Standard linetype/style names never hit the database
+- The shared layer_standards snapshot is reused until its TTL expires
+"""
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from dxf_lookup_service import DXFLookupService, LayerStandardsCache, layer_standards_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_shared_cache():
+    """Keep the process-wide layer_standards snapshot out of other tests."""
+    layer_standards_cache.invalidate()
+    yield
+    layer_standards_cache.invalidate()
+
+
+@pytest.fixture
+def mock_conn():
+    """Mock connection returning canned rows per query."""
+    conn = MagicMock()
+    cursor = MagicMock()
+    conn.cursor.return_value = cursor
+    return conn, cursor
+
+
+def _executed_sql(cursor):
+    return [' '.join(c.args[0].split()) for c in cursor.execute.call_args_list]
+
+
+class TestWarmUp:
+    """Test resolving DXF tables up front."""
+
+    def test_layers_resolved_in_bulk(self, mock_conn):
+        conn, cursor = mock_conn
+        cursor.fetchall.side_effect = [
+            [{'layer_id': 'std-1', 'layer_name': 'C-STORM-PIPE'}],   # layer_standards
+            [{'layer_id': 'layer-1', 'layer_name': 'C-STORM-PIPE'}]  # existing layers
+        ]
+        service = DXFLookupService({}, conn=conn)
+
+        with patch('dxf_lookup_service.execute_values') as mock_execute_values:
+            mock_execute_values.return_value = [
+                {'layer_id': 'layer-2', 'layer_name': 'V-NODE'},
+                {'layer_id': 'layer-3', 'layer_name': '0'}
+            ]
+            counts = service.warm_up('project-1', layers={
+                'C-STORM-PIPE': (5, 'Continuous'),
+                'V-NODE': (7, 'Continuous'),
+                '0': (7, 'Continuous')
+            })
+
+        assert counts['layers'] == 3
+        assert counts['layers_created'] == 2
+        assert cursor.execute.call_count == 2
+        inserted_rows = mock_execute_values.call_args.args[2]
+        assert [row[2] for row in inserted_rows] == ['V-NODE', '0']
+        assert 'ON CONFLICT (project_id, layer_name) DO NOTHING' in mock_execute_values.call_args.args[1]
+
+        cursor.execute.reset_mock()
+        assert service.get_or_create_layer('C-STORM-PIPE', 'project-1') == ('layer-1', 'std-1')
+        assert service.get_or_create_layer('V-NODE', 'project-1') == ('layer-2', None)
+        cursor.execute.assert_not_called()
+
+    def test_concurrently_created_layers_are_reselected(self, mock_conn):
+        conn, cursor = mock_conn
+        cursor.fetchall.side_effect = [
+            [],  # layer_standards
+            [],  # existing layers
+            [{'layer_id': 'layer-9', 'layer_name': 'RACED'}]
+        ]
+        service = DXFLookupService({}, conn=conn)
+
+        with patch('dxf_lookup_service.execute_values', return_value=[]):
+            counts = service.warm_up('project-1', layers={'RACED': (7, 'Continuous')})
+
+        assert counts['layers_created'] == 0
+        assert service._layer_cache['project-1:RACED'] == ('layer-9', None)
+
+    def test_linetypes_single_query_and_standard_names_skipped(self, mock_conn):
+        conn, cursor = mock_conn
+        cursor.fetchall.return_value = [{'id': 'lt-1', 'name': 'DASHED'}]
+        service = DXFLookupService({}, conn=conn)
+
+        counts = service.warm_up(linetypes=['ByLayer', 'Continuous', 'DASHED', 'HIDDEN', 'DASHED'])
+
+        assert counts['linetypes'] == 2
+        assert cursor.execute.call_count == 1
+        assert cursor.execute.call_args.args[1] == (['DASHED', 'HIDDEN'],)
+
+        cursor.execute.reset_mock()
+        assert service.get_or_create_linetype('DASHED') == 'lt-1'
+        assert service.get_or_create_linetype('HIDDEN') is None
+        assert service.get_or_create_linetype('ByLayer') is None
+        cursor.execute.assert_not_called()
+
+    def test_styles_resolved_per_table(self, mock_conn):
+        conn, cursor = mock_conn
+        cursor.fetchall.return_value = []
+        service = DXFLookupService({}, conn=conn)
+
+        service.warm_up(text_styles=['Standard', 'ROMANS'],
+                        hatch_patterns=['SOLID', 'ANSI31'],
+                        dimension_styles=['CIVIL'])
+
+        sql = _executed_sql(cursor)
+        assert len(sql) == 3
+        assert 'FROM text_styles' in sql[0]
+        assert 'FROM hatch_patterns' in sql[1]
+        assert 'FROM dimension_styles' in sql[2]
+
+
+class TestLayerStandardsCache:
+    """Test the process-wide layer_standards snapshot."""
+
+    def test_snapshot_shared_across_services(self, mock_conn):
+        conn, cursor = mock_conn
+        cursor.fetchone.return_value = {'layer_id': 'layer-1'}
+        cursor.fetchall.return_value = [{'layer_id': 'std-1', 'layer_name': 'C-ROAD'}]
+
+        first = DXFLookupService({}, conn=conn)
+        second = DXFLookupService({}, conn=conn)
+        first.get_or_create_layer('C-ROAD', 'project-1')
+        second.get_or_create_layer('C-ROAD', 'project-2')
+
+        standards_queries = [s for s in _executed_sql(cursor) if 'FROM layer_standards' in s]
+        assert len(standards_queries) == 1
+
+    def test_snapshot_reloaded_after_ttl(self):
+        cache = LayerStandardsCache(ttl_seconds=60)
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [{'layer_id': 'std-1', 'layer_name': 'C-ROAD'}]
+
+        with patch('dxf_lookup_service.time.monotonic', side_effect=[0, 30, 100, 100]):
+            cache.get_all(('db',), cursor)   # load at t=0
+            cache.get_all(('db',), cursor)   # fresh at t=30
+            cache.get_all(('db',), cursor)   # stale at t=100, reload
+
+        assert cursor.execute.call_count == 2
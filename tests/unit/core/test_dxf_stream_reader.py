@@ -0,0 +1,92 @@
+"""
+Unit tests for streaming DXF import.
+
+Tests cover:
+- Reading layer/linetype table records without loading the document
+- Chunked modelspace iteration and progress reporting
+- DXFImporter streaming mode flushing each chunk through the bulk writer
+"""
+
+import os
+import pytest
+import ezdxf
+from unittest.mock import MagicMock, patch
+
+from dxf_stream_reader import DXFStreamReader
+from dxf_importer import DXFImporter
+
+
+@pytest.fixture
+def streaming_dxf_file(temp_dir):
+    """DXF file with a custom layer and ten entities."""
+    filepath = os.path.join(temp_dir, "streaming_test.dxf")
+    doc = ezdxf.new('R2010')
+    doc.layers.add('C-STORM-PIPE', color=5)
+    msp = doc.modelspace()
+    for i in range(8):
+        msp.add_line((0, 0, i), (10, 10, i), dxfattribs={'layer': 'C-STORM-PIPE'})
+    msp.add_polyline3d([(0, 0, 1), (5, 0, 2), (5, 5, 3)], dxfattribs={'layer': 'C-STORM-PIPE'})
+    msp.add_point((1, 2, 3), dxfattribs={'layer': 'V-NODE'})
+    doc.saveas(filepath)
+    return filepath
+
+
+class TestDXFStreamReader:
+    """Test table reading and chunked entity streaming."""
+
+    def test_read_tables_returns_layers(self, streaming_dxf_file):
+        reader = DXFStreamReader(streaming_dxf_file)
+        tables = reader.read_tables()
+
+        layers = {layer.dxf.name: layer for layer in tables.layers}
+        assert 'C-STORM-PIPE' in layers
+        assert layers['C-STORM-PIPE'].dxf.color == 5
+        assert 'Continuous' in [lt.dxf.name for lt in tables.linetypes]
+
+    def test_chunks_are_bounded(self, streaming_dxf_file):
+        reader = DXFStreamReader(streaming_dxf_file, chunk_size=4)
+        sizes = [len(chunk) for chunk in reader.iter_chunks()]
+
+        assert sizes == [4, 4, 2]
+
+    def test_polyline_vertices_are_linked(self, streaming_dxf_file):
+        reader = DXFStreamReader(streaming_dxf_file, chunk_size=100)
+        entities = next(reader.iter_chunks())
+        polyline = [e for e in entities if e.dxftype() == 'POLYLINE'][0]
+
+        assert len(list(polyline.vertices)) == 3
+
+    def test_progress_reaches_completion(self, streaming_dxf_file):
+        reader = DXFStreamReader(streaming_dxf_file, chunk_size=4)
+        assert reader.progress() == 0.0
+
+        fractions = []
+        for _ in reader.iter_chunks():
+            fractions.append(reader.progress())
+
+        assert fractions == sorted(fractions)
+        assert reader.progress() == 1.0
+
+
+class TestStreamingImport:
+    """Test DXFImporter streaming mode with a mocked connection."""
+
+    def test_streaming_import_flushes_each_chunk(self, db_config, streaming_dxf_file):
+        conn = MagicMock()
+        progress = []
+
+        with patch('dxf_importer.DXFLookupService') as mock_lookup:
+            mock_lookup.return_value.get_or_create_layer.return_value = ('layer-id', None)
+            importer = DXFImporter(db_config, create_intelligent_objects=False,
+                                   use_name_translator=False)
+            stats = importer.import_dxf(streaming_dxf_file, 'project-1',
+                                        external_conn=conn, streaming=True,
+                                        chunk_size=4, progress_callback=progress.append)
+
+        assert stats['errors'] == []
+        assert stats['chunks'] == 3
+        assert stats['entities'] == 9
+        assert stats['points'] == 1
+        assert [p['chunk'] for p in progress] == [1, 2, 3]
+        assert progress[-1]['entities_read'] == 10
+        assert sum(batch['rows'] for batch in stats['batch_timings']) == 10
@@ -0,0 +1,231 @@
+"""
+Unit tests for pluggable, batched embedding generation.
+
+Tests cover:
+- The local hashed n-gram provider is deterministic and normalised
+- embed_in_batches keeps input order, bounds concurrency and isolates failures
+- The content-hash cache and set-based save_embeddings
+- EmbeddingGenerator embeds each distinct text once and skips unchanged text
+- EmbeddingWorker sends one multi-input request per batch
+"""
+
+import threading
+import time
+import pytest
+import numpy as np
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+from tools.embeddings.providers import (
+    EmbeddingBatch, EmbeddingCache, EmbeddingProvider, HashedNgramEmbeddingProvider,
+    apportion_tokens, content_hash, embed_in_batches, get_provider, save_embeddings
+)
+from tools.embeddings.embedding_generator import EmbeddingGenerator
+from workers.embedding_worker import EmbeddingWorker
+
+
+class RecordingProvider(EmbeddingProvider):
+    """Returns [len(text)] vectors, recording requests and concurrency."""
+
+    name = 'recording'
+
+    def __init__(self, max_batch_size=3, delay=0.0, fail_on=None):
+        super().__init__('recording-v1', 1, max_batch_size)
+        self.requests = []
+        self.delay = delay
+        self.fail_on = fail_on
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def embed(self, texts):
+        with self.lock:
+            self.requests.append(list(texts))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if self.fail_on in texts:
+                raise RuntimeError('rate limited')
+            return EmbeddingBatch([[float(len(t))] for t in texts], tokens=len(texts))
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class TestHashedNgramProvider:
+    """Test the local provider."""
+
+    def test_deterministic_normalised_vectors(self):
+        first = get_provider('local').embed(['Storm Drain Manhole']).vectors[0]
+        second = HashedNgramEmbeddingProvider().embed(['storm  drain manhole']).vectors[0]
+
+        assert len(first) == 1536
+        assert first == second
+        assert np.linalg.norm(first) == pytest.approx(1.0, abs=1e-5)
+
+    def test_similar_text_scores_higher(self):
+        a, b, c = (np.array(v) for v in HashedNgramEmbeddingProvider().embed(
+            ['storm drain manhole', 'storm drain manholes', 'asphalt paving note']).vectors)
+
+        assert a @ b > a @ c
+
+    def test_unknown_provider(self):
+        with pytest.raises(ValueError, match='not supported'):
+            get_provider('nope')
+
+
+class TestEmbedInBatches:
+    """Test multi-input request pipelining."""
+
+    def test_order_and_batch_sizes(self):
+        provider = RecordingProvider(max_batch_size=3, delay=0.01)
+        texts = [f't{i:02d}' for i in range(10)]
+
+        batches = list(embed_in_batches(provider, texts, batch_size=5, max_concurrency=2))
+
+        assert [offset for offset, _ in batches] == [0, 3, 6, 9]
+        assert sorted(len(r) for r in provider.requests) == [1, 3, 3, 3]
+        assert provider.max_in_flight <= 2
+
+    def test_failed_request_does_not_stop_others(self):
+        provider = RecordingProvider(max_batch_size=2, fail_on='b')
+
+        batches = dict(embed_in_batches(provider, ['a', 'b', 'c', 'd'], max_concurrency=2))
+
+        assert batches[0].error == 'rate limited'
+        assert len(batches[2].vectors) == 2
+
+
+class TestCacheAndWrites:
+    """Test the content-hash cache and bulk writes."""
+
+    def test_lru_eviction(self):
+        cache = EmbeddingCache(max_entries=2)
+        cache.put('a', [1.0])
+        cache.put('b', [2.0])
+        cache.get('a')
+        cache.put('c', [3.0])
+
+        assert cache.get('b') is None
+        assert cache.get('a') == [1.0]
+
+    def test_content_hash_includes_model(self):
+        assert content_hash('pipe', 'm1') != content_hash('pipe', 'm2')
+
+    def test_apportion_tokens(self):
+        shares = apportion_tokens(10, ['a', 'bbb', 'cccccc'])
+
+        assert sum(shares) == 10
+        assert shares[0] <= shares[2]
+
+    def test_save_embeddings_is_set_based(self):
+        cursor = MagicMock()
+        with patch('psycopg2.extras.execute_values',
+                   return_value=[{'entity_id': 'e1', 'embedding_id': 'x1'}]) as execute_values:
+            ids = save_embeddings(cursor, 'm1', [('e1', [0.5, 0.25], 'text', 3), ('e2', [1, 0], 'x', 0)])
+
+        assert cursor.execute.call_count == 1
+        execute_values.assert_called_once()
+        assert execute_values.call_args[0][2][0] == ('e1', 'm1', '[0.5,0.25]', 'text', 3)
+        assert ids == {'e1': 'x1'}
+
+
+@pytest.fixture
+def generator_env():
+    """EmbeddingGenerator with its database calls replaced; records saved batches."""
+    saved = []
+    module = 'tools.embeddings.embedding_generator'
+
+    def execute_query(query, params=None, fetch=True):
+        if 'SELECT model_id FROM embedding_models' in query:
+            return [{'model_id': 'm1'}]
+        if 'total_cost' in query:
+            return [{'total_cost': 0}]
+        if 'cost_per_1k_tokens' in query:
+            return [{'cost_per_1k_tokens': 0}]
+        if 'FROM standards_entities' in query:
+            return [{'entity_id': 'e1', 'entity_type': 'layer', 'canonical_name': 'Storm'},
+                    {'entity_id': 'e2', 'entity_type': 'layer', 'canonical_name': 'Sewer'}]
+        if 'FROM entity_embeddings' in query:
+            return [{'entity_id': 'e1', 'embedding_text': 'layer: Storm'}]
+        return []
+
+    @contextmanager
+    def get_cursor():
+        yield MagicMock()
+
+    def save(cursor, model_id, records, supersede=True, page_size=500):
+        saved.append(records)
+        return {str(r[0]): f'id-{r[0]}' for r in records}
+
+    with patch(f'{module}.execute_query', execute_query), \
+            patch(f'{module}.get_cursor', get_cursor), \
+            patch(f'{module}.save_embeddings', save), \
+            patch('builtins.print'):
+        provider = RecordingProvider(max_batch_size=100)
+        generator = EmbeddingGenerator(provider=provider, cache=EmbeddingCache())
+        yield generator, provider, saved
+
+
+class TestEmbeddingGenerator:
+    """Test batched generation through the provider interface."""
+
+    def test_batch_dedupes_and_writes_per_batch(self, generator_env):
+        generator, provider, saved = generator_env
+        entity_ids = [f'e{i}' for i in range(6)]
+        text_map = {e: ['pipe', 'valve', 'curb'][i % 3] for i, e in enumerate(entity_ids)}
+        text_map['e5'] = ''
+
+        stats = generator.generate_batch_embeddings(entity_ids, text_map, batch_size=2)
+
+        assert sorted(sum(provider.requests, [])) == ['curb', 'pipe', 'valve']
+        assert (stats['generated'], stats['api_calls'], len(stats['errors'])) == (5, 2, 1)
+        assert len(saved) == 2
+
+    def test_cached_text_not_sent_again(self, generator_env):
+        generator, provider, saved = generator_env
+
+        generator.generate_batch_embeddings(['e1'], {'e1': 'pipe'})
+        stats = generator.generate_batch_embeddings(['e2'], {'e2': 'pipe'})
+
+        assert len(provider.requests) == 1
+        assert stats['cached'] == 1
+        assert saved[-1][0][:3] == ('e2', [4.0], 'pipe')
+
+    def test_refresh_skips_unchanged_text(self, generator_env):
+        generator, provider, saved = generator_env
+
+        stats = generator.refresh_embeddings()
+
+        assert stats['skipped_unchanged'] == 1
+        assert provider.requests == [['layer: Sewer']]
+
+
+class TestEmbeddingWorker:
+    """Test the worker's multi-input requests."""
+
+    def test_one_request_per_batch(self):
+        worker = EmbeddingWorker(provider='local')
+        worker.cache = EmbeddingCache()
+
+        with patch.object(worker.provider, 'embed', wraps=worker.provider.embed) as embed:
+            results = worker.generate_embeddings(['inlet', 'outlet', 'inlet'])
+
+        embed.assert_called_once()
+        assert embed.call_args[0][0] == ['inlet', 'outlet']
+        assert results[0]['embedding'] == results[2]['embedding']
+        assert [r['tokens'] for r in results][2] == 0
+        assert all(result['success'] for result in results)
+
+    def test_mark_completed_casts_ids_to_uuid(self):
+        worker = EmbeddingWorker(provider='local')
+        worker.conn = MagicMock()
+        cursor = worker.conn.cursor.return_value
+
+        worker.mark_completed(['6f1c0a52-3c1e-4a5e-9b8e-1d2f3a4b5c6d'])
+
+        query, params = cursor.execute.call_args.args
+        assert 'queue_id = ANY(%s::uuid[])' in query
+        assert params == (['6f1c0a52-3c1e-4a5e-9b8e-1d2f3a4b5c6d'],)
+        worker.conn.commit.assert_called_once()
@@ -0,0 +1,75 @@
+"""
+Unit Tests for GIS Engine Blueprint
+Tests the SQL /api/map/data builds for each entity type
+"""
+import pytest
+from unittest.mock import patch
+from flask import Flask
+from app.blueprints import gis_engine
+from app.blueprints.gis_engine import gis_bp
+
+
+@pytest.fixture
+def app():
+    """Create a test Flask app with just the GIS engine blueprint"""
+    test_app = Flask(__name__)
+    test_app.config['TESTING'] = True
+    test_app.register_blueprint(gis_bp)
+    return test_app
+
+
+@pytest.fixture
+def client(app):
+    """Create a test client"""
+    return app.test_client()
+
+
+@pytest.fixture
+def sources():
+    """Capture the (query, params, transform) sources handed to stream_features"""
+    captured = []
+
+    def stream_features(feature_sources, output_format):
+        captured.extend(feature_sources)
+        return iter(['{"type": "FeatureCollection", "features": []}'])
+
+    columns = ['material', 'structure_type', 'point_number']
+    with patch.object(gis_engine, 'stream_features', side_effect=stream_features), \
+         patch.object(gis_engine, 'get_layer_columns', return_value=columns):
+        yield captured
+
+
+class TestMapData:
+    """Test /api/map/data query building"""
+
+    def test_structures_and_lines_have_no_is_active_filter(self, client, sources):
+        """utility_structures and utility_lines have no is_active column"""
+        response = client.post('/api/map/data', json={
+            'entity_types': ['utility_structures', 'utility_lines'],
+            'bbox': [-122.8, 38.3, -122.6, 38.5],
+            'filters': {'material': 'PVC'}
+        })
+
+        assert response.status_code == 200
+        structures, lines = (query for query, _, _ in sources)
+        assert 'FROM utility_structures' in structures
+        assert 'rim_geometry && ST_Transform' in structures
+        assert 'is_active' not in structures
+        assert 'FROM utility_lines' in lines
+        assert 'is_active' not in lines
+        assert 'material = %(filter_0)s' in lines
+
+    def test_survey_points_only_active(self, client, sources):
+        """survey_points keeps its is_active filter"""
+        client.post('/api/map/data', json={'entity_types': ['survey_points']})
+
+        query, params, _ = sources[0]
+        assert 'WHERE is_active = TRUE' in query
+        assert params == {}
+
+    def test_unfiltered_table_has_no_where(self, client, sources):
+        """A table with no conditions gets no dangling WHERE"""
+        client.post('/api/map/data', json={'entity_types': ['utility_lines']})
+
+        query, _, _ = sources[0]
+        assert 'WHERE' not in query
@@ -0,0 +1,126 @@
+"""
+Unit tests for the prefix-filtered import mapping matcher.
+
+Tests cover:
+- Literal prefix extraction from regex patterns
+- find_match returns the same MappingMatch (including conflicts) as a full scan
+- Per-client partitioning
+- Memoized results are bounded and returned as copies
+"""
+
+import pytest
+
+from standards.import_mapping_manager import ImportMappingManager
+from standards.pattern_matcher import PatternMatcher, literal_prefix
+
+
+def _row(mapping_id, regex, confidence=90, client=None, type_code='PIPE'):
+    return {
+        'mapping_id': mapping_id,
+        'client_name': client,
+        'source_pattern': f'pattern-{mapping_id}',
+        'regex_pattern': regex,
+        'extraction_rules': {'attributes': ['group:size'], 'phase': 'group:phase'},
+        'confidence_score': confidence,
+        'discipline_code': 'CIV',
+        'category_code': 'UTIL',
+        'type_code': type_code
+    }
+
+
+@pytest.fixture
+def pattern_rows():
+    """Confidence-ordered rows with overlapping and prefix-less patterns."""
+    return [
+        _row(1, r'^SD-(?P<size>\d+)-(?P<phase>NEW|EXIST)$', 95, client='ACME'),
+        _row(2, r'^(?P<size>\d+)IN-STORM$', 90),
+        _row(3, r'^SD-(?P<size>\d+)', 85, client='BETA'),
+        _row(4, r'^W-(?P<size>\d+)-(?P<phase>\w+)$', 80),
+        _row(5, r'SD|SS|W', 75, type_code='SEWER'),
+        _row(6, r'^SD-[', 70),  # invalid regex
+    ]
+
+
+@pytest.fixture
+def manager(pattern_rows):
+    return ImportMappingManager(validate_entities=False, patterns=pattern_rows)
+
+
+class TestLiteralPrefix:
+    """Test prefix extraction."""
+
+    @pytest.mark.parametrize('regex,prefix', [
+        (r'^SD-(?P<size>\d+)', 'sd-'),
+        (r'\A12IN-STORM', '12in-storm'),
+        (r'(?P<size>\d+)IN', ''),
+        (r'SD|SS', 's'),
+        (r'SD|W', ''),
+        (r'^W?-X', ''),
+        (r'^C\-ROAD', 'c-road'),
+        (r'^É-X', ''),
+    ])
+    def test_prefixes(self, regex, prefix):
+        assert literal_prefix(regex) == prefix
+
+
+class TestFindMatch:
+    """Test matcher results against the full pattern scan."""
+
+    @pytest.mark.parametrize('layer_name', [
+        'SD-12-NEW', 'sd-8-exist', 'SD-8', '12IN-STORM', 'W-6-PROP',
+        'SS-8', 'SDX', 'nothing', 'sd-ñ', 'ſD-12-NEW'
+    ])
+    @pytest.mark.parametrize('detect_conflicts', [True, False])
+    def test_same_result_as_full_scan(self, manager, layer_name, detect_conflicts):
+        expected = manager._match_patterns(layer_name, manager.patterns, detect_conflicts)
+        result = manager.find_match(layer_name, detect_conflicts)
+
+        assert (result.to_dict() if result else None) == \
+               (expected.to_dict() if expected else None)
+
+    def test_conflicts_reported_in_confidence_order(self, manager):
+        result = manager.find_match('SD-12-NEW')
+
+        assert result.mapping_id == 1
+        assert result.has_conflicts
+        assert result.conflict_patterns == ['pattern-3 (ID: 3)', 'pattern-5 (ID: 5)']
+
+    def test_candidates_skip_other_prefixes(self, pattern_rows, manager):
+        candidates = manager.matcher.candidates('W-6-PROP')
+
+        assert [row['mapping_id'] for row in candidates] == [2, 4, 5]
+
+    def test_client_partition(self, manager):
+        acme = manager.find_match('SD-12-NEW', client_name='ACME')
+        beta = manager.find_match('SD-12-NEW', client_name='BETA')
+        unknown = manager.find_match('SD-12-NEW', client_name='OTHER')
+
+        assert acme.mapping_id == 1
+        assert acme.conflict_patterns == ['pattern-5 (ID: 5)']
+        assert beta.mapping_id == 3
+        assert unknown.mapping_id == 5
+
+    def test_memoized_result_is_a_copy(self, manager):
+        first = manager.find_match('SD-12-NEW')
+        first.conflict_patterns.append('tampered')
+        first.has_conflicts = False
+
+        second = manager.find_match('SD-12-NEW')
+
+        assert second.has_conflicts
+        assert 'tampered' not in second.conflict_patterns
+
+    def test_memo_is_bounded(self, pattern_rows):
+        manager = ImportMappingManager(validate_entities=False, patterns=pattern_rows,
+                                       cache_size=2)
+        for name in ['SD-1', 'SD-2', 'SD-3']:
+            manager.find_match(name)
+
+        assert [key[0] for key in manager._match_cache] == ['SD-2', 'SD-3']
+
+    def test_reload_clears_memo(self, manager, pattern_rows):
+        manager.find_match('SD-12-NEW')
+        manager._load_patterns(pattern_rows[1:])
+
+        assert not manager._match_cache
+        assert isinstance(manager.matcher, PatternMatcher)
@@ -0,0 +1,115 @@
+"""
+Unit tests for grid-indexed pipe/structure auto-connection.
+
+Tests cover:
+- Grid lookups agree with a linear nearest-structure scan (including ties)
+- Structures without geometry are skipped
+- Connection changes are written with one batched UPDATE
+- Timing and match statistics are reported
+"""
+
+import random
+import pytest
+from unittest.mock import MagicMock, patch
+
+from pipe_structure_connector import PipeStructureConnector, StructureGridIndex
+
+
+def _linear_nearest(point, structures, tolerance):
+    """Reference linear scan (first structure wins ties)."""
+    nearest, min_distance = None, float('inf')
+    for struct in structures:
+        dx = point[0] - struct['point'][0]
+        dy = point[1] - struct['point'][1]
+        distance = (dx ** 2 + dy ** 2) ** 0.5
+        if distance < min_distance and distance <= tolerance:
+            min_distance, nearest = distance, struct
+    return nearest
+
+
+def _structure(i, x, y):
+    return {'structure_id': f's-{i}', 'structure_number': f'MH-{i}',
+            'structure_type': 'MH', 'point': (x, y)}
+
+
+class TestStructureGridIndex:
+    """Test fixed-radius nearest lookups."""
+
+    @pytest.mark.parametrize('tolerance', [0.5, 2.0, 5.0])
+    def test_matches_linear_scan(self, tolerance):
+        rng = random.Random(11)
+        structures = [_structure(i, rng.uniform(6000000, 6000200), rng.uniform(2100000, 2100200))
+                      for i in range(400)]
+        index = StructureGridIndex(structures, tolerance)
+
+        for _ in range(500):
+            point = (rng.uniform(6000000, 6000200), rng.uniform(2100000, 2100200))
+            assert index.nearest(point) is _linear_nearest(point, structures, tolerance)
+
+    def test_tie_goes_to_first_structure(self):
+        structures = [_structure(1, 10.0, 0.0), _structure(2, -10.0, 0.0), _structure(3, 0.0, 10.0)]
+        index = StructureGridIndex(structures, 10.0)
+
+        assert index.nearest((0.0, 0.0))['structure_id'] == 's-1'
+
+    def test_point_on_cell_boundary(self):
+        index = StructureGridIndex([_structure(1, 4.0, 4.0)], 2.0)
+
+        assert index.nearest((5.999, 4.0))['structure_id'] == 's-1'
+        assert index.nearest((6.001, 4.0)) is None
+
+    def test_missing_geometry_skipped(self):
+        index = StructureGridIndex([_structure(1, None, None), _structure(2, 1.0, 1.0)], 2.0)
+
+        assert index.indexed == 1
+        assert index.nearest((None, None)) is None
+        assert index.nearest((1.5, 1.0))['structure_id'] == 's-2'
+
+
+class TestConnectNetworkPipes:
+    """Test auto-connection with a mocked database."""
+
+    @pytest.fixture
+    def connector(self):
+        connector = PipeStructureConnector(tolerance_feet=2.0)
+        connector.get_db_connection = MagicMock(return_value=MagicMock())
+        return connector
+
+    def test_changed_connections_written_in_one_update(self, connector):
+        pipes = [
+            {'line_id': 'p-1', 'line_number': 'SS-1', 'from_structure_id': None,
+             'to_structure_id': None, 'start_point': (0.5, 0.0), 'end_point': (100.0, 0.5)},
+            {'line_id': 'p-2', 'line_number': 'SS-2', 'from_structure_id': 's-2',
+             'to_structure_id': None, 'start_point': (100.0, 0.0), 'end_point': (500.0, 0.0)},
+            {'line_id': 'p-3', 'line_number': None, 'from_structure_id': 's-1',
+             'to_structure_id': 's-2', 'start_point': (0.0, 0.0), 'end_point': (100.0, 0.0)},
+        ]
+        structures = [_structure(1, 0.0, 0.0), _structure(2, 100.0, 0.0)]
+
+        with patch.object(connector, '_get_network_pipes', return_value=pipes), \
+             patch.object(connector, '_get_network_structures', return_value=structures), \
+             patch('pipe_structure_connector.execute_values') as mock_execute_values:
+            results = connector.connect_network_pipes('network-1')
+
+        assert results['success']
+        assert results['fully_connected'] == 2
+        assert results['unconnected_end'] == ['SS-2']
+        mock_execute_values.assert_called_once()
+        assert mock_execute_values.call_args.args[2] == [('p-1', 's-1', 's-2')]
+        assert results['match_stats']['pipes_updated'] == 1
+        assert results['match_stats']['endpoints_matched'] == 5
+        assert results['match_stats']['endpoints_unmatched'] == 1
+        assert set(results['timings']) == {'load_seconds', 'index_seconds', 'match_seconds',
+                                           'update_seconds', 'total_seconds'}
+
+    def test_update_failure_reports_error(self, connector):
+        pipes = [{'line_id': 'p-1', 'line_number': 'SS-1', 'from_structure_id': None,
+                  'to_structure_id': None, 'start_point': (0.0, 0.0), 'end_point': (9.0, 9.0)}]
+
+        with patch.object(connector, '_get_network_pipes', return_value=pipes), \
+             patch.object(connector, '_get_network_structures',
+                          return_value=[_structure(1, 0.0, 0.0)]), \
+             patch('pipe_structure_connector.execute_values', side_effect=Exception('boom')):
+            results = connector.connect_network_pipes('network-1')
+
+        assert results == {'success': False, 'error': 'boom'}
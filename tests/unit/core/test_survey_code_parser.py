@@ -0,0 +1,144 @@
+"""
+Unit tests for cached survey code parsing.
+
+Tests cover:
+- parse_codes resolves many codes with one library load
+- Results match parse_code and are independent copies
+- Snapshots are reused until invalidated or expired
+- simulate_field_sequence, batch_validate and PNEZD imports load the library once
+"""
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from survey_code_parser import SurveyCodeLibraryCache, SurveyCodeParser
+from batch_pnezd_parser import PNEZDParser
+
+
+def _row(code, connectivity, create_block=False):
+    return {
+        'code_id': f'id-{code}', 'code': code, 'display_name': code.title(),
+        'description': None, 'discipline_code': 'CIV', 'category_code': 'UTIL',
+        'feature_type': code, 'connectivity_type': connectivity, 'geometry_output': 'LN',
+        'category_group': None, 'auto_connect': False, 'create_block': create_block,
+        'block_name': None, 'layer_template': '{discipline}-{category}-{feature}-{phase}',
+        'default_phase': 'EXIST', 'is_favorite': False, 'usage_count': 0, 'is_active': True
+    }
+
+
+@pytest.fixture
+def library_rows():
+    return [_row('MH', 'NODE', create_block=True), _row('EP', 'LINE'),
+            _row('BLDG', 'EDGE'), _row('TOPO', 'POINT')]
+
+
+@pytest.fixture
+def mock_connect(library_rows):
+    """psycopg2.connect returning the library rows, counting connections."""
+    with patch('survey_code_parser.psycopg2.connect') as connect:
+        connect.return_value.cursor.return_value.fetchall.side_effect = \
+            lambda: [dict(row) for row in library_rows]
+        yield connect
+
+
+@pytest.fixture
+def parser(db_config):
+    return SurveyCodeParser(db_config, cache=SurveyCodeLibraryCache())
+
+
+class TestParseCodes:
+    """Test in-memory code resolution."""
+
+    def test_one_load_for_many_codes(self, parser, mock_connect):
+        results = parser.parse_codes(['mh', ' EP ', 'NOPE', None, 'MH'] * 100)
+
+        assert mock_connect.call_count == 1
+        assert [r['valid'] for r in results[:5]] == [True, True, False, False, True]
+        assert results[0]['code'] == 'MH'
+        assert results[2]['error'] == 'Code "NOPE" not found in library or is inactive'
+        assert results[3]['error'] == 'Code is required and must be a string'
+
+    def test_matches_parse_code(self, parser, mock_connect):
+        assert parser.parse_codes(['EP'])[0] == parser.parse_code('ep')
+
+    def test_results_are_copies(self, parser, mock_connect):
+        first = parser.parse_code('MH')
+        first['display_name'] = 'tampered'
+
+        assert parser.parse_code('MH')['display_name'] == 'Mh'
+
+    def test_invalid_only_input_skips_load(self, parser, mock_connect):
+        parser.parse_codes(['', None])
+
+        mock_connect.assert_not_called()
+
+
+class TestSurveyCodeLibraryCache:
+    """Test snapshot reuse and invalidation."""
+
+    def test_shared_across_parsers_until_invalidated(self, db_config, mock_connect):
+        cache = SurveyCodeLibraryCache()
+        SurveyCodeParser(db_config, cache=cache).parse_code('MH')
+        SurveyCodeParser(db_config, cache=cache).parse_code('EP')
+
+        assert mock_connect.call_count == 1
+
+        cache.invalidate()
+        SurveyCodeParser(db_config, cache=cache).parse_code('EP')
+
+        assert mock_connect.call_count == 2
+        assert cache.version == 1
+
+    def test_expired_snapshot_reloaded(self, db_config, mock_connect):
+        parser = SurveyCodeParser(db_config, cache=SurveyCodeLibraryCache(ttl_seconds=0))
+        parser.parse_code('MH')
+        parser.parse_code('MH')
+
+        assert mock_connect.call_count == 2
+
+    def test_edit_during_load_not_cached(self):
+        cache = SurveyCodeLibraryCache()
+
+        def loader():
+            cache.invalidate()
+            return {}
+
+        cache.get_library(('db',), loader)
+        loader_mock = MagicMock(return_value={})
+        cache.get_library(('db',), loader_mock)
+
+        loader_mock.assert_called_once()
+
+
+class TestBatchCallers:
+    """Test callers resolve codes through a single library load."""
+
+    def test_simulate_field_sequence(self, parser, mock_connect):
+        shots = [{'point_number': str(i), 'code': code, 'northing': i, 'easting': i, 'elevation': 0}
+                 for i, code in enumerate(['EP', 'EP', 'EP', 'MH', 'BLDG', 'BLDG', 'bad', 'BLDG'])]
+
+        result = parser.simulate_field_sequence(shots)
+
+        assert mock_connect.call_count == 1
+        assert result['polylines'] == [
+            {'code': 'EP', 'points': ['0', '1', '2'], 'closed': False},
+            {'code': 'BLDG', 'points': ['4', '5', '7'], 'closed': True},
+        ]
+        assert result['blocks'][0]['point'] == '3'
+        assert result['warnings'] == ['Point 6: Code "BAD" not found in library or is inactive']
+
+    def test_batch_validate(self, parser, mock_connect):
+        result = parser.batch_validate(['MH', 'EP', 'XX'])
+
+        assert mock_connect.call_count == 1
+        assert (result['total'], result['valid'], result['invalid']) == (3, 2, 1)
+
+    def test_pnezd_parser_attaches_code_data(self, db_config, parser, mock_connect):
+        content = '1,100.0,200.0,10.0,MH\n2,101.0,201.0,10.5,"ep"\n3,102.0,202.0,11.0,XX'
+
+        with patch('batch_pnezd_parser.CoordinateSystemService'):
+            result = PNEZDParser(db_config).parse_file(content, 'shots.txt', code_parser=parser)
+
+        assert mock_connect.call_count == 1
+        assert [p['code_data']['valid'] for p in result['points']] == [True, True, False]
+        assert result['points'][1]['code_data']['code'] == 'EP'
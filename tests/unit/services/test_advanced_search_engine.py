@@ -0,0 +1,194 @@
+"""
+Unit tests for the advanced search engine
+Tests keyset cursors and predicates (including NULL sort values), sort and
+date field whitelisting, trigram text filters, pre-aggregated project counts
+and batched search history logging.
+"""
+
+import unittest
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from services.advanced_search_engine import (
+    AdvancedSearchEngine, SearchHistoryLog, encode_cursor, decode_cursor
+)
+
+MODULE = 'services.advanced_search_engine'
+
+
+class FakeDatabase:
+    """Records statements and returns canned rows."""
+
+    def __init__(self, rows=None):
+        self.rows = rows or []
+        self.queries = []
+        self.batches = []
+        self.cursor = MagicMock()
+        self.cursor.execute.side_effect = self.execute
+
+    def execute(self, query, params=None):
+        self.queries.append((query, params))
+        self.cursor.fetchall.return_value = self.rows
+
+    def execute_values(self, cursor, query, rows, template=None, page_size=100):
+        self.batches.append(rows)
+
+    @contextmanager
+    def get_cursor(self):
+        yield self.cursor
+
+
+class SearchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.db = FakeDatabase()
+        patch(f'{MODULE}.get_cursor', self.db.get_cursor).start()
+        patch(f'{MODULE}.execute_values', self.db.execute_values).start()
+        self.addCleanup(patch.stopall)
+        self.engine = AdvancedSearchEngine()
+
+
+class TestBuildQuery(SearchTestCase):
+    """Test SQL generation."""
+
+    def test_first_page_has_no_offset(self):
+        query, params = self.engine.build_query('survey_points', {}, per_page=50)
+
+        self.assertIn('ORDER BY sp.created_at DESC, sp.point_id DESC', query)
+        self.assertNotIn('OFFSET', query)
+        self.assertEqual(params, [51])
+
+    def test_cursor_adds_row_comparison(self):
+        key = str(uuid.uuid4())
+        cursor = encode_cursor('created_at', 'DESC', '2026-01-01 10:00:00', key)
+
+        query, params = self.engine.build_query('survey_points', {}, cursor=cursor)
+
+        self.assertIn('(sp.created_at, sp.point_id) < (%s::timestamp, %s::uuid)', query)
+        self.assertEqual(params, ['2026-01-01 10:00:00', key, 51])
+
+    def test_null_sort_values(self):
+        key = str(uuid.uuid4())
+
+        desc, _ = self.engine.build_query(
+            'survey_points', {}, 'elevation', 'DESC', cursor=encode_cursor('elevation', 'DESC', None, key))
+        asc, _ = self.engine.build_query(
+            'survey_points', {}, 'elevation', 'ASC', cursor=encode_cursor('elevation', 'ASC', 12.5, key))
+
+        self.assertIn('(sp.elevation IS NULL AND sp.point_id < %s::uuid) OR sp.elevation IS NOT NULL', desc)
+        self.assertIn('AND (sp.elevation, sp.point_id) > (%s::numeric, %s::uuid)\n', asc)
+
+    def test_asc_predicate_is_a_bare_row_comparison(self):
+        cursor = encode_cursor('elevation', 'ASC', 12.5, str(uuid.uuid4()))
+
+        query, _ = self.engine.build_query('survey_points', {}, 'elevation', 'ASC', cursor=cursor)
+
+        where = query.split('WHERE', 1)[1].split('ORDER BY', 1)[0]
+        self.assertNotIn(' OR ', where)
+        self.assertNotIn('IS NULL', where)
+
+    def test_rejects_unknown_sort_and_mismatched_cursor(self):
+        with self.assertRaises(ValueError):
+            self.engine.build_query('survey_points', {}, sort_field='1; DROP TABLE projects')
+        with self.assertRaises(ValueError):
+            self.engine.build_query('survey_points', {}, sort_direction='sideways')
+        with self.assertRaises(ValueError):
+            self.engine.build_query('survey_points', {}, cursor='not-a-cursor')
+        cursor = encode_cursor('point_number', 'ASC', 'P1', str(uuid.uuid4()))
+        with self.assertRaises(ValueError):
+            self.engine.build_query('survey_points', {}, cursor=cursor)
+        with self.assertRaises(ValueError):
+            self.engine.build_query('survey_points', {'date_range': {'field': 'notes', 'start': 'x'}})
+
+    def test_text_search_escapes_wildcards(self):
+        query, params = self.engine.build_query('utility_structures', {'search_text': 'MH_1%',
+                                                                       'project_id': 'p1'})
+
+        self.assertIn('(us.structure_number ILIKE %s OR us.structure_type ILIKE %s)', query)
+        self.assertIn('us.project_id = %s', query)
+        self.assertEqual(params[:3], ['%MH\\_1\\%%', '%MH\\_1\\%%', 'p1'])
+
+    def test_projects_read_pre_aggregated_counts(self):
+        query, _ = self.engine.build_query('projects', {})
+
+        self.assertIn('LEFT JOIN project_entity_counts pc', query)
+        self.assertNotIn('GROUP BY', query)
+        self.assertNotIn('COUNT(DISTINCT', query)
+
+
+class TestSearch(SearchTestCase):
+    """Test paging through results."""
+
+    def test_next_cursor_from_last_row(self):
+        keys = [str(uuid.uuid4()) for _ in range(3)]
+        self.db.rows = [{'point_id': key, 'created_at': datetime(2026, 1, 3 - i)}
+                        for i, key in enumerate(keys)]
+
+        page = self.engine.search('survey_points', {}, per_page=2)
+
+        self.assertEqual(page['count'], 2)
+        self.assertTrue(page['has_more'])
+        self.assertEqual(decode_cursor(page['next_cursor']),
+                         ('created_at', 'DESC', '2026-01-02 00:00:00', keys[1]))
+
+    def test_short_asc_page_continues_with_null_tail(self):
+        keys = sorted(str(uuid.uuid4()) for _ in range(3))
+        cursor = encode_cursor('elevation', 'ASC', 10.0, keys[0])
+        self.db.rows = [{'point_id': keys[1], 'elevation': 11.0}]
+        tail = [{'point_id': keys[2], 'elevation': None}]
+        self.db.cursor.fetchall.side_effect = [self.db.rows, tail]
+
+        page = self.engine.search('survey_points', {}, 'elevation', 'ASC', per_page=5, cursor=cursor)
+
+        self.assertEqual([row['point_id'] for row in page['results']], keys[1:])
+        tail_query, tail_params = self.db.queries[1]
+        self.assertIn('AND sp.elevation IS NULL', tail_query)
+        self.assertNotIn('sp.point_id) >', tail_query)
+        self.assertEqual(tail_params[-1], 5)
+
+    def test_full_asc_page_skips_null_tail(self):
+        cursor = encode_cursor('elevation', 'ASC', 10.0, str(uuid.uuid4()))
+        self.db.rows = [{'point_id': str(uuid.uuid4()), 'elevation': 11.0 + i} for i in range(3)]
+
+        page = self.engine.search('survey_points', {}, 'elevation', 'ASC', per_page=2, cursor=cursor)
+
+        self.assertTrue(page['has_more'])
+        self.assertEqual(len(self.db.queries), 1)
+
+    def test_last_page(self):
+        self.db.rows = [{'point_id': str(uuid.uuid4()), 'created_at': datetime(2026, 1, 1)}]
+
+        page = self.engine.search('survey_points', {}, per_page=2)
+
+        self.assertFalse(page['has_more'])
+        self.assertIsNone(page['next_cursor'])
+
+
+class TestSearchHistoryLog(SearchTestCase):
+    """Test batched history writes."""
+
+    def test_rows_batched_until_flush(self):
+        log = SearchHistoryLog(flush_interval=None)
+
+        ids = [log.record('survey_points', {'search_text': 'P'}, 10, 3) for _ in range(3)]
+
+        self.assertEqual(self.db.batches, [])
+        self.assertEqual(log.flush(), 3)
+        self.assertEqual(log.flush(), 0)
+        self.assertEqual(len(self.db.batches), 1)
+        self.assertEqual([row[0] for row in self.db.batches[0]], ids)
+
+    def test_flush_when_queue_full(self):
+        log = SearchHistoryLog(flush_interval=None, max_pending=2)
+
+        log.record('projects', {}, 1, 1)
+        log.record('projects', {}, 1, 1)
+
+        self.assertEqual(len(self.db.batches), 1)
+        self.assertEqual(len(log), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
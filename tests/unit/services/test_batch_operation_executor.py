@@ -0,0 +1,210 @@
+"""
+Unit tests for the batch operation executor
+Tests compiling seeded template configs into SET clauses, chunked
+ANY(...) updates for immediate operations, chunked job execution with
+cancellation, rollback from recorded original values, and project data
+version bumps for every chunk that changes rows.
+"""
+
+import unittest
+import uuid
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+from services.batch_operation_executor import BatchOperationExecutor
+
+MODULE = 'services.batch_operation_executor'
+COLUMNS = ['structure_id', 'structure_number', 'structure_type', 'project_id',
+           'rim_elevation', 'is_active']
+
+
+class FakeDatabase:
+    """Answers the executor's statements from an in-memory job and item list."""
+
+    def __init__(self, entity_ids, status='running', existing=None):
+        self.job = {'job_id': 'job-1', 'operation_type': 'bulk_update',
+                    'entity_type': 'utility_structures',
+                    'operation_config': {'field': 'project_id', 'project_id': 'p2'},
+                    'status': status, 'total_items': len(entity_ids), 'successful_items': 0,
+                    'is_reversible': False, 'rolled_back_at': None, 'result_summary': None}
+        self.items = {entity_id: 'pending' for entity_id in sorted(entity_ids)}
+        self.existing = set(entity_ids if existing is None else existing)
+        self.statements = []
+        self.cancel_after = None
+        self.cursor = MagicMock()
+        self.cursor.execute.side_effect = self.execute
+
+    def execute(self, query, params=None):
+        self.statements.append(query)
+        text = ' '.join(query.split())
+        if 'information_schema.columns' in text:
+            self.cursor.fetchall.return_value = [{'column_name': c} for c in COLUMNS]
+        elif text.startswith('SELECT job_id, operation_type'):
+            self.cursor.fetchone.return_value = dict(self.job)
+        elif text.startswith('SELECT entity_id::text'):
+            if 'EXISTS' in text and self.job['status'] != 'running':
+                self.cursor.fetchall.return_value = []
+                return
+            after = params['after']
+            ids = [e for e, s in self.items.items()
+                   if s == params['status'] and (after is None or e > after)]
+            self.cursor.fetchall.return_value = [{'entity_id': e} for e in ids[:params['limit']]]
+        elif text.startswith('WITH targets AS'):
+            for entity_id in params['ids']:
+                if entity_id in self.existing:
+                    self.items[entity_id] = 'success'
+            self.cursor.fetchall.return_value = [
+                {'project_id': 'p1'} for e in params['ids'] if e in self.existing]
+            if self.cancel_after is not None:
+                self.cancel_after -= 1
+                if self.cancel_after == 0:
+                    self.job['status'] = 'cancelled'
+        elif text.startswith("UPDATE batch_operation_items SET status = 'failed'"):
+            for entity_id in params[2]:
+                if self.items[entity_id] == 'pending':
+                    self.items[entity_id] = 'failed'
+        elif text.startswith('UPDATE batch_operation_jobs SET status'):
+            successful = sum(1 for s in self.items.values() if s == 'success')
+            self.cursor.fetchone.return_value = {
+                'job_id': 'job-1', 'status': 'cancelled' if self.job['status'] == 'cancelled' else params[0],
+                'total_items': len(self.items), 'processed_items': successful,
+                'successful_items': successful, 'failed_items': 0, 'execution_time_ms': 1}
+        elif text.startswith('UPDATE utility_structures'):
+            self.cursor.fetchall.return_value = [
+                {'entity_id': e, 'project_id': 'p1'} for e in params['ids'] if e in self.existing]
+
+    @contextmanager
+    def get_cursor(self):
+        yield self.cursor
+
+
+def _ids(n):
+    return sorted(str(uuid.uuid4()) for _ in range(n))
+
+
+class ExecutorTestCase(unittest.TestCase):
+
+    def use_database(self, db):
+        self.db = db
+        patch(f'{MODULE}.get_cursor', db.get_cursor).start()
+        self.bump = patch(f'{MODULE}.bump_project_data_version').start()
+        self.addCleanup(patch.stopall)
+        self.executor = BatchOperationExecutor(chunk_size=4)
+
+
+class TestCompileOperation(ExecutorTestCase):
+    """Test template configs compile to SET clauses."""
+
+    def setUp(self):
+        self.use_database(FakeDatabase([]))
+
+    def compile(self, config, operation_type='bulk_update'):
+        return self.executor.compile_operation(operation_type, 'utility_structures', config)
+
+    def test_template_shapes(self):
+        self.assertEqual(self.compile({'field': 'project_id', 'project_id': 'p1'}),
+                         ('project_id = %(value)s', {'value': 'p1'}, ['project_id']))
+        self.assertEqual(self.compile({'field': 'is_active', 'value': False})[1], {'value': False})
+        self.assertEqual(self.compile({'field': 'rim_elevation', 'operation': 'add_offset', 'offset': 1.5}),
+                         ('rim_elevation = rim_elevation + %(offset)s', {'offset': 1.5}, ['rim_elevation']))
+        assignments, _, changed = self.compile({'fields': ['structure_number'], 'uppercase': True})
+        self.assertEqual(assignments, 'structure_number = UPPER(TRIM(structure_number))')
+        self.assertEqual(self.compile({}, 'bulk_delete')[0], 'is_active = FALSE')
+
+    def test_rejects_unknown_fields_and_missing_values(self):
+        for config in ({'field': 'name; DROP TABLE projects'}, {'field': 'structure_id', 'value': 'x'},
+                       {'field': 'project_id'}, {}):
+            with self.assertRaises(ValueError):
+                self.compile(config)
+        with self.assertRaises(ValueError):
+            self.executor.compile_operation('bulk_export', 'utility_structures', {})
+
+
+class TestApply(ExecutorTestCase):
+    """Test immediate operations."""
+
+    def test_one_statement_per_chunk(self):
+        ids = _ids(10)
+        self.use_database(FakeDatabase(ids, existing=ids[:9]))
+
+        results = self.executor.apply('bulk_update', 'utility_structures', ids + ['bad-id'],
+                                      {'field': 'project_id', 'value': 'p2'})
+
+        updates = [s for s in self.db.statements if 'UPDATE utility_structures' in s]
+        self.assertEqual(len(updates), 3)
+        self.assertIn('WHERE structure_id = ANY(%(ids)s::uuid[])', updates[0])
+        self.assertEqual(results['successful'], ids[:9])
+        self.assertEqual(results['failed'], [{'entity_id': 'bad-id', 'error': 'Invalid id'},
+                                             {'entity_id': ids[9], 'error': 'Not found'}])
+        self.assertEqual(results['total'], 11)
+        self.assertEqual(self.bump.call_count, 3)
+        self.bump.assert_called_with('p1', self.db.cursor)
+
+
+class TestRunJob(ExecutorTestCase):
+    """Test background job execution."""
+
+    def test_chunks_record_values_and_missing_rows_fail(self):
+        ids = _ids(10)
+        self.use_database(FakeDatabase(ids, existing=ids[1:]))
+        progress = []
+
+        summary = self.executor.run_job('job-1', progress_callback=progress.append)
+
+        self.assertEqual(summary['status'], 'completed')
+        self.assertEqual(summary['chunks'], 3)
+        self.assertEqual([p['processed'] for p in progress], [4, 8, 10])
+        self.assertEqual(self.db.items[ids[0]], 'failed')
+        self.assertEqual(sum(1 for s in self.db.items.values() if s == 'success'), 9)
+        update = next(s for s in self.db.statements if 'WITH targets AS' in s)
+        self.assertIn("jsonb_build_object('project_id', t.project_id) AS original_values", update)
+        self.assertIn('FOR UPDATE', update)
+        self.assertIn('RETURNING changed.project_id::text AS project_id', update)
+        self.assertEqual(self.bump.call_count, 3)
+        self.bump.assert_called_with('p1', self.db.cursor)
+
+    def test_cancel_stops_before_next_chunk(self):
+        ids = _ids(10)
+        self.use_database(FakeDatabase(ids))
+        self.db.cancel_after = 1
+
+        summary = self.executor.run_job('job-1')
+
+        self.assertEqual(summary['status'], 'cancelled')
+        self.assertEqual(list(self.db.items.values()).count('pending'), 6)
+
+    def test_requires_running_job(self):
+        self.use_database(FakeDatabase(_ids(2), status='pending'))
+
+        with self.assertRaises(ValueError):
+            self.executor.run_job('job-1')
+
+
+class TestRollback(ExecutorTestCase):
+    """Test restoring original values."""
+
+    def test_restores_recorded_columns(self):
+        ids = _ids(5)
+        self.use_database(FakeDatabase(ids, status='completed'))
+        self.db.job.update(is_reversible=True, successful_items=5,
+                           result_summary={'columns': ['project_id']})
+        for entity_id in ids:
+            self.db.items[entity_id] = 'success'
+
+        result = self.executor.rollback_job('job-1')
+
+        self.assertEqual(result['restored_items'], 5)
+        restore = next(s for s in self.db.statements if 'jsonb_populate_record' in s)
+        self.assertIn('SET project_id = r.project_id', restore)
+        self.assertEqual(self.bump.call_count, 2)
+        self.assertTrue(any('rolled_back_at = CURRENT_TIMESTAMP' in s for s in self.db.statements))
+
+    def test_not_reversible(self):
+        self.use_database(FakeDatabase(_ids(1), status='completed'))
+
+        with self.assertRaises(ValueError):
+            self.executor.rollback_job('job-1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+"""
+Unit tests for EmbeddingMatrix and the in-memory semantic search paths
+Tests vector parsing, blockwise similarity against a dense reference, top-k
+and threshold selection, clustering, and that the service loads vectors
+once instead of cross-joining embeddings in SQL.
+"""
+
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from services.embedding_matrix import EmbeddingMatrix, parse_vectors
+from services.semantic_search_service import SemanticSearchService
+
+
+def _clustered(groups=3, per_group=10, dims=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((groups, dims))
+    vectors = np.repeat(centres, per_group, axis=0) + 0.05 * rng.standard_normal((groups * per_group, dims))
+    ids = [f'e{i:03d}' for i in range(len(vectors))]
+    entities = [{'entity_type': f'type{i // per_group}', 'canonical_name': ids[i]} for i in range(len(ids))]
+    return EmbeddingMatrix(ids, vectors, entities, model_id='m1')
+
+
+class TestSimilarity(unittest.TestCase):
+    """Test blockwise similarity."""
+
+    def test_parse_vectors(self):
+        vectors = parse_vectors(['[1,2.5,-3]', '[0.5,0,1e-3]'])
+
+        self.assertEqual(vectors.shape, (2, 3))
+        self.assertEqual(vectors.dtype, np.float32)
+        self.assertAlmostEqual(float(vectors[1, 2]), 0.001)
+
+    def test_blocks_match_dense_cosine(self):
+        matrix = _clustered()
+        dense = matrix.vectors @ matrix.vectors.T
+
+        blocks = list(matrix.similarity_blocks(block_size=7))
+
+        self.assertEqual([start for start, _ in blocks], [0, 7, 14, 21, 28])
+        np.testing.assert_allclose(np.vstack([block for _, block in blocks]), dense, atol=1e-6)
+        np.testing.assert_allclose(np.diag(dense), 1.0, atol=1e-5)
+
+    def test_block_rows_bounded_by_bytes(self):
+        matrix = _clustered()
+
+        self.assertEqual(matrix.block_rows(block_bytes=30 * 4 * 5), 5)
+        self.assertEqual(matrix.block_rows(block_bytes=1), 1)
+
+    def test_full_and_top_k_rows(self):
+        matrix = _clustered()
+
+        full = matrix.similarity_rows(block_size=4)
+        top = matrix.similarity_rows(top_k=3, block_size=4)
+        above = matrix.similarity_rows(min_similarity=0.9)
+
+        self.assertEqual(len(full['e000']), 30)
+        self.assertEqual(full['e000']['e000'], 1.0)
+        self.assertEqual(full['e003']['e017'], full['e017']['e003'])
+        self.assertEqual(list(top['e000'])[0], 'e000')
+        self.assertTrue(set(top['e000']) <= {f'e{i:03d}' for i in range(10)})
+        self.assertEqual(set(above['e012']), {f'e{i:03d}' for i in range(10, 20)})
+
+
+class TestClustering(unittest.TestCase):
+    """Test clustering on the array."""
+
+    def _groups(self, matrix, labels):
+        return sorted(sorted(c['entity_ids']) for c in matrix.describe_clusters(labels))
+
+    def test_methods_recover_groups(self):
+        matrix = _clustered()
+        expected = [[f'e{i:03d}' for i in range(g * 10, g * 10 + 10)] for g in range(3)]
+
+        for method in ('kmeans', 'hierarchical', 'dbscan'):
+            with self.subTest(method=method):
+                labels = matrix.cluster(3, method)
+                self.assertEqual(self._groups(matrix, labels), expected)
+
+    def test_hierarchical_links_micro_clusters_when_large(self):
+        matrix = _clustered()
+
+        with patch('sklearn.cluster.AgglomerativeClustering.fit_predict',
+                   autospec=True, side_effect=lambda self, X: np.arange(len(X)) % 3) as fit:
+            labels = matrix.cluster(3, 'hierarchical', max_linkage_points=6)
+
+        self.assertEqual(len(fit.call_args[0][1]), 6)
+        self.assertEqual(len(labels), 30)
+
+    def test_describe_clusters(self):
+        matrix = _clustered()
+        cluster = matrix.describe_clusters(matrix.cluster(3, 'kmeans'))[0]
+
+        self.assertEqual(cluster['size'], 10)
+        self.assertIn(cluster['representative_entity_id'], cluster['entity_ids'])
+        self.assertEqual(len({matrix.entities[matrix.entity_ids.index(e)]['entity_type']
+                              for e in cluster['entity_ids']}), 1)
+        self.assertGreater(cluster['cohesion'], 0.95)
+
+
+class TestServiceInMemoryPaths(unittest.TestCase):
+    """Test SemanticSearchService uses one vector fetch."""
+
+    def setUp(self):
+        self.matrix = _clustered()
+        self.load = patch('services.semantic_search_service.EmbeddingMatrix.load',
+                          return_value=self.matrix).start()
+        self.query = patch('services.semantic_search_service.execute_query',
+                           return_value=[{'entity_id': 'e000'}]).start()
+        self.addCleanup(patch.stopall)
+
+    def test_similarity_matrix_shape(self):
+        result = SemanticSearchService().compute_entity_similarity_matrix(self.matrix.entity_ids)
+
+        self.load.assert_called_once()
+        self.assertNotIn('CROSS JOIN', self.query.call_args[0][0])
+        self.assertEqual(len(result['similarity_matrix']['e000']), 30)
+        self.assertEqual((result['size'], result['sparse']), (30, False))
+
+    def test_large_matrix_defaults_to_top_k(self):
+        service = SemanticSearchService()
+        service.max_dense_matrix, service.matrix_top_k = 10, 4
+
+        result = service.compute_entity_similarity_matrix(self.matrix.entity_ids)
+
+        self.assertTrue(result['sparse'])
+        self.assertEqual(len(result['similarity_matrix']['e000']), 4)
+
+    def test_cluster_entities(self):
+        result = SemanticSearchService().cluster_entities(self.matrix.entity_ids, 3, 'kmeans')
+
+        self.assertEqual(result['num_clusters'], 3)
+        self.assertEqual(sorted(c['representative_type'] for c in result['clusters']),
+                         ['type0', 'type1', 'type2'])
+
+    def test_unknown_cluster_method(self):
+        result = SemanticSearchService().cluster_entities(['e000'], method='spectral')
+
+        self.assertIn('error', result)
+        self.load.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
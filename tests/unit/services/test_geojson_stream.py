@@ -0,0 +1,115 @@
+"""
+Unit tests for streamed GeoJSON / NDJSON responses
+Tests named cursors with itersize, splicing geometry text unparsed,
+chunked FeatureCollection and NDJSON output, trailing members and
+surfacing query errors before the response starts.
+"""
+
+import json
+import unittest
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from services.geojson_stream import stream_features, feature_text, mimetype
+
+MODULE = 'services.geojson_stream'
+POINT = '{"type":"Point","coordinates":[-122.7,38.4]}'
+
+
+class FakeConnection:
+    """Serves canned (columns, rows) per query through named cursors."""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.cursors = []
+        self.fail = False
+        self.rollback = MagicMock()
+
+    def cursor(self, name=None):
+        columns, rows = self.results.pop(0)
+        cursor = MagicMock()
+        cursor.name = name
+        cursor.__enter__.return_value = cursor
+        cursor.__iter__.return_value = iter(rows)
+        cursor.description = [(column,) for column in columns]
+        if self.fail:
+            cursor.execute.side_effect = Exception('column "diameter" does not exist')
+        self.cursors.append(cursor)
+        return cursor
+
+    @contextmanager
+    def get_connection(self):
+        yield self
+
+
+class GeoJSONStreamTestCase(unittest.TestCase):
+
+    def use_results(self, *results):
+        self.conn = FakeConnection(results)
+        patch(f'{MODULE}.get_connection', self.conn.get_connection).start()
+        self.addCleanup(patch.stopall)
+
+
+class TestStreamFeatures(GeoJSONStreamTestCase):
+    """Test streamed output."""
+
+    def test_feature_collection(self):
+        rows = [(POINT, 'P1', Decimal('101.25'), None), (None, 'P2', Decimal('99.5'), datetime(2026, 1, 2))]
+        self.use_results((['geometry_json', 'point_number', 'elevation', 'created_at'], rows))
+
+        body = list(stream_features([('SELECT ...', {'a': 1}, None)], chunk_features=1,
+                                    trailer=lambda count: {'count': count}))
+        collection = json.loads(''.join(body))
+
+        self.assertEqual(len(body), 4)
+        self.assertEqual(collection['count'], 2)
+        self.assertEqual(collection['features'][0]['properties'], {'point_number': 'P1', 'elevation': 101.25})
+        self.assertEqual(collection['features'][1]['properties']['created_at'], '2026-01-02T00:00:00')
+        self.assertIsNone(collection['features'][1]['geometry'])
+        self.assertIn('"geometry":' + POINT, body[1])
+        cursor = self.conn.cursors[0]
+        self.assertTrue(cursor.name.startswith('geojson_'))
+        self.assertEqual(cursor.itersize, 2000)
+        cursor.execute.assert_called_once_with('SELECT ...', {'a': 1})
+        self.conn.rollback.assert_called_once()
+
+    def test_ndjson_across_sources(self):
+        self.use_results((['id', 'geometry_json'], [('a', POINT)]),
+                         (['id', 'geometry_json'], [('b', POINT), ('c', POINT)]))
+        label = lambda properties: {**properties, 'color': '#00ffff'}
+
+        body = ''.join(stream_features([('q1', None, None), ('q2', None, label)], format='ndjson'))
+        lines = [json.loads(line) for line in body.splitlines()]
+
+        self.assertEqual([line['properties']['id'] for line in lines], ['a', 'b', 'c'])
+        self.assertEqual(lines[2]['properties']['color'], '#00ffff')
+        self.assertEqual(mimetype('ndjson'), 'application/x-ndjson')
+
+    def test_empty_result(self):
+        self.use_results((['geometry_json'], []))
+
+        collection = json.loads(''.join(stream_features([('q', None, None)])))
+
+        self.assertEqual(collection, {'type': 'FeatureCollection', 'features': []})
+
+    def test_query_error_raised_before_streaming(self):
+        self.use_results((['geometry_json'], []))
+        self.conn.fail = True
+
+        with self.assertRaises(Exception):
+            stream_features([('q', None, None)])
+        self.conn.rollback.assert_called_once()
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            stream_features([], format='csv')
+
+    def test_feature_text(self):
+        self.assertEqual(feature_text(POINT, {'id': 1}),
+                         '{"type":"Feature","geometry":' + POINT + ',"properties":{"id":1}}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Unit tests for the geometry generalization service
+Tests level selection by zoom and resolution, coordinate precision, the
+serving SQL, and incremental refresh statements.
+"""
+
+import unittest
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+from psycopg2 import errors
+
+from services.geometry_generalization_service import GeometryGeneralizationService
+
+MODULE = 'services.geometry_generalization_service'
+
+
+class TestLevelSelection(unittest.TestCase):
+    """Test choosing a generalization level."""
+
+    def setUp(self):
+        self.service = GeometryGeneralizationService()
+
+    def test_level_for_resolution(self):
+        self.assertIsNone(self.service.level_for_resolution(1.5))
+        self.assertEqual(self.service.level_for_resolution(2.0), 1)
+        self.assertEqual(self.service.level_for_resolution(20), 2)
+        self.assertEqual(self.service.level_for_resolution(5000), 4)
+
+    def test_level_for_zoom(self):
+        self.assertIsNone(self.service.level_for_zoom(19))
+        self.assertEqual(self.service.level_for_zoom(16), 1)
+        self.assertEqual(self.service.level_for_zoom(12), 3)
+        self.assertEqual(self.service.level_for_zoom(10), 4)
+
+    def test_coordinate_digits(self):
+        self.assertEqual(self.service.coordinate_digits(0.5), 7)
+        self.assertEqual(self.service.coordinate_digits(100), 5)
+        self.assertLess(self.service.coordinate_digits(100), self.service.coordinate_digits(3))
+
+
+class TestGeometrySql(unittest.TestCase):
+    """Test the serving SQL."""
+
+    def setUp(self):
+        self.service = GeometryGeneralizationService()
+
+    def test_generalized_table(self):
+        join, geometry = self.service.geometry_sql('parcels', 't', 3)
+
+        self.assertIn("gg.source_table = 'parcels'", join)
+        self.assertIn('gg.source_id = t.parcel_id AND gg.level = 3', join)
+        self.assertEqual(geometry, 'COALESCE(gg.geometry, t.boundary_geometry)')
+
+    def test_full_resolution_and_other_tables(self):
+        self.assertEqual(self.service.geometry_sql('drawing_entities', 'de', None), ('', 'de.geometry'))
+        self.assertEqual(self.service.geometry_sql('survey_points', 't', 2), ('', 't.geometry'))
+
+    def test_table_without_generalized_rows_uses_its_geometry_column(self):
+        for level in (None, 2):
+            self.assertEqual(
+                self.service.geometry_sql('horizontal_alignments', 't', level, 'alignment_geometry'),
+                ('', 't.alignment_geometry'))
+        self.assertEqual(self.service.geometry_sql('utility_structures', 't', 3, 'rim_geometry'),
+                         ('', 't.rim_geometry'))
+
+    def test_min_size_keeps_points(self):
+        clause = self.service.min_size_sql('t.geometry')
+
+        self.assertTrue(clause.startswith('(ST_Dimension(t.geometry) = 0 OR'))
+        self.assertIn('>= %(min_size)s', clause)
+
+
+class TestRefresh(unittest.TestCase):
+    """Test incremental refresh."""
+
+    def setUp(self):
+        self.service = GeometryGeneralizationService()
+        self.cursor = MagicMock()
+        self.cursor.rowcount = 4
+
+    def test_project_refresh_in_callers_transaction(self):
+        summary = self.service.refresh('p1', tables=['drawing_entities', 'utility_structures'],
+                                       cursor=self.cursor)
+
+        self.assertEqual(summary, {'drawing_entities': {'removed': 4, 'added': 4}})
+        (delete, params), _ = self.cursor.execute.call_args_list[1]
+        (insert, _), _ = self.cursor.execute.call_args_list[2]
+        self.assertIn('md5(ST_AsEWKB(t.geometry)) = g.source_hash', delete)
+        self.assertIn('AND g.project_id = %(project_id)s', delete)
+        self.assertIn('ST_SimplifyPreserveTopology(', insert)
+        self.assertIn('ST_SnapToGrid(ST_Force2D(t.geometry), lv.tolerance / 4)', insert)
+        self.assertIn('(1, 2.0), (2, 8.0), (3, 32.0), (4, 128.0)', insert)
+        self.assertIn('AND t.project_id = %(project_id)s', insert)
+        self.assertEqual(params['project_id'], 'p1')
+
+    def test_refresh_all_on_own_connection(self):
+        @contextmanager
+        def get_cursor(dict_cursor=True):
+            yield self.cursor
+
+        with patch(f'{MODULE}.get_cursor', get_cursor):
+            summary = self.service.refresh()
+
+        self.assertEqual(set(summary), {'drawing_entities', 'parcels', 'utility_lines', 'surface_features'})
+        for call in self.cursor.execute.call_args_list:
+            self.assertNotIn('%(project_id)s', call.args[0])
+
+    def test_missing_table_leaves_callers_transaction_usable(self):
+        def execute(query, params=None):
+            if query.lstrip().startswith('DELETE FROM generalized_geometries'):
+                raise errors.UndefinedTable('relation "generalized_geometries" does not exist')
+        self.cursor.execute.side_effect = execute
+
+        summary = self.service.refresh('p1', cursor=self.cursor)
+
+        self.assertEqual(summary, {})
+        self.assertEqual(self.cursor.execute.call_args.args,
+                         ("ROLLBACK TO SAVEPOINT generalized_geometries",))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+"""
+Unit tests for GraphStore and its use by GraphAnalyticsService
+Tests per-project loading, incremental refresh and CSR-backed analytics.
+"""
+
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import networkx as nx
+
+from services.graph_store import GraphStore, ProjectGraph, graph_to_csr, pagerank_csr
+from services.graph_analytics_service import GraphAnalyticsService
+
+
+class FakeRelationshipTable:
+    """In-memory entity_relationships answering the store's queries."""
+
+    def __init__(self):
+        self.rows = {}
+        self.queries = []
+        self.clock = datetime(2025, 1, 1)
+
+    def upsert(self, relationship_id, subject, obj, project='p1', confidence=0.9,
+               subject_type='layer', object_type='layer'):
+        self.clock += timedelta(seconds=1)
+        self.rows[relationship_id] = {
+            'relationship_id': relationship_id, 'subject_entity_id': subject,
+            'object_entity_id': obj, 'relationship_type': 'connects',
+            'confidence_score': confidence, 'attributes': {'project_id': project},
+            'updated_at': self.clock, 'subject_entity_type': subject_type,
+            'object_entity_type': object_type
+        }
+
+    def execute_query(self, query, params):
+        self.queries.append(query)
+        project_id = params[0]
+        rows = [row for row in self.rows.values()
+                if project_id is None or row['attributes']['project_id'] == project_id]
+        if 'updated_at >=' in query:
+            rows = [row for row in rows if row['updated_at'] >= params[2]]
+        if query.strip().startswith('SELECT er.relationship_id FROM'):
+            return [{'relationship_id': row['relationship_id']} for row in rows]
+        return [dict(row) for row in rows]
+
+
+class TestGraphStore(unittest.TestCase):
+    """Test loading and incremental refresh."""
+
+    def setUp(self):
+        self.table = FakeRelationshipTable()
+        self.table.upsert('r1', 'a', 'b')
+        self.table.upsert('r2', 'b', 'c')
+        self.table.upsert('r3', 'x', 'y', project='p2')
+        self.table.upsert('r4', 'c', 'd', confidence=0.1)
+        patcher = patch('services.graph_store.execute_query', side_effect=self.table.execute_query)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = GraphStore(refresh_interval=0)
+
+    def test_project_scope_and_threshold(self):
+        graph = self.store.get('p1').graph
+
+        self.assertEqual(set(graph.edges()), {('a', 'b'), ('b', 'c')})
+        self.assertEqual(len(self.store.get('p1')), 3)
+        self.assertEqual(self.store.get(None).graph.number_of_edges(), 3)
+
+    def test_refresh_applies_inserts_updates_and_deletes(self):
+        project_graph = self.store.get('p1')
+        self.table.upsert('r5', 'c', 'e')
+        self.table.upsert('r4', 'c', 'd', confidence=0.8)
+        del self.table.rows['r1']
+
+        refreshed = self.store.get('p1')
+
+        self.assertIs(refreshed, project_graph)
+        self.assertEqual(set(refreshed.graph.edges()), {('b', 'c'), ('c', 'e'), ('c', 'd')})
+        self.assertNotIn('a', refreshed.graph)
+
+    def test_refresh_reads_only_changed_rows(self):
+        self.store.get('p1')
+        self.table.queries.clear()
+
+        self.store.get('p1')
+
+        self.assertEqual(len(self.table.queries), 2)
+        self.assertIn('updated_at >=', self.table.queries[0])
+        self.assertIn('SELECT er.relationship_id FROM', self.table.queries[1])
+
+    def test_refresh_sees_delete_when_count_is_unchanged(self):
+        self.store.get('p1')
+        del self.table.rows['r1']
+        self.table.upsert('r5', 'c', 'e')
+
+        graph = self.store.get('p1').graph
+
+        self.assertEqual(set(graph.edges()), {('b', 'c'), ('c', 'e')})
+
+    def test_refresh_interval_skips_queries(self):
+        store = GraphStore(refresh_interval=3600)
+        store.get('p1')
+        self.table.queries.clear()
+
+        store.get('p1')
+
+        self.assertEqual(self.table.queries, [])
+
+    def test_invalidate_forces_reload(self):
+        first = self.store.get('p1')
+        self.store.invalidate('p1')
+
+        self.assertIsNot(self.store.get('p1'), first)
+
+
+class TestProjectGraph(unittest.TestCase):
+    """Test in-place edge bookkeeping."""
+
+    def _row(self, relationship_id, subject, obj, relationship_type='connects'):
+        return {'relationship_id': relationship_id, 'subject_entity_id': subject,
+                'object_entity_id': obj, 'relationship_type': relationship_type,
+                'confidence_score': 1.0, 'attributes': {}}
+
+    def test_parallel_relationships_keep_edge_until_last_removed(self):
+        graph = ProjectGraph('p1', 0.3)
+        graph.apply([self._row('r1', 'a', 'b', 'feeds'), self._row('r2', 'a', 'b', 'drains')])
+
+        graph.apply(deleted_ids=['r2'])
+
+        self.assertEqual(graph.graph.edges['a', 'b']['relationship_type'], 'feeds')
+
+        graph.apply(deleted_ids=['r1'])
+
+        self.assertEqual(graph.graph.number_of_nodes(), 0)
+
+    def test_derived_caches_follow_version(self):
+        graph = ProjectGraph('p1', 0.3)
+        graph.apply([self._row('r1', 'a', 'b')])
+        nodes, matrix = graph.csr()
+
+        self.assertIs(graph.csr()[1], matrix)
+
+        graph.apply([self._row('r2', 'b', 'c')])
+
+        self.assertEqual(graph.csr()[1].shape, (3, 3))
+
+
+class TestCSRAlgorithms(unittest.TestCase):
+    """Test array-backed algorithms against NetworkX."""
+
+    def test_pagerank_matches_networkx(self):
+        G = nx.gnp_random_graph(200, 0.03, seed=5, directed=True)
+        G.add_node(500)  # isolated/dangling node
+
+        nodes, A = graph_to_csr(G)
+        scores = pagerank_csr(nodes, A)
+        expected = nx.pagerank(G, alpha=0.85, max_iter=100)
+
+        for node, score in expected.items():
+            self.assertAlmostEqual(scores[node], score, places=9)
+
+
+class TestGraphAnalyticsService(unittest.TestCase):
+    """Test analytics reading from the shared store."""
+
+    def setUp(self):
+        self.table = FakeRelationshipTable()
+        self.table.upsert('r1', 'a', 'b', object_type='block')
+        self.table.upsert('r2', 'b', 'c', subject_type='block')
+        self.table.upsert('r3', 'c', 'a')
+        self.table.upsert('r4', 'x', 'y', project='p2')
+        patcher = patch('services.graph_store.execute_query', side_effect=self.table.execute_query)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = GraphAnalyticsService(store=GraphStore(refresh_interval=3600))
+
+    def test_analytics_share_one_load(self):
+        self.service.compute_pagerank('p1', use_cache=False)
+        self.service.identify_bridges('p1')
+        self.service.identify_articulation_points('p1')
+        self.service.compute_centrality_measures('p1', use_cache=False)
+
+        self.assertEqual(len(self.table.queries), 1)
+
+    def test_degree_from_csr(self):
+        result = self.service.compute_centrality_measures('p1', ['degree'], use_cache=False)
+
+        self.assertEqual(result['degree'], {'a': 2, 'b': 2, 'c': 2})
+        self.assertEqual(result['in_degree']['a'], 1)
+
+    def test_entity_type_filter(self):
+        scores = self.service.compute_pagerank('p1', entity_type='layer', use_cache=False)
+
+        self.assertEqual(set(scores), {'a', 'c'})
+
+    def test_degree_counts_entity_type_filter(self):
+        in_degree, out_degree = self.service._degree_counts('p1', entity_type='layer')
+
+        self.assertEqual(in_degree, {'a': 1, 'c': 0})
+        self.assertEqual(out_degree, {'a': 0, 'c': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,235 @@
+"""
+Unit tests for the streaming map export engine
+Tests fanning one feature stream out to concurrent writers, per-format
+timings and failures, incremental zipping, the named-cursor reader and the
+Shapefile, GeoPackage, FlatGeobuf, DXF, KML and PNG writers.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import zipfile
+import xml.etree.ElementTree as ET
+from unittest.mock import MagicMock
+
+import ezdxf
+import fiona
+
+from map_export_service import MapExportService
+from services.map_export_engine import (
+    DxfWriter, ExportFeature, FlatGeobufWriter, FormatWriter, GeoPackageWriter,
+    KmlWriter, MapExportEngine, PngWriter, ShapefileWriter, iter_drawing_entities
+)
+
+KML_NS = '{http://www.opengis.net/kml/2.2}'
+
+
+def make_features(count=10, layers=('C-ROAD', 'V-TOPO')):
+    """Features ordered by layer, cycling point / 3D line / polygon."""
+    features = []
+    per_layer = count // len(layers)
+    for layer in layers:
+        for i in range(per_layer):
+            x, y = 6000000 + i * 10, 2000000 + i * 10
+            if i % 3 == 0:
+                geometry = {'type': 'Point', 'coordinates': [x, y]}
+            elif i % 3 == 1:
+                geometry = {'type': 'LineString', 'coordinates': [[x, y, 5.0], [x + 5, y + 5, 6.0]]}
+            else:
+                geometry = {'type': 'Polygon', 'coordinates': [[[x, y], [x + 5, y], [x + 5, y + 5], [x, y]]]}
+            features.append(ExportFeature(
+                layer=layer,
+                geometry=geometry,
+                properties={'entity_id': f'{layer}-{i}', 'entity_type': 'LINE', 'color_aci': 3},
+                geometry_wgs84={'type': 'Point', 'coordinates': [-122.7, 38.4]},
+            ))
+    return features
+
+
+class RecordingWriter(FormatWriter):
+    """Writes a text file listing entity ids; records the threads it ran on."""
+
+    def __init__(self, job_dir, name, fail_at=None):
+        super().__init__(job_dir)
+        self.name = name
+        self.fail_at = fail_at
+        self.ids = []
+        self.threads = set()
+        self.aborted = False
+
+    def write_batch(self, features):
+        self.threads.add(threading.current_thread().name)
+        if self.fail_at is not None and len(self.ids) >= self.fail_at:
+            raise IOError('disk full')
+        self.ids.extend(feature.properties['entity_id'] for feature in features)
+
+    def close(self):
+        with open(os.path.join(self.job_dir, self.name), 'w') as f:
+            f.write('\n'.join(self.ids))
+        return [self.name]
+
+    def abort(self):
+        self.aborted = True
+
+
+class TestMapExportEngine(unittest.TestCase):
+    """Test fan-out, timings and zipping."""
+
+    def setUp(self):
+        self.job_dir = tempfile.mkdtemp()
+        self.zip_path = os.path.join(self.job_dir, 'export.zip')
+
+    def tearDown(self):
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+
+    def test_every_writer_gets_every_feature_on_its_own_thread(self):
+        writers = {'a': RecordingWriter(self.job_dir, 'a.txt'), 'b': RecordingWriter(self.job_dir, 'b.txt')}
+        progress = []
+
+        summary = MapExportEngine(batch_size=3, queue_batches=1).run(
+            make_features(10), writers, self.zip_path, progress_callback=progress.append)
+
+        self.assertEqual(summary['feature_count'], 10)
+        self.assertEqual(writers['a'].ids, writers['b'].ids)
+        self.assertEqual(len(writers['a'].ids), 10)
+        self.assertEqual(writers['a'].threads, {'map-export-a'})
+        self.assertEqual(progress[-1], {'features': 10})
+        self.assertEqual(summary['timings']['read']['features'], 10)
+        self.assertEqual(summary['timings']['a']['features'], 10)
+        self.assertIsNone(summary['timings']['a']['error'])
+        self.assertEqual(summary['timings']['a']['files'], ['a.txt'])
+        self.assertGreater(summary['timings']['a']['bytes'], 0)
+
+    def test_written_files_are_moved_into_zip(self):
+        writers = {'a': RecordingWriter(self.job_dir, 'a.txt'), 'b': RecordingWriter(self.job_dir, 'b.txt')}
+
+        summary = MapExportEngine(batch_size=4).run(make_features(6), writers, self.zip_path)
+
+        with zipfile.ZipFile(self.zip_path) as archive:
+            self.assertEqual(sorted(archive.namelist()), ['a.txt', 'b.txt'])
+        self.assertEqual(sorted(os.listdir(self.job_dir)), ['export.zip'])
+        self.assertEqual(sorted(summary['files']), ['a.txt', 'b.txt'])
+
+    def test_failing_writer_does_not_stop_others(self):
+        writers = {'bad': RecordingWriter(self.job_dir, 'bad.txt', fail_at=2),
+                   'good': RecordingWriter(self.job_dir, 'good.txt')}
+
+        summary = MapExportEngine(batch_size=2, queue_batches=1).run(make_features(20), writers, self.zip_path)
+
+        self.assertEqual(summary['timings']['bad']['error'], 'disk full')
+        self.assertEqual(summary['timings']['bad']['files'], [])
+        self.assertTrue(writers['bad'].aborted)
+        self.assertEqual(len(writers['good'].ids), 20)
+        self.assertEqual(summary['files'], ['good.txt'])
+
+    def test_reader_error_aborts_writers(self):
+        def features():
+            yield from make_features(4)
+            raise RuntimeError('connection lost')
+
+        writers = {'a': RecordingWriter(self.job_dir, 'a.txt')}
+
+        with self.assertRaises(RuntimeError):
+            MapExportEngine(batch_size=2).run(features(), writers, self.zip_path)
+        self.assertTrue(writers['a'].aborted)
+        self.assertFalse(os.path.exists(self.zip_path))
+
+
+class TestDrawingEntityReader(unittest.TestCase):
+    """Test the named-cursor reader."""
+
+    def test_named_cursor_rows_become_features(self):
+        conn = MagicMock()
+        cursor = conn.cursor.return_value.__enter__.return_value
+        cursor.__iter__.return_value = iter([
+            ('C-ROAD', 'e1', 'LINE', 7, 'CONTINUOUS', 25,
+             '{"type":"LineString","coordinates":[[1,2],[3,4]]}', '{"type":"LineString","coordinates":[[0,0],[1,1]]}'),
+            ('C-ROAD', 'e2', 'POINT', None, None, None, None, None),
+        ])
+
+        features = list(iter_drawing_entities(conn, (1, 2, 3, 4), 2226, project_id='p1', wgs84=True,
+                                              itersize=500))
+
+        self.assertEqual(len(features), 1)
+        self.assertEqual(features[0].layer, 'C-ROAD')
+        self.assertEqual(features[0].geometry['type'], 'LineString')
+        self.assertEqual(features[0].properties['color_aci'], 7)
+        self.assertEqual(features[0].geometry_wgs84['coordinates'], [[0, 0], [1, 1]])
+        self.assertTrue(conn.cursor.call_args.kwargs['name'].startswith('map_export_'))
+        self.assertEqual(cursor.itersize, 500)
+        query, params = cursor.execute.call_args.args
+        self.assertIn('AND e.project_id = %(project_id)s', query)
+        self.assertIn('ST_Transform(ST_Force2D(e.geometry), 4326)', query)
+        self.assertEqual(params['project_id'], 'p1')
+        conn.rollback.assert_called_once()
+
+
+class TestFormatWriters(unittest.TestCase):
+    """Test the real format writers on a small stream."""
+
+    def setUp(self):
+        self.job_dir = tempfile.mkdtemp()
+        self.features = make_features(12)
+
+    def tearDown(self):
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+
+    def write(self, writer):
+        writer.write_batch(self.features[:5])
+        writer.write_batch(self.features[5:])
+        return writer.close()
+
+    def test_shapefile_per_layer_and_geometry_family(self):
+        files = self.write(ShapefileWriter(self.job_dir))
+
+        shapefiles = sorted(name for name in files if name.endswith('.shp'))
+        self.assertEqual(shapefiles, ['C-ROAD.shp', 'C-ROAD_line.shp', 'C-ROAD_polygon.shp',
+                                      'V-TOPO.shp', 'V-TOPO_line.shp', 'V-TOPO_polygon.shp'])
+        with fiona.open(os.path.join(self.job_dir, 'C-ROAD_line.shp')) as lines:
+            self.assertEqual(lines.schema['geometry'], '3D LineString')
+            record = next(iter(lines))
+            # Field name truncated by the driver, value kept
+            self.assertEqual(record['properties']['entity_typ'], 'LINE')
+
+    def test_geopackage_and_flatgeobuf(self):
+        self.assertEqual(self.write(GeoPackageWriter(self.job_dir)), ['export.gpkg'])
+        self.assertEqual(fiona.listlayers(os.path.join(self.job_dir, 'export.gpkg')), ['C-ROAD', 'V-TOPO'])
+
+        files = self.write(FlatGeobufWriter(self.job_dir))
+        self.assertEqual(files, ['C-ROAD.fgb', 'V-TOPO.fgb'])
+        with fiona.open(os.path.join(self.job_dir, 'V-TOPO.fgb')) as collection:
+            self.assertEqual(len(collection), 6)
+
+    def test_dxf_stream(self):
+        self.assertEqual(self.write(DxfWriter(self.job_dir)), ['export.dxf'])
+
+        doc = ezdxf.readfile(os.path.join(self.job_dir, 'export.dxf'))
+        entities = list(doc.modelspace())
+        self.assertEqual(len(entities), 12)
+        self.assertEqual({entity.dxf.layer for entity in entities}, {'C-ROAD', 'V-TOPO'})
+        self.assertEqual({entity.dxf.color for entity in entities}, {3})
+
+    def test_kml_folders_per_layer(self):
+        self.assertEqual(self.write(KmlWriter(self.job_dir)), ['export.kml'])
+
+        root = ET.parse(os.path.join(self.job_dir, 'export.kml')).getroot()
+        folders = root.findall(f'{KML_NS}Document/{KML_NS}Folder')
+        self.assertEqual([folder.find(f'{KML_NS}name').text for folder in folders], ['C-ROAD', 'V-TOPO'])
+        self.assertEqual(len(root.findall(f'.//{KML_NS}Placemark')), 12)
+
+    def test_png_canvas(self):
+        service = MapExportService(export_dir=self.job_dir)
+        bbox = {'minx': 6000000, 'miny': 2000000, 'maxx': 6000100, 'maxy': 2000100}
+
+        files = self.write(PngWriter(self.job_dir, 2226, service, bbox, width=600, height=450))
+
+        self.assertEqual(files, ['map.png'])
+        from PIL import Image
+        with Image.open(os.path.join(self.job_dir, 'map.png')) as image:
+            self.assertEqual(image.size, (600, 450))
+
+
+if __name__ == '__main__':
+    unittest.main()
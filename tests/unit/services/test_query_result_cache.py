@@ -0,0 +1,206 @@
+"""
+Unit tests for the two-tier GraphRAG query result cache
+Tests local hits without database round trips, shared-tier fallback,
+batched hit-count flushes, entity-driven invalidation and polling of
+invalidations made by other workers.
+"""
+
+import unittest
+import json
+from contextlib import contextmanager
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from services.query_result_cache import QueryResultCache, normalize_query, touched_entity_ids
+from services.graphrag_service import GraphRAGService
+
+MODULE = 'services.query_result_cache'
+
+
+def _result(*entity_ids, relationships=()):
+    return {'entities': [{'entity_id': e} for e in entity_ids],
+            'relationships': list(relationships),
+            'metadata': {'query_type': 'hybrid_search'}}
+
+
+class FakeCacheTable:
+    """ai_query_cache rows keyed by query_hash, answering the cache's statements."""
+
+    def __init__(self):
+        self.rows = {}
+        self.statements = []
+        self.flushed = []
+        self.cursor = MagicMock()
+        self.cursor.execute.side_effect = self.execute
+
+    def execute(self, query, params=None):
+        self.statements.append(query)
+        if query.lstrip().startswith('SELECT result_json'):
+            row = self.rows.get(params[0])
+            self.cursor.fetchone.return_value = (
+                {'result_json': row['result_json'], 'entity_ids': row['entity_ids'], 'expires_in': 600}
+                if row and row['is_valid'] else None)
+        elif 'INSERT INTO ai_query_cache' in query:
+            self.rows[params[0]] = {'result_json': json.loads(params[3]), 'entity_ids': params[4],
+                                    'is_valid': True, 'invalidated_at': None}
+        elif query.lstrip().startswith('UPDATE ai_query_cache'):
+            entity_ids = set(params[1]) if len(params) > 1 else None
+            count = 0
+            for row in self.rows.values():
+                if row['is_valid'] and (entity_ids is None or entity_ids & set(row['entity_ids'])):
+                    row.update(is_valid=False, invalidated_at=datetime.now())
+                    count += 1
+            self.cursor.rowcount = count
+        elif 'invalidated_at >' in query:
+            self.cursor.fetchall.return_value = [
+                {'query_hash': key, 'invalidated_at': row['invalidated_at']}
+                for key, row in self.rows.items()
+                if row['invalidated_at'] and (params[0] is None or row['invalidated_at'] > params[0])]
+
+    def execute_values(self, cursor, query, rows, template=None, page_size=100):
+        self.flushed.append(rows)
+
+    @contextmanager
+    def get_cursor(self):
+        yield self.cursor
+
+
+class CacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.table = FakeCacheTable()
+        patch(f'{MODULE}.get_cursor', self.table.get_cursor).start()
+        patch(f'{MODULE}.execute_values', self.table.execute_values).start()
+        self.addCleanup(patch.stopall)
+        self.cache = QueryResultCache(max_entries=10, flush_interval=None)
+
+
+class TestTwoTierLookup(CacheTestCase):
+    """Test local and shared tier hits."""
+
+    def test_local_hit_skips_database(self):
+        self.cache.put('Show  Storm Pipes', 100, 'hybrid_search', _result('e1'), 12.5)
+        statements = len(self.table.statements)
+
+        cached = self.cache.get('show storm pipes', 100)
+
+        self.assertEqual(len(self.table.statements), statements)
+        self.assertEqual(cached['metadata']['cache_tier'], 'local')
+        self.assertTrue(cached['metadata']['from_cache'])
+        self.assertEqual(self.cache.get('show storm pipes', 100)['metadata']['cache_tier'], 'local')
+
+    def test_shared_tier_fills_local(self):
+        self.cache.put('storm pipes', 100, 'hybrid_search', _result('e1'), 1.0)
+        self.cache.clear()
+
+        first = self.cache.get('storm pipes', 100)
+        second = self.cache.get('storm pipes', 100)
+
+        self.assertEqual(first['metadata']['cache_tier'], 'shared')
+        self.assertEqual(second['metadata']['cache_tier'], 'local')
+
+    def test_key_includes_max_results(self):
+        self.cache.put('storm pipes', 10, 'hybrid_search', _result('e1'), 1.0)
+
+        self.assertIsNone(self.cache.get('storm pipes', 100))
+
+    def test_cached_entry_not_mutated_by_callers(self):
+        self.cache.put('q', 100, 'hybrid_search', _result('e1'), 1.0)
+
+        self.cache.get('q', 100)['metadata']['query_type'] = 'changed'
+
+        self.assertEqual(self.cache.get('q', 100)['metadata']['query_type'], 'hybrid_search')
+
+    def test_lru_eviction_updates_entity_index(self):
+        for i in range(12):
+            self.cache.put(f'q{i}', 100, 'hybrid_search', _result(f'e{i}'), 1.0)
+
+        self.assertEqual(len(self.cache), 10)
+        self.assertNotIn('e0', self.cache._by_entity)
+
+    def test_helpers(self):
+        self.assertEqual(normalize_query('  Find\tPipes  NEAR mh-1 '), 'find pipes near mh-1')
+        result = _result('e1', relationships=[{'subject_entity_id': 'e2', 'object_entity_id': 'e3'}])
+        self.assertEqual(touched_entity_ids(result), ['e1', 'e2', 'e3'])
+
+
+class TestHitFlush(CacheTestCase):
+    """Test batched hit counters."""
+
+    def test_hits_flushed_in_one_batch(self):
+        self.cache.put('a', 100, 'hybrid_search', _result('e1'), 1.0)
+        self.cache.put('b', 100, 'hybrid_search', _result('e2'), 1.0)
+        for _ in range(3):
+            self.cache.get('a', 100)
+        self.cache.get('b', 100)
+        self.assertFalse(any('hit_count' in s for s in self.table.statements))
+
+        self.cache.flush()
+        self.cache.flush()
+
+        self.assertEqual(len(self.table.flushed), 1)
+        hits = {key: count for key, count, _ in self.table.flushed[0]}
+        self.assertEqual(hits, {self.cache.key('a', 100): 3, self.cache.key('b', 100): 1})
+
+
+    def test_flusher_starts_on_first_store(self):
+        cache = QueryResultCache(flush_interval=60)
+        with patch(f'{MODULE}.atexit.register'):
+            cache.put('a', 100, 'hybrid_search', _result('e1'), 1.0)
+        self.addCleanup(cache._flusher.join)
+        self.addCleanup(cache.close)
+
+        self.assertTrue(cache._flusher.is_alive())
+        self.assertFalse(cache._pending_hits)
+
+
+class TestInvalidation(CacheTestCase):
+    """Test entity-driven invalidation."""
+
+    def test_only_results_with_entity_are_dropped(self):
+        self.cache.put('a', 100, 'hybrid_search', _result('e1', 'e2'), 1.0)
+        self.cache.put('b', 100, 'hybrid_search', _result('e3'), 1.0)
+
+        count = self.cache.invalidate(['e2'], reason='entity_updated')
+
+        self.assertEqual(count, 1)
+        self.assertIsNone(self.cache.get('a', 100))
+        self.assertEqual(self.cache.get('b', 100)['metadata']['cache_tier'], 'local')
+        update = next(s for s in self.table.statements if 'invalidation_reason = %s' in s)
+        self.assertIn('entity_ids && %s::uuid[] OR entity_ids IS NULL', update)
+
+    def test_invalidate_all(self):
+        self.cache.put('a', 100, 'hybrid_search', _result('e1'), 1.0)
+
+        self.assertEqual(self.cache.invalidate(), 1)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_flush_drops_entries_invalidated_elsewhere(self):
+        self.cache.put('a', 100, 'hybrid_search', _result('e1'), 1.0)
+        other_worker = QueryResultCache(flush_interval=None)
+        other_worker.invalidate(['e1'])
+        self.assertEqual(len(self.cache), 1)
+
+        self.cache.flush()
+
+        self.assertEqual(len(self.cache), 0)
+        self.assertIsNotNone(self.cache._invalidations_seen)
+
+
+class TestGraphRAGServiceCache(CacheTestCase):
+    """Test GraphRAGService reads and writes through the cache."""
+
+    def test_execute_query_served_from_local_tier(self):
+        service = GraphRAGService(cache=self.cache)
+        with patch.object(service, '_execute_hybrid_search', return_value=_result('e1')) as search, \
+                patch.object(service, '_log_query'):
+            service.execute_query('something vague')
+            cached = service.execute_query('Something  vague')
+
+        search.assert_called_once()
+        self.assertEqual(cached['metadata']['cache_tier'], 'local')
+        self.assertEqual(service.invalidate_cache(['e1']), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+"""
+Unit tests for RelationshipGraphService bulk edge writes
+Tests up-front batch validation, paged upserts, ordering of returned edges
+and batch metrics.
+"""
+
+import unittest
+import uuid
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+from services.relationship_graph_service import RelationshipGraphService
+
+PROJECT = str(uuid.uuid4())
+
+
+class FakeEdgeTable:
+    """relationship_edges keyed by unique_directed_edge, answering EDGE_UPSERT_QUERY."""
+
+    def __init__(self):
+        self.rows = {}
+        self.statements = 0
+        self.cursor = MagicMock()
+
+    def add(self, key, is_active=True):
+        self.rows[key] = {'edge_id': str(uuid.uuid4()), 'is_active': is_active}
+
+    def execute_values(self, cur, query, rows, page_size=100, fetch=False):
+        assert 'ON CONFLICT' in query and fetch
+        self.statements += 1
+        results = []
+        for row in reversed(rows):  # RETURNING order is not relied upon
+            key = row[:6]
+            existing = self.rows.get(key)
+            if existing and existing['is_active']:
+                continue
+            inserted = existing is None
+            if inserted:
+                self.add(key)
+            self.rows[key]['is_active'] = True
+            results.append(dict(zip(
+                ('project_id', 'source_entity_type', 'source_entity_id',
+                 'target_entity_type', 'target_entity_id', 'relationship_type'), key),
+                edge_id=self.rows[key]['edge_id'], inserted=inserted))
+        return results
+
+    @contextmanager
+    def get_cursor(self):
+        yield self.cursor
+
+
+def _edge(source, target, relationship_type='USES', **extra):
+    return dict(source_entity_type='detail', source_entity_id=source,
+                target_entity_type='material', target_entity_id=target,
+                relationship_type=relationship_type, **extra)
+
+
+class TestCreateEdgesBatch(unittest.TestCase):
+    """Test validated, paged edge creation."""
+
+    def setUp(self):
+        self.table = FakeEdgeTable()
+        self.type_query = MagicMock(return_value=[
+            {'type_code': 'USES', 'valid_source_types': None, 'valid_target_types': None},
+            {'type_code': 'CONTAINS', 'valid_source_types': ['block'], 'valid_target_types': None},
+        ])
+        self.valid_type = MagicMock(side_effect=lambda t: t in ('detail', 'material', 'block'))
+        for target, value in (('get_cursor', self.table.get_cursor),
+                              ('execute_values', self.table.execute_values),
+                              ('execute_query', self.type_query)):
+            patcher = patch(f'services.relationship_graph_service.{target}', value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.service = RelationshipGraphService()
+        self.service.registry = MagicMock(is_valid_entity_type=self.valid_type)
+        self.ids = [str(uuid.uuid4()) for _ in range(10)]
+
+    def test_returns_created_edges_in_input_order(self):
+        edges = [_edge(self.ids[0], self.ids[i]) for i in range(1, 8)]
+
+        created = self.service.create_edges_batch(PROJECT, edges, page_size=3)
+
+        self.assertEqual([e['target_entity_id'] for e in created], self.ids[1:8])
+        self.assertEqual(self.table.statements, 3)
+        self.assertEqual([p['edges'] for p in self.service.batch_metrics['pages']], [3, 3, 1])
+        self.assertEqual(self.service.batch_metrics['created'], 7)
+        self.assertNotIn('inserted', created[0])
+
+    def test_lookups_once_per_distinct_type(self):
+        edges = [_edge(self.ids[0], self.ids[i % 9 + 1]) for i in range(500)]
+
+        self.service.create_edges_batch(PROJECT, edges)
+
+        self.assertEqual(self.valid_type.call_count, 2)
+        self.type_query.assert_called_once()
+
+    def test_existing_and_repeated_edges(self):
+        active = (PROJECT, 'detail', self.ids[0], 'material', self.ids[1], 'USES')
+        deleted = (PROJECT, 'detail', self.ids[0], 'material', self.ids[2], 'USES')
+        self.table.add(active)
+        self.table.add(deleted, is_active=False)
+        edges = [_edge(self.ids[0], self.ids[i]) for i in (1, 2, 3, 3)]
+
+        created = self.service.create_edges_batch(PROJECT, edges)
+
+        self.assertEqual([e['target_entity_id'] for e in created], self.ids[2:4])
+        metrics = self.service.batch_metrics
+        self.assertEqual((metrics['created'], metrics['restored'], metrics['skipped_existing'],
+                          metrics['duplicates_in_batch']), (1, 1, 1, 1))
+
+    def test_ids_are_normalised(self):
+        edges = [_edge(self.ids[0].upper(), self.ids[1])]
+
+        created = self.service.create_edges_batch(PROJECT.upper(), edges)
+
+        self.assertEqual(created[0]['source_entity_id'], self.ids[0])
+
+    def test_validation_reports_every_bad_edge_before_writing(self):
+        edges = [
+            _edge(self.ids[0], self.ids[1]),
+            _edge(self.ids[0], 'not-a-uuid'),
+            dict(_edge(self.ids[0], self.ids[2]), target_entity_type='widget'),
+            _edge(self.ids[0], self.ids[3], relationship_type='CONTAINS'),
+            _edge(self.ids[0], self.ids[4], relationship_type='NOPE'),
+        ]
+
+        with self.assertRaises(ValueError) as ctx:
+            self.service.create_edges_batch(PROJECT, edges)
+
+        message = str(ctx.exception)
+        for expected in ("Edge 1: entity ids must be UUIDs",
+                         "Edge 2: Invalid target_entity_type 'widget'",
+                         "Edge 3: Invalid source_entity_type 'detail' for relationship_type 'CONTAINS'",
+                         "Edge 4: Invalid relationship_type 'NOPE'"):
+            self.assertIn(expected, message)
+        self.assertEqual(self.table.statements, 0)
+
+    def test_missing_fields(self):
+        edge = _edge(self.ids[0], self.ids[1])
+        del edge['relationship_type']
+
+        with self.assertRaisesRegex(ValueError, 'Edge 0: Missing required field: relationship_type'):
+            self.service.create_edges_batch(PROJECT, [edge])
+
+
+class TestDeleteEdgesBatch(unittest.TestCase):
+    """Test paged edge deletion."""
+
+    def setUp(self):
+        self.table = FakeEdgeTable()
+        self.table.cursor.rowcount = 2
+        patcher = patch('services.relationship_graph_service.get_cursor', self.table.get_cursor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = RelationshipGraphService()
+
+    def test_pages_and_counts(self):
+        ids = [str(uuid.uuid4()) for _ in range(5)]
+
+        deleted = self.service.delete_edges_batch(ids + ids[:1], page_size=2)
+
+        self.assertEqual(self.table.cursor.execute.call_count, 3)
+        self.assertEqual(deleted, 6)
+        self.assertEqual(len(self.service.batch_metrics['pages']), 3)
+        query = self.table.cursor.execute.call_args[0][0]
+        self.assertIn('is_active = TRUE', query)
+
+    def test_invalid_id(self):
+        with self.assertRaisesRegex(ValueError, "Edge 1: invalid edge_id 'x'"):
+            self.service.delete_edges_batch([str(uuid.uuid4()), 'x'])
+        self.table.cursor.execute.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
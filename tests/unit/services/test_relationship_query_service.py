@@ -0,0 +1,235 @@
+"""
+Unit tests for RelationshipQueryService traversals
+Tests single-query neighborhood loading, in-memory subgraph/path traversal
+and SCC-based cycle analysis.
+"""
+
+import random
+import unittest
+from collections import deque
+from unittest.mock import patch
+
+from services.relationship_edge_index import NEIGHBORHOOD_EDGES_QUERY
+from services.relationship_query_service import RelationshipQueryService
+
+
+def _edge(i, source, target, bidirectional=False, relationship_type='USES'):
+    return {
+        'edge_id': f'e{i}', 'project_id': 'p1',
+        'source_entity_type': source[0], 'source_entity_id': source[1],
+        'target_entity_type': target[0], 'target_entity_id': target[1],
+        'relationship_type': relationship_type, 'relationship_strength': 0.5,
+        'is_bidirectional': bidirectional, 'is_active': True
+    }
+
+
+def _leaves(edge, node):
+    """Edges the old per-node query returned for a node."""
+    return ((edge['source_entity_type'], edge['source_entity_id']) == node or
+            (edge['is_bidirectional'] and (edge['target_entity_type'], edge['target_entity_id']) == node))
+
+
+def _other_end(edge, node):
+    if (edge['source_entity_type'], edge['source_entity_id']) == node:
+        return (edge['target_entity_type'], edge['target_entity_id']), 'outgoing'
+    return (edge['source_entity_type'], edge['source_entity_id']), 'incoming'
+
+
+class FakeEdgeTable:
+    """Evaluates NEIGHBORHOOD_EDGES_QUERY in Python over a list of edges."""
+
+    def __init__(self, edges):
+        self.edges = edges
+        self.calls = 0
+
+    def execute_query(self, query, params):
+        self.calls += 1
+        if 'WITH RECURSIVE' not in query:
+            return [dict(e) for e in self.edges]
+        params = list(params)
+        types = params[1] if 'ANY(%s)' in query else None
+        entity_type, entity_id, depth = params[-3:]
+        edges = [e for e in self.edges if types is None or e['relationship_type'] in types]
+
+        distance = {(entity_type, entity_id): 0}
+        queue = deque([(entity_type, entity_id)])
+        while queue:
+            node = queue.popleft()
+            if distance[node] + 1 >= depth:
+                continue
+            for edge in edges:
+                if _leaves(edge, node):
+                    other, _ = _other_end(edge, node)
+                    if other not in distance:
+                        distance[other] = distance[node] + 1
+                        queue.append(other)
+
+        return [dict(e) for e in edges if any(_leaves(e, node) for node in distance)]
+
+
+def legacy_subgraph(edges, entity_type, entity_id, depth, relationship_types=None):
+    """The previous per-node BFS, against an in-memory edge list."""
+    edges = [e for e in edges if not relationship_types or e['relationship_type'] in relationship_types]
+    nodes = {f"{entity_type}:{entity_id}": {'entity_type': entity_type, 'entity_id': entity_id, 'depth': 0}}
+    result_edges = []
+    visited = {(entity_type, entity_id)}
+    queue = deque([((entity_type, entity_id), 0)])
+    while queue:
+        node, curr_depth = queue.popleft()
+        if curr_depth >= depth:
+            continue
+        for edge in edges:
+            if not _leaves(edge, node):
+                continue
+            other, direction = _other_end(edge, node)
+            result_edges.append({k: edge[k] for k in (
+                'edge_id', 'source_entity_type', 'source_entity_id', 'target_entity_type',
+                'target_entity_id', 'relationship_type', 'relationship_strength')} | {'direction': direction})
+            if other not in visited:
+                visited.add(other)
+                nodes[f"{other[0]}:{other[1]}"] = {'entity_type': other[0], 'entity_id': other[1],
+                                                   'depth': curr_depth + 1}
+                queue.append((other, curr_depth + 1))
+    return {'nodes': list(nodes.values()), 'edges': result_edges,
+            'node_count': len(nodes), 'edge_count': len(result_edges)}
+
+
+class TestRelationshipTraversal(unittest.TestCase):
+    """Test traversals against the previous per-node behaviour."""
+
+    def setUp(self):
+        rng = random.Random(3)
+        nodes = [('detail', f'{i:08x}-0000-0000-0000-000000000000') for i in range(60)]
+        self.nodes = nodes
+        self.edges = [_edge(i, rng.choice(nodes), rng.choice(nodes), rng.random() < 0.3,
+                            rng.choice(['USES', 'REFERENCES']))
+                      for i in range(150)]
+        self.table = FakeEdgeTable(self.edges)
+        patcher = patch('services.relationship_query_service.execute_query',
+                        side_effect=self.table.execute_query)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = RelationshipQueryService()
+
+    def test_subgraph_matches_per_node_bfs(self):
+        for depth in (0, 1, 2, 3):
+            for types in (None, ['USES']):
+                root = self.nodes[depth * 7]
+                result = self.service.get_entity_subgraph(root[0], root[1], 'p1', depth, types)
+
+                self.assertEqual(result, legacy_subgraph(self.edges, root[0], root[1], depth, types))
+
+    def test_single_query_per_traversal(self):
+        root = self.nodes[0]
+        self.service.get_entity_subgraph(root[0], root[1], 'p1', depth=3)
+        self.service.find_path('p1', *self.nodes[0], *self.nodes[1])
+        self.service.find_all_paths('p1', *self.nodes[0], *self.nodes[1])
+
+        self.assertEqual(self.table.calls, 3)
+        self.assertEqual(self.service.query_stats['query_count'], 3)
+        self.assertGreaterEqual(self.service.query_stats['query_ms'], 0)
+
+    def test_edges_matched_by_two_joins(self):
+        # Source and bidirectional target matches are separate semi-joins, not one OR
+        self.assertNotIn(' OR ', NEIGHBORHOOD_EDGES_QUERY)
+        self.assertEqual(NEIGHBORHOOD_EDGES_QUERY.count('JOIN expanded x'), 2)
+
+    def test_root_id_case_insensitive(self):
+        root = self.nodes[5]
+        lower = self.service.get_entity_subgraph(root[0], root[1], 'p1', depth=2)
+        upper = self.service.get_entity_subgraph(root[0], root[1].upper(), 'p1', depth=2)
+
+        self.assertEqual(lower['edges'], upper['edges'])
+
+
+class TestPathFinding(unittest.TestCase):
+    """Test shortest and all-path search on a small graph."""
+
+    def setUp(self):
+        a, b, c, d, e = [('block', n) for n in 'abcde']
+        self.edges = [
+            _edge(1, a, b), _edge(2, b, c), _edge(3, c, d),
+            _edge(4, a, e), _edge(5, d, e, bidirectional=True),
+        ]
+        patcher = patch('services.relationship_query_service.execute_query',
+                        side_effect=FakeEdgeTable(self.edges).execute_query)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = RelationshipQueryService()
+
+    def test_shortest_path_uses_bidirectional_edge(self):
+        path = self.service.find_path('p1', 'block', 'a', 'block', 'd')
+
+        self.assertEqual([edge['edge_id'] for edge in path], ['e4', 'e5'])
+
+    def test_path_respects_max_depth(self):
+        self.assertIsNone(self.service.find_path('p1', 'block', 'a', 'block', 'd', max_depth=1))
+        self.assertIsNone(self.service.find_path('p1', 'block', 'd', 'block', 'z'))
+        self.assertEqual(self.service.find_path('p1', 'block', 'a', 'block', 'a'), [])
+
+    def test_all_paths(self):
+        paths = self.service.find_all_paths('p1', 'block', 'a', 'block', 'd', max_depth=4)
+
+        self.assertEqual(sorted([e['edge_id'] for e in p] for p in paths),
+                         [['e1', 'e2', 'e3'], ['e4', 'e5']])
+
+
+class TestCycleAnalysis(unittest.TestCase):
+    """Test strongly-connected-component cycle analysis."""
+
+    def _service(self, edges):
+        patcher = patch('services.relationship_query_service.execute_query',
+                        side_effect=FakeEdgeTable(edges).execute_query)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return RelationshipQueryService()
+
+    def test_components_and_representative_cycles(self):
+        a, b, c, d, x, y, z = [('note', n) for n in 'abcdxyz']
+        service = self._service([
+            _edge(1, a, b), _edge(2, b, c), _edge(3, c, a), _edge(4, c, d),  # 3-cycle + tail
+            _edge(5, x, y, bidirectional=True),                              # 2-step cycle
+            _edge(6, z, z),                                                  # self-loop
+        ])
+
+        analysis = service.analyze_cycles('p1')
+
+        self.assertEqual(analysis['cyclic_component_count'], 3)
+        self.assertEqual([comp['size'] for comp in analysis['components']], [3, 2, 1])
+        self.assertEqual(analysis['components'][0]['edge_count'], 3)
+        self.assertEqual([[e['edge_id'] for e in cycle] for cycle in analysis['cycles']],
+                         [['e1', 'e2', 'e3'], ['e5', 'e5'], ['e6']])
+        self.assertFalse(analysis['cycles_truncated'])
+
+    def test_acyclic_graph(self):
+        service = self._service([_edge(1, ('n', 'a'), ('n', 'b')), _edge(2, ('n', 'b'), ('n', 'c'))])
+
+        self.assertEqual(service.detect_cycles('p1'), [])
+
+    def test_long_cycle_without_recursion(self):
+        nodes = [('detail', str(i)) for i in range(50000)]
+        edges = [_edge(i, nodes[i], nodes[(i + 1) % len(nodes)]) for i in range(len(nodes))]
+        service = self._service(edges)
+
+        analysis = service.analyze_cycles('p1', max_component_nodes=5)
+
+        self.assertEqual(analysis['components'][0]['size'], 50000)
+        self.assertEqual(len(analysis['components'][0]['entities']), 5)
+        self.assertEqual(len(analysis['cycles'][0]), 50000)
+
+    def test_max_cycles(self):
+        edges = []
+        for i in range(5):
+            u, v = ('n', f'u{i}'), ('n', f'v{i}')
+            edges += [_edge(2 * i, u, v), _edge(2 * i + 1, v, u)]
+        service = self._service(edges)
+
+        analysis = service.analyze_cycles('p1', max_cycles=2)
+
+        self.assertEqual(len(analysis['cycles']), 2)
+        self.assertEqual(analysis['cyclic_component_count'], 5)
+        self.assertTrue(analysis['cycles_truncated'])
+
+
+if __name__ == '__main__':
+    unittest.main()
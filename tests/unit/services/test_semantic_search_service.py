@@ -0,0 +1,187 @@
+"""
+Unit tests for SemanticSearchService KNN queries
+Tests the per-model query plan (exact vs HNSW/IVFFlat), filtering by
+threshold and type (in SQL for exact scans), candidate widening, and that
+find_similar_entities
+fetches the source vector once instead of self-joining embeddings.
+"""
+
+import unittest
+import uuid
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+from services.semantic_search_service import SemanticSearchService
+
+MODEL = str(uuid.uuid4())
+
+
+class FakeIndexManager:
+    def __init__(self, index=None):
+        self.index = index
+
+    def get_index(self, model_id):
+        return self.index
+
+
+class FakeKnnTable:
+    """Answers the KNN queries from a fixed list of (entity_id, type, similarity), best first."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+        self.settings = []
+        self.cursor = MagicMock()
+        self.cursor.execute.side_effect = self.execute
+
+    def execute(self, query, params=None):
+        if 'set_config' in query:
+            self.settings.append(params)
+            return
+        self.queries.append((query, params))
+        rows = self.rows
+        if 'threshold' in params:
+            # EXACT_KNN_QUERY filters before the LIMIT
+            rows = [(entity_id, entity_type, score) for entity_id, entity_type, score in rows
+                    if score >= params['threshold'] and entity_id != params['exclude_entity_id']
+                    and params['entity_type'] in (None, entity_type)]
+        knn = rows[:params['k']]
+        self.cursor.fetchall.return_value = [
+            {'entity_id': entity_id, 'entity_type': entity_type, 'similarity_score': score,
+             'canonical_name': entity_id, 'candidate_count': len(knn)}
+            for entity_id, entity_type, score in knn
+        ]
+
+    @contextmanager
+    def get_cursor(self):
+        yield self.cursor
+
+
+def _rows(count, entity_type='layer', start=0.99, step=0.001):
+    return [(f'e{i}', entity_type, start - i * step) for i in range(count)]
+
+
+class TestPlanKnn(unittest.TestCase):
+    """Test strategy and search parameter selection."""
+
+    def test_exact_without_index(self):
+        plan = SemanticSearchService(FakeIndexManager()).plan_knn(MODEL, 10, post_filtered=True)
+
+        self.assertEqual(plan['strategy'], 'exact')
+        self.assertEqual(plan['candidates'], 10)
+        self.assertEqual(plan['settings'], {'enable_indexscan': 'off'})
+
+    def test_hnsw_overfetches_and_sizes_ef_search(self):
+        index = {'index_name': 'idx', 'method': 'hnsw'}
+        plan = SemanticSearchService(FakeIndexManager(index)).plan_knn(MODEL, 49, post_filtered=True)
+
+        self.assertEqual(plan['strategy'], 'ann')
+        self.assertEqual(plan['candidates'], 200)
+        self.assertEqual(plan['settings'], {'hnsw.ef_search': '200'})
+
+    def test_ivfflat_probes(self):
+        index = {'index_name': 'idx', 'method': 'ivfflat', 'lists': 1000, 'probes': 32}
+        plan = SemanticSearchService(FakeIndexManager(index)).plan_knn(MODEL, 10, post_filtered=False)
+
+        self.assertEqual(plan['candidates'], 11)
+        self.assertEqual(plan['settings'], {'ivfflat.probes': '32'})
+
+
+class TestKnnSearch(unittest.TestCase):
+    """Test post-filtering and widening."""
+
+    def _search(self, table, index=None, **kwargs):
+        service = SemanticSearchService(FakeIndexManager(index))
+        with patch('services.semantic_search_service.get_cursor', table.get_cursor):
+            return service, service.knn_search(MODEL, '[0.1,0.2]', **kwargs)
+
+    def test_filters_threshold_type_and_source(self):
+        rows = [('src', 'layer', 1.0), ('a', 'block', 0.95), ('b', 'layer', 0.9), ('c', 'layer', 0.5)]
+        table = FakeKnnTable(rows)
+
+        _, results = self._search(table, limit=5, threshold=0.7, entity_type='layer',
+                                  exclude_entity_id='src')
+
+        self.assertEqual([r['entity_id'] for r in results], ['b'])
+        self.assertEqual(len(table.queries), 1)
+
+    def test_exact_scan_filters_in_sql(self):
+        # The only layer ranks behind more candidates than an ANN search would widen to
+        rows = _rows(1500, 'block', step=0.0001) + [('rare', 'layer', 0.8)]
+        table = FakeKnnTable(rows)
+
+        service, results = self._search(table, limit=5, threshold=0.7, entity_type='layer')
+
+        self.assertEqual([r['entity_id'] for r in results], ['rare'])
+        query, params = table.queries[0]
+        self.assertIn('se.entity_type = %(entity_type)s', query)
+        self.assertIn('>= %(threshold)s', query)
+        self.assertEqual(params['k'], 5)
+        self.assertEqual(len(table.queries), 1)
+        self.assertEqual(service.last_plan['strategy'], 'exact')
+
+    def test_query_is_ordered_limited_knn(self):
+        table = FakeKnnTable(_rows(3))
+
+        service, _ = self._search(table, {'index_name': 'idx', 'method': 'hnsw'},
+                                  limit=2, threshold=0.0)
+
+        query, params = table.queries[0]
+        self.assertIn('ORDER BY ee.embedding <=> %(vector)s::vector', query)
+        self.assertIn('LIMIT %(k)s', query)
+        self.assertEqual(params['model_id'], MODEL)
+        self.assertEqual(service.last_plan['strategy'], 'ann')
+
+    def test_widens_when_filter_leaves_too_few(self):
+        # Fifteen blocks rank ahead of the layers; the first 16 candidates hold one layer
+        rows = _rows(15, 'block') + _rows(50, 'layer', start=0.98)
+        table = FakeKnnTable(rows)
+
+        service, results = self._search(table, {'index_name': 'idx', 'method': 'hnsw'},
+                                        limit=3, threshold=0.5, entity_type='layer')
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual([params['k'] for _, params in table.queries], [16, 64])
+        self.assertEqual(table.settings[-1], ('hnsw.ef_search', '64'))
+        self.assertEqual(service.last_plan['returned'], 64)
+
+    def test_no_widening_once_below_threshold(self):
+        table = FakeKnnTable(_rows(100, 'block', start=0.6, step=0.01))
+
+        _, results = self._search(table, {'index_name': 'idx', 'method': 'hnsw'},
+                                  limit=3, threshold=0.5, entity_type='layer')
+
+        self.assertEqual(results, [])
+        self.assertEqual(len(table.queries), 1)
+
+
+class TestFindSimilarEntities(unittest.TestCase):
+    """Test the source-vector lookup and per-model merge."""
+
+    def test_fetches_source_vectors_once_and_merges_models(self):
+        other_model = str(uuid.uuid4())
+        sources = [{'model_id': MODEL, 'embedding': '[1,0]'},
+                   {'model_id': other_model, 'embedding': '[0,1]'}]
+        service = SemanticSearchService(FakeIndexManager())
+        service.cache_similar_pairs = False
+        per_model = {
+            MODEL: [{'entity_id': 'a', 'similarity_score': 0.8}, {'entity_id': 'b', 'similarity_score': 0.75}],
+            other_model: [{'entity_id': 'a', 'similarity_score': 0.9}]
+        }
+
+        with patch('services.semantic_search_service.execute_query', return_value=sources) as query, \
+                patch.object(service, 'knn_search', side_effect=lambda m, *a, **k: per_model[m]) as knn:
+            results = service.find_similar_entities('src', entity_type='layer',
+                                                    include_cross_type=False)
+
+        query.assert_called_once()
+        self.assertNotIn('JOIN entity_embeddings', query.call_args[0][0])
+        self.assertEqual(knn.call_count, 2)
+        self.assertEqual(knn.call_args_list[0][0][4], 'layer')
+        self.assertEqual(knn.call_args_list[0][1], {'exclude_entity_id': 'src'})
+        self.assertEqual([(r['entity_id'], r['similarity_score']) for r in results],
+                         [('a', 0.9), ('b', 0.75)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+"""
+Unit tests for SpatialProximityService
+Tests the spatial catalog built from geometry_columns, per-table index-friendly
+proximity branches (units, SRID transforms, project scoping), merged results
+and GraphRAG spatial queries going through the service.
+"""
+
+import unittest
+import uuid
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+from services.spatial_proximity_service import SpatialProximityService
+from services.graphrag_service import GraphRAGService
+
+MODULE = 'services.spatial_proximity_service'
+FT = '+proj=lcc +lat_1=38.43 +datum=NAD83 +units=us-ft +no_defs'
+METERS = '+proj=lcc +lat_1=38.43 +datum=NAD83 +units=m +no_defs'
+
+CATALOG_ROWS = [
+    {'table_name': 'utility_lines', 'geometry_column': 'geometry', 'srid': 2226, 'proj4text': FT,
+     'indexed': True, 'columns': {'line_id': 'uuid', 'entity_id': 'uuid', 'project_id': 'uuid',
+                                  'line_number': 'character varying'}},
+    {'table_name': 'utility_structures', 'geometry_column': 'centroid', 'srid': 2226, 'proj4text': FT,
+     'indexed': False, 'columns': {'structure_id': 'uuid', 'project_id': 'uuid',
+                                   'structure_number': 'character varying'}},
+    {'table_name': 'utility_structures', 'geometry_column': 'rim_geometry', 'srid': 2226, 'proj4text': FT,
+     'indexed': True, 'columns': {'structure_id': 'uuid', 'project_id': 'uuid',
+                                  'structure_number': 'character varying'}},
+    {'table_name': 'parcels', 'geometry_column': 'boundary_geometry', 'srid': 6423, 'proj4text': METERS,
+     'indexed': True, 'columns': {'parcel_id': 'uuid', 'parcel_name': 'text'}},
+    {'table_name': 'survey_codes', 'geometry_column': 'geometry', 'srid': 2226, 'proj4text': FT,
+     'indexed': True, 'columns': {'code': 'integer'}},
+]
+
+
+class FakeDatabase:
+    """Answers the catalog query; records other statements and returns canned rows."""
+
+    def __init__(self, rows=None):
+        self.rows = rows or []
+        self.queries = []
+        self.cursor = MagicMock()
+        self.cursor.execute.side_effect = self.execute
+
+    def execute(self, query, params=None):
+        if 'FROM geometry_columns' in query:
+            self.cursor.fetchall.return_value = CATALOG_ROWS
+            return
+        self.queries.append((query, params))
+        self.cursor.fetchall.return_value = self.rows
+
+    @contextmanager
+    def get_cursor(self):
+        yield self.cursor
+
+
+class ProximityTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.db = FakeDatabase()
+        patch(f'{MODULE}.get_cursor', self.db.get_cursor).start()
+        patch(f'{MODULE}.EntityRegistry.get_all_entity_types', return_value=[]).start()
+        self.addCleanup(patch.stopall)
+        self.service = SpatialProximityService()
+
+
+class TestCatalog(ProximityTestCase):
+    """Test catalog discovery."""
+
+    def test_catalog_entries(self):
+        tables = {t.entity_type: t for t in self.service.get_catalog()}
+
+        self.assertEqual(set(tables), {'utility_line', 'utility_structure', 'parcel'})
+        self.assertEqual(tables['utility_structure'].geometry_column, 'rim_geometry')
+        self.assertEqual(tables['utility_structure'].name_column, 'structure_number')
+        self.assertEqual(tables['utility_line'].name_column, 'line_number')
+        self.assertEqual(tables['parcel'].feet_per_unit, 3.28084)
+        self.assertFalse(tables['parcel'].has_project_id)
+        self.assertTrue(tables['utility_line'].has_entity_id)
+
+    def test_catalog_is_cached(self):
+        self.service.get_catalog()
+        self.service.get_catalog()
+
+        catalog_queries = [c for c in self.db.cursor.execute.call_args_list
+                           if 'geometry_columns' in c[0][0]]
+        self.assertEqual(len(catalog_queries), 1)
+
+
+class TestFindNearby(ProximityTestCase):
+    """Test the UNION ALL of per-table proximity branches."""
+
+    def test_one_query_with_indexed_branch_per_table(self):
+        self.db.rows = [{'entity_type': 'utility_line', 'distance_ft': 3.0}]
+
+        results = self.service.find_nearby('POINT(1 2)', 2226, radius_ft=50, limit=10)
+
+        self.assertEqual(results, self.db.rows)
+        self.assertEqual(len(self.db.queries), 1)
+        query, params = self.db.queries[0]
+        self.assertEqual(query.count('UNION ALL'), 2)
+        self.assertIn('ST_DWithin(t.rim_geometry, ST_GeomFromText(%(wkt)s, 2226), %(r', query)
+        self.assertIn('ORDER BY t.geometry <-> ST_GeomFromText(%(wkt)s, 2226)', query)
+        self.assertIn('ST_Transform(ST_GeomFromText(%(wkt)s, %(srid)s), 6423)', query)
+        radii = sorted(value for key, value in params.items() if key.startswith('r'))
+        self.assertAlmostEqual(radii[0], 50 / 3.28084)
+        self.assertEqual(radii[1:], [50, 50])
+
+    def test_project_scope_skips_unscoped_tables(self):
+        self.service.find_nearby('POINT(1 2)', 2226, radius_ft=50, project_id='p1',
+                                 exclude_entity_id='e1')
+
+        query, params = self.db.queries[0]
+        self.assertNotIn('parcels', query)
+        self.assertEqual(query.count('t.project_id = %(project_id)s'), 2)
+        self.assertIn('t.entity_id::text IS DISTINCT FROM %(exclude)s', query)
+        self.assertEqual(params['exclude'], 'e1')
+
+    def test_nearest_has_no_radius(self):
+        self.service.nearest('POINT(1 2)', 2226, ['utility_line'])
+
+        query, params = self.db.queries[0]
+        self.assertNotIn('ST_DWithin', query)
+        self.assertEqual(params['limit'], 1)
+
+    def test_count_nearby(self):
+        self.db.rows = [{'entity_type': 'utility_line', 'count': 4}]
+
+        counts = self.service.count_nearby('POINT(1 2)', 2226, 50, 'p1',
+                                           ['utility_line', 'utility_structure'])
+
+        self.assertEqual(counts, {'utility_line': 4, 'utility_structure': 0})
+
+    def test_geometry_of_requires_uuid(self):
+        self.assertIsNone(self.service.geometry_of('not-a-uuid'))
+        self.assertEqual(self.db.queries, [])
+
+        self.service.geometry_of(str(uuid.uuid4()))
+        query, _ = self.db.queries[0]
+        self.assertIn('t.line_id = %(id)s::uuid OR t.entity_id = %(id)s::uuid', query)
+
+
+class TestGraphRAGSpatialQuery(unittest.TestCase):
+    """Test GraphRAG spatial queries use the proximity service."""
+
+    def test_spatial_query(self):
+        spatial = MagicMock()
+        spatial.find_nearby_entity.return_value = (
+            {'wkt': 'POINT(0 0)', 'srid': 2226},
+            [{'entity_type': 'utility_line', 'entity_id': 'e2', 'distance_ft': 4.0}])
+        service = GraphRAGService(cache=MagicMock(), spatial=spatial)
+        parsed = {'entity_references': ['MH-1'], 'parameters': {'distance': 10, 'distance_unit': 'm'}}
+
+        with patch.object(service, '_resolve_entity_reference',
+                          return_value={'entity_id': 'e1', 'canonical_name': 'MH-1'}):
+            result = service._execute_spatial_query(parsed, 25)
+
+        args, kwargs = spatial.find_nearby_entity.call_args
+        self.assertEqual(args[0], 'e1')
+        self.assertAlmostEqual(args[1], 32.8084)
+        self.assertEqual(kwargs['limit'], 25)
+        self.assertEqual([e['entity_id'] for e in result['entities']], ['e1', 'e2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
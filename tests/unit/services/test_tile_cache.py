@@ -0,0 +1,199 @@
+"""
+Unit tests for the on-disk tile cache
+Tests hits and misses keyed by project data version, bypassing the cache
+when the version is unknown, LRU eviction by size, version bumps and
+seeding a project's extent.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+from psycopg2 import errors
+
+from services.map_viewer_service import TILE_LAYERS
+from services.tile_cache import TileCache, bump_project_data_version, tiles_for_bounds
+
+MODULE = 'services.tile_cache'
+
+
+class FakeDatabase:
+    """Answers data version lookups."""
+
+    def __init__(self, version=1):
+        self.version = version
+        self.fail = False
+        self.queries = []
+        self.cursor = MagicMock()
+        self.cursor.execute.side_effect = self.execute
+
+    def execute(self, query, params=None):
+        if self.fail:
+            raise Exception('relation "project_data_versions" does not exist')
+        self.queries.append((query, params))
+        self.cursor.fetchone.return_value = (self.version,)
+
+    @contextmanager
+    def get_cursor(self, dict_cursor=True):
+        yield self.cursor
+
+
+class TileCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.db = FakeDatabase()
+        patch(f'{MODULE}.get_cursor', self.db.get_cursor).start()
+        self.addCleanup(patch.stopall)
+
+        self.renderer = MagicMock()
+        self.renderer.layers = TILE_LAYERS
+        self.renderer.get_vector_tile_data.side_effect = \
+            lambda z, x, y, layer, project_id=None: f'{layer}/{z}/{x}/{y}'.encode()
+        self.cache = self.make_cache()
+
+    def make_cache(self, **kwargs):
+        return TileCache(path=os.path.join(self.directory, 'tiles.sqlite'),
+                         map_viewer=self.renderer, version_ttl=0, **kwargs)
+
+
+class TestGetTile(TileCacheTestCase):
+    """Test cache lookups."""
+
+    def test_miss_then_hit(self):
+        first = self.cache.get_tile('utility_lines', 16, 10429, 25177, 'p1')
+        second = self.cache.get_tile('utility_lines', 16, 10429, 25177, 'p1')
+
+        self.assertEqual(first, b'utility_lines/16/10429/25177')
+        self.assertEqual(second, first)
+        self.assertEqual(self.renderer.get_vector_tile_data.call_count, 1)
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (1, 1, 0.5))
+        self.assertEqual(stats['by_layer']['utility_lines']['hit_rate'], 0.5)
+        self.assertEqual(stats['tiles'], 1)
+
+    def test_version_bump_retires_tiles(self):
+        self.cache.get_tile('parcels', 15, 5214, 12588, 'p1')
+        self.db.version = 2
+
+        self.cache.get_tile('parcels', 15, 5214, 12588, 'p1')
+        self.cache.get_tile('parcels', 15, 5214, 12588, 'p1')
+
+        self.assertEqual(self.renderer.get_vector_tile_data.call_count, 2)
+        self.assertEqual(self.cache.stats()['stale'], 1)
+
+    def test_projects_cached_separately(self):
+        self.cache.get_tile('parcels', 15, 5214, 12588, 'p1')
+        self.cache.get_tile('parcels', 15, 5214, 12588)
+
+        self.assertEqual(self.renderer.get_vector_tile_data.call_count, 2)
+        self.assertIn('MAX(version)', self.db.queries[-1][0])
+
+    def test_unknown_version_bypasses_cache(self):
+        self.db.fail = True
+
+        tile = self.cache.get_tile('parcels', 15, 5214, 12588, 'p1')
+
+        self.assertEqual(tile, b'parcels/15/5214/12588')
+        self.assertEqual(self.cache.stats()['bypassed'], 1)
+        self.assertEqual(self.cache.stats()['tiles'], 0)
+
+    def test_failed_render_not_stored(self):
+        self.renderer.get_vector_tile_data.side_effect = None
+        self.renderer.get_vector_tile_data.return_value = None
+
+        self.assertIsNone(self.cache.get_tile('parcels', 15, 5214, 12588, 'p1'))
+        self.assertEqual(self.cache.stats()['tiles'], 0)
+
+
+class TestEviction(TileCacheTestCase):
+    """Test the size limit."""
+
+    def test_least_recently_used_evicted(self):
+        self.renderer.get_vector_tile_data.side_effect = lambda z, x, y, layer, project_id=None: b'x' * 100
+        cache = self.make_cache(max_bytes=500, check_interval_bytes=10 ** 9)
+        for x in range(5):
+            cache.get_tile('utility_lines', 16, x, 0, 'p1')
+        cache.get_tile('utility_lines', 16, 0, 0, 'p1')
+
+        for x in range(5, 7):
+            cache.get_tile('utility_lines', 16, x, 0, 'p1')
+        evicted = cache.enforce_size_limit()
+
+        self.assertEqual(evicted, 3)
+        calls = self.renderer.get_vector_tile_data.call_count
+        cache.get_tile('utility_lines', 16, 0, 0, 'p1')
+        self.assertEqual(self.renderer.get_vector_tile_data.call_count, calls)
+        cache.get_tile('utility_lines', 16, 1, 0, 'p1')
+        self.assertEqual(self.renderer.get_vector_tile_data.call_count, calls + 1)
+
+
+class TestVersions(TileCacheTestCase):
+    """Test data version bumps."""
+
+    def test_bump_in_callers_transaction(self):
+        cursor = MagicMock()
+
+        with patch(f'{MODULE}.tile_cache', self.cache):
+            self.cache.data_version('p1')
+            bump_project_data_version('p1', cursor)
+
+        statements = [c.args for c in cursor.execute.call_args_list]
+        self.assertEqual(statements, [("SAVEPOINT project_data_version",),
+                                      ("SELECT bump_project_data_version(%s)", ('p1',)),
+                                      ("RELEASE SAVEPOINT project_data_version",)])
+        self.assertNotIn('p1', self.cache._versions)
+
+    def test_bump_skipped_without_migration(self):
+        cursor = MagicMock()
+
+        def execute(query, params=None):
+            if query.startswith('SELECT bump_project_data_version'):
+                raise errors.UndefinedFunction('function bump_project_data_version(unknown) does not exist')
+        cursor.execute.side_effect = execute
+
+        with patch(f'{MODULE}.tile_cache', self.cache):
+            bump_project_data_version('p1', cursor)
+
+        self.assertEqual(cursor.execute.call_args.args, ("ROLLBACK TO SAVEPOINT project_data_version",))
+
+    def test_bump_without_project(self):
+        bump_project_data_version(None)
+
+        self.assertEqual(self.db.queries, [])
+
+
+class TestSeed(TileCacheTestCase):
+    """Test pre-rendering a project's extent."""
+
+    def test_seed_renders_each_tile_once(self):
+        self.renderer.project_extent.return_value = (-122.72, 38.43, -122.70, 38.45)
+
+        first = self.cache.seed('p1', 14, 15, layers=['utility_lines', 'survey_points'], workers=2)
+        second = self.cache.seed('p1', 14, 15, layers=['utility_lines', 'survey_points'], workers=2)
+
+        expected = len(tiles_for_bounds((-122.72, 38.43, -122.70, 38.45), 14)) + \
+            2 * len(tiles_for_bounds((-122.72, 38.43, -122.70, 38.45), 15))
+        self.assertEqual(first['tiles'], expected)
+        self.assertEqual(first['rendered'], expected)
+        self.assertEqual(second['already_cached'], expected)
+        self.assertEqual(self.cache.stats()['requests'], 0)
+
+    def test_seed_limits(self):
+        self.renderer.project_extent.return_value = (-123.0, 38.0, -122.0, 39.0)
+
+        with self.assertRaises(ValueError):
+            self.cache.seed('p1', 12, 18, max_tiles=1000)
+        with self.assertRaises(ValueError):
+            self.cache.seed('p1', 12, 13, layers=['projects'])
+        self.renderer.project_extent.return_value = None
+        with self.assertRaises(ValueError):
+            self.cache.seed('p1', 12, 13)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,19 +3,26 @@ Embedding Generation Module
 
 Generate vector embeddings for entities using OpenAI or other providers.
 Automatically tracks model usage, versions embeddings, and updates quality scores.
+
+Batches are embedded with multi-input requests (several in flight at once),
+texts already embedded with the same model are skipped, and vectors are
+written with set-based SQL. See embeddings/providers.py.
 """
 
 import os
 import sys
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 import json
-import time
 
 sys.path.append(str(Path(__file__).parent.parent))
 
 from db_utils import (
-    execute_query, execute_many, generate_uuid, update_quality_score
+    execute_query, execute_many, generate_uuid, get_cursor, update_quality_score
+)
+from embeddings.providers import (
+    EmbeddingProvider, EmbeddingCache, embedding_cache, get_provider,
+    embed_in_batches, content_hash, apportion_tokens, save_embeddings
 )
 
 
@@ -24,38 +31,37 @@ class EmbeddingGenerator:
     
     def __init__(
         self, 
-        provider: str = 'openai', 
-        model: str = 'text-embedding-3-small',
+        provider: Union[str, EmbeddingProvider] = 'openai', 
+        model: Optional[str] = None,
         budget_cap: float = 100.0,
-        dry_run: bool = False
+        dry_run: bool = False,
+        max_concurrency: int = 4,
+        cache: Optional[EmbeddingCache] = None
     ):
         """
         Initialize embedding generator.
         
         Args:
-            provider: 'openai' or other providers
-            model: Model name (default: text-embedding-3-small, 1536 dimensions)
+            provider: 'openai', 'local' (hashed n-grams, no network) or an
+                EmbeddingProvider instance
+            model: Model name (default: the provider's, e.g. text-embedding-3-small,
+                1536 dimensions)
             budget_cap: Maximum total cost in USD (default: $100)
             dry_run: If True, preview costs without generating embeddings
+            max_concurrency: Embedding requests in flight at once
+            cache: Vector cache (default: the process-wide embedding_cache)
         """
-        self.provider = provider
-        self.model = model
-        self.dimensions = 1536
-        self.api_key = None
-        self.client = None
+        if isinstance(provider, str):
+            provider = get_provider(provider, model)
+        self.embedding_provider = provider
+        self.provider = provider.name
+        self.model = provider.model
+        self.dimensions = provider.dimensions
+        self.client = getattr(provider, 'client', None)
         self.budget_cap = budget_cap
         self.dry_run = dry_run
-        
-        if provider == 'openai':
-            self.api_key = os.environ.get('OPENAI_API_KEY')
-            if not self.api_key:
-                raise ValueError("OPENAI_API_KEY not set. Please set your API key.")
-            
-            try:
-                from openai import OpenAI
-                self.client = OpenAI(api_key=self.api_key)
-            except ImportError:
-                raise ImportError("OpenAI package not installed. Run: uv add openai")
+        self.max_concurrency = max_concurrency
+        self.cache = cache if cache is not None else embedding_cache
         
         # Register model in database
         self.model_id = self._register_model()
@@ -69,6 +75,8 @@ class EmbeddingGenerator:
             'errors': [],
             'api_calls': 0,
             'tokens_used': 0,
+            'cached': 0,
+            'skipped_unchanged': 0,
             'estimated_cost': 0.0,
             'cumulative_cost': self.cumulative_cost,
             'budget_remaining': self.budget_cap - self.cumulative_cost
@@ -188,17 +196,10 @@ class EmbeddingGenerator:
             RETURNING model_id
         """
         
-        # Default costs for common models
-        cost_map = {
-            'text-embedding-3-small': 0.00002,
-            'text-embedding-3-large': 0.00013,
-            'text-embedding-ada-002': 0.00010
-        }
-        cost = cost_map.get(self.model, 0.0001)
-        
         result = execute_query(
             insert_query,
-            (model_id, self.provider, self.model, self.dimensions, cost, 8191)
+            (model_id, self.provider, self.model, self.dimensions,
+             self.embedding_provider.cost_per_1k_tokens, self.embedding_provider.max_input_tokens)
         )
         if result:
             return str(result[0]['model_id'])
@@ -209,17 +210,11 @@ class EmbeddingGenerator:
         if not text or not text.strip():
             raise ValueError("Text cannot be empty")
         
-        if self.provider == 'openai':
-            response = self.client.embeddings.create(
-                model=self.model,
-                input=text.strip()
-            )
-            self.stats['api_calls'] += 1
-            self.stats['tokens_used'] += response.usage.total_tokens
-            
-            return response.data[0].embedding
-        else:
-            raise ValueError(f"Provider {self.provider} not supported yet")
+        batch = self.embedding_provider.embed([text.strip()])
+        self.stats['api_calls'] += 1
+        self.stats['tokens_used'] += batch.tokens
+        
+        return batch.vectors[0]
     
     def generate_entity_embedding(
         self,
@@ -240,40 +235,24 @@ class EmbeddingGenerator:
         """
         try:
             # Generate embedding
+            tokens_before = self.stats['tokens_used']
             embedding = self._generate_embedding(text)
+            text = text.strip()
+            self.cache.put(content_hash(text, self.model), embedding)
             
-            # Invalidate old embeddings if requested
-            if invalidate_old:
-                update_query = """
-                    UPDATE entity_embeddings
-                    SET is_current = false
-                    WHERE entity_id = %s AND is_current = true
-                """
-                execute_query(update_query, (entity_id,), fetch=False)
-            
-            # Insert new embedding
-            embedding_id = generate_uuid()
-            insert_query = """
-                INSERT INTO entity_embeddings (
-                    embedding_id, entity_id, model_id, embedding,
-                    is_current, embedding_version, quality_score
-                ) VALUES (%s, %s, %s, %s, true, 1, 0.9)
-                RETURNING embedding_id
-            """
-            
-            result = execute_query(
-                insert_query,
-                (embedding_id, entity_id, self.model_id, embedding)
-            )
+            with get_cursor() as cursor:
+                embedding_ids = save_embeddings(
+                    cursor, self.model_id,
+                    [(entity_id, embedding, text, self.stats['tokens_used'] - tokens_before)],
+                    supersede=invalidate_old
+                )
             
             self.stats['generated'] += 1
             
             # Update entity quality score
             update_quality_score(entity_id, 10, 10)
             
-            if result:
-                return {'embedding_id': str(result[0]['embedding_id']), 'success': True}
-            return {'embedding_id': embedding_id, 'success': True}
+            return {'embedding_id': embedding_ids.get(str(entity_id)), 'success': True}
             
         except Exception as e:
             self.stats['errors'].append(f"Error for entity {entity_id}: {str(e)}")
@@ -288,10 +267,14 @@ class EmbeddingGenerator:
         """
         Generate embeddings for multiple entities in batches.
         
+        Each distinct text is embedded once; texts found in the cache are not
+        sent. Requests carry batch_size texts each, up to max_concurrency at
+        a time, and every completed batch is written in one transaction.
+        
         Args:
             entity_ids: List of entity UUIDs
             text_map: Dict mapping entity_id to text
-            batch_size: Number of entities to process at once
+            batch_size: Number of texts per embedding request
             
         Returns:
             Statistics dict
@@ -305,13 +288,33 @@ class EmbeddingGenerator:
             'errors': [], 
             'api_calls': 0, 
             'tokens_used': 0,
+            'cached': 0,
+            'skipped_unchanged': self.stats.get('skipped_unchanged', 0),
             'estimated_cost': 0.0,
             'cumulative_cost': cumulative,
             'budget_remaining': budget_remaining
         }
         
+        # Group entities by content hash: each distinct text is embedded once,
+        # and texts already in the cache are not sent at all
+        entities_by_key = {}
+        texts_by_key = {}
+        for entity_id in entity_ids:
+            text = (text_map.get(entity_id) or '').strip()
+            if not text:
+                self.stats['errors'].append(f"No text for entity {entity_id}")
+                continue
+            key = content_hash(text, self.model)
+            entities_by_key.setdefault(key, []).append(entity_id)
+            texts_by_key[key] = text
+        
+        cached = {key: self.cache.get(key) for key in entities_by_key}
+        cached = {key: vector for key, vector in cached.items() if vector is not None}
+        pending_keys = [key for key in entities_by_key if key not in cached]
+        pending_texts = [texts_by_key[key] for key in pending_keys]
+        
         # Estimate tokens for budget check
-        total_text_length = sum(len(text_map.get(eid, '')) for eid in entity_ids)
+        total_text_length = sum(len(text) for text in pending_texts)
         estimated_tokens = int(total_text_length * 0.4)  # Rough estimate: 1 token ~= 2.5 chars
         
         # DRY RUN MODE
@@ -328,6 +331,7 @@ class EmbeddingGenerator:
             print(f"🔍 DRY RUN MODE - No embeddings will be generated")
             print(f"{'='*60}")
             print(f"Entities to process: {len(entity_ids)}")
+            print(f"Distinct texts to embed: {len(pending_texts)} ({len(cached)} cached)")
             print(f"Estimated tokens: {estimated_tokens:,}")
             print(f"Estimated cost: ${estimated_cost:.4f}")
             print(f"Current cumulative: ${cumulative:.2f}")
@@ -349,39 +353,78 @@ class EmbeddingGenerator:
         print(f"\n{'='*60}")
         print(f"Starting embedding generation:")
         print(f"  Entities: {len(entity_ids)}")
+        print(f"  Distinct texts to embed: {len(pending_texts)} ({len(cached)} cached)")
         print(f"  Estimated tokens: {estimated_tokens:,}")
         print(f"  Current budget: ${self.stats['cumulative_cost']:.2f} / ${self.budget_cap:.2f}")
         print(f"  Budget remaining: ${self.stats['budget_remaining']:.2f}")
         print(f"{'='*60}\n")
         
-        for i in range(0, len(entity_ids), batch_size):
-            batch = entity_ids[i:i + batch_size]
-            batch_num = i // batch_size + 1
-            total_batches = (len(entity_ids) + batch_size - 1) // batch_size
+        # Cached texts are written straight away
+        if cached:
+            self._save_batch([(key, cached[key], 0) for key in cached], entities_by_key, texts_by_key)
+            self.stats['cached'] += sum(len(entities_by_key[key]) for key in cached)
+        
+        total_batches = (len(pending_texts) + batch_size - 1) // batch_size
+        for offset, batch in embed_in_batches(self.embedding_provider, pending_texts,
+                                              batch_size, self.max_concurrency):
+            keys = pending_keys[offset:offset + batch_size]
+            batch_num = offset // batch_size + 1
+            self.stats['api_calls'] += 1
             
-            print(f"Processing batch {batch_num}/{total_batches} ({len(batch)} entities)")
+            if batch.error:
+                for key in keys:
+                    for entity_id in entities_by_key[key]:
+                        self.stats['errors'].append(f"Error for entity {entity_id}: {batch.error}")
+                continue
             
-            for entity_id in batch:
-                text = text_map.get(entity_id, '')
-                if text:
-                    self.generate_entity_embedding(entity_id, text)
-                else:
-                    self.stats['errors'].append(f"No text for entity {entity_id}")
+            tokens = apportion_tokens(batch.tokens, [texts_by_key[key] for key in keys])
+            for key, vector in zip(keys, batch.vectors):
+                self.cache.put(key, vector)
+            try:
+                self._save_batch(list(zip(keys, batch.vectors, tokens)), entities_by_key, texts_by_key)
+            except Exception as e:
+                self.stats['errors'].append(f"Error saving batch {batch_num}: {str(e)}")
             
             # Update cost tracking after each batch
-            if self.stats['tokens_used'] > 0:
-                self._update_cost_tracking(self.stats['tokens_used'])
-                self.stats['tokens_used'] = 0  # Reset for next batch
+            if batch.tokens > 0:
+                self.stats['tokens_used'] += batch.tokens
+                self._update_cost_tracking(batch.tokens)
             
-            print(f"  Progress: {self.stats['generated']} generated, "
+            print(f"  Batch {batch_num}/{total_batches}: {self.stats['generated']} generated, "
                   f"${self.stats['cumulative_cost']:.2f} spent, "
                   f"${self.stats['budget_remaining']:.2f} remaining")
-            
-            # Rate limiting
-            time.sleep(1)
         
         return self.stats
     
+    def _save_batch(self, embedded: List[tuple], entities_by_key: Dict[str, List[str]],
+                    texts_by_key: Dict[str, str]) -> None:
+        """
+        Write vectors for every entity sharing each embedded text, in one transaction.
+        
+        Args:
+            embedded: (content hash, vector, tokens used) per distinct text
+            entities_by_key: content hash -> entity_ids with that text
+            texts_by_key: content hash -> text
+        """
+        records = []
+        for key, vector, tokens in embedded:
+            for i, entity_id in enumerate(entities_by_key[key]):
+                records.append((entity_id, vector, texts_by_key[key], tokens if i == 0 else 0))
+        
+        with get_cursor() as cursor:
+            save_embeddings(cursor, self.model_id, records)
+            cursor.execute("""
+                UPDATE standards_entities
+                SET quality_score = compute_quality_score(10, 10, TRUE,
+                        EXISTS(SELECT 1 FROM entity_relationships
+                               WHERE subject_entity_id = standards_entities.entity_id
+                                  OR object_entity_id = standards_entities.entity_id)),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE entity_id = ANY(%s::uuid[])
+            """, ([str(record[0]) for record in records],))
+        
+        self.stats['generated'] += len(records)
+    
     def generate_for_table(
         self,
         table_name: str,
@@ -432,6 +475,9 @@ class EmbeddingGenerator:
         """
         Refresh embeddings that are old or missing.
         
+        Entities whose current embedding was made by this model from the same
+        text are skipped (counted in stats['skipped_unchanged']).
+        
         Args:
             entity_ids: Optional list of specific entity IDs to refresh
             older_than_days: Refresh embeddings older than this many days
@@ -440,16 +486,17 @@ class EmbeddingGenerator:
             Statistics dict
         """
         if entity_ids:
-            entity_list = ','.join([f"'{e}'" for e in entity_ids])
-            where_clause = f"WHERE entity_id = ANY(ARRAY[{entity_list}]::uuid[])"
+            where_clause = "WHERE entity_id = ANY(%s::uuid[])"
+            params = ([str(e) for e in entity_ids],)
         else:
-            where_clause = f"""
+            where_clause = """
                 WHERE entity_id NOT IN (
                     SELECT entity_id FROM entity_embeddings
                     WHERE is_current = true
-                    AND created_at > CURRENT_TIMESTAMP - INTERVAL '{older_than_days} days'
+                    AND created_at > CURRENT_TIMESTAMP - make_interval(days => %s)
                 )
             """
+            params = (int(older_than_days),)
         
         # Get entities needing refresh from standards_entities
         query = f"""
@@ -458,16 +505,29 @@ class EmbeddingGenerator:
             {where_clause}
         """
         
-        results = execute_query(query)
+        results = execute_query(query, params)
         if not results:
             print("No entities need embedding refresh")
             return self.stats
         
-        print(f"Refreshing embeddings for {len(results)} entities")
-        
         # Build text map
         text_map = {row['entity_id']: f"{row['entity_type']}: {row['canonical_name']}" for row in results}
-        entity_ids_to_refresh = list(text_map.keys())
+        
+        # Skip entities whose current embedding was made by this model from the same text
+        texts = {str(e): text.strip() for e, text in text_map.items()}
+        current = execute_query("""
+            SELECT entity_id, embedding_text FROM entity_embeddings
+            WHERE is_current = true AND model_id = %s::uuid AND entity_id = ANY(%s::uuid[])
+        """, (self.model_id, list(texts)))
+        unchanged = {str(row['entity_id']) for row in current or []
+                     if row['embedding_text'] == texts.get(str(row['entity_id']))}
+        entity_ids_to_refresh = [e for e in text_map if str(e) not in unchanged]
+        self.stats['skipped_unchanged'] = len(text_map) - len(entity_ids_to_refresh)
+        
+        print(f"Refreshing embeddings for {len(entity_ids_to_refresh)} entities "
+              f"({self.stats['skipped_unchanged']} unchanged)")
+        if not entity_ids_to_refresh:
+            return self.stats
         
         return self.generate_batch_embeddings(entity_ids_to_refresh, text_map)
     
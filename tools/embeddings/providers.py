@@ -0,0 +1,321 @@
+"""
+Embedding Providers
+
+Pluggable embedding backends behind one interface. Every provider embeds a
+list of texts per request; embed_in_batches() splits large inputs into
+provider-sized requests and keeps a bounded number of them in flight.
+EmbeddingCache skips texts already embedded with the same model, and
+save_embeddings() writes a batch of vectors with set-based SQL.
+
+Providers:
+    - OpenAIEmbeddingProvider: OpenAI embeddings API (multi-input requests)
+    - HashedNgramEmbeddingProvider: deterministic local embeddings from hashed
+      character n-grams and words; no network access or model files needed,
+      for backfills, tests and benchmarks
+"""
+
+import hashlib
+import os
+import re
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass
+class EmbeddingBatch:
+    """Vectors for one request, in input order (empty if the request failed)."""
+    vectors: List[List[float]]
+    tokens: int
+    error: Optional[str] = None
+
+
+class EmbeddingProvider:
+    """Base class for embedding backends."""
+
+    name = 'base'
+    cost_per_1k_tokens = 0.0
+    max_input_tokens = 8191
+
+    def __init__(self, model: str, dimensions: int, max_batch_size: int = 100):
+        self.model = model
+        self.dimensions = dimensions
+        self.max_batch_size = max_batch_size
+
+    def embed(self, texts: List[str]) -> EmbeddingBatch:
+        """
+        Embed a list of texts in one request.
+
+        Args:
+            texts: Non-empty texts (at most max_batch_size)
+
+        Returns:
+            EmbeddingBatch with one vector per text
+        """
+        raise NotImplementedError
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """OpenAI embeddings API; the client retries rate-limited requests itself."""
+
+    name = 'openai'
+    COSTS = {
+        'text-embedding-3-small': 0.00002,
+        'text-embedding-3-large': 0.00013,
+        'text-embedding-ada-002': 0.00010
+    }
+
+    def __init__(self, model: str = 'text-embedding-3-small', dimensions: int = 1536,
+                 api_key: Optional[str] = None, max_batch_size: int = 256):
+        super().__init__(model, dimensions, max_batch_size)
+        api_key = api_key or os.environ.get('OPENAI_API_KEY')
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY not set. Please set your API key.")
+
+        try:
+            from openai import OpenAI
+        except ImportError:
+            raise ImportError("OpenAI package not installed. Run: uv add openai")
+
+        self.client = OpenAI(api_key=api_key)
+        self.cost_per_1k_tokens = self.COSTS.get(model, 0.0001)
+
+    def embed(self, texts: List[str]) -> EmbeddingBatch:
+        kwargs = {'model': self.model, 'input': texts}
+        if not self.model.endswith('ada-002'):
+            kwargs['dimensions'] = self.dimensions
+        response = self.client.embeddings.create(**kwargs)
+
+        data = sorted(response.data, key=lambda item: item.index)
+        return EmbeddingBatch([item.embedding for item in data], response.usage.total_tokens)
+
+
+class HashedNgramEmbeddingProvider(EmbeddingProvider):
+    """
+    Deterministic local embeddings (feature hashing).
+
+    Lower-cased words and character n-grams (of the text padded with
+    spaces) are hashed with CRC32 into `dimensions` signed buckets; word
+    features are weighted higher. Vectors are L2-normalised, so cosine
+    similarity reflects shared vocabulary and spelling. The same text
+    always produces the same vector, on any machine.
+    """
+
+    name = 'local'
+    WORD_PATTERN = re.compile(r'[a-z0-9]+')
+
+    def __init__(self, model: str = 'hashed-ngram-v1', dimensions: int = 1536,
+                 ngram_range: Tuple[int, int] = (3, 5), word_weight: float = 2.0,
+                 max_batch_size: int = 1000):
+        super().__init__(model, dimensions, max_batch_size)
+        self.ngram_range = ngram_range
+        self.word_weight = word_weight
+
+    def _features(self, text: str) -> Iterator[Tuple[str, float]]:
+        normalized = ' '.join(text.lower().split())
+        for word in self.WORD_PATTERN.findall(normalized):
+            yield 'w:' + word, self.word_weight
+
+        padded = f' {normalized} '
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(padded) - n + 1):
+                yield padded[i:i + n], 1.0
+
+    def embed_one(self, text: str) -> np.ndarray:
+        """Embedding of one text as a float32 array."""
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, weight in self._features(text):
+            h = zlib.crc32(feature.encode('utf-8'))
+            vector[h % self.dimensions] += weight if h & 0x80000000 else -weight
+
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def embed(self, texts: List[str]) -> EmbeddingBatch:
+        vectors = [self.embed_one(text).tolist() for text in texts]
+        return EmbeddingBatch(vectors, sum(len(text.split()) for text in texts))
+
+
+PROVIDERS = {
+    OpenAIEmbeddingProvider.name: OpenAIEmbeddingProvider,
+    HashedNgramEmbeddingProvider.name: HashedNgramEmbeddingProvider,
+}
+
+
+def get_provider(name: str = 'openai', model: Optional[str] = None, **kwargs) -> EmbeddingProvider:
+    """
+    Create a provider by name ('openai' or 'local').
+
+    Args:
+        name: Provider name
+        model: Model name (provider default if None)
+        **kwargs: Provider-specific options (dimensions, max_batch_size, ...)
+    """
+    if name not in PROVIDERS:
+        raise ValueError(f"Provider {name} not supported. Available: {', '.join(PROVIDERS)}")
+    if model is not None:
+        kwargs['model'] = model
+    return PROVIDERS[name](**kwargs)
+
+
+def embed_in_batches(provider: EmbeddingProvider, texts: List[str],
+                     batch_size: Optional[int] = None,
+                     max_concurrency: int = 4) -> Iterator[Tuple[int, EmbeddingBatch]]:
+    """
+    Embed texts with multi-input requests, up to max_concurrency in flight.
+
+    Batches are yielded in input order as soon as each is ready, so callers
+    can write one batch while later requests are still running. A failed
+    request yields an EmbeddingBatch with its error set and does not stop
+    the others.
+
+    Args:
+        provider: Embedding provider
+        texts: Texts to embed
+        batch_size: Texts per request (capped at provider.max_batch_size)
+        max_concurrency: Maximum concurrent requests
+
+    Yields:
+        (offset of the batch's first text, EmbeddingBatch)
+    """
+    batch_size = min(batch_size or provider.max_batch_size, provider.max_batch_size)
+    offsets = list(range(0, len(texts), batch_size))
+
+    def request(offset: int) -> EmbeddingBatch:
+        try:
+            return provider.embed(texts[offset:offset + batch_size])
+        except Exception as e:
+            return EmbeddingBatch([], 0, error=str(e))
+
+    if max_concurrency <= 1:
+        for offset in offsets:
+            yield offset, request(offset)
+        return
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        pending = OrderedDict()
+        for offset in offsets:
+            pending[offset] = executor.submit(request, offset)
+            if len(pending) >= max_concurrency:
+                first, future = pending.popitem(last=False)
+                yield first, future.result()
+        while pending:
+            first, future = pending.popitem(last=False)
+            yield first, future.result()
+
+
+def content_hash(text: str, model: str) -> str:
+    """Cache key for an embedding: SHA-256 of the model name and the text."""
+    return hashlib.sha256(f'{model}\0{text}'.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Process-wide LRU of vectors keyed by content_hash(text, model).
+
+    Repeated texts (e.g. entities sharing a name) are embedded once, and
+    re-runs within a process do not pay for unchanged text.
+    """
+
+    def __init__(self, max_entries: int = 50000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            return vector
+
+    def put(self, key: str, vector: List[float]):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Shared by every EmbeddingGenerator and EmbeddingWorker in this process
+embedding_cache = EmbeddingCache()
+
+
+def vector_literal(vector) -> str:
+    """pgvector text representation of a vector ('[x,y,...]')."""
+    return '[' + ','.join(repr(float(x)) for x in vector) + ']'
+
+
+def apportion_tokens(tokens: int, texts: List[str]) -> List[int]:
+    """Split a request's token count across its texts in proportion to their length."""
+    total = sum(len(text) for text in texts)
+    if not texts or total == 0:
+        return [0] * len(texts)
+    shares = [tokens * len(text) // total for text in texts]
+    shares[-1] += tokens - sum(shares)
+    return shares
+
+
+def save_embeddings(cursor, model_id: str, records: List[Tuple[str, List[float], str, int]],
+                    supersede: bool = True, page_size: int = 500) -> Dict[str, str]:
+    """
+    Bulk-write current embeddings.
+
+    One UPDATE marks the entities' existing embeddings not current (when
+    supersede), then one multi-row INSERT per page writes the new vectors
+    with version = previous max + 1. The caller owns the transaction.
+
+    Args:
+        cursor: psycopg2 cursor
+        model_id: embedding_models.model_id
+        records: (entity_id, vector, embedding_text, tokens_used) per entity;
+            an entity should appear once
+        supersede: Mark the entities' previous embeddings not current
+        page_size: Rows per INSERT statement
+
+    Returns:
+        Dict mapping entity_id to the new embedding_id (expects a dict cursor)
+    """
+    from psycopg2.extras import execute_values
+
+    if not records:
+        return {}
+
+    if supersede:
+        cursor.execute("""
+            UPDATE entity_embeddings
+            SET is_current = FALSE
+            WHERE entity_id = ANY(%s::uuid[]) AND is_current = TRUE
+        """, ([str(record[0]) for record in records],))
+
+    rows = [(str(entity_id), str(model_id), vector_literal(vector), text, tokens)
+            for entity_id, vector, text, tokens in records]
+    inserted = execute_values(cursor, """
+        INSERT INTO entity_embeddings (
+            entity_id, model_id, embedding, embedding_text, is_current, version, tokens_used
+        )
+        SELECT v.entity_id, v.model_id, v.embedding, v.embedding_text, TRUE,
+               COALESCE((SELECT MAX(e.version) FROM entity_embeddings e
+                         WHERE e.entity_id = v.entity_id), 0) + 1,
+               v.tokens_used
+        FROM (VALUES %s) AS v(entity_id, model_id, embedding, embedding_text, tokens_used)
+        RETURNING entity_id, embedding_id
+    """, rows, template='(%s::uuid, %s::uuid, %s::vector, %s, %s::integer)',
+        page_size=page_size, fetch=True)
+
+    return {str(row['entity_id']): str(row['embedding_id']) for row in inserted}
@@ -12,6 +12,8 @@ Options:
     --batch-size N      Process N items per batch (default: 50)
     --poll-interval N   Check queue every N seconds (default: 10)
     --budget-cap X      Daily budget cap in dollars (default: 100.0)
+    --provider NAME     Embedding provider: openai or local (default: openai)
+    --concurrency N     Embedding requests in flight at once (default: 4)
 """
 
 import sys
@@ -27,8 +29,12 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from dotenv import load_dotenv
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from openai import OpenAI
+from psycopg2.extras import RealDictCursor, execute_values
+
+from tools.embeddings.providers import (
+    get_provider, embed_in_batches, embedding_cache, content_hash,
+    apportion_tokens, save_embeddings
+)
 
 # Load environment
 load_dotenv()
@@ -37,16 +43,19 @@ load_dotenv()
 class EmbeddingWorker:
     """Background worker for async embedding generation."""
 
-    def __init__(self, batch_size=50, budget_cap=100.0):
+    def __init__(self, batch_size=50, budget_cap=100.0, provider='openai', model=None,
+                 max_concurrency=4):
         self.batch_size = batch_size
         self.budget_cap = budget_cap
+        self.max_concurrency = max_concurrency
         self.running = True
 
-        # OpenAI client
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        self.model = 'text-embedding-3-small'
-        self.dimensions = 1536
-        self.cost_per_1k_tokens = 0.00002
+        # Embedding provider
+        self.provider = get_provider(provider, model)
+        self.model = self.provider.model
+        self.dimensions = self.provider.dimensions
+        self.cost_per_1k_tokens = self.provider.cost_per_1k_tokens
+        self.cache = embedding_cache
 
         # Database connection
         self.conn = None
@@ -84,12 +93,13 @@ class EmbeddingWorker:
                 model_name, provider, dimensions,
                 cost_per_1k_tokens, max_input_tokens, is_active
             ) VALUES (
-                %s, 'openai', %s, %s, 8191, TRUE
+                %s, %s, %s, %s, %s, TRUE
             )
             ON CONFLICT (model_name, provider)
             DO UPDATE SET is_active = TRUE
             RETURNING model_id
-        """, (self.model, self.dimensions, self.cost_per_1k_tokens))
+        """, (self.model, self.provider.name, self.dimensions, self.cost_per_1k_tokens,
+              self.provider.max_input_tokens))
 
         self.model_id = cursor.fetchone()['model_id']
         self.conn.commit()
@@ -143,59 +153,56 @@ class EmbeddingWorker:
 
         return items
 
-    def generate_embedding(self, text):
-        """Generate embedding via OpenAI API."""
-        try:
-            response = self.client.embeddings.create(
-                model=self.model,
-                input=text,
-                dimensions=self.dimensions
-            )
-
-            return {
-                'embedding': response.data[0].embedding,
-                'tokens': response.usage.total_tokens,
-                'success': True
-            }
-        except Exception as e:
-            return {
-                'error': str(e),
-                'success': False
-            }
-
-    def save_embedding(self, entity_id, embedding, text, tokens):
-        """Save embedding to database."""
+    def generate_embeddings(self, texts):
+        """
+        Embed texts with multi-input requests, reusing cached vectors.
+
+        Returns:
+            One dict per text: {'embedding', 'tokens', 'success'} or
+            {'error', 'success': False}
+        """
+        keys = [content_hash(text, self.model) for text in texts]
+        text_by_key = dict(zip(keys, texts))
+        vectors = {key: self.cache.get(key) for key in text_by_key}
+        pending = [key for key in text_by_key if vectors[key] is None]
+        pending_texts = [text_by_key[key] for key in pending]
+        batch_size = self.provider.max_batch_size
+        tokens = {}
+        errors = {}
+
+        for offset, batch in embed_in_batches(self.provider, pending_texts, batch_size,
+                                              max_concurrency=self.max_concurrency):
+            batch_keys = pending[offset:offset + batch_size]
+            if batch.error:
+                errors.update({key: batch.error for key in batch_keys})
+                continue
+            shares = apportion_tokens(batch.tokens, pending_texts[offset:offset + batch_size])
+            for key, vector, share in zip(batch_keys, batch.vectors, shares):
+                self.cache.put(key, vector)
+                vectors[key] = vector
+                tokens[key] = share
+
+        results = []
+        for key in keys:
+            if key in errors:
+                results.append({'error': errors[key], 'success': False})
+            else:
+                # Tokens are charged once per distinct text
+                results.append({'embedding': vectors[key], 'tokens': tokens.pop(key, 0),
+                                'success': True})
+        return results
+
+    def save_embeddings(self, records):
+        """
+        Save embeddings to database in one transaction.
+
+        Args:
+            records: (entity_id, embedding, text, tokens) per entity
+        """
         cursor = self.conn.cursor()
 
         try:
-            # Mark old embeddings as not current
-            cursor.execute("""
-                UPDATE entity_embeddings
-                SET is_current = FALSE
-                WHERE entity_id = %s
-            """, (entity_id,))
-
-            # Insert new embedding
-            cursor.execute("""
-                INSERT INTO entity_embeddings (
-                    entity_id,
-                    model_id,
-                    embedding,
-                    embedding_text,
-                    is_current,
-                    version,
-                    tokens_used
-                ) VALUES (
-                    %s, %s, %s, %s, TRUE,
-                    COALESCE((
-                        SELECT MAX(version) + 1
-                        FROM entity_embeddings
-                        WHERE entity_id = %s
-                    ), 1),
-                    %s
-                )
-            """, (entity_id, self.model_id, embedding, text, entity_id, tokens))
-
+            save_embeddings(cursor, self.model_id, records)
             self.conn.commit()
             cursor.close()
             return True
@@ -205,32 +212,38 @@ class EmbeddingWorker:
             cursor.close()
             raise e
 
-    def mark_completed(self, queue_id):
-        """Mark queue item as completed."""
+    def mark_completed(self, queue_ids):
+        """Mark queue items as completed."""
         cursor = self.conn.cursor()
 
         cursor.execute("""
             UPDATE embedding_generation_queue
             SET status = 'completed',
                 processed_at = CURRENT_TIMESTAMP
-            WHERE queue_id = %s
-        """, (queue_id,))
+            WHERE queue_id = ANY(%s::uuid[])
+        """, (list(queue_ids),))
 
         self.conn.commit()
         cursor.close()
 
-    def mark_failed(self, queue_id, error_msg):
-        """Mark queue item as failed."""
+    def mark_failed(self, failures):
+        """
+        Mark queue items as failed.
+
+        Args:
+            failures: (queue_id, error message) pairs
+        """
         cursor = self.conn.cursor()
 
-        cursor.execute("""
-            UPDATE embedding_generation_queue
+        execute_values(cursor, """
+            UPDATE embedding_generation_queue q
             SET status = 'failed',
-                attempt_count = attempt_count + 1,
-                error_message = %s,
+                attempt_count = q.attempt_count + 1,
+                error_message = f.error_message,
                 processed_at = CURRENT_TIMESTAMP
-            WHERE queue_id = %s
-        """, (error_msg, queue_id))
+            FROM (VALUES %s) AS f(queue_id, error_message)
+            WHERE q.queue_id = f.queue_id
+        """, list(failures), template='(%s::uuid, %s)')
 
         self.conn.commit()
         cursor.close()
@@ -250,53 +263,49 @@ class EmbeddingWorker:
 
         print(f'  Processing {len(items)} items...')
 
-        # Process each item
-        succeeded = 0
-        failed = 0
-
+        failures = []
+        embeddable = []
         for item in items:
-            queue_id = item['queue_id']
-            entity_id = item['entity_id']
-            text = item['text_to_embed']
-
+            text = (item['text_to_embed'] or '').strip()
+            if text:
+                embeddable.append((item, text))
+            else:
+                failures.append((item['queue_id'], 'No text to embed'))
+
+        results = self.generate_embeddings([text for _, text in embeddable])
+
+        # One current embedding per entity: the last queued text wins
+        records = {}
+        completed = []
+        for (item, text), result in zip(embeddable, results):
+            if result['success']:
+                records[item['entity_id']] = (item['entity_id'], result['embedding'], text, result['tokens'])
+                completed.append(item['queue_id'])
+            else:
+                failures.append((item['queue_id'], result['error']))
+
+        if records:
             try:
-                # Generate embedding
-                result = self.generate_embedding(text)
-
-                if result['success']:
-                    # Save to database
-                    self.save_embedding(
-                        entity_id,
-                        result['embedding'],
-                        text,
-                        result['tokens']
-                    )
-
-                    # Mark completed
-                    self.mark_completed(queue_id)
-
-                    # Update stats
-                    succeeded += 1
-                    self.stats['tokens'] += result['tokens']
-                    self.stats['total_cost'] += (result['tokens'] / 1000.0) * self.cost_per_1k_tokens
-
-                else:
-                    # Mark failed
-                    self.mark_failed(queue_id, result['error'])
-                    failed += 1
-
+                self.save_embeddings(list(records.values()))
+                self.mark_completed(completed)
             except Exception as e:
-                # Mark failed
-                self.mark_failed(queue_id, str(e))
-                failed += 1
-                print(f'    ✗ Error processing {entity_id}: {e}')
-
-        # Update overall stats
+                print(f'    ✗ Error saving batch: {e}')
+                failures.extend((queue_id, str(e)) for queue_id in completed)
+                completed = []
+                records = {}
+
+        if failures:
+            self.mark_failed(failures)
+
+        # Update stats
+        tokens = sum(record[3] for record in records.values())
+        self.stats['total_tokens'] += tokens
+        self.stats['total_cost'] += (tokens / 1000.0) * self.cost_per_1k_tokens
         self.stats['processed'] += len(items)
-        self.stats['succeeded'] += succeeded
-        self.stats['failed'] += failed
+        self.stats['succeeded'] += len(completed)
+        self.stats['failed'] += len(failures)
 
-        print(f'  ✓ Completed: {succeeded}, Failed: {failed}')
+        print(f'  ✓ Completed: {len(completed)}, Failed: {len(failures)}')
 
         return len(items)
 
@@ -322,7 +331,7 @@ class EmbeddingWorker:
         print('=' * 70)
         print('EMBEDDING WORKER STARTED')
         print('=' * 70)
-        print(f'  Model: {self.model}')
+        print(f'  Model: {self.model} ({self.provider.name})')
         print(f'  Batch size: {self.batch_size}')
         print(f'  Poll interval: {poll_interval}s')
         print(f'  Budget cap: ${self.budget_cap}/day')
@@ -383,6 +392,10 @@ def main():
                         help='Poll interval in seconds (default: 10)')
     parser.add_argument('--budget-cap', type=float, default=100.0,
                         help='Daily budget cap in dollars (default: 100.0)')
+    parser.add_argument('--provider', default=os.getenv('EMBEDDING_PROVIDER', 'openai'),
+                        help='Embedding provider: openai or local (default: openai)')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='Embedding requests in flight at once (default: 4)')
 
     args = parser.parse_args()
 
@@ -394,7 +407,9 @@ def main():
     try:
         worker = EmbeddingWorker(
             batch_size=args.batch_size,
-            budget_cap=args.budget_cap
+            budget_cap=args.budget_cap,
+            provider=args.provider,
+            max_concurrency=args.concurrency
         )
         worker.run(poll_interval=args.poll_interval)
     except Exception as e: